@@ -0,0 +1,30 @@
+"""add speech regions to transcriptions
+
+Revision ID: 2a7f4c9e8b61
+Revises: 8e5c1f3a7d24
+Create Date: 2025-06-16 15:20:11.337948
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7f4c9e8b61'
+down_revision = '8e5c1f3a7d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transcriptions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('audio_duration', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('speech_duration', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('speech_regions', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transcriptions', schema=None) as batch_op:
+        batch_op.drop_column('speech_regions')
+        batch_op.drop_column('speech_duration')
+        batch_op.drop_column('audio_duration')
@@ -0,0 +1,92 @@
+"""add indexes for list filters and sort keys
+
+Revision ID: 3f6d2a8c41b7
+Revises: 9cc4b07120b3
+Create Date: 2025-06-03 09:12:41.518302
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6d2a8c41b7'
+down_revision = '9cc4b07120b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 与各蓝图列表接口的过滤条件、排序键以及按父记录查询日志的方式一一对应
+    op.create_index('ix_alarm_records_alarm_time_id', 'alarm_records', ['alarm_time', 'id'], unique=False)
+    op.create_index('ix_alarm_records_status_alarm_time', 'alarm_records', ['status', 'alarm_time'], unique=False)
+    op.create_index('ix_alarm_records_alarm_type_alarm_time', 'alarm_records', ['alarm_type', 'alarm_time'], unique=False)
+    op.create_index('ix_alarm_records_emergency_level_alarm_time', 'alarm_records', ['emergency_level', 'alarm_time'], unique=False)
+    op.create_index('ix_media_files_alarm_record_id', 'media_files', ['alarm_record_id'], unique=False)
+    op.create_index('ix_transcriptions_alarm_record_id', 'transcriptions', ['alarm_record_id'], unique=False)
+    op.create_index('ix_dispatch_units_parent_id', 'dispatch_units', ['parent_id'], unique=False)
+    op.create_index('ix_alarm_dispatches_dispatch_time_id', 'alarm_dispatches', ['dispatch_time', 'id'], unique=False)
+    op.create_index('ix_alarm_dispatches_unit_id_dispatch_time', 'alarm_dispatches', ['unit_id', 'dispatch_time'], unique=False)
+    op.create_index('ix_alarm_dispatches_status_dispatch_time', 'alarm_dispatches', ['status', 'dispatch_time'], unique=False)
+    op.create_index('ix_alarm_dispatches_alarm_record_id_dispatch_time', 'alarm_dispatches', ['alarm_record_id', 'dispatch_time'], unique=False)
+    op.create_index('ix_dispatch_logs_dispatch_id_created_at', 'dispatch_logs', ['dispatch_id', 'created_at'], unique=False)
+    op.create_index('ix_police_officers_unit_id_name', 'police_officers', ['unit_id', 'name'], unique=False)
+    op.create_index('ix_police_officers_status_name', 'police_officers', ['status', 'name'], unique=False)
+    op.create_index('ix_dispatch_tasks_assigned_time_id', 'dispatch_tasks', ['assigned_time', 'id'], unique=False)
+    op.create_index('ix_dispatch_tasks_officer_id_assigned_time', 'dispatch_tasks', ['officer_id', 'assigned_time'], unique=False)
+    op.create_index('ix_dispatch_tasks_status_assigned_time', 'dispatch_tasks', ['status', 'assigned_time'], unique=False)
+    op.create_index('ix_dispatch_tasks_priority_assigned_time', 'dispatch_tasks', ['priority', 'assigned_time'], unique=False)
+    op.create_index('ix_dispatch_tasks_alarm_record_id_assigned_time', 'dispatch_tasks', ['alarm_record_id', 'assigned_time'], unique=False)
+    op.create_index('ix_dispatch_groups_created_at_id', 'dispatch_groups', ['created_at', 'id'], unique=False)
+    op.create_index('ix_dispatch_groups_status_created_at', 'dispatch_groups', ['status', 'created_at'], unique=False)
+    op.create_index('ix_dispatch_groups_alarm_record_id_created_at', 'dispatch_groups', ['alarm_record_id', 'created_at'], unique=False)
+    op.create_index('ix_dispatch_group_members_group_id', 'dispatch_group_members', ['group_id'], unique=False)
+    op.create_index('ix_handling_records_created_at_id', 'handling_records', ['created_at', 'id'], unique=False)
+    op.create_index('ix_handling_records_status_created_at', 'handling_records', ['status', 'created_at'], unique=False)
+    op.create_index('ix_handling_records_alarm_record_id_created_at', 'handling_records', ['alarm_record_id', 'created_at'], unique=False)
+    op.create_index('ix_evidence_files_handling_record_id', 'evidence_files', ['handling_record_id'], unique=False)
+    op.create_index('ix_handling_logs_handling_record_id_created_at', 'handling_logs', ['handling_record_id', 'created_at'], unique=False)
+    op.create_index('ix_archived_alarms_created_at_id', 'archived_alarms', ['created_at', 'id'], unique=False)
+    op.create_index('ix_archived_alarms_archive_status_created_at', 'archived_alarms', ['archive_status', 'created_at'], unique=False)
+    op.create_index('ix_archived_alarms_archive_type_created_at', 'archived_alarms', ['archive_type', 'created_at'], unique=False)
+    op.create_index('ix_archived_alarms_alarm_record_id_created_at', 'archived_alarms', ['alarm_record_id', 'created_at'], unique=False)
+    op.create_index('ix_archive_files_archived_alarm_id', 'archive_files', ['archived_alarm_id'], unique=False)
+    op.create_index('ix_archive_logs_archived_alarm_id_created_at', 'archive_logs', ['archived_alarm_id', 'created_at'], unique=False)
+    op.create_index('ix_statistics_records_statistics_type_statistics_date', 'statistics_records', ['statistics_type', 'statistics_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_statistics_records_statistics_type_statistics_date', table_name='statistics_records')
+    op.drop_index('ix_archive_logs_archived_alarm_id_created_at', table_name='archive_logs')
+    op.drop_index('ix_archive_files_archived_alarm_id', table_name='archive_files')
+    op.drop_index('ix_archived_alarms_alarm_record_id_created_at', table_name='archived_alarms')
+    op.drop_index('ix_archived_alarms_archive_type_created_at', table_name='archived_alarms')
+    op.drop_index('ix_archived_alarms_archive_status_created_at', table_name='archived_alarms')
+    op.drop_index('ix_archived_alarms_created_at_id', table_name='archived_alarms')
+    op.drop_index('ix_handling_logs_handling_record_id_created_at', table_name='handling_logs')
+    op.drop_index('ix_evidence_files_handling_record_id', table_name='evidence_files')
+    op.drop_index('ix_handling_records_alarm_record_id_created_at', table_name='handling_records')
+    op.drop_index('ix_handling_records_status_created_at', table_name='handling_records')
+    op.drop_index('ix_handling_records_created_at_id', table_name='handling_records')
+    op.drop_index('ix_dispatch_group_members_group_id', table_name='dispatch_group_members')
+    op.drop_index('ix_dispatch_groups_alarm_record_id_created_at', table_name='dispatch_groups')
+    op.drop_index('ix_dispatch_groups_status_created_at', table_name='dispatch_groups')
+    op.drop_index('ix_dispatch_groups_created_at_id', table_name='dispatch_groups')
+    op.drop_index('ix_dispatch_tasks_alarm_record_id_assigned_time', table_name='dispatch_tasks')
+    op.drop_index('ix_dispatch_tasks_priority_assigned_time', table_name='dispatch_tasks')
+    op.drop_index('ix_dispatch_tasks_status_assigned_time', table_name='dispatch_tasks')
+    op.drop_index('ix_dispatch_tasks_officer_id_assigned_time', table_name='dispatch_tasks')
+    op.drop_index('ix_dispatch_tasks_assigned_time_id', table_name='dispatch_tasks')
+    op.drop_index('ix_police_officers_status_name', table_name='police_officers')
+    op.drop_index('ix_police_officers_unit_id_name', table_name='police_officers')
+    op.drop_index('ix_dispatch_logs_dispatch_id_created_at', table_name='dispatch_logs')
+    op.drop_index('ix_alarm_dispatches_alarm_record_id_dispatch_time', table_name='alarm_dispatches')
+    op.drop_index('ix_alarm_dispatches_status_dispatch_time', table_name='alarm_dispatches')
+    op.drop_index('ix_alarm_dispatches_unit_id_dispatch_time', table_name='alarm_dispatches')
+    op.drop_index('ix_alarm_dispatches_dispatch_time_id', table_name='alarm_dispatches')
+    op.drop_index('ix_dispatch_units_parent_id', table_name='dispatch_units')
+    op.drop_index('ix_transcriptions_alarm_record_id', table_name='transcriptions')
+    op.drop_index('ix_media_files_alarm_record_id', table_name='media_files')
+    op.drop_index('ix_alarm_records_emergency_level_alarm_time', table_name='alarm_records')
+    op.drop_index('ix_alarm_records_alarm_type_alarm_time', table_name='alarm_records')
+    op.drop_index('ix_alarm_records_status_alarm_time', table_name='alarm_records')
+    op.drop_index('ix_alarm_records_alarm_time_id', table_name='alarm_records')
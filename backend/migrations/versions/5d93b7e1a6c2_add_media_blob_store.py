@@ -0,0 +1,41 @@
+"""add content-addressed media blob store
+
+Revision ID: 5d93b7e1a6c2
+Revises: c41a8e2d9f57
+Create Date: 2025-06-11 16:03:22.914570
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d93b7e1a6c2'
+down_revision = 'c41a8e2d9f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256', name=op.f('pk_media_blobs'))
+    )
+    # 已有文件记录的 content_hash 为空，继续使用原路径
+    for table in ('media_files', 'evidence_files', 'archive_files'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+            batch_op.create_index(f'ix_{table}_content_hash', ['content_hash'], unique=False)
+
+
+def downgrade():
+    for table in ('archive_files', 'evidence_files', 'media_files'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_content_hash')
+            batch_op.drop_column('content_hash')
+
+    op.drop_table('media_blobs')
@@ -0,0 +1,36 @@
+"""add media probe fields
+
+Revision ID: 7b2e9d4f0c13
+Revises: 3f6d2a8c41b7
+Create Date: 2025-06-05 14:27:08.731466
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e9d4f0c13'
+down_revision = '3f6d2a8c41b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('probe_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('probe_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('codec', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('sample_rate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('media_files', schema=None) as batch_op:
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
+        batch_op.drop_column('sample_rate')
+        batch_op.drop_column('codec')
+        batch_op.drop_column('probe_error')
+        batch_op.drop_column('probe_status')
@@ -0,0 +1,38 @@
+"""add transcription segments
+
+Revision ID: 8e5c1f3a7d24
+Revises: 5d93b7e1a6c2
+Create Date: 2025-06-13 11:48:36.402751
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e5c1f3a7d24'
+down_revision = '5d93b7e1a6c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transcription_segments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transcription_id', sa.Integer(), nullable=False),
+    sa.Column('segment_index', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Float(), nullable=False),
+    sa.Column('end_time', sa.Float(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['transcription_id'], ['transcriptions.id'], name=op.f('fk_transcription_segments_transcription_id_transcriptions')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_transcription_segments')),
+    sa.UniqueConstraint('transcription_id', 'segment_index', name='uq_transcription_segments_transcription_id_segment_index')
+    )
+
+
+def downgrade():
+    op.drop_table('transcription_segments')
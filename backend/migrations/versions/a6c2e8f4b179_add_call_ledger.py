@@ -0,0 +1,76 @@
+"""add call ledger
+
+Revision ID: a6c2e8f4b179
+Revises: e1a9b7c4f352
+Create Date: 2025-06-26 15:02:53.771264
+
+"""
+from datetime import date, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c2e8f4b179'
+down_revision = 'e1a9b7c4f352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL 下按 start_time 建日分区表，分区表的主键和唯一约束必须包含分区键
+    partitioned = op.get_bind().dialect.name == 'postgresql'
+    if partitioned:
+        primary_key = sa.PrimaryKeyConstraint('id', 'start_time', name=op.f('pk_call_ledger'))
+        id_column = sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False)
+        options = {'postgresql_partition_by': 'RANGE (start_time)'}
+    else:
+        primary_key = sa.PrimaryKeyConstraint('id', name=op.f('pk_call_ledger'))
+        id_column = sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False)
+        options = {}
+
+    op.create_table('call_ledger',
+    id_column,
+    sa.Column('call_id', sa.String(length=64), nullable=False),
+    sa.Column('direction', sa.String(length=20), nullable=True),
+    sa.Column('caller_number', sa.String(length=50), nullable=True),
+    sa.Column('caller_number_normalized', sa.String(length=50), nullable=True),
+    sa.Column('called_number', sa.String(length=50), nullable=True),
+    sa.Column('called_number_normalized', sa.String(length=50), nullable=True),
+    sa.Column('agent_id', sa.String(length=50), nullable=True),
+    sa.Column('trunk', sa.String(length=50), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('answer_time', sa.DateTime(), nullable=True),
+    sa.Column('end_time', sa.DateTime(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('talk_duration', sa.Integer(), nullable=True),
+    sa.Column('disposition', sa.String(length=20), nullable=True),
+    sa.Column('alarm_record_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    primary_key,
+    sa.UniqueConstraint('call_id', 'start_time', name='uq_call_ledger_call_id_start_time'),
+    **options
+    )
+    op.create_index('ix_call_ledger_start_time', 'call_ledger', ['start_time'], unique=False)
+    op.create_index('ix_call_ledger_caller_number_normalized_start_time', 'call_ledger', ['caller_number_normalized', 'start_time'], unique=False)
+    op.create_index('ix_call_ledger_called_number_normalized_start_time', 'call_ledger', ['called_number_normalized', 'start_time'], unique=False)
+    op.create_index('ix_call_ledger_alarm_record_id', 'call_ledger', ['alarm_record_id'], unique=False)
+
+    if partitioned:
+        # 兜底分区接收没有对应日分区的数据（如交换机时钟错误、补录历史话单），日常由 flask maintain-call-ledger
+        # 预建日分区，并把兜底分区中的数据迁入对应日分区、清理其中的过期行
+        op.execute('CREATE TABLE call_ledger_default PARTITION OF call_ledger DEFAULT')
+        today = date.today()
+        for offset in range(-1, 8):
+            day = today + timedelta(days=offset)
+            op.execute(f"CREATE TABLE call_ledger_p{day:%Y%m%d} PARTITION OF call_ledger "
+                       f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')")
+
+
+def downgrade():
+    op.drop_index('ix_call_ledger_alarm_record_id', table_name='call_ledger')
+    op.drop_index('ix_call_ledger_called_number_normalized_start_time', table_name='call_ledger')
+    op.drop_index('ix_call_ledger_caller_number_normalized_start_time', table_name='call_ledger')
+    op.drop_index('ix_call_ledger_start_time', table_name='call_ledger')
+    # 分区表删除父表时一并删除全部分区
+    op.drop_table('call_ledger')
@@ -0,0 +1,32 @@
+"""add duplicate alarm link
+
+Revision ID: a8d3f61c27e4
+Revises: f2c6e8a1b593
+Create Date: 2025-06-24 16:35:02.871946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3f61c27e4'
+down_revision = 'f2c6e8a1b593'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('primary_alarm_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('duplicate_reason', sa.String(length=20), nullable=True))
+        batch_op.create_foreign_key(batch_op.f('fk_alarm_records_primary_alarm_id_alarm_records'), 'alarm_records', ['primary_alarm_id'], ['id'])
+        batch_op.create_index('ix_alarm_records_primary_alarm_id', ['primary_alarm_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_alarm_records_primary_alarm_id')
+        batch_op.drop_constraint(batch_op.f('fk_alarm_records_primary_alarm_id_alarm_records'), type_='foreignkey')
+        batch_op.drop_column('duplicate_reason')
+        batch_op.drop_column('primary_alarm_id')
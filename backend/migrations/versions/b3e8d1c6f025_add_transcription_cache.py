@@ -0,0 +1,43 @@
+"""add transcription cache
+
+Revision ID: b3e8d1c6f025
+Revises: 2a7f4c9e8b61
+Create Date: 2025-06-17 10:42:05.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8d1c6f025'
+down_revision = '2a7f4c9e8b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transcription_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('model_version', sa.String(length=100), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('audio_duration', sa.Float(), nullable=True),
+    sa.Column('speech_duration', sa.Float(), nullable=True),
+    sa.Column('speech_regions', sa.JSON(), nullable=True),
+    sa.Column('asr_seconds', sa.Float(), nullable=True),
+    sa.Column('hit_count', sa.Integer(), nullable=True),
+    sa.Column('last_hit_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash', 'model_version', name='uq_transcription_cache_content_hash_model_version')
+    )
+    with op.batch_alter_table('transcription_segments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('asr_seconds', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transcription_segments', schema=None) as batch_op:
+        batch_op.drop_column('asr_seconds')
+
+    op.drop_table('transcription_cache')
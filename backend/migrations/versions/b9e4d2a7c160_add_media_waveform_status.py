@@ -0,0 +1,28 @@
+"""add media waveform status
+
+Revision ID: b9e4d2a7c160
+Revises: a6c2e8f4b179
+Create Date: 2025-06-27 11:26:08.143955
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e4d2a7c160'
+down_revision = 'a6c2e8f4b179'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('waveform_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('waveform_error', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('media_files', schema=None) as batch_op:
+        batch_op.drop_column('waveform_error')
+        batch_op.drop_column('waveform_status')
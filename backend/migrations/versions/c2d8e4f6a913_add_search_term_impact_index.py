@@ -0,0 +1,24 @@
+"""add impact-ordered index on alarm search terms
+
+Revision ID: c2d8e4f6a913
+Revises: f7a3c9e1b284
+Create Date: 2025-07-02 15:08:31.274916
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8e4f6a913'
+down_revision = 'f7a3c9e1b284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 检索按权重从高到低读取每个词项的倒排列表，反向扫描该索引即可，读够一页即停
+    op.create_index('ix_alarm_search_terms_term_weight_alarm_record_id', 'alarm_search_terms', ['term', 'weight', 'alarm_record_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_alarm_search_terms_term_weight_alarm_record_id', table_name='alarm_search_terms')
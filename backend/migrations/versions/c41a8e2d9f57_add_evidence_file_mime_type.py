@@ -0,0 +1,26 @@
+"""add evidence file mime type
+
+Revision ID: c41a8e2d9f57
+Revises: 7b2e9d4f0c13
+Create Date: 2025-06-09 10:12:45.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41a8e2d9f57'
+down_revision = '7b2e9d4f0c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('evidence_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mime_type', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('evidence_files', schema=None) as batch_op:
+        batch_op.drop_column('mime_type')
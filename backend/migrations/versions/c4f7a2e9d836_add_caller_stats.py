@@ -0,0 +1,109 @@
+"""add caller stats
+
+Revision ID: c4f7a2e9d836
+Revises: a8d3f61c27e4
+Create Date: 2025-06-24 10:41:15.382907
+
+"""
+import re
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a2e9d836'
+down_revision = 'a8d3f61c27e4'
+branch_labels = None
+depends_on = None
+
+RECENT_TYPES = 5
+
+
+def normalize_phone(phone):
+    # 与 src/phone_numbers.py 保持一致，迁移脚本不依赖应用代码
+    if not phone:
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    national = None
+    if digits.startswith('0086'):
+        national = digits[4:]
+    elif digits.startswith('86') and 11 <= len(digits) <= 13:
+        # 国内号码不会以 86 开头且长达 11~13 位（手机号以 1 开头，带区号的座机以 0 开头）
+        national = digits[2:]
+    if national is not None:
+        # 去掉国家码后，1 开头的 11 位是手机号，其余是省略了长途字冠 0 的区号加本地号码
+        if (national.startswith('1') and len(national) == 11) or national.startswith('0'):
+            digits = national
+        else:
+            digits = '0' + national
+    if len(digits) < 7:
+        return None
+    return digits
+
+
+def upgrade():
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reporter_phone_normalized', sa.String(length=50), nullable=True))
+
+    op.create_table('caller_stats',
+    sa.Column('phone', sa.String(length=50), nullable=False),
+    sa.Column('total_calls', sa.Integer(), nullable=False),
+    sa.Column('first_call_at', sa.DateTime(), nullable=True),
+    sa.Column('last_call_at', sa.DateTime(), nullable=True),
+    sa.Column('last_alarm_id', sa.Integer(), nullable=True),
+    sa.Column('last_alarm_types', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['last_alarm_id'], ['alarm_records.id'], name=op.f('fk_caller_stats_last_alarm_id_alarm_records')),
+    sa.PrimaryKeyConstraint('phone', name=op.f('pk_caller_stats'))
+    )
+
+    # 回填规范化号码，并按报警时间顺序汇总各号码的来电统计
+    bind = op.get_bind()
+    alarm_records = sa.table('alarm_records',
+        sa.column('id', sa.Integer), sa.column('reporter_phone', sa.String),
+        sa.column('reporter_phone_normalized', sa.String), sa.column('alarm_time', sa.DateTime),
+        sa.column('alarm_type', sa.String))
+    caller_stats = sa.table('caller_stats',
+        sa.column('phone', sa.String), sa.column('total_calls', sa.Integer),
+        sa.column('first_call_at', sa.DateTime), sa.column('last_call_at', sa.DateTime),
+        sa.column('last_alarm_id', sa.Integer), sa.column('last_alarm_types', sa.JSON),
+        sa.column('updated_at', sa.DateTime))
+
+    stats = {}
+    updates = []
+    rows = bind.execute(sa.select(alarm_records.c.id, alarm_records.c.reporter_phone,
+                                  alarm_records.c.alarm_time, alarm_records.c.alarm_type)
+                        .where(alarm_records.c.reporter_phone.isnot(None))
+                        .order_by(alarm_records.c.alarm_time, alarm_records.c.id))
+    for alarm_id, raw, alarm_time, alarm_type in rows:
+        phone = normalize_phone(raw)
+        if not phone:
+            continue
+        updates.append({'alarm_id': alarm_id, 'normalized': phone})
+        entry = stats.setdefault(phone, {'phone': phone, 'total_calls': 0, 'first_call_at': alarm_time,
+                                         'last_alarm_types': []})
+        entry['total_calls'] += 1
+        entry['last_call_at'] = alarm_time
+        entry['last_alarm_id'] = alarm_id
+        if alarm_type:
+            entry['last_alarm_types'] = ([alarm_type] + [t for t in entry['last_alarm_types']
+                                                         if t != alarm_type])[:RECENT_TYPES]
+
+    if updates:
+        bind.execute(alarm_records.update()
+                     .where(alarm_records.c.id == sa.bindparam('alarm_id'))
+                     .values(reporter_phone_normalized=sa.bindparam('normalized')), updates)
+    if stats:
+        now = datetime.utcnow()
+        op.bulk_insert(caller_stats, [dict(entry, updated_at=now) for entry in stats.values()])
+
+    op.create_index('ix_alarm_records_reporter_phone_normalized_alarm_time', 'alarm_records', ['reporter_phone_normalized', 'alarm_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_alarm_records_reporter_phone_normalized_alarm_time', table_name='alarm_records')
+    op.drop_table('caller_stats')
+
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.drop_column('reporter_phone_normalized')
@@ -0,0 +1,67 @@
+"""add media integrity log
+
+Revision ID: d3f8a1c5e927
+Revises: b9e4d2a7c160
+Create Date: 2025-06-28 16:44:21.905372
+
+"""
+import hashlib
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8a1c5e927'
+down_revision = 'b9e4d2a7c160'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_integrity_log',
+    sa.Column('seq', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('prev_hash', sa.String(length=64), nullable=False),
+    sa.Column('entry_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('seq', name=op.f('pk_media_integrity_log'))
+    )
+    op.create_index('ix_media_integrity_log_sha256', 'media_integrity_log', ['sha256'], unique=False)
+
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('verified_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('integrity_status', sa.String(length=20), nullable=True))
+        batch_op.create_index('ix_media_blobs_verified_at', ['verified_at'], unique=False)
+
+    # 已有内容按入库时间补登到哈希链（与 src/media_integrity.py 的 chain_hash 一致）
+    bind = op.get_bind()
+    media_blobs = sa.table('media_blobs',
+        sa.column('sha256', sa.String), sa.column('size', sa.BigInteger), sa.column('created_at', sa.DateTime))
+    log = sa.table('media_integrity_log',
+        sa.column('seq', sa.Integer), sa.column('sha256', sa.String), sa.column('size', sa.BigInteger),
+        sa.column('prev_hash', sa.String), sa.column('entry_hash', sa.String), sa.column('created_at', sa.DateTime))
+    prev_hash = '0' * 64
+    created_at = datetime.utcnow().replace(microsecond=0)
+    entries = []
+    rows = bind.execute(sa.select(media_blobs.c.sha256, media_blobs.c.size)
+                        .order_by(media_blobs.c.created_at, media_blobs.c.sha256))
+    for seq, (sha256, size) in enumerate(rows, start=1):
+        raw = f'{seq}|{prev_hash}|{sha256}|{size}|{created_at.isoformat()}'
+        entry_hash = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        entries.append({'seq': seq, 'sha256': sha256, 'size': size, 'prev_hash': prev_hash,
+                        'entry_hash': entry_hash, 'created_at': created_at})
+        prev_hash = entry_hash
+    if entries:
+        op.bulk_insert(log, entries)
+
+
+def downgrade():
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_blobs_verified_at')
+        batch_op.drop_column('integrity_status')
+        batch_op.drop_column('verified_at')
+
+    op.drop_index('ix_media_integrity_log_sha256', table_name='media_integrity_log')
+    op.drop_table('media_integrity_log')
@@ -0,0 +1,79 @@
+"""add alarm type taxonomy
+
+Revision ID: d7a4f2b9c318
+Revises: b3e8d1c6f025
+Create Date: 2025-06-19 14:08:37.604511
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a4f2b9c318'
+down_revision = 'b3e8d1c6f025'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('alarm_types',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['alarm_types.id'], name=op.f('fk_alarm_types_parent_id_alarm_types')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_alarm_types'))
+    )
+    op.create_index('ix_alarm_types_path', 'alarm_types', ['path'], unique=True)
+    op.create_index('ix_alarm_types_parent_id', 'alarm_types', ['parent_id'], unique=False)
+
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('alarm_type_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(batch_op.f('fk_alarm_records_alarm_type_id_alarm_types'), 'alarm_types', ['alarm_type_id'], ['id'])
+
+    # 由已有的 alarm_type 字符串生成分类树并回填 alarm_type_id
+    bind = op.get_bind()
+    alarm_types = sa.table('alarm_types',
+        sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('path', sa.String),
+        sa.column('parent_id', sa.Integer), sa.column('depth', sa.Integer), sa.column('created_at', sa.DateTime))
+    alarm_records = sa.table('alarm_records',
+        sa.column('alarm_type', sa.String), sa.column('alarm_type_id', sa.Integer))
+
+    ids = {}
+    now = datetime.utcnow()
+    existing = bind.execute(sa.select(alarm_records.c.alarm_type).where(
+        alarm_records.c.alarm_type.isnot(None)).distinct()).scalars().all()
+    for raw in existing:
+        segments = [segment.strip() for segment in raw.split('/') if segment.strip()]
+        if not segments:
+            continue
+        for depth in range(len(segments)):
+            path = '/'.join(segments[:depth + 1])
+            if path in ids:
+                continue
+            parent_id = ids['/'.join(segments[:depth])] if depth else None
+            bind.execute(alarm_types.insert().values(
+                name=segments[depth], path=path, parent_id=parent_id, depth=depth, created_at=now))
+            ids[path] = bind.execute(sa.select(alarm_types.c.id).where(alarm_types.c.path == path)).scalar()
+        bind.execute(alarm_records.update().where(alarm_records.c.alarm_type == raw).values(
+            alarm_type='/'.join(segments), alarm_type_id=ids['/'.join(segments)]))
+
+    op.drop_index('ix_alarm_records_alarm_type_alarm_time', table_name='alarm_records')
+    op.create_index('ix_alarm_records_alarm_type_id_alarm_time', 'alarm_records', ['alarm_type_id', 'alarm_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_alarm_records_alarm_type_id_alarm_time', table_name='alarm_records')
+    op.create_index('ix_alarm_records_alarm_type_alarm_time', 'alarm_records', ['alarm_type', 'alarm_time'], unique=False)
+
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_alarm_records_alarm_type_id_alarm_types'), type_='foreignkey')
+        batch_op.drop_column('alarm_type_id')
+
+    op.drop_index('ix_alarm_types_parent_id', table_name='alarm_types')
+    op.drop_index('ix_alarm_types_path', table_name='alarm_types')
+    op.drop_table('alarm_types')
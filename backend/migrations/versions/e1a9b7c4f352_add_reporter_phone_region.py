@@ -0,0 +1,30 @@
+"""add reporter phone region
+
+Revision ID: e1a9b7c4f352
+Revises: c4f7a2e9d836
+Create Date: 2025-06-25 09:17:42.518630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a9b7c4f352'
+down_revision = 'c4f7a2e9d836'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reporter_phone_province', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('reporter_phone_city', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('reporter_phone_carrier', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.drop_column('reporter_phone_carrier')
+        batch_op.drop_column('reporter_phone_city')
+        batch_op.drop_column('reporter_phone_province')
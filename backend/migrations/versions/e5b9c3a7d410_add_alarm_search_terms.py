@@ -0,0 +1,35 @@
+"""add alarm full-text search index
+
+Revision ID: e5b9c3a7d410
+Revises: d7a4f2b9c318
+Create Date: 2025-06-20 11:26:53.902715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c3a7d410'
+down_revision = 'd7a4f2b9c318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已有警情的词项由 flask rebuild-search-index 生成
+    op.create_table('alarm_search_terms',
+    sa.Column('term', sa.String(length=32), nullable=False),
+    sa.Column('alarm_record_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['alarm_record_id'], ['alarm_records.id'], name=op.f('fk_alarm_search_terms_alarm_record_id_alarm_records')),
+    sa.PrimaryKeyConstraint('term', 'alarm_record_id', name=op.f('pk_alarm_search_terms'))
+    )
+    op.create_index('ix_alarm_search_terms_alarm_record_id', 'alarm_search_terms', ['alarm_record_id'], unique=False)
+    op.create_index('ix_alarm_search_terms_term_alarm_record_id_weight', 'alarm_search_terms', ['term', 'alarm_record_id', 'weight'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_alarm_search_terms_term_alarm_record_id_weight', table_name='alarm_search_terms')
+    op.drop_index('ix_alarm_search_terms_alarm_record_id', table_name='alarm_search_terms')
+    op.drop_table('alarm_search_terms')
@@ -0,0 +1,60 @@
+"""add geocell index to alarm records
+
+Revision ID: f2c6e8a1b593
+Revises: e5b9c3a7d410
+Create Date: 2025-06-23 09:51:18.240367
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6e8a1b593'
+down_revision = 'e5b9c3a7d410'
+branch_labels = None
+depends_on = None
+
+CELL_BITS = 26
+
+
+def encode_cell(longitude, latitude):
+    """与 src/geo.py 的 encode_cell 相同；迁移脚本不依赖应用代码"""
+    def axis_index(value, low, high):
+        index = int((value - low) / (high - low) * (1 << CELL_BITS))
+        return min(max(index, 0), (1 << CELL_BITS) - 1)
+
+    x = axis_index(longitude, -180.0, 180.0)
+    y = axis_index(latitude, -90.0, 90.0)
+    code = 0
+    for bit in range(CELL_BITS - 1, -1, -1):
+        code = (code << 2) | (((x >> bit) & 1) << 1) | ((y >> bit) & 1)
+    return code
+
+
+def upgrade():
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('event_geocell', sa.BigInteger(), nullable=True))
+
+    # 回填已有坐标的格网码
+    bind = op.get_bind()
+    alarm_records = sa.table('alarm_records',
+        sa.column('id', sa.Integer), sa.column('event_location_longitude', sa.Float),
+        sa.column('event_location_latitude', sa.Float), sa.column('event_geocell', sa.BigInteger))
+    rows = bind.execute(sa.select(
+        alarm_records.c.id, alarm_records.c.event_location_longitude, alarm_records.c.event_location_latitude
+    ).where(
+        alarm_records.c.event_location_longitude.between(-180, 180),
+        alarm_records.c.event_location_latitude.between(-90, 90)
+    )).fetchall()
+    for alarm_id, longitude, latitude in rows:
+        bind.execute(alarm_records.update().where(alarm_records.c.id == alarm_id).values(
+            event_geocell=encode_cell(longitude, latitude)))
+
+    op.create_index('ix_alarm_records_event_geocell_alarm_time', 'alarm_records', ['event_geocell', 'alarm_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_alarm_records_event_geocell_alarm_time', table_name='alarm_records')
+    with op.batch_alter_table('alarm_records', schema=None) as batch_op:
+        batch_op.drop_column('event_geocell')
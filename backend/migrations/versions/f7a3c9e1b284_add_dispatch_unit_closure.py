@@ -0,0 +1,55 @@
+"""add dispatch unit closure
+
+Revision ID: f7a3c9e1b284
+Revises: d3f8a1c5e927
+Create Date: 2025-06-29 10:12:47.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a3c9e1b284'
+down_revision = 'd3f8a1c5e927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dispatch_unit_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['dispatch_units.id'], name=op.f('fk_dispatch_unit_closure_ancestor_id_dispatch_units')),
+    sa.ForeignKeyConstraint(['descendant_id'], ['dispatch_units.id'], name=op.f('fk_dispatch_unit_closure_descendant_id_dispatch_units')),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id', name=op.f('pk_dispatch_unit_closure'))
+    )
+    op.create_index('ix_dispatch_unit_closure_descendant_id_depth', 'dispatch_unit_closure', ['descendant_id', 'depth'], unique=False)
+
+    # 由现有 parent_id 逐个单位向上追溯，生成全部 (祖先, 子孙, 层差)
+    bind = op.get_bind()
+    units = sa.table('dispatch_units', sa.column('id', sa.Integer), sa.column('parent_id', sa.Integer))
+    parents = dict(bind.execute(sa.select(units.c.id, units.c.parent_id)).all())
+    closure = sa.table('dispatch_unit_closure',
+        sa.column('ancestor_id', sa.Integer),
+        sa.column('descendant_id', sa.Integer),
+        sa.column('depth', sa.Integer))
+    rows = []
+    for unit_id in parents:
+        ancestor_id, depth, seen = unit_id, 0, set()
+        # 历史数据中若已存在环或指向不存在的上级，追溯到此为止
+        while ancestor_id is not None and ancestor_id in parents and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append({'ancestor_id': ancestor_id, 'descendant_id': unit_id, 'depth': depth})
+            ancestor_id, depth = parents[ancestor_id], depth + 1
+        if len(rows) >= 1000:
+            op.bulk_insert(closure, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(closure, rows)
+
+
+def downgrade():
+    op.drop_index('ix_dispatch_unit_closure_descendant_id_depth', table_name='dispatch_unit_closure')
+    op.drop_table('dispatch_unit_closure')
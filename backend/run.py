@@ -1,4 +1,5 @@
 import os
+import click
 from dotenv import load_dotenv
 from src import create_app, db
 from config.config import config
@@ -38,6 +39,96 @@ def migrate_db():
     upgrade()
     print('数据库迁移已完成')
 
+@app.cli.command('check-query-plans')
+@click.option('--seed', default=0, help='检查前写入的种子数据行数（事务内写入，结束后回滚）')
+def check_query_plans_command(seed):
+    """检查列表接口的查询计划，出现全表扫描时以非零状态退出"""
+    from src.query_plans import check_query_plans
+    results, passed = check_query_plans(seed_rows=seed)
+    for item in results:
+        status = 'FULL SCAN' if item['full_scans'] else 'ok'
+        detail = f" ({'; '.join(item['full_scans'])})" if item['full_scans'] else ''
+        print(f"{item['endpoint']:<24} {item['shape']:<18} {status}{detail}")
+    if not passed:
+        raise SystemExit(1)
+    print('所有列表查询均命中索引')
+
+@app.cli.command('prune-blobs')
+@click.option('--grace', default=3600, help='宽限期（秒），只清理早于该时间的对象')
+def prune_blobs_command(grace):
+    """清理媒体存储中引用计数为零的内容及孤儿文件"""
+    from src.blob_store import prune_blobs
+    removed = prune_blobs(grace_seconds=grace)
+    print(f'已清理 {removed} 个文件')
+
+@app.cli.command('prune-audio-cache')
+@click.option('--max-mb', default=10240, help='归一化音频缓存的容量上限（MB）')
+def prune_audio_cache_command(max_mb):
+    """按最近使用时间淘汰转写用的归一化音频缓存"""
+    from src.audio_processing import prune_normalized_cache
+    removed = prune_normalized_cache(max_mb * 1024 * 1024)
+    print(f'已清理 {removed} 个文件')
+
+@app.cli.command('rebuild-search-index')
+@click.option('--batch-size', default=1000, help='每批重建的警情数')
+def rebuild_search_index_command(batch_size):
+    """重建警情全文检索索引（用于初次上线或调整切分规则后）"""
+    from src.alarm_unified_access.models import AlarmRecord
+    from src.alarm_unified_access.search import index_alarms
+    last_id, total = 0, 0
+    while True:
+        ids = [row.id for row in db.session.query(AlarmRecord.id).filter(
+            AlarmRecord.id > last_id).order_by(AlarmRecord.id).limit(batch_size)]
+        if not ids:
+            break
+        index_alarms(db.session.connection(), ids)
+        db.session.commit()
+        last_id, total = ids[-1], total + len(ids)
+        print(f'已索引 {total} 条警情')
+
+@app.cli.command('build-phone-region-table')
+@click.argument('source')
+@click.option('--output', default=None, help='输出文件，默认为配置项 PHONE_REGION_TABLE')
+def build_phone_region_table_command(source, output):
+    """由 CSV（号段或区号, 省, 市, 运营商, 区号）编译号码归属地表，原子替换后各进程自动重新映射"""
+    from src.phone_region import build_table, read_source
+    output = output or app.config.get('PHONE_REGION_TABLE')
+    if not output:
+        raise click.UsageError('PHONE_REGION_TABLE is not configured, use --output')
+    count = build_table(read_source(source), output)
+    print(f'已写入 {count} 个号段')
+
+@app.cli.command('maintain-call-ledger')
+@click.option('--ahead', default=7, help='预建未来多少天的日分区（仅 PostgreSQL 分区表）')
+@click.option('--retain', default=365, help='话单保留天数，更早的分区（或行）被删除')
+def maintain_call_ledger_command(ahead, retain):
+    """预建话单日分区并删除过期话单，建议每天定时执行"""
+    from src.alarm_log_ledger.ledger import ensure_partitions, drop_expired, is_partitioned
+    created = ensure_partitions(days_ahead=ahead)
+    removed = drop_expired(retain)
+    if is_partitioned():
+        print(f'已新建 {len(created)} 个分区，删除 {removed} 个过期分区')
+    else:
+        print(f'已删除 {removed} 条过期话单')
+
+@app.cli.command('scrub-media')
+@click.option('--max-gb', default=100.0, help='本次最多读取的数据量（GB）')
+@click.option('--rate-mb', default=32.0, help='读取限速（MB/s），0 为不限速')
+@click.option('--verify-chain/--no-verify-chain', default=True, help='是否同时复算哈希链')
+def scrub_media_command(max_gb, rate_mb, verify_chain):
+    """巡检媒体存储：校验文件哈希与防篡改哈希链，发现异常时以非零状态退出"""
+    from src.media_integrity import scrub, verify_chain as verify_integrity_chain
+    failed = False
+    if verify_chain:
+        result = verify_integrity_chain()
+        print(f"哈希链：{result['entries']} 条记录，{'完整' if result['valid'] else '断开于 ' + str(result['broken_at']) + '：' + result['reason']}")
+        failed = not result['valid']
+    summary = scrub(max_bytes=int(max_gb * 1024 ** 3), bytes_per_second=int(rate_mb * 1024 * 1024))
+    print(f"已校验 {summary['checked']} 个文件（{summary['bytes']} 字节）：正常 {summary['ok']}，"
+          f"不一致 {summary['mismatch']}，缺失 {summary['missing']}")
+    if failed or summary['mismatch'] or summary['missing']:
+        raise SystemExit(1)
+
 if __name__ == '__main__':
     # 确保上传目录存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
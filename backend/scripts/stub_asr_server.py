@@ -0,0 +1,128 @@
+"""本地语音识别桩服务，用于联调与压测转写流水线
+
+用法：
+    python scripts/stub_asr_server.py --port 8765 --latency 0.5 --error-rate 0.1
+
+然后把 SPEECH_RECOGNITION_API_URL 指向 http://127.0.0.1:8765/asr。
+POST /asr 接收 multipart 音频，按配置的延迟返回 {"text": ...}，并按概率返回 503 以验证重试；
+GET /stats 返回请求数、错误数与峰值并发，可用来确认并发限制是否生效。
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.peak_active = 0
+        self.connections = 0
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def leave(self, failed):
+        with self.lock:
+            self.active -= 1
+            if failed:
+                self.errors += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'active': self.active,
+                'peak_active': self.peak_active,
+                'connections': self.connections
+            }
+
+def make_handler(options, stats):
+    class Handler(BaseHTTPRequestHandler):
+        # 支持 keep-alive，便于观察客户端连接复用
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with stats.lock:
+                stats.connections += 1
+
+        def send_json(self, status, body):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self.send_json(200, stats.to_dict())
+            else:
+                self.send_json(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            hasher = hashlib.sha256()
+            remaining = length
+            while remaining:
+                block = self.rfile.read(min(remaining, 1024 * 1024))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+
+            if options.api_key and self.headers.get('Authorization') != f'Bearer {options.api_key}':
+                self.send_json(401, {'error': 'Unauthorized'})
+                return
+
+            stats.enter()
+            failed = random.random() < options.error_rate
+            try:
+                time.sleep(max(0.0, options.latency + random.uniform(-options.jitter, options.jitter)))
+                if failed:
+                    self.send_json(503, {'error': 'Service temporarily unavailable'})
+                else:
+                    self.send_json(200, {'text': f'桩服务识别结果：{length} 字节，摘要 {hasher.hexdigest()[:12]}'})
+            finally:
+                stats.leave(failed)
+
+        def log_message(self, format, *args):
+            if options.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='语音识别桩服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='每个请求的处理时间（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='处理时间的随机浮动（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的概率')
+    parser.add_argument('--api-key', default=None, help='设置后校验 Authorization: Bearer <key>')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+
+    stats = Stats()
+    server = ThreadingHTTPServer((options.host, options.port), make_handler(options, stats))
+    server.daemon_threads = True
+    print(f'Stub ASR server listening on http://{options.host}:{options.port}/asr')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,9 @@ def create_app(config_class):
     from .statistics import bp as statistics_bp
     app.register_blueprint(statistics_bp, url_prefix='/api/statistics')
     
+    from .alarm_log_ledger import bp as alarm_log_ledger_bp
+    app.register_blueprint(alarm_log_ledger_bp, url_prefix='/api/ledger')
+    
     # 初始化Celery
     from .tasks import init_celery
     init_celery(app)
@@ -4,6 +4,12 @@ from .. import db
 class ArchivedAlarm(db.Model):
     """警情归档记录"""
     __tablename__ = 'archived_alarms'
+    __table_args__ = (
+        db.Index('ix_archived_alarms_created_at_id', 'created_at', 'id'),
+        db.Index('ix_archived_alarms_archive_status_created_at', 'archive_status', 'created_at'),
+        db.Index('ix_archived_alarms_archive_type_created_at', 'archive_type', 'created_at'),
+        db.Index('ix_archived_alarms_alarm_record_id_created_at', 'alarm_record_id', 'created_at')
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
@@ -49,6 +55,10 @@ class ArchivedAlarm(db.Model):
 class ArchiveFile(db.Model):
     """归档文件"""
     __tablename__ = 'archive_files'
+    __table_args__ = (
+        db.Index('ix_archive_files_archived_alarm_id', 'archived_alarm_id'),
+        db.Index('ix_archive_files_content_hash', 'content_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     archived_alarm_id = db.Column(db.Integer, db.ForeignKey('archived_alarms.id'), nullable=False)
@@ -57,6 +67,7 @@ class ArchiveFile(db.Model):
     file_size = db.Column(db.Integer)  # 文件大小（字节）
     file_type = db.Column(db.String(20))  # 文件类型：image, video, audio, document
     mime_type = db.Column(db.String(100))  # MIME类型
+    content_hash = db.Column(db.String(64))  # 内容 SHA-256，对应 media_blobs
     description = db.Column(db.Text)  # 文件描述
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -72,6 +83,7 @@ class ArchiveFile(db.Model):
             'file_size': self.file_size,
             'file_type': self.file_type,
             'mime_type': self.mime_type,
+            'content_hash': self.content_hash,
             'description': self.description,
             'upload_time': self.upload_time.isoformat(),
             'created_at': self.created_at.isoformat(),
@@ -81,6 +93,9 @@ class ArchiveFile(db.Model):
 class ArchiveLog(db.Model):
     """归档操作日志"""
     __tablename__ = 'archive_logs'
+    __table_args__ = (
+        db.Index('ix_archive_logs_archived_alarm_id_created_at', 'archived_alarm_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     archived_alarm_id = db.Column(db.Integer, db.ForeignKey('archived_alarms.id'), nullable=False)
@@ -1,9 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from datetime import datetime
-import os
+import mimetypes
 from werkzeug.utils import secure_filename
 from .models import ArchivedAlarm, ArchiveFile, ArchiveLog
 from ..alarm_unified_access.models import AlarmRecord
+from ..pagination import paginate_query
+from ..chunked_upload import (UploadError, init_upload, finalize_upload, discard_upload,
+                              error_response, session_response, status_view, append_view,
+                              discard_view)
+from ..blob_store import store_file, store_stream, find_blob, acquire_blob
+from ..serialization import parse_fields, apply_projection, make_serializer
 from .. import db
 
 bp = Blueprint('alarm_archiving', __name__)
@@ -39,6 +45,28 @@ def create_archive_log(archived_alarm_id, action, status, operator, operator_id,
     db.session.add(log)
     return log
 
+def create_archive_file(archive, filename, blob, mime_type, description, operator, operator_id):
+    """为已存入内容存储的文件创建归档文件记录及上传日志"""
+    archive_file = ArchiveFile(
+        archived_alarm_id=archive.id,
+        file_path=blob.path,
+        file_name=filename,
+        file_size=blob.size,
+        file_type=get_file_type(filename),
+        mime_type=mime_type,
+        content_hash=blob.sha256,
+        description=description
+    )
+    db.session.add(archive_file)
+    acquire_blob(blob)
+    
+    # 创建文件上传日志
+    create_archive_log(archive.id, 'upload', archive.archive_status, operator, operator_id,
+                       f'上传归档文件：{filename}')
+    
+    db.session.commit()
+    return archive_file
+
 def generate_archive_number():
     """生成归档编号"""
     prefix = datetime.now().strftime('%Y%m%d')
@@ -167,48 +195,114 @@ def upload_archive_file(archive_id):
         return jsonify({'error': 'Archive record not found'}), 404
     
     try:
-        # 创建上传目录
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'archives', str(archive_id))
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # 保存文件
+        # 保存文件（边写边计算哈希，内容已存在时不重复落盘）
         filename = secure_filename(file.filename)
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
-        
-        # 获取文件信息
-        file_size = os.path.getsize(file_path)
-        file_type = get_file_type(filename)
-        mime_type = file.content_type
+        blob = store_stream(file.stream)
         
-        # 创建归档文件记录
-        archive_file = ArchiveFile(
-            archived_alarm_id=archive_id,
-            file_path=file_path,
-            file_name=filename,
-            file_size=file_size,
-            file_type=file_type,
-            mime_type=mime_type,
-            description=request.form.get('description')
+        archive_file = create_archive_file(
+            archive, filename, blob, file.content_type,
+            request.form.get('description'),
+            request.form.get('operator', 'system'),
+            request.form.get('operator_id', 0)
         )
         
-        db.session.add(archive_file)
+        return jsonify({
+            'message': 'Archive file uploaded successfully',
+            'data': archive_file.to_dict()
+        }), 201
         
-        # 创建文件上传日志
-        create_archive_log(
-            archive.id,
-            'upload',
-            archive.archive_status,
-            request.form.get('operator', 'system'),
-            request.form.get('operator_id', 0),
-            f'上传归档文件：{filename}'
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error uploading archive file: {str(e)}'}), 500
+
+@bp.route('/archives/<int:archive_id>/files/uploads', methods=['POST'])
+def init_archive_file_upload(archive_id):
+    """创建归档文件分片上传会话（大文件断点续传）"""
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('file_name') or '')
+    if not filename:
+        return jsonify({'error': 'file_name is required'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    archive = ArchivedAlarm.query.get(archive_id)
+    if not archive:
+        return jsonify({'error': 'Archive record not found'}), 404
+    
+    extra = {
+        'mime_type': data.get('mime_type') or mimetypes.guess_type(filename)[0],
+        'description': data.get('description'),
+        'operator': data.get('operator', 'system'),
+        'operator_id': data.get('operator_id', 0)
+    }
+    try:
+        # 存储中已有相同内容时直接秒传，无需上传数据
+        blob = find_blob(data.get('sha256'), data.get('total_size'))
+        if blob:
+            archive_file = create_archive_file(
+                archive, filename, blob, extra['mime_type'], extra['description'],
+                extra['operator'], extra['operator_id']
+            )
+            return jsonify({
+                'message': 'Archive file uploaded successfully',
+                'data': archive_file.to_dict(),
+                'sha256': blob.sha256,
+                'instant': True
+            }), 201
+        meta = init_upload('archive', archive_id, filename, data.get('total_size'),
+                           data.get('sha256'), extra)
+    except UploadError as e:
+        return error_response(e)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'total_size must be an integer'}), 400
+    
+    return jsonify({
+        'message': 'Upload session created',
+        'data': session_response(meta)
+    }), 201
+
+@bp.route('/files/uploads/<upload_id>', methods=['GET'])
+def get_archive_file_upload(upload_id):
+    """查询归档文件上传进度"""
+    return status_view(upload_id, 'archive')
+
+@bp.route('/files/uploads/<upload_id>', methods=['PATCH'])
+def append_archive_file_upload(upload_id):
+    """提交归档文件分片"""
+    return append_view(upload_id, 'archive')
+
+@bp.route('/files/uploads/<upload_id>', methods=['DELETE'])
+def discard_archive_file_upload(upload_id):
+    """取消归档文件上传"""
+    return discard_view(upload_id, 'archive')
+
+@bp.route('/files/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_archive_file_upload(upload_id):
+    """完成归档文件上传，校验后创建归档文件记录"""
+    try:
+        meta, data_path, sha256 = finalize_upload(upload_id, 'archive')
+    except UploadError as e:
+        return error_response(e)
+    
+    archive = ArchivedAlarm.query.get(meta['target_id'])
+    if not archive:
+        discard_upload(upload_id)
+        return jsonify({'error': 'Archive record not found'}), 404
+    
+    try:
+        # 上传文件直接重命名进内容存储，不再复制
+        blob = store_file(data_path, sha256)
+        extra = meta['extra']
+        archive_file = create_archive_file(
+            archive, meta['file_name'], blob, extra.get('mime_type'),
+            extra.get('description'), extra.get('operator', 'system'), extra.get('operator_id', 0)
         )
-        
-        db.session.commit()
+        discard_upload(upload_id)
         
         return jsonify({
             'message': 'Archive file uploaded successfully',
-            'data': archive_file.to_dict()
+            'data': archive_file.to_dict(),
+            'sha256': sha256
         }), 201
         
     except Exception as e:
@@ -218,11 +312,15 @@ def upload_archive_file(archive_id):
 @bp.route('/archives', methods=['GET'])
 def list_archives():
     """获取警情归档记录列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # 解析输出列，列裁剪下推到 SQL
+    try:
+        fields = parse_fields(ArchivedAlarm)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # 构建查询
-    query = ArchivedAlarm.query
+    query = apply_projection(ArchivedAlarm.query, ArchivedAlarm, {}, fields, set(),
+                             required=[ArchivedAlarm.created_at])
     
     # 添加过滤条件
     alarm_id = request.args.get('alarm_record_id')
@@ -242,17 +340,14 @@ def list_archives():
     if end_date:
         query = query.filter(ArchivedAlarm.created_at <= datetime.fromisoformat(end_date))
     
-    # 执行分页查询
-    pagination = query.order_by(ArchivedAlarm.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 执行分页查询（页码分页或游标分页）
+    try:
+        result = paginate_query(query, ArchivedAlarm.created_at, ArchivedAlarm.id,
+                                serialize=make_serializer(fields))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }), 200
+    return jsonify(result), 200
 
 @bp.route('/archives/<int:archive_id>/logs', methods=['GET'])
 def get_archive_logs(archive_id):
@@ -4,6 +4,9 @@ from datetime import datetime
 class DispatchUnit(db.Model):
     """下发单位模型"""
     __tablename__ = 'dispatch_units'
+    __table_args__ = (
+        db.Index('ix_dispatch_units_parent_id', 'parent_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -31,9 +34,26 @@ class DispatchUnit(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class DispatchUnitClosure(db.Model):
+    """下发单位层级的闭包表：每对 (祖先, 子孙) 一行，包含 depth 为 0 的自身行，由 unit_tree.py 维护"""
+    __tablename__ = 'dispatch_unit_closure'
+    __table_args__ = (
+        db.Index('ix_dispatch_unit_closure_descendant_id_depth', 'descendant_id', 'depth'),
+    )
+    
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('dispatch_units.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('dispatch_units.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
 class AlarmDispatch(db.Model):
     """警情下发记录模型"""
     __tablename__ = 'alarm_dispatches'
+    __table_args__ = (
+        db.Index('ix_alarm_dispatches_dispatch_time_id', 'dispatch_time', 'id'),
+        db.Index('ix_alarm_dispatches_unit_id_dispatch_time', 'unit_id', 'dispatch_time'),
+        db.Index('ix_alarm_dispatches_status_dispatch_time', 'status', 'dispatch_time'),
+        db.Index('ix_alarm_dispatches_alarm_record_id_dispatch_time', 'alarm_record_id', 'dispatch_time')
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
@@ -51,8 +71,8 @@ class AlarmDispatch(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, expand=None):
+        data = {
             'id': self.id,
             'alarm_record_id': self.alarm_record_id,
             'unit_id': self.unit_id,
@@ -63,14 +83,19 @@ class AlarmDispatch(db.Model):
             'feedback': self.feedback,
             'feedback_time': self.feedback_time.isoformat() if self.feedback_time else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'unit': self.unit.to_dict() if self.unit else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if expand is None or 'unit' in expand:
+            data['unit'] = self.unit.to_dict() if self.unit else None
+        return data
 
 class DispatchLog(db.Model):
     """下发日志模型"""
     __tablename__ = 'dispatch_logs'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_dispatch_logs_dispatch_id_created_at', 'dispatch_id', 'created_at'),
+        {'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     dispatch_id = db.Column(db.Integer, db.ForeignKey('alarm_dispatches.id'), nullable=False)
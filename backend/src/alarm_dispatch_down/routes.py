@@ -1,11 +1,19 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from .models import DispatchUnit, AlarmDispatch, DispatchLog
+from .unit_tree import subtree_ids_query, descendants, ancestors, is_in_subtree
 from ..alarm_unified_access.models import AlarmRecord
+from sqlalchemy.orm import joinedload
+from ..pagination import paginate_query
+from ..serialization import parse_projection, apply_projection, make_serializer
 from .. import db
 
 bp = Blueprint('alarm_dispatch_down', __name__)
 
+DISPATCH_EXPAND_LOADERS = {
+    'unit': lambda: joinedload(AlarmDispatch.unit)
+}
+
 def create_dispatch_log(dispatch_id, action, status, operator, operator_id, details=None):
     """创建下发日志"""
     log = DispatchLog(
@@ -43,6 +51,26 @@ def get_dispatch_unit(unit_id):
         return jsonify(unit.to_dict()), 200
     return jsonify({'error': 'Dispatch unit not found'}), 404
 
+@bp.route('/units/<int:unit_id>/subtree', methods=['GET'])
+def get_dispatch_unit_subtree(unit_id):
+    """获取下属单位（含各级），可用 max_depth 限制层数"""
+    unit = DispatchUnit.query.get(unit_id)
+    if not unit:
+        return jsonify({'error': 'Dispatch unit not found'}), 404
+    max_depth = request.args.get('max_depth', type=int)
+    return jsonify({
+        'unit': unit.to_dict(),
+        'descendants': [dict(child.to_dict(), depth=depth) for child, depth in descendants(unit_id, max_depth)]
+    }), 200
+
+@bp.route('/units/<int:unit_id>/ancestors', methods=['GET'])
+def get_dispatch_unit_ancestors(unit_id):
+    """获取全部上级单位，由顶层到直接上级"""
+    unit = DispatchUnit.query.get(unit_id)
+    if not unit:
+        return jsonify({'error': 'Dispatch unit not found'}), 404
+    return jsonify([ancestor.to_dict() for ancestor in ancestors(unit_id)]), 200
+
 @bp.route('/units', methods=['POST'])
 def create_dispatch_unit():
     """创建新的下发单位"""
@@ -89,7 +117,14 @@ def update_dispatch_unit(unit_id):
         if 'level' in data:
             unit.level = data['level']
         if 'parent_id' in data:
-            unit.parent_id = data['parent_id']
+            parent_id = data['parent_id']
+            if parent_id is not None:
+                if not DispatchUnit.query.get(parent_id):
+                    return jsonify({'error': 'Parent unit not found'}), 400
+                # 不能把单位挂到自身或其下属单位下
+                if is_in_subtree(unit.id, parent_id):
+                    return jsonify({'error': 'parent_id must not be the unit itself or one of its descendants'}), 400
+            unit.parent_id = parent_id
         if 'status' in data:
             unit.status = data['status']
         
@@ -228,15 +263,20 @@ def add_dispatch_feedback(dispatch_id):
 @bp.route('/dispatch', methods=['GET'])
 def list_dispatches():
     """获取警情下发记录列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # 解析输出列与需要展开的关联对象，列裁剪下推到 SQL，关联对象按接口选择预加载策略
+    try:
+        fields, expand = parse_projection(AlarmDispatch, DISPATCH_EXPAND_LOADERS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # 构建查询
-    query = AlarmDispatch.query
+    query = apply_projection(AlarmDispatch.query, AlarmDispatch, DISPATCH_EXPAND_LOADERS, fields, expand,
+                             required=[AlarmDispatch.dispatch_time])
     
     # 添加过滤条件
     alarm_id = request.args.get('alarm_record_id')
     unit_id = request.args.get('unit_id')
+    unit_subtree = request.args.get('unit_subtree', type=int)
     status = request.args.get('status')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
@@ -245,6 +285,9 @@ def list_dispatches():
         query = query.filter(AlarmDispatch.alarm_record_id == alarm_id)
     if unit_id:
         query = query.filter(AlarmDispatch.unit_id == unit_id)
+    if unit_subtree:
+        # 该单位及其全部下属单位，经闭包表一次展开
+        query = query.filter(AlarmDispatch.unit_id.in_(subtree_ids_query(unit_subtree)))
     if status:
         query = query.filter(AlarmDispatch.status == status)
     if start_date:
@@ -252,17 +295,14 @@ def list_dispatches():
     if end_date:
         query = query.filter(AlarmDispatch.dispatch_time <= datetime.fromisoformat(end_date))
     
-    # 执行分页查询
-    pagination = query.order_by(AlarmDispatch.dispatch_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 执行分页查询（页码分页或游标分页）
+    try:
+        result = paginate_query(query, AlarmDispatch.dispatch_time, AlarmDispatch.id,
+                                serialize=make_serializer(fields, expand))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }), 200
+    return jsonify(result), 200
 
 @bp.route('/dispatch/<int:dispatch_id>/logs', methods=['GET'])
 def get_dispatch_logs(dispatch_id):
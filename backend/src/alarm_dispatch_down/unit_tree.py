@@ -0,0 +1,90 @@
+"""下发单位层级（支队 → 大队 → 工作站）
+
+dispatch_units 以 parent_id 邻接表存储，另以闭包表 dispatch_unit_closure 保存全部 (祖先, 子孙, 层差)：
+- 单位新增或调整上级时，在同一次 flush 内增量维护闭包表，无需遍历整棵树
+- “某支队及其下属全部大队、工作站”的下发记录或警员，以 unit_id IN (闭包表子查询) 一条语句查出，
+  子查询命中闭包表主键 (ancestor_id, descendant_id)，不再逐级懒加载 children
+"""
+from sqlalchemy import event, inspect, select, insert, delete, true
+from sqlalchemy.orm import Session
+from .models import DispatchUnit, DispatchUnitClosure
+from .. import db
+
+closure = DispatchUnitClosure.__table__
+
+def subtree_ids_query(unit_id, max_depth=None):
+    """单位自身及全部下属单位 id 的子查询，可直接用于 IN 条件"""
+    query = select(closure.c.descendant_id).where(closure.c.ancestor_id == unit_id)
+    if max_depth is not None:
+        query = query.where(closure.c.depth <= max_depth)
+    return query
+
+def descendants(unit_id, max_depth=None):
+    """返回下属单位（不含自身）及其相对层差，按层差、名称排序"""
+    rows = (db.session.query(DispatchUnit, DispatchUnitClosure.depth)
+            .join(DispatchUnitClosure, DispatchUnitClosure.descendant_id == DispatchUnit.id)
+            .filter(DispatchUnitClosure.ancestor_id == unit_id, DispatchUnitClosure.depth > 0))
+    if max_depth is not None:
+        rows = rows.filter(DispatchUnitClosure.depth <= max_depth)
+    return rows.order_by(DispatchUnitClosure.depth, DispatchUnit.name).all()
+
+def ancestors(unit_id):
+    """返回全部上级单位，由顶层到直接上级"""
+    return (DispatchUnit.query
+            .join(DispatchUnitClosure, DispatchUnitClosure.ancestor_id == DispatchUnit.id)
+            .filter(DispatchUnitClosure.descendant_id == unit_id, DispatchUnitClosure.depth > 0)
+            .order_by(DispatchUnitClosure.depth.desc()).all())
+
+def is_in_subtree(unit_id, candidate_id):
+    """candidate_id 是否为 unit_id 自身或其下属单位（用于调整上级时防止形成环）"""
+    return db.session.query(DispatchUnitClosure).filter_by(
+        ancestor_id=unit_id, descendant_id=candidate_id).first() is not None
+
+def _link(connection, unit_id, parent_id):
+    """把以 unit_id 为根的子树挂到 parent_id 下：parent 的每个祖先 × 子树的每个节点"""
+    if parent_id is None:
+        return
+    above = closure.alias('above')
+    below = closure.alias('below')
+    connection.execute(insert(closure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+        .select_from(above.join(below, true()))
+        .where(above.c.descendant_id == parent_id, below.c.ancestor_id == unit_id)
+    ))
+
+def _unlink(connection, unit_id):
+    """断开子树与原上级各祖先的关联；先取出 id 列表，MySQL 不支持在 DELETE 中子查询同一张表"""
+    subtree = connection.execute(select(closure.c.descendant_id).where(
+        closure.c.ancestor_id == unit_id)).scalars().all()
+    above = connection.execute(select(closure.c.ancestor_id).where(
+        closure.c.descendant_id == unit_id, closure.c.depth > 0)).scalars().all()
+    if subtree and above:
+        connection.execute(delete(closure).where(
+            closure.c.descendant_id.in_(subtree), closure.c.ancestor_id.in_(above)))
+
+@event.listens_for(Session, 'before_flush')
+def _drop_deleted_unit_paths(session, flush_context, instances):
+    """删除单位前先删除其闭包行，避免外键约束失败"""
+    unit_ids = [obj.id for obj in session.deleted if isinstance(obj, DispatchUnit) and obj.id]
+    if unit_ids:
+        session.connection().execute(delete(closure).where(
+            closure.c.ancestor_id.in_(unit_ids) | closure.c.descendant_id.in_(unit_ids)))
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_unit_closure(session, flush_context):
+    """新增单位写入自身行并继承上级的祖先；调整上级的单位整棵子树迁移到新上级下"""
+    connection = None
+    created = [obj for obj in session.new if isinstance(obj, DispatchUnit)]
+    # 先处理上级在同一次 flush 中新增的单位
+    for unit in sorted(created, key=lambda unit: unit.id):
+        connection = connection or session.connection()
+        connection.execute(insert(closure).values(ancestor_id=unit.id, descendant_id=unit.id, depth=0))
+        _link(connection, unit.id, unit.parent_id)
+    for obj in session.dirty:
+        if isinstance(obj, DispatchUnit) and obj not in created:
+            attrs = inspect(obj).attrs
+            if attrs.parent_id.history.has_changes() or attrs.parent.history.has_changes():
+                connection = connection or session.connection()
+                _unlink(connection, obj.id)
+                _link(connection, obj.id, obj.parent_id)
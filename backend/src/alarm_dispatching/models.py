@@ -5,6 +5,10 @@ from ..alarm_dispatch_down.models import DispatchLog
 class PoliceOfficer(db.Model):
     """警员信息模型"""
     __tablename__ = 'police_officers'
+    __table_args__ = (
+        db.Index('ix_police_officers_unit_id_name', 'unit_id', 'name'),
+        db.Index('ix_police_officers_status_name', 'status', 'name')
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -47,6 +51,13 @@ class PoliceOfficer(db.Model):
 class DispatchTask(db.Model):
     """派警任务模型"""
     __tablename__ = 'dispatch_tasks'
+    __table_args__ = (
+        db.Index('ix_dispatch_tasks_assigned_time_id', 'assigned_time', 'id'),
+        db.Index('ix_dispatch_tasks_officer_id_assigned_time', 'officer_id', 'assigned_time'),
+        db.Index('ix_dispatch_tasks_status_assigned_time', 'status', 'assigned_time'),
+        db.Index('ix_dispatch_tasks_priority_assigned_time', 'priority', 'assigned_time'),
+        db.Index('ix_dispatch_tasks_alarm_record_id_assigned_time', 'alarm_record_id', 'assigned_time')
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
@@ -67,8 +78,8 @@ class DispatchTask(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, expand=None):
+        data = {
             'id': self.id,
             'alarm_record_id': self.alarm_record_id,
             'officer_id': self.officer_id,
@@ -82,13 +93,20 @@ class DispatchTask(db.Model):
             'cancel_reason': self.cancel_reason,
             'feedback': self.feedback,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'officer': self.officer.to_dict() if self.officer else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if expand is None or 'officer' in expand:
+            data['officer'] = self.officer.to_dict() if self.officer else None
+        return data
 
 class DispatchGroup(db.Model):
     """派警任务组模型"""
     __tablename__ = 'dispatch_groups'
+    __table_args__ = (
+        db.Index('ix_dispatch_groups_created_at_id', 'created_at', 'id'),
+        db.Index('ix_dispatch_groups_status_created_at', 'status', 'created_at'),
+        db.Index('ix_dispatch_groups_alarm_record_id_created_at', 'alarm_record_id', 'created_at')
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
@@ -103,22 +121,28 @@ class DispatchGroup(db.Model):
     leader = db.relationship('PoliceOfficer', foreign_keys=[leader_id])
     members = db.relationship('DispatchGroupMember', backref='group', lazy=True)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, expand=None):
+        data = {
             'id': self.id,
             'alarm_record_id': self.alarm_record_id,
             'name': self.name,
             'leader_id': self.leader_id,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'leader': self.leader.to_dict() if self.leader else None,
-            'members': [member.to_dict() for member in self.members]
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if expand is None or 'leader' in expand:
+            data['leader'] = self.leader.to_dict() if self.leader else None
+        if expand is None or 'members' in expand:
+            data['members'] = [member.to_dict() for member in self.members]
+        return data
 
 class DispatchGroupMember(db.Model):
     """派警任务组成员模型"""
     __tablename__ = 'dispatch_group_members'
+    __table_args__ = (
+        db.Index('ix_dispatch_group_members_group_id', 'group_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('dispatch_groups.id'), nullable=False)
@@ -6,10 +6,23 @@ from .models import (
     DispatchGroupMember, DispatchLog
 )
 from ..alarm_unified_access.models import AlarmRecord
+from ..alarm_dispatch_down.unit_tree import subtree_ids_query
+from sqlalchemy.orm import joinedload, selectinload
+from ..pagination import paginate_query
+from ..serialization import parse_projection, apply_projection, make_serializer
 from .. import db
 
 bp = Blueprint('alarm_dispatching', __name__)
 
+TASK_EXPAND_LOADERS = {
+    'officer': lambda: joinedload(DispatchTask.officer)
+}
+
+GROUP_EXPAND_LOADERS = {
+    'leader': lambda: joinedload(DispatchGroup.leader),
+    'members': lambda: selectinload(DispatchGroup.members).joinedload(DispatchGroupMember.officer)
+}
+
 def create_dispatch_log(task_id=None, group_id=None, action=None, status=None, operator=None, operator_id=None, details=None):
     """创建派警日志"""
     log = DispatchLog(
@@ -35,11 +48,15 @@ def list_officers():
     
     # 添加过滤条件
     unit_id = request.args.get('unit_id')
+    unit_subtree = request.args.get('unit_subtree', type=int)
     status = request.args.get('status')
     skill = request.args.get('skill')
     
     if unit_id:
         query = query.filter(PoliceOfficer.unit_id == unit_id)
+    if unit_subtree:
+        # 该单位及其全部下属单位的警员
+        query = query.filter(PoliceOfficer.unit_id.in_(subtree_ids_query(unit_subtree)))
     if status:
         query = query.filter(PoliceOfficer.status == status)
     if skill:
@@ -266,11 +283,15 @@ def add_task_feedback(task_id):
 @bp.route('/tasks', methods=['GET'])
 def list_dispatch_tasks():
     """获取派警任务列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # 解析输出列与需要展开的关联对象，列裁剪下推到 SQL，关联对象按接口选择预加载策略
+    try:
+        fields, expand = parse_projection(DispatchTask, TASK_EXPAND_LOADERS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # 构建查询
-    query = DispatchTask.query
+    query = apply_projection(DispatchTask.query, DispatchTask, TASK_EXPAND_LOADERS, fields, expand,
+                             required=[DispatchTask.assigned_time])
     
     # 添加过滤条件
     alarm_id = request.args.get('alarm_record_id')
@@ -293,17 +314,14 @@ def list_dispatch_tasks():
     if end_date:
         query = query.filter(DispatchTask.assigned_time <= datetime.fromisoformat(end_date))
     
-    # 执行分页查询
-    pagination = query.order_by(DispatchTask.assigned_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 执行分页查询（页码分页或游标分页）
+    try:
+        result = paginate_query(query, DispatchTask.assigned_time, DispatchTask.id,
+                                serialize=make_serializer(fields, expand))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }), 200
+    return jsonify(result), 200
 
 @bp.route('/groups', methods=['POST'])
 def create_dispatch_group():
@@ -462,11 +480,15 @@ def remove_group_member(group_id, member_id):
 @bp.route('/groups', methods=['GET'])
 def list_dispatch_groups():
     """获取派警任务组列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # 解析输出列与需要展开的关联对象，列裁剪下推到 SQL，关联对象按接口选择预加载策略
+    try:
+        fields, expand = parse_projection(DispatchGroup, GROUP_EXPAND_LOADERS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # 构建查询
-    query = DispatchGroup.query
+    query = apply_projection(DispatchGroup.query, DispatchGroup, GROUP_EXPAND_LOADERS, fields, expand,
+                             required=[DispatchGroup.created_at])
     
     # 添加过滤条件
     alarm_id = request.args.get('alarm_record_id')
@@ -483,17 +505,14 @@ def list_dispatch_groups():
     if end_date:
         query = query.filter(DispatchGroup.created_at <= datetime.fromisoformat(end_date))
     
-    # 执行分页查询
-    pagination = query.order_by(DispatchGroup.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 执行分页查询（页码分页或游标分页）
+    try:
+        result = paginate_query(query, DispatchGroup.created_at, DispatchGroup.id,
+                                serialize=make_serializer(fields, expand))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }), 200
+    return jsonify(result), 200
 
 @bp.route('/tasks/<int:task_id>/logs', methods=['GET'])
 def get_task_logs(task_id):
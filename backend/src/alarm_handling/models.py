@@ -4,6 +4,11 @@ from datetime import datetime
 class HandlingRecord(db.Model):
     """警情处理记录模型"""
     __tablename__ = 'handling_records'
+    __table_args__ = (
+        db.Index('ix_handling_records_created_at_id', 'created_at', 'id'),
+        db.Index('ix_handling_records_status_created_at', 'status', 'created_at'),
+        db.Index('ix_handling_records_alarm_record_id_created_at', 'alarm_record_id', 'created_at')
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
@@ -26,8 +31,8 @@ class HandlingRecord(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, expand=None):
+        data = {
             'id': self.id,
             'alarm_record_id': self.alarm_record_id,
             'handler_id': self.handler_id,
@@ -40,15 +45,23 @@ class HandlingRecord(db.Model):
             'latitude': self.latitude,
             'longitude': self.longitude,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'handler': self.handler.to_dict() if self.handler else None,
-            'evidence_files': [file.to_dict() for file in self.evidence_files],
-            'handling_logs': [log.to_dict() for log in self.handling_logs]
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if expand is None or 'handler' in expand:
+            data['handler'] = self.handler.to_dict() if self.handler else None
+        if expand is None or 'evidence_files' in expand:
+            data['evidence_files'] = [file.to_dict() for file in self.evidence_files]
+        if expand is None or 'handling_logs' in expand:
+            data['handling_logs'] = [log.to_dict() for log in self.handling_logs]
+        return data
 
 class EvidenceFile(db.Model):
     """证据文件模型"""
     __tablename__ = 'evidence_files'
+    __table_args__ = (
+        db.Index('ix_evidence_files_handling_record_id', 'handling_record_id'),
+        db.Index('ix_evidence_files_content_hash', 'content_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     handling_record_id = db.Column(db.Integer, db.ForeignKey('handling_records.id'), nullable=False)
@@ -56,6 +69,8 @@ class EvidenceFile(db.Model):
     file_path = db.Column(db.String(512), nullable=False)
     file_type = db.Column(db.String(50))  # 'image', 'video', 'audio', 'document'
     file_size = db.Column(db.Integer)  # 文件大小（字节）
+    mime_type = db.Column(db.String(100))  # MIME类型
+    content_hash = db.Column(db.String(64))  # 内容 SHA-256，对应 media_blobs
     description = db.Column(db.Text)
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -70,6 +85,8 @@ class EvidenceFile(db.Model):
             'file_path': self.file_path,
             'file_type': self.file_type,
             'file_size': self.file_size,
+            'mime_type': self.mime_type,
+            'content_hash': self.content_hash,
             'description': self.description,
             'upload_time': self.upload_time.isoformat() if self.upload_time else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -79,6 +96,9 @@ class EvidenceFile(db.Model):
 class HandlingLog(db.Model):
     """处理日志模型"""
     __tablename__ = 'handling_logs'
+    __table_args__ = (
+        db.Index('ix_handling_logs_handling_record_id_created_at', 'handling_record_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     handling_record_id = db.Column(db.Integer, db.ForeignKey('handling_records.id'), nullable=False)
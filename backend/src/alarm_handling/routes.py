@@ -1,14 +1,29 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from datetime import datetime
-import os
+import mimetypes
 from werkzeug.utils import secure_filename
 from .models import HandlingRecord, EvidenceFile, HandlingLog
 from ..alarm_unified_access.models import AlarmRecord
 from ..alarm_dispatching.models import DispatchTask, DispatchGroup
+from sqlalchemy.orm import joinedload, selectinload
+from ..pagination import paginate_query
+from ..chunked_upload import (UploadError, init_upload, finalize_upload, discard_upload,
+                              error_response, session_response, status_view, append_view,
+                              discard_view)
+from ..blob_store import store_file, store_stream, find_blob, acquire_blob, release_blob
+from ..serialization import parse_projection, apply_projection, make_serializer
+from ..media_delivery import send_media
+from ..media_integrity import integrity_report
 from .. import db
 
 bp = Blueprint('alarm_handling', __name__)
 
+HANDLING_EXPAND_LOADERS = {
+    'handler': lambda: joinedload(HandlingRecord.handler),
+    'evidence_files': lambda: selectinload(HandlingRecord.evidence_files),
+    'handling_logs': lambda: selectinload(HandlingRecord.handling_logs)
+}
+
 def allowed_file(filename):
     """检查文件类型是否允许上传"""
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'mp4', 'avi', 'mp3', 'wav', 'pdf', 'doc', 'docx'}
@@ -40,6 +55,28 @@ def create_handling_log(handling_record_id, action, status, operator, operator_i
     db.session.add(log)
     return log
 
+def create_evidence_file(record, filename, blob, mime_type, description, operator, operator_id):
+    """为已存入内容存储的文件创建证据文件记录及上传日志"""
+    evidence_file = EvidenceFile(
+        handling_record_id=record.id,
+        file_path=blob.path,
+        file_name=filename,
+        file_size=blob.size,
+        file_type=get_file_type(filename),
+        mime_type=mime_type,
+        content_hash=blob.sha256,
+        description=description
+    )
+    db.session.add(evidence_file)
+    acquire_blob(blob)
+    
+    # 创建文件上传日志
+    create_handling_log(record.id, 'upload', record.status, operator, operator_id,
+                        f'上传证据文件：{filename}')
+    
+    db.session.commit()
+    return evidence_file
+
 @bp.route('/records', methods=['POST'])
 def create_handling_record():
     """创建新的警情处置记录"""
@@ -198,62 +235,176 @@ def upload_evidence_file(record_id):
         return jsonify({'error': 'Handling record not found'}), 404
     
     try:
-        # 创建上传目录
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'evidence', str(record_id))
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # 保存文件
+        # 保存文件（边写边计算哈希，内容已存在时不重复落盘）
         filename = secure_filename(file.filename)
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
+        blob = store_stream(file.stream)
         
-        # 获取文件信息
-        file_size = os.path.getsize(file_path)
-        file_type = get_file_type(filename)
-        mime_type = file.content_type
-        
-        # 创建证据文件记录
-        evidence_file = EvidenceFile(
-            handling_record_id=record_id,
-            file_path=file_path,
-            file_name=filename,
-            file_size=file_size,
-            file_type=file_type,
-            mime_type=mime_type,
-            description=request.form.get('description')
+        evidence_file = create_evidence_file(
+            record, filename, blob, file.content_type,
+            request.form.get('description'),
+            request.form.get('operator', 'system'),
+            request.form.get('operator_id', 0)
         )
         
-        db.session.add(evidence_file)
+        return jsonify({
+            'message': 'Evidence file uploaded successfully',
+            'data': evidence_file.to_dict()
+        }), 201
         
-        # 创建文件上传日志
-        create_handling_log(
-            record.id,
-            'upload',
-            record.status,
-            request.form.get('operator', 'system'),
-            request.form.get('operator_id', 0),
-            f'上传证据文件：{filename}'
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error uploading evidence file: {str(e)}'}), 500
+
+@bp.route('/records/<int:record_id>/evidence/uploads', methods=['POST'])
+def init_evidence_upload(record_id):
+    """创建证据文件分片上传会话（大文件断点续传）"""
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('file_name') or '')
+    if not filename:
+        return jsonify({'error': 'file_name is required'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    record = HandlingRecord.query.get(record_id)
+    if not record:
+        return jsonify({'error': 'Handling record not found'}), 404
+    
+    extra = {
+        'mime_type': data.get('mime_type') or mimetypes.guess_type(filename)[0],
+        'description': data.get('description'),
+        'operator': data.get('operator', 'system'),
+        'operator_id': data.get('operator_id', 0)
+    }
+    try:
+        # 存储中已有相同内容时直接秒传，无需上传数据
+        blob = find_blob(data.get('sha256'), data.get('total_size'))
+        if blob:
+            evidence_file = create_evidence_file(
+                record, filename, blob, extra['mime_type'], extra['description'],
+                extra['operator'], extra['operator_id']
+            )
+            return jsonify({
+                'message': 'Evidence file uploaded successfully',
+                'data': evidence_file.to_dict(),
+                'sha256': blob.sha256,
+                'instant': True
+            }), 201
+        meta = init_upload('evidence', record_id, filename, data.get('total_size'),
+                           data.get('sha256'), extra)
+    except UploadError as e:
+        return error_response(e)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'total_size must be an integer'}), 400
+    
+    return jsonify({
+        'message': 'Upload session created',
+        'data': session_response(meta)
+    }), 201
+
+@bp.route('/evidence/uploads/<upload_id>', methods=['GET'])
+def get_evidence_upload(upload_id):
+    """查询证据文件上传进度"""
+    return status_view(upload_id, 'evidence')
+
+@bp.route('/evidence/uploads/<upload_id>', methods=['PATCH'])
+def append_evidence_upload(upload_id):
+    """提交证据文件分片"""
+    return append_view(upload_id, 'evidence')
+
+@bp.route('/evidence/uploads/<upload_id>', methods=['DELETE'])
+def discard_evidence_upload(upload_id):
+    """取消证据文件上传"""
+    return discard_view(upload_id, 'evidence')
+
+@bp.route('/evidence/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_evidence_upload(upload_id):
+    """完成证据文件上传，校验后创建证据文件记录"""
+    try:
+        meta, data_path, sha256 = finalize_upload(upload_id, 'evidence')
+    except UploadError as e:
+        return error_response(e)
+    
+    record = HandlingRecord.query.get(meta['target_id'])
+    if not record:
+        discard_upload(upload_id)
+        return jsonify({'error': 'Handling record not found'}), 404
+    
+    try:
+        # 上传文件直接重命名进内容存储，不再复制
+        blob = store_file(data_path, sha256)
+        extra = meta['extra']
+        evidence_file = create_evidence_file(
+            record, meta['file_name'], blob, extra.get('mime_type'),
+            extra.get('description'), extra.get('operator', 'system'), extra.get('operator_id', 0)
         )
-        
-        db.session.commit()
+        discard_upload(upload_id)
         
         return jsonify({
             'message': 'Evidence file uploaded successfully',
-            'data': evidence_file.to_dict()
+            'data': evidence_file.to_dict(),
+            'sha256': sha256
         }), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Error uploading evidence file: {str(e)}'}), 500
 
+@bp.route('/evidence/<int:file_id>/content', methods=['GET'])
+def get_evidence_content(file_id):
+    """在线查看或下载证据文件，支持 Range 与条件请求"""
+    evidence_file = EvidenceFile.query.get(file_id)
+    if not evidence_file:
+        return jsonify({'error': 'Evidence file not found'}), 404
+    return send_media(evidence_file.file_path, evidence_file.file_name, evidence_file.mime_type,
+                      evidence_file.content_hash, evidence_file.upload_time)
+
+@bp.route('/evidence/<int:file_id>/integrity', methods=['GET'])
+def get_evidence_integrity(file_id):
+    """获取证据文件的哈希链记录与最近一次巡检结果"""
+    evidence_file = EvidenceFile.query.get(file_id)
+    if not evidence_file:
+        return jsonify({'error': 'Evidence file not found'}), 404
+    return jsonify(integrity_report(evidence_file.content_hash)), 200
+
+@bp.route('/evidence/<int:file_id>', methods=['DELETE'])
+def delete_evidence_file(file_id):
+    """删除证据文件记录，释放对存储内容的引用"""
+    evidence_file = EvidenceFile.query.get(file_id)
+    if not evidence_file:
+        return jsonify({'error': 'Evidence file not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        record = HandlingRecord.query.get(evidence_file.handling_record_id)
+        if evidence_file.content_hash:
+            release_blob(evidence_file.content_hash)
+        create_handling_log(
+            record.id,
+            'delete_evidence',
+            record.status,
+            data.get('operator', 'system'),
+            data.get('operator_id', 0),
+            f'删除证据文件：{evidence_file.file_name}'
+        )
+        db.session.delete(evidence_file)
+        db.session.commit()
+        return jsonify({'message': 'Evidence file deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error deleting evidence file: {str(e)}'}), 500
+
 @bp.route('/records', methods=['GET'])
 def list_handling_records():
     """获取警情处置记录列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # 解析输出列与需要展开的关联对象，列裁剪下推到 SQL，关联对象按接口选择预加载策略
+    try:
+        fields, expand = parse_projection(HandlingRecord, HANDLING_EXPAND_LOADERS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # 构建查询
-    query = HandlingRecord.query
+    query = apply_projection(HandlingRecord.query, HandlingRecord, HANDLING_EXPAND_LOADERS, fields, expand,
+                             required=[HandlingRecord.created_at])
     
     # 添加过滤条件
     alarm_id = request.args.get('alarm_record_id')
@@ -279,17 +430,14 @@ def list_handling_records():
     if end_date:
         query = query.filter(HandlingRecord.created_at <= datetime.fromisoformat(end_date))
     
-    # 执行分页查询
-    pagination = query.order_by(HandlingRecord.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 执行分页查询（页码分页或游标分页）
+    try:
+        result = paginate_query(query, HandlingRecord.created_at, HandlingRecord.id,
+                                serialize=make_serializer(fields, expand))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }), 200
+    return jsonify(result), 200
 
 @bp.route('/records/<int:record_id>/logs', methods=['GET'])
 def get_handling_logs(record_id):
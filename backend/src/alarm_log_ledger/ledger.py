@@ -0,0 +1,287 @@
+"""话单写入缓冲与分区维护
+
+交换机每分钟上报数千条呼叫事件，逐条提交事务会让数据库在日志刷盘上排队。接口只做校验后放入进程内缓冲，
+由后台线程每 LEDGER_FLUSH_INTERVAL_MS 毫秒或积累 LEDGER_FLUSH_ROWS 行时以一次 executemany 批量写入：
+- 缓冲超过 LEDGER_BUFFER_MAX_ROWS 时由请求线程同步写入，形成背压，内存占用有上限
+- 重复上报的行（call_id + start_time 唯一约束）在批量写入语句内直接跳过（ON CONFLICT DO NOTHING /
+  ON DUPLICATE KEY UPDATE）；其他约束冲突或格式错误的行导致整批失败时退化为逐行写入，出错的行记录日志后丢弃
+- 数据库暂时不可用（连接断开、锁等待超时等）时整批放回缓冲等待下次写入；进程正常退出时写完剩余数据，异常退出会丢失未写入的缓冲
+  （交换机侧按 call_id 重传即可，重复行会被跳过）
+
+PostgreSQL 下 call_ledger 按天分区，ensure_partitions 预建分区并把落入兜底分区的数据迁入对应日分区，
+drop_expired 以 DROP TABLE 删除过期分区并清理兜底分区中的过期行；
+其他数据库为普通表，过期数据按主键分批删除。
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timedelta, date
+from flask import current_app
+from sqlalchemy import insert, delete, select, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import (InterfaceError, OperationalError, SQLAlchemyError,
+                            TimeoutError as PoolTimeoutError)
+from .models import CallRecord
+from .. import db
+
+PARTITION_PREFIX = 'call_ledger_p'
+DEFAULT_PARTITION = 'call_ledger_default'
+DELETE_BATCH_SIZE = 10000
+DEDUP_COLUMNS = ['call_id', 'start_time']
+# 数据库暂时不可用的错误，批次放回缓冲重试；其他错误由数据本身引起，重试也不会成功
+RETRYABLE_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
+ledger_table = CallRecord.__table__
+
+_buffer_lock = threading.Lock()
+
+class LedgerBufferFull(Exception):
+    """缓冲已满且无法写入数据库"""
+
+class WriteBehindBuffer:
+    """按时间间隔或行数批量写入话单的进程内缓冲"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.interval = app.config.get('LEDGER_FLUSH_INTERVAL_MS', 200) / 1000
+        self.flush_rows = app.config.get('LEDGER_FLUSH_ROWS', 500)
+        self.max_rows = app.config.get('LEDGER_BUFFER_MAX_ROWS', 50000)
+        self.rows = []
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.stats = {'written': 0, 'duplicates': 0, 'rejected': 0, 'batches': 0, 'last_error': None,
+                      'last_flush_at': None}
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='call-ledger-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def append(self, rows):
+        if self.pending() >= self.max_rows:
+            # 后台线程跟不上时由请求线程同步写入；数据库不可用时拒绝新数据，由上游重传
+            self.flush()
+            if self.pending() >= self.max_rows:
+                raise LedgerBufferFull(f'{self.pending()} call records are waiting to be written')
+        with self.condition:
+            self.rows.extend(rows)
+            if len(self.rows) >= self.flush_rows:
+                self.condition.notify()
+
+    def pending(self):
+        with self.condition:
+            return len(self.rows)
+
+    def _take(self):
+        with self.condition:
+            rows, self.rows = self.rows, []
+            return rows
+
+    def _run(self):
+        while not self.closed:
+            with self.condition:
+                if len(self.rows) < self.flush_rows:
+                    self.condition.wait(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                # 写入线程退出后只能靠请求线程在缓冲写满时同步写入，任何异常都不能结束循环
+                self.stats['last_error'] = str(e)
+                self.app.logger.error(f'Call ledger writer error: {str(e)}')
+                time.sleep(self.interval)
+
+    def flush(self):
+        """写入当前缓冲中的全部话单；数据库不可用时把未写入的批次放回缓冲"""
+        with self.flush_lock:
+            rows = self._take()
+            for begin in range(0, len(rows), self.flush_rows):
+                batch = rows[begin:begin + self.flush_rows]
+                try:
+                    with self.app.app_context():
+                        self._write(batch)
+                except RETRYABLE_ERRORS as e:
+                    self.stats['last_error'] = str(e)
+                    self.app.logger.warning(f'Call ledger flush failed, {len(rows) - begin} rows requeued: {str(e)}')
+                    with self.condition:
+                        self.rows[:0] = rows[begin:]
+                    # 等待下一个周期再重试，避免数据库故障时空转
+                    time.sleep(self.interval)
+                    return
+                except Exception as e:
+                    # _write 已逐行处理数据错误，走到这里说明问题出在整批上，只丢弃这一批
+                    self.stats['last_error'] = str(e)
+                    self.stats['rejected'] += len(batch)
+                    self.app.logger.error(f'Call ledger batch of {len(batch)} rows rejected: {str(e)}')
+
+    def _write(self, batch):
+        rejected = 0
+        try:
+            with db.engine.begin() as connection:
+                counts = [insert_new_calls(connection, batch)]
+        except RETRYABLE_ERRORS:
+            raise
+        except Exception as e:
+            # 约束冲突或格式错误的行（缺字段、类型不符）会让整批失败，逐行写入找出并丢弃这些行
+            self.app.logger.warning(f'Call ledger batch failed, writing row by row: {error_message(e)}')
+            counts = []
+            for row in batch:
+                try:
+                    with db.engine.begin() as connection:
+                        counts.append(insert_new_calls(connection, [row]))
+                except RETRYABLE_ERRORS:
+                    raise
+                except Exception as e:
+                    rejected += 1
+                    call_id = row.get('call_id') if isinstance(row, dict) else None
+                    self.app.logger.error(f'Call record {call_id} rejected: {error_message(e)}')
+        if None in counts:
+            # MySQL 下重复行也计入影响行数，无法区分，全部计为已写入
+            written = len(batch) - rejected
+        else:
+            written = sum(counts)
+            self.stats['duplicates'] += len(batch) - rejected - written
+        self.stats['written'] += written
+        self.stats['rejected'] += rejected
+        self.stats['batches'] += 1
+        self.stats['last_flush_at'] = datetime.utcnow().isoformat()
+
+    def close(self):
+        self.closed = True
+        with self.condition:
+            self.condition.notify()
+        self.flush()
+
+def error_message(error):
+    """数据库错误只取驱动原始信息，不带完整 SQL"""
+    return str(getattr(error, 'orig', None) or error)
+
+def insert_new_calls(connection, batch):
+    """写入一批话单并跳过 (call_id, start_time) 已存在的行，返回新写入的行数；无法区分重复行时返回 None"""
+    name = connection.dialect.name
+    if name in ('mysql', 'mariadb'):
+        # 只对唯一键冲突做空更新；INSERT IGNORE 会把截断等其他错误也降为警告
+        statement = mysql.insert(ledger_table)
+        connection.execute(statement.on_duplicate_key_update(call_id=statement.inserted.call_id), batch)
+        # 驱动默认启用 CLIENT_FOUND_ROWS，影响行数包含重复行
+        return None
+    if name == 'postgresql':
+        statement = postgresql.insert(ledger_table).on_conflict_do_nothing(index_elements=DEDUP_COLUMNS)
+    elif name == 'sqlite':
+        statement = sqlite.insert(ledger_table).on_conflict_do_nothing(index_elements=DEDUP_COLUMNS)
+    else:
+        statement = insert(ledger_table)
+    if connection.dialect.insert_executemany_returning:
+        # 冲突而跳过的行不返回
+        return len(connection.execute(statement.returning(ledger_table.c.id), batch).all())
+    return connection.execute(statement, batch).rowcount
+
+def get_buffer():
+    """返回当前进程的写入缓冲；fork 出的子进程重新创建（父进程的写入线程不会被继承）"""
+    app = current_app._get_current_object()
+    buffer = app.extensions.get('call_ledger_buffer')
+    if buffer is None or buffer.pid != os.getpid():
+        with _buffer_lock:
+            buffer = app.extensions.get('call_ledger_buffer')
+            if buffer is None or buffer.pid != os.getpid():
+                buffer = app.extensions['call_ledger_buffer'] = WriteBehindBuffer(app)
+    return buffer
+
+def is_partitioned():
+    """call_ledger 是否为 PostgreSQL 分区表（db.create_all 建出的是普通表）"""
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'call_ledger'::regclass"
+    )).scalar() is not None
+
+def partition_name(day):
+    return f'{PARTITION_PREFIX}{day:%Y%m%d}'
+
+def ensure_partitions(days_ahead=7):
+    """预建从昨天到 days_ahead 天后的日分区，并为兜底分区中已有数据的日期补建分区，返回新建的分区名
+
+    兜底分区有某天的数据时不能直接建该天的分区（PostgreSQL 会报分区范围冲突），
+    在同一事务内先把这些行移出兜底分区，建好分区后再经父表写回；每个分区单独提交，一天失败不影响其他天。
+    """
+    if not is_partitioned():
+        return []
+    existing = set(list_partitions())
+    today = date.today()
+    has_default = DEFAULT_PARTITION in existing
+    days = {today + timedelta(days=offset) for offset in range(-1, days_ahead + 1)}
+    if has_default:
+        days.update(day.date() for day in db.session.execute(text(
+            f"SELECT DISTINCT date_trunc('day', start_time) FROM {DEFAULT_PARTITION}"
+        )).scalars())
+    created = []
+    for day in sorted(days):
+        name = partition_name(day)
+        if name in existing:
+            continue
+        try:
+            create_partition(day, has_default)
+            db.session.commit()
+            created.append(name)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f'Failed to create call ledger partition {name}: {str(e)}')
+    return created
+
+def create_partition(day, has_default=True):
+    """建立某天的分区，兜底分区中该天的行随之迁入新分区（由调用方提交）"""
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    in_range = f"start_time >= '{start}' AND start_time < '{end}'"
+    moving = has_default and db.session.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1")).scalar() is not None
+    if moving:
+        db.session.execute(text(
+            'CREATE TEMPORARY TABLE call_ledger_moving (LIKE call_ledger INCLUDING DEFAULTS) ON COMMIT DROP'))
+        db.session.execute(text(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) '
+            f'INSERT INTO call_ledger_moving SELECT * FROM moved'))
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF call_ledger "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    if moving:
+        db.session.execute(text('INSERT INTO call_ledger SELECT * FROM call_ledger_moving'))
+        db.session.execute(text('DROP TABLE call_ledger_moving'))
+
+def list_partitions():
+    return db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'call_ledger'::regclass ORDER BY c.relname"
+    )).scalars().all()
+
+def drop_expired(retain_days):
+    """删除 retain_days 天以前的话单；分区表直接删除整个日分区，返回删除的分区数或行数"""
+    cutoff = date.today() - timedelta(days=retain_days)
+    if is_partitioned():
+        dropped = 0
+        partitions = list_partitions()
+        for name in partitions:
+            suffix = name[len(PARTITION_PREFIX):]
+            if not name.startswith(PARTITION_PREFIX) or not suffix.isdigit():
+                continue
+            if datetime.strptime(suffix, '%Y%m%d').date() < cutoff:
+                db.session.execute(text(f'DROP TABLE {name}'))
+                dropped += 1
+        if DEFAULT_PARTITION in partitions:
+            # 兜底分区中的过期行（通常已由 ensure_partitions 迁入日分区，这里只清理残留）
+            db.session.execute(text(f'DELETE FROM {DEFAULT_PARTITION} WHERE start_time < :cutoff'),
+                               {'cutoff': datetime.combine(cutoff, datetime.min.time())})
+        db.session.commit()
+        return dropped
+
+    removed = 0
+    cutoff_time = datetime.combine(cutoff, datetime.min.time())
+    while True:
+        ids = db.session.execute(select(ledger_table.c.id).where(
+            ledger_table.c.start_time < cutoff_time).limit(DELETE_BATCH_SIZE)).scalars().all()
+        if not ids:
+            return removed
+        db.session.execute(delete(ledger_table).where(ledger_table.c.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
@@ -0,0 +1,54 @@
+from .. import db
+from datetime import datetime
+
+class CallRecord(db.Model):
+    """话单模型（只追加）
+
+    PostgreSQL 下由迁移脚本建为按 start_time 分区的表（每天一个分区，主键为 (id, start_time)），
+    过期数据以整个分区删除，见 ledger.py。
+    """
+    __tablename__ = 'call_ledger'
+    __table_args__ = (
+        db.UniqueConstraint('call_id', 'start_time', name='uq_call_ledger_call_id_start_time'),
+        db.Index('ix_call_ledger_start_time', 'start_time'),
+        db.Index('ix_call_ledger_caller_number_normalized_start_time', 'caller_number_normalized', 'start_time'),
+        db.Index('ix_call_ledger_called_number_normalized_start_time', 'called_number_normalized', 'start_time'),
+        db.Index('ix_call_ledger_alarm_record_id', 'alarm_record_id')
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    call_id = db.Column(db.String(64), nullable=False)  # 交换机分配的呼叫标识，重复上报时据此去重
+    direction = db.Column(db.String(20), default='inbound')  # 'inbound', 'outbound', 'internal'
+    caller_number = db.Column(db.String(50))
+    caller_number_normalized = db.Column(db.String(50))
+    called_number = db.Column(db.String(50))
+    called_number_normalized = db.Column(db.String(50))
+    agent_id = db.Column(db.String(50))  # 接听席位
+    trunk = db.Column(db.String(50))
+    start_time = db.Column(db.DateTime, nullable=False)
+    answer_time = db.Column(db.DateTime)
+    end_time = db.Column(db.DateTime)
+    duration = db.Column(db.Integer)  # 通话总时长（秒），自 start_time 起
+    talk_duration = db.Column(db.Integer)  # 接通后的通话时长（秒）
+    disposition = db.Column(db.String(20))  # 'answered', 'no_answer', 'busy', 'failed'
+    alarm_record_id = db.Column(db.Integer)  # 关联警情；分区表不支持外键，不建约束
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'call_id': self.call_id,
+            'direction': self.direction,
+            'caller_number': self.caller_number,
+            'called_number': self.called_number,
+            'agent_id': self.agent_id,
+            'trunk': self.trunk,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'answer_time': self.answer_time.isoformat() if self.answer_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'duration': self.duration,
+            'talk_duration': self.talk_duration,
+            'disposition': self.disposition,
+            'alarm_record_id': self.alarm_record_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
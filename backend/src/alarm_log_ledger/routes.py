@@ -0,0 +1,199 @@
+from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime, timedelta
+import json
+import uuid
+from sqlalchemy import or_
+from .models import CallRecord
+from .ledger import get_buffer, LedgerBufferFull
+from ..pagination import paginate_query
+from ..phone_numbers import normalize_phone
+
+bp = Blueprint('alarm_log_ledger', __name__)
+
+CALL_DIRECTIONS = {'inbound', 'outbound', 'internal'}
+CALL_DISPOSITIONS = {'answered', 'no_answer', 'busy', 'failed'}
+
+def parse_time(value, name):
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be an ISO 8601 string')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # 统一存为不带时区的 UTC 时间，与其他表一致
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+def build_call_values(data):
+    """校验单条呼叫事件，返回可直接写入 call_ledger 的字段字典"""
+    if not isinstance(data, dict):
+        raise ValueError('Call data must be a JSON object')
+    start_time = parse_time(data.get('start_time'), 'start_time')
+    if start_time is None:
+        raise ValueError('start_time is required')
+    answer_time = parse_time(data.get('answer_time'), 'answer_time')
+    end_time = parse_time(data.get('end_time'), 'end_time')
+    if end_time and end_time < start_time:
+        raise ValueError('end_time must not be earlier than start_time')
+
+    direction = data.get('direction', 'inbound')
+    if direction not in CALL_DIRECTIONS:
+        raise ValueError(f'direction must be one of {", ".join(sorted(CALL_DIRECTIONS))}')
+    disposition = data.get('disposition') or ('answered' if answer_time else None)
+    if disposition is not None and disposition not in CALL_DISPOSITIONS:
+        raise ValueError(f'disposition must be one of {", ".join(sorted(CALL_DISPOSITIONS))}')
+
+    duration = data.get('duration')
+    if duration is None and end_time:
+        duration = int((end_time - start_time).total_seconds())
+    talk_duration = data.get('talk_duration')
+    if talk_duration is None and end_time and answer_time:
+        talk_duration = max(0, int((end_time - answer_time).total_seconds()))
+    for name, value in (('duration', duration), ('talk_duration', talk_duration)):
+        if value is not None and (not isinstance(value, int) or value < 0):
+            raise ValueError(f'{name} must be a non-negative integer')
+
+    call_id = data.get('call_id') or uuid.uuid4().hex
+    if not isinstance(call_id, str) or len(call_id) > 64:
+        raise ValueError('call_id must be a string of at most 64 characters')
+    alarm_record_id = data.get('alarm_record_id')
+    if alarm_record_id is not None and not isinstance(alarm_record_id, int):
+        raise ValueError('alarm_record_id must be an integer')
+
+    return {
+        'call_id': call_id,
+        'direction': direction,
+        'caller_number': data.get('caller_number'),
+        'caller_number_normalized': normalize_phone(data.get('caller_number')),
+        'called_number': data.get('called_number'),
+        'called_number_normalized': normalize_phone(data.get('called_number')),
+        'agent_id': data.get('agent_id'),
+        'trunk': data.get('trunk'),
+        'start_time': start_time,
+        'answer_time': answer_time,
+        'end_time': end_time,
+        'duration': duration,
+        'talk_duration': talk_duration,
+        'disposition': disposition,
+        'alarm_record_id': alarm_record_id
+    }
+
+def iter_call_rows():
+    """按请求格式逐行产出呼叫事件：NDJSON 流、JSON 数组、{"items": [...]} 或单个对象"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f'Invalid JSON line: {str(e)}')
+        return
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data['items'] if isinstance(data.get('items'), list) else [data]
+    if not isinstance(data, list):
+        raise ValueError('Request body must be a JSON object, array, {"items": [...]} or NDJSON')
+    yield from data
+
+@bp.route('/calls', methods=['POST'])
+def record_calls():
+    """上报呼叫事件（单条、数组或 NDJSON），校验后进入写入缓冲，异步批量落库
+
+    返回 202 及逐行校验错误；数据通常在 LEDGER_FLUSH_INTERVAL_MS 毫秒内可查询。
+    """
+    max_rows = current_app.config.get('LEDGER_MAX_ROWS_PER_REQUEST', 10000)
+    rows = []
+    errors = []
+    total = 0
+    try:
+        for index, row in enumerate(iter_call_rows()):
+            total += 1
+            if index >= max_rows:
+                errors.append({'index': index, 'error': f'Request exceeds maximum of {max_rows} rows'})
+                break
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                rows.append(build_call_values(row))
+            except ValueError as e:
+                errors.append({'index': index, 'error': f'Invalid data format: {str(e)}'})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if total == 0:
+        return jsonify({'error': 'No input data provided'}), 400
+    if rows:
+        try:
+            get_buffer().append(rows)
+        except LedgerBufferFull as e:
+            return jsonify({'error': f'Call ledger is busy, retry later: {str(e)}'}), 503
+
+    return jsonify({
+        'message': 'Call records accepted',
+        'data': {
+            'total': total,
+            'accepted': len(rows),
+            'failed': len(errors),
+            'errors': errors
+        }
+    }), 202
+
+@bp.route('/calls', methods=['GET'])
+def list_calls():
+    """查询话单，支持按号码（主叫或被叫）、时间范围、方向、席位和关联警情过滤
+
+    未指定时间范围时只查最近 LEDGER_DEFAULT_QUERY_DAYS 天，PostgreSQL 分区表上按时间范围裁剪分区。
+    """
+    try:
+        start_time = parse_time(request.args.get('start_time'), 'start_time')
+        end_time = parse_time(request.args.get('end_time'), 'end_time')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start_time is None:
+        days = current_app.config.get('LEDGER_DEFAULT_QUERY_DAYS', 7)
+        start_time = (end_time or datetime.utcnow()) - timedelta(days=days)
+
+    query = CallRecord.query.filter(CallRecord.start_time >= start_time)
+    if end_time:
+        query = query.filter(CallRecord.start_time <= end_time)
+
+    number = request.args.get('number')
+    if number:
+        normalized = normalize_phone(number)
+        if not normalized:
+            return jsonify({'error': 'Invalid phone number'}), 400
+        # 两侧各有 (号码, start_time) 索引，OR 条件可走索引合并
+        query = query.filter(or_(CallRecord.caller_number_normalized == normalized,
+                                 CallRecord.called_number_normalized == normalized))
+    direction = request.args.get('direction')
+    if direction:
+        query = query.filter(CallRecord.direction == direction)
+    agent_id = request.args.get('agent_id')
+    if agent_id:
+        query = query.filter(CallRecord.agent_id == agent_id)
+    alarm_record_id = request.args.get('alarm_record_id', type=int)
+    if alarm_record_id:
+        query = query.filter(CallRecord.alarm_record_id == alarm_record_id)
+
+    try:
+        result = paginate_query(query, CallRecord.start_time, CallRecord.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+@bp.route('/calls/<call_id>', methods=['GET'])
+def get_call(call_id):
+    """按呼叫标识查询话单（同一 call_id 可能因跨天重用返回多条）"""
+    calls = CallRecord.query.filter_by(call_id=call_id).order_by(CallRecord.start_time.desc()).all()
+    if not calls:
+        return jsonify({'error': 'Call record not found'}), 404
+    return jsonify([call.to_dict() for call in calls]), 200
+
+@bp.route('/buffer', methods=['GET'])
+def get_buffer_status():
+    """查看当前进程写入缓冲的状态"""
+    buffer = get_buffer()
+    return jsonify(dict(buffer.stats, pending=buffer.pending(), pid=buffer.pid)), 200
@@ -1,5 +1 @@
-from flask import Blueprint
-
-bp = Blueprint('alarm_unified_access', __name__)
-
-from . import routes 
\ No newline at end of file
+from .routes import bp
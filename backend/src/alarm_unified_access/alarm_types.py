@@ -0,0 +1,101 @@
+"""警情类型分类树
+
+alarm_types 以物化路径存储分类树，alarm_records.alarm_type_id 指向其中一个节点（叶子或中间节点）。
+按大类过滤或统计时，先在分类表的 path 唯一索引上做前缀查询取出该节点及全部子孙的 id（分类表很小），
+再以 alarm_type_id IN (...) 命中 alarm_records 的 (alarm_type_id, alarm_time) 索引，不再对警情表做字符串匹配。
+"""
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from .models import AlarmType
+from .. import db
+
+PATH_SEPARATOR = '/'
+MAX_PATH_LENGTH = 100  # 与 AlarmRecord.alarm_type 列长度一致
+
+def normalize_path(value):
+    """规范化类型路径：去掉各级首尾空白和空的层级，空路径返回 None"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError('alarm_type must be a string')
+    segments = [segment.strip() for segment in value.split(PATH_SEPARATOR)]
+    path = PATH_SEPARATOR.join(segment for segment in segments if segment)
+    if len(path) > MAX_PATH_LENGTH:
+        raise ValueError(f'alarm_type must not exceed {MAX_PATH_LENGTH} characters')
+    return path or None
+
+def _get_or_create(path, parent):
+    alarm_type = AlarmType.query.filter_by(path=path).first()
+    if alarm_type:
+        return alarm_type
+    try:
+        with db.session.begin_nested():
+            alarm_type = AlarmType(
+                name=path.rsplit(PATH_SEPARATOR, 1)[-1], path=path,
+                parent_id=parent.id if parent else None,
+                depth=parent.depth + 1 if parent else 0
+            )
+            db.session.add(alarm_type)
+    except IntegrityError:
+        # 并发请求已先创建同一节点
+        alarm_type = AlarmType.query.filter_by(path=path).one()
+    return alarm_type
+
+def resolve_alarm_type(path, cache=None):
+    """返回路径对应的分类节点，不存在的节点（含祖先）随调用方事务一起创建
+
+    cache 为 {path: id}，批量导入时跨行复用，避免逐行查询分类表。
+    """
+    path = normalize_path(path)
+    if path is None:
+        return None
+    if cache is not None and path in cache:
+        return cache[path]
+
+    parent = None
+    segments = path.split(PATH_SEPARATOR)
+    for depth in range(len(segments)):
+        parent = _get_or_create(PATH_SEPARATOR.join(segments[:depth + 1]), parent)
+    if cache is not None:
+        cache[path] = parent.id
+    return parent.id
+
+def subtree_ids(path):
+    """返回路径对应节点及其全部子孙的 id，路径不存在时返回空列表"""
+    path = normalize_path(path)
+    if path is None:
+        return []
+    rows = db.session.query(AlarmType.id).filter(or_(
+        AlarmType.path == path,
+        AlarmType.path.startswith(path + PATH_SEPARATOR, autoescape=True)
+    ))
+    return [row.id for row in rows]
+
+def rollup_counts(counts, root=None):
+    """把按 alarm_type_id 统计的数量汇总到各级分类
+
+    counts 为 {alarm_type_id: 数量}；返回按路径排序的节点列表，
+    count 为直接归入该节点的数量，total 为该节点及全部子孙的合计。
+    """
+    query = AlarmType.query
+    if root:
+        root = normalize_path(root)
+        query = query.filter(or_(
+            AlarmType.path == root,
+            AlarmType.path.startswith(root + PATH_SEPARATOR, autoescape=True)
+        ))
+    nodes = {node.path: dict(node.to_dict(), count=0, total=0) for node in query}
+    by_id = {node['id']: node for node in nodes.values()}
+
+    for type_id, count in counts.items():
+        node = by_id.get(type_id)
+        if node is None:
+            continue
+        node['count'] += count
+        # 沿路径逐级向上累加；只统计 root 子树时，root 以上的祖先不在 nodes 中
+        segments = node['path'].split(PATH_SEPARATOR)
+        for depth in range(len(segments), 0, -1):
+            ancestor = nodes.get(PATH_SEPARATOR.join(segments[:depth]))
+            if ancestor is not None:
+                ancestor['total'] += count
+    return [nodes[path] for path in sorted(nodes)]
@@ -0,0 +1,47 @@
+"""来电统计
+
+caller_stats 按规范化号码保存累计报警次数、首末次报警时间和最近的警情类型，
+与警情在同一事务内更新，来电时按主键一次读取即可得到该号码的历史概况。
+"""
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from .models import CallerStats
+from .. import db
+
+RECENT_TYPES = 5
+
+def _locked_stats(phone):
+    """取得号码统计行并加行锁，不存在时创建"""
+    stats = CallerStats.query.filter_by(phone=phone).with_for_update().first()
+    if stats:
+        return stats
+    try:
+        with db.session.begin_nested():
+            stats = CallerStats(phone=phone, total_calls=0, last_alarm_types=[])
+            db.session.add(stats)
+    except IntegrityError:
+        # 并发请求已先创建同一号码
+        stats = CallerStats.query.filter_by(phone=phone).with_for_update().one()
+    return stats
+
+def record_calls(calls):
+    """calls 为 [(规范化号码, 警情 id, 报警时间, 警情类型)]，按报警时间顺序累加到各号码的统计中"""
+    by_phone = {}
+    for phone, alarm_id, alarm_time, alarm_type in calls:
+        if phone:
+            by_phone.setdefault(phone, []).append((alarm_time or datetime.utcnow(), alarm_id, alarm_type))
+
+    # 按号码排序加锁，避免并发批量导入相互等待形成死锁
+    for phone in sorted(by_phone):
+        stats = _locked_stats(phone)
+        types = list(stats.last_alarm_types or [])
+        for alarm_time, alarm_id, alarm_type in sorted(by_phone[phone], key=lambda c: (c[0], c[1])):
+            stats.total_calls = (stats.total_calls or 0) + 1
+            if stats.first_call_at is None or alarm_time < stats.first_call_at:
+                stats.first_call_at = alarm_time
+            if stats.last_call_at is None or alarm_time >= stats.last_call_at:
+                stats.last_call_at = alarm_time
+                stats.last_alarm_id = alarm_id
+                if alarm_type:
+                    types = [alarm_type] + [t for t in types if t != alarm_type]
+        stats.last_alarm_types = types[:RECENT_TYPES]
@@ -0,0 +1,143 @@
+"""接警重复警情识别
+
+同一事件常有多人、多次报警。新警情写入前按以下键在滑动时间窗内查找主警情：
+- 报警电话：同一号码在窗口内再次报警
+- 事发位置：事发坐标所在格网及相邻 8 个格网、当前及上一个时间桶内，距离不超过阈值的警情
+每次查找是一次 MGET（固定 19 个键），与历史警情数量无关。命中时新警情关联到主警情，
+窗口随每次命中顺延。索引保存在 Redis 中由所有 worker 共享，未配置 Redis 时退化为进程内字典。
+"""
+import json
+import threading
+import time
+from flask import current_app
+from ..geo import cell_xy, haversine
+from ..phone_numbers import normalize_phone
+
+KEY_PREFIX = 'alarm:dedup:'
+# 位置格网级别：每轴 16 位，约 470m x 305m（纬度 40° 附近），配合相邻格网覆盖默认 300m 的判定距离
+LOCATION_CELL_BITS = 16
+
+_redis_clients = {}
+_local_store = {}
+_local_lock = threading.Lock()
+
+def _config(name, default):
+    return current_app.config.get(name, default)
+
+def _redis():
+    url = _config('DEDUP_REDIS_URL', None) or _config('REDIS_URL', None)
+    if not url:
+        return None
+    if url not in _redis_clients:
+        import redis
+        _redis_clients[url] = redis.Redis.from_url(url)
+    return _redis_clients[url]
+
+def _mget(keys):
+    client = _redis()
+    if client is not None:
+        try:
+            return [json.loads(value) if value else None for value in client.mget(keys)]
+        except Exception as e:
+            # 索引不可用时不影响接警，只是不做重复识别
+            current_app.logger.warning(f'Duplicate index lookup failed: {str(e)}')
+            return [None] * len(keys)
+    now = time.time()
+    with _local_lock:
+        values = []
+        for key in keys:
+            entry = _local_store.get(key)
+            values.append(entry[1] if entry and entry[0] > now else None)
+        return values
+
+def _mset(items, ttl):
+    client = _redis()
+    if client is not None:
+        pipe = client.pipeline(transaction=False)
+        for key, value in items:
+            pipe.set(key, json.dumps(value), ex=ttl)
+        try:
+            pipe.execute()
+        except Exception as e:
+            current_app.logger.warning(f'Duplicate index update failed: {str(e)}')
+        return
+    now = time.time()
+    with _local_lock:
+        for key, value in items:
+            _local_store[key] = (now + ttl, value)
+        # 顺带清理过期键，避免进程内字典无限增长
+        if len(_local_store) > 10000:
+            for key in [key for key, entry in _local_store.items() if entry[0] <= now]:
+                del _local_store[key]
+
+def _phone_key(phone):
+    return f'{KEY_PREFIX}phone:{phone}'
+
+def _cell_key(x, y, bucket):
+    return f'{KEY_PREFIX}cell:{LOCATION_CELL_BITS}:{x}:{y}:{bucket}'
+
+def _lookup_keys(values, now):
+    """返回 [(键, 匹配方式)]"""
+    window = _config('DUPLICATE_WINDOW_SECONDS', 600)
+    keys = []
+    phone = normalize_phone(values.get('reporter_phone'))
+    if phone:
+        keys.append((_phone_key(phone), 'phone'))
+    cell = cell_xy(values.get('event_location_longitude'), values.get('event_location_latitude'),
+                   LOCATION_CELL_BITS)
+    if cell:
+        bucket = int(now // window)
+        columns = 1 << LOCATION_CELL_BITS
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for b in (bucket, bucket - 1):
+                    # 经度方向首尾相接，±180° 经线两侧的格网互为相邻
+                    keys.append((_cell_key((cell[0] + dx) % columns, cell[1] + dy, b), 'location'))
+    return keys
+
+def find_primary(values, now=None):
+    """查找新警情对应的主警情，返回 (主警情 id, 匹配方式)，未命中返回 (None, None)"""
+    if not _config('DUPLICATE_DETECTION_ENABLED', True):
+        return None, None
+    now = now or time.time()
+    keys = _lookup_keys(values, now)
+    if not keys:
+        return None, None
+    window = _config('DUPLICATE_WINDOW_SECONDS', 600)
+    radius = _config('DUPLICATE_RADIUS', 300)
+
+    best = None
+    for (_, reason), entry in zip(keys, _mget([key for key, _ in keys])):
+        if not entry or now - entry['t'] > window:
+            continue
+        if reason == 'location':
+            distance = haversine(values['event_location_longitude'], values['event_location_latitude'],
+                                 entry['lon'], entry['lat'])
+            if distance > radius:
+                continue
+        # 电话命中优先，其次取最近一次报警的主警情
+        rank = (reason == 'phone', entry['t'])
+        if best is None or rank > best[0]:
+            best = (rank, entry['id'], reason)
+    if best is None:
+        return None, None
+    return best[1], best[2]
+
+def register(alarm_id, values, primary_id=None, now=None):
+    """把警情登记到滑动窗口索引；重复警情以其主警情 id 登记，使窗口顺延"""
+    if not _config('DUPLICATE_DETECTION_ENABLED', True):
+        return
+    now = now or time.time()
+    window = _config('DUPLICATE_WINDOW_SECONDS', 600)
+    entry = {'id': primary_id or alarm_id, 't': now,
+             'lon': values.get('event_location_longitude'), 'lat': values.get('event_location_latitude')}
+    items = []
+    phone = normalize_phone(values.get('reporter_phone'))
+    if phone:
+        items.append((_phone_key(phone), entry))
+    cell = cell_xy(entry['lon'], entry['lat'], LOCATION_CELL_BITS)
+    if cell:
+        items.append((_cell_key(cell[0], cell[1], int(now // window)), entry))
+    if items:
+        # 位置键按时间桶划分，需保留到下一个时间桶结束
+        _mset(items, window * 2)
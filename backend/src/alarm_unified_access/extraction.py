@@ -0,0 +1,254 @@
+"""警情要素提取
+
+从录音转写文本和警情描述中提取时间、地址、电话、车牌以及警情类型/紧急程度关键词，用于生成警情初稿。
+正则在模块加载时预编译，关键词构建为 Aho-Corasick 自动机，应用启动时建好、所有请求共用，
+一次扫描即可完成全部关键词匹配，不依赖外部 NLP 服务。
+"""
+import re
+from collections import deque
+from datetime import timedelta
+
+# 警情类型 -> 关键词，类型使用与 AlarmRecord.alarm_type 相同的层级写法
+ALARM_TYPE_KEYWORDS = {
+    '刑事案件/盗窃/入室盗窃': ['入室盗窃', '撬门', '撬锁', '家里被偷', '家里进了小偷', '翻窗进来'],
+    '刑事案件/盗窃': ['盗窃', '被偷', '偷了', '偷走', '小偷', '扒手', '被扒'],
+    '刑事案件/抢劫': ['抢劫', '抢包', '抢走', '抢了', '飞车抢'],
+    '刑事案件/故意伤害': ['捅伤', '砍伤', '刺伤', '捅了', '砍了'],
+    '刑事案件/诈骗': ['诈骗', '被骗', '骗了', '骗子', '刷单', '冒充客服'],
+    '治安案件/殴打他人': ['打人', '打架', '斗殴', '被打', '殴打', '动手'],
+    '纠纷/家庭纠纷': ['家暴', '夫妻吵架', '家里吵架', '老公打我', '老婆打我'],
+    '纠纷/邻里纠纷': ['邻居吵', '邻居闹', '噪音扰民', '太吵了'],
+    '交通事故': ['交通事故', '车祸', '撞车', '追尾', '撞人', '撞了', '翻车', '刮擦'],
+    '火灾': ['火灾', '着火', '起火', '失火', '冒烟', '烧起来'],
+    '求助/人员走失': ['走失', '走丢', '找不到孩子', '找不到老人', '迷路'],
+    '求助/医疗救助': ['晕倒', '昏迷', '不省人事', '心脏病', '喘不上气'],
+}
+
+# 紧急程度 -> 关键词，取值与 AlarmRecord.emergency_level 一致
+EMERGENCY_KEYWORDS = {
+    '非常紧急': ['持刀', '拿刀', '有刀', '有枪', '流了很多血', '流血', '昏迷', '不省人事', '被困',
+                 '爆炸', '救命', '着火', '挟持', '要跳楼', '煤气泄漏'],
+    '紧急': ['受伤', '正在打', '还在打', '打起来了', '追尾', '撞人', '人还在', '跑了'],
+}
+EMERGENCY_ORDER = ['一般', '紧急', '非常紧急']
+
+# 分段转写拼接结果中每行开头的时间标注，如 [01:30.0-02:00.0]
+SEGMENT_TAG_RE = re.compile(r'^\[\d{2}:\d{2}\.\d-\d{2}:\d{2}\.\d\] ?', re.M)
+
+_NUM = r'[0-9零〇一二两三四五六七八九十]{1,3}'
+# 地址用字：汉字，但排除口语中常紧挨在地址前面的虚词与代词，避免把“我在”“说是”并入地址
+_HAN = r'[^\W\d_A-Za-z在的了我你他她们是有到去从就说住这那呢吗啊吧呀哦嗯喂]'
+
+TIME_RE = re.compile(
+    r'(?P<day>今天|今日|昨天|昨日|前天|明天|今早|今晚|昨晚|昨夜)?'
+    r'(?P<period>凌晨|早上|早晨|上午|中午|下午|傍晚|晚上|夜里|半夜|深夜)?'
+    rf'(?P<hour>{_NUM})(?:点|时|(?=[:：]\d))'
+    # “一刻”“三刻”须先于分钟尝试，否则“三点一刻”会被读成三点零一分
+    rf'(?:(?P<fraction>半|一刻|三刻)|[:：]?(?P<minute>{_NUM})分?)?'
+)
+RELATIVE_TIME_RE = re.compile(
+    rf'(?P<amount>{_NUM}|半|几)个?(?P<unit>分钟|小时|钟头)(?:以前|之前|前)'
+)
+DATE_RE = re.compile(
+    rf'(?:(?P<year>\d{{4}})年)?(?P<month>{_NUM})月(?P<day>{_NUM})[日号]'
+)
+ADDRESS_RE = re.compile(
+    rf'(?:{_HAN}{{1,8}}?(?:自治区|省|市|区|县|镇|乡|街道))*'
+    # 道路与地点名可以连续出现，如“中关村大街”（“中关村”本身也以“村”结尾）
+    rf'(?:{_HAN}{{1,10}}?(?:大道|大街|路|街|巷|弄|胡同|村|小区|花园|大厦|广场|公园|商场|学校|医院|车站))+'
+    rf'(?:{_NUM}号(?:院|楼)?)?(?:{_NUM}(?:号楼|栋|幢|单元|楼|层|室))*'
+)
+MOBILE_RE = re.compile(r'(?<!\d)1[3-9]\d[ -]?\d{4}[ -]?\d{4}(?!\d)')
+LANDLINE_RE = re.compile(r'(?<!\d)0\d{2,3}[ -]?\d{7,8}(?!\d)')
+PLATE_RE = re.compile(
+    r'[京津沪渝冀豫云辽黑湘皖鲁新苏浙赣鄂桂甘晋蒙陕吉闽贵粤青藏川宁琼][A-HJ-NP-Z][·\s]?'
+    r'(?:[A-HJ-NP-Z0-9]{4}[挂学警港澳]|[A-HJ-NP-Z0-9]{5,6})(?![A-Z0-9])'
+)
+
+_CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4,
+              '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_DAY_OFFSETS = {'今天': 0, '今日': 0, '今早': 0, '今晚': 0, '昨天': -1, '昨日': -1,
+                '昨晚': -1, '昨夜': -1, '前天': -2, '明天': 1}
+_AFTERNOON = {'下午', '傍晚', '晚上', '夜里', '深夜', '今晚', '昨晚', '昨夜'}
+
+class KeywordAutomaton:
+    """Aho-Corasick 多模式匹配自动机，扫描一遍文本即可找出全部关键词（含相互重叠的）"""
+
+    def __init__(self, keywords):
+        # keywords: [(关键词, 附带数据), ...]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for word, payload in keywords:
+            state = 0
+            for char in word:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append((word, payload))
+
+        # 按层次遍历建立失败指针，并把失败指针所指状态的输出合并进来
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def finditer(self, text):
+        """依次产出 (开始位置, 结束位置, 关键词, 附带数据)"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for word, payload in self._output[state]:
+                yield index - len(word) + 1, index + 1, word, payload
+
+    def findall_longest(self, text):
+        """只保留互不重叠的最长匹配，如“入室盗窃”命中后不再单独计“盗窃”"""
+        matches = sorted(self.finditer(text), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        end = 0
+        for match in matches:
+            if match[0] >= end:
+                selected.append(match)
+                end = match[1]
+        return selected
+
+def cn_to_int(value):
+    """解析不超过两位的阿拉伯数字或中文数字，如 '11'、'十一'、'二十三'"""
+    if value.isdigit():
+        return int(value)
+    if '十' in value:
+        tens, _, ones = value.partition('十')
+        return (_CN_DIGITS.get(tens, 1) if tens else 1) * 10 + (_CN_DIGITS.get(ones, 0) if ones else 0)
+    number = 0
+    for char in value:
+        if char not in _CN_DIGITS:
+            return None
+        number = number * 10 + _CN_DIGITS[char]
+    return number
+
+def resolve_clock_time(match, reference):
+    """把“昨晚十一点半”之类的时间表达解析为具体时间；未指明日期时取不晚于报警时间的最近一次"""
+    hour = cn_to_int(match.group('hour'))
+    if hour is None or hour > 24:
+        return None
+    if match.group('fraction'):
+        minute = {'半': 30, '一刻': 15, '三刻': 45}[match.group('fraction')]
+    else:
+        minute = cn_to_int(match.group('minute')) if match.group('minute') else 0
+    if minute is None or minute > 59:
+        return None
+
+    day, period = match.group('day'), match.group('period')
+    if hour < 12 and (period in _AFTERNOON or day in _AFTERNOON or (period == '中午' and hour < 6)):
+        hour += 12
+    elif hour == 12 and period in ('凌晨', '半夜'):
+        hour = 0
+    if hour == 24:
+        hour = 0
+
+    value = reference.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if day:
+        value += timedelta(days=_DAY_OFFSETS[day])
+    elif value > reference + timedelta(minutes=10):
+        # 报警人描述的通常是已经发生的事
+        value -= timedelta(days=1)
+    return value
+
+def resolve_relative_time(match, reference):
+    """解析“十分钟前”“半小时前”，“几”按 3 计"""
+    amount = match.group('amount')
+    if amount == '半':
+        amount = 0.5
+    elif amount == '几':
+        amount = 3
+    else:
+        amount = cn_to_int(amount)
+        if amount is None:
+            return None
+    if match.group('unit') == '分钟':
+        return reference - timedelta(minutes=amount)
+    return reference - timedelta(hours=amount)
+
+def normalize_text(text):
+    """去掉分段转写拼接结果中的时间标注"""
+    return SEGMENT_TAG_RE.sub('', text or '')
+
+def _unique(values):
+    return list(dict.fromkeys(values))
+
+class ExtractionEngine:
+    """警情要素提取器；关键词自动机在构造时建好，实例可在线程间共享"""
+
+    def __init__(self, type_keywords, emergency_keywords):
+        self.type_automaton = KeywordAutomaton(
+            (word, alarm_type) for alarm_type, words in type_keywords.items() for word in words
+        )
+        self.emergency_automaton = KeywordAutomaton(
+            (word, level) for level, words in emergency_keywords.items() for word in words
+        )
+
+    def extract_times(self, text, reference=None):
+        times = []
+        for match in TIME_RE.finditer(text):
+            # “快一点”“多一点”之类不是时间：中文数字的钟点须带日期、时段或分钟
+            if not (match.group('day') or match.group('period') or match.group('minute')
+                    or match.group('fraction') or match.group('hour').isdigit()):
+                continue
+            value = resolve_clock_time(match, reference) if reference else None
+            times.append({'text': match.group(0), 'value': value.isoformat() if value else None})
+        for match in RELATIVE_TIME_RE.finditer(text):
+            value = resolve_relative_time(match, reference) if reference else None
+            times.append({'text': match.group(0), 'value': value.isoformat() if value else None})
+        for match in DATE_RE.finditer(text):
+            times.append({'text': match.group(0), 'value': None})
+        return times
+
+    def extract_alarm_types(self, text):
+        scores = {}
+        for _, _, word, alarm_type in self.type_automaton.findall_longest(text):
+            entry = scores.setdefault(alarm_type, {'type': alarm_type, 'score': 0, 'keywords': []})
+            entry['score'] += 1
+            if word not in entry['keywords']:
+                entry['keywords'].append(word)
+        # 得分相同时取层级更细的类型
+        return sorted(scores.values(), key=lambda e: (-e['score'], -e['type'].count('/'), e['type']))
+
+    def extract_emergency_level(self, text):
+        level, keywords = '一般', []
+        for _, _, word, matched_level in self.emergency_automaton.findall_longest(text):
+            keywords.append(word)
+            if EMERGENCY_ORDER.index(matched_level) > EMERGENCY_ORDER.index(level):
+                level = matched_level
+        return {'level': level, 'keywords': _unique(keywords)}
+
+    def extract(self, text, reference=None):
+        """提取全部要素；reference 为报警时间，用于把相对时间解析为具体时间"""
+        text = normalize_text(text)
+        upper = text.upper()
+        alarm_types = self.extract_alarm_types(text)
+        times = self.extract_times(text, reference)
+        return {
+            'times': times,
+            'addresses': _unique(m.group(0) for m in ADDRESS_RE.finditer(text)),
+            'phones': _unique(re.sub(r'[ -]', '', m.group(0))
+                              for pattern in (MOBILE_RE, LANDLINE_RE) for m in pattern.finditer(text)),
+            'plates': _unique(re.sub(r'[·\s]', '', m.group(0)) for m in PLATE_RE.finditer(upper)),
+            'alarm_types': alarm_types,
+            'suggested_alarm_type': alarm_types[0]['type'] if alarm_types else None,
+            'suggested_event_time': next((t['value'] for t in times if t['value']), None),
+            'emergency': self.extract_emergency_level(text)
+        }
+
+# 随蓝图在应用启动时构建，所有请求共用
+engine = ExtractionEngine(ALARM_TYPE_KEYWORDS, EMERGENCY_KEYWORDS)
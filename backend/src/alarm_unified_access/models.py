@@ -1,22 +1,64 @@
 from datetime import datetime
 from .. import db
 
+class AlarmType(db.Model):
+    """警情类型分类树，以物化路径存储（path 如 '刑事案件/盗窃/入室盗窃'）"""
+    __tablename__ = 'alarm_types'
+    __table_args__ = (
+        db.Index('ix_alarm_types_path', 'path', unique=True),
+        db.Index('ix_alarm_types_parent_id', 'parent_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # 本级名称
+    path = db.Column(db.String(255), nullable=False)  # 从根到本节点的完整路径
+    parent_id = db.Column(db.Integer, db.ForeignKey('alarm_types.id'))
+    depth = db.Column(db.Integer, nullable=False, default=0)  # 根节点为 0
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'path': self.path,
+            'parent_id': self.parent_id,
+            'depth': self.depth
+        }
+
 class AlarmRecord(db.Model):
     __tablename__ = 'alarm_records'
+    __table_args__ = (
+        db.Index('ix_alarm_records_alarm_time_id', 'alarm_time', 'id'),
+        db.Index('ix_alarm_records_status_alarm_time', 'status', 'alarm_time'),
+        db.Index('ix_alarm_records_alarm_type_id_alarm_time', 'alarm_type_id', 'alarm_time'),
+        db.Index('ix_alarm_records_emergency_level_alarm_time', 'emergency_level', 'alarm_time'),
+        db.Index('ix_alarm_records_event_geocell_alarm_time', 'event_geocell', 'alarm_time'),
+        db.Index('ix_alarm_records_primary_alarm_id', 'primary_alarm_id'),
+        db.Index('ix_alarm_records_reporter_phone_normalized_alarm_time', 'reporter_phone_normalized', 'alarm_time')
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     alarm_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     reporter_name = db.Column(db.String(100))
     reporter_phone = db.Column(db.String(50))
+    reporter_phone_normalized = db.Column(db.String(50))  # 去掉分隔符和国家码的号码，用于来电历史查询
+    reporter_phone_province = db.Column(db.String(50))  # 号码归属地，接警时按号段查询填入
+    reporter_phone_city = db.Column(db.String(50))
+    reporter_phone_carrier = db.Column(db.String(50))
     reporter_type = db.Column(db.String(50)) # e.g., '群众', '单位', '内部上报'
     event_time = db.Column(db.DateTime, nullable=False)
     event_location_address = db.Column(db.String(255), nullable=False)
     event_location_longitude = db.Column(db.Float)
     event_location_latitude = db.Column(db.Float)
+    event_geocell = db.Column(db.BigInteger)  # 事发坐标的格网码，见 src/geo.py
     alarm_type = db.Column(db.String(100)) # e.g., '刑事案件/盗窃/入室盗窃'
+    alarm_type_id = db.Column(db.Integer, db.ForeignKey('alarm_types.id'))  # 与 alarm_type 对应的分类节点
     brief_summary = db.Column(db.Text, nullable=False)
     emergency_level = db.Column(db.String(50), default='一般') # e.g., '一般', '紧急', '非常紧急'
     status = db.Column(db.String(50), default='待处理') # e.g., '待处理', '处理中', '已派单'
+    # 疑似重复报警时关联的主警情及匹配方式（'phone' 同一号码、'location' 同一地点）
+    primary_alarm_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'))
+    duplicate_reason = db.Column(db.String(20))
 
     # Relationships
     associated_media = db.relationship('MediaFile', backref='alarm_record', lazy=True)
@@ -28,29 +70,64 @@ class AlarmRecord(db.Model):
     def __repr__(self):
         return f'<AlarmRecord {self.id} - {self.alarm_type}>'
 
-    def to_dict(self):
-        return {
+    def to_dict(self, expand=None):
+        data = {
             'id': self.id,
             'alarm_time': self.alarm_time.isoformat() if self.alarm_time else None,
             'reporter_name': self.reporter_name,
             'reporter_phone': self.reporter_phone,
+            'reporter_phone_province': self.reporter_phone_province,
+            'reporter_phone_city': self.reporter_phone_city,
+            'reporter_phone_carrier': self.reporter_phone_carrier,
             'reporter_type': self.reporter_type,
             'event_time': self.event_time.isoformat() if self.event_time else None,
             'event_location_address': self.event_location_address,
             'event_location_longitude': self.event_location_longitude,
             'event_location_latitude': self.event_location_latitude,
             'alarm_type': self.alarm_type,
+            'alarm_type_id': self.alarm_type_id,
             'brief_summary': self.brief_summary,
             'emergency_level': self.emergency_level,
             'status': self.status,
+            'primary_alarm_id': self.primary_alarm_id,
+            'duplicate_reason': self.duplicate_reason,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'associated_media': [media.to_dict() for media in self.associated_media],
-            'transcription': self.transcription.to_dict() if self.transcription else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+        if expand is None or 'associated_media' in expand:
+            data['associated_media'] = [media.to_dict() for media in self.associated_media]
+        if expand is None or 'transcription' in expand:
+            data['transcription'] = self.transcription.to_dict() if self.transcription else None
+        return data
+
+class CallerStats(db.Model):
+    """按报警号码汇总的来电统计，随警情写入同步更新"""
+    __tablename__ = 'caller_stats'
+
+    phone = db.Column(db.String(50), primary_key=True)  # 规范化后的号码
+    total_calls = db.Column(db.Integer, nullable=False, default=0)
+    first_call_at = db.Column(db.DateTime)
+    last_call_at = db.Column(db.DateTime)
+    last_alarm_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'))
+    last_alarm_types = db.Column(db.JSON)  # 最近几次报警的警情类型，最近的在前
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'phone': self.phone,
+            'total_calls': self.total_calls,
+            'first_call_at': self.first_call_at.isoformat() if self.first_call_at else None,
+            'last_call_at': self.last_call_at.isoformat() if self.last_call_at else None,
+            'last_alarm_id': self.last_alarm_id,
+            'last_alarm_types': self.last_alarm_types or []
         }
 
 class MediaFile(db.Model):
     __tablename__ = 'media_files'
+    __table_args__ = (
+        db.Index('ix_media_files_alarm_record_id', 'alarm_record_id'),
+        db.Index('ix_media_files_content_hash', 'content_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
@@ -60,6 +137,16 @@ class MediaFile(db.Model):
     media_type = db.Column(db.String(50))  # 'audio', 'video', 'image'
     duration = db.Column(db.Integer)  # Duration in seconds for audio/video
     mime_type = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))  # 内容 SHA-256，对应 media_blobs
+    # 媒体元数据由后台任务探测后回填
+    probe_status = db.Column(db.String(20))  # 'pending', 'processing', 'completed', 'failed'; 图片为空
+    probe_error = db.Column(db.Text)
+    waveform_status = db.Column(db.String(20))  # 'pending', 'processing', 'completed', 'failed'; 仅音频
+    waveform_error = db.Column(db.Text)
+    codec = db.Column(db.String(50))
+    sample_rate = db.Column(db.Integer)  # 音频采样率（Hz）
+    width = db.Column(db.Integer)  # 视频分辨率
+    height = db.Column(db.Integer)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -71,20 +158,40 @@ class MediaFile(db.Model):
             'media_type': self.media_type,
             'duration': self.duration,
             'mime_type': self.mime_type,
+            'content_hash': self.content_hash,
+            'probe_status': self.probe_status,
+            'probe_error': self.probe_error,
+            'waveform_status': self.waveform_status,
+            'codec': self.codec,
+            'sample_rate': self.sample_rate,
+            'width': self.width,
+            'height': self.height,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
         }
 
 class Transcription(db.Model):
     __tablename__ = 'transcriptions'
+    __table_args__ = (
+        db.Index('ix_transcriptions_alarm_record_id', 'alarm_record_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(50), default='pending')  # 'pending', 'processing', 'completed', 'failed'
     error_message = db.Column(db.Text)
+    # 语音活动检测结果：原始时长、语音时长（秒）及语音区间 [[开始, 结束], ...]
+    audio_duration = db.Column(db.Float)
+    speech_duration = db.Column(db.Float)
+    speech_regions = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # 长录音按静音切分后的分段转写结果
+    segments = db.relationship('TranscriptionSegment', backref='transcription', lazy=True,
+                               order_by='TranscriptionSegment.segment_index',
+                               cascade='all, delete-orphan')
+
     def __repr__(self):
         return f'<Transcription {self.id}>'
 
@@ -95,6 +202,91 @@ class Transcription(db.Model):
             'content': self.content,
             'status': self.status,
             'error_message': self.error_message,
+            'audio_duration': self.audio_duration,
+            'speech_duration': self.speech_duration,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class TranscriptionSegment(db.Model):
+    __tablename__ = 'transcription_segments'
+    __table_args__ = (
+        db.UniqueConstraint('transcription_id', 'segment_index',
+                            name='uq_transcription_segments_transcription_id_segment_index'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    transcription_id = db.Column(db.Integer, db.ForeignKey('transcriptions.id'), nullable=False)
+    segment_index = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.Float, nullable=False)  # 在原录音中的起止时间（秒）
+    end_time = db.Column(db.Float, nullable=False)
+    content = db.Column(db.Text)
+    status = db.Column(db.String(50), default='pending')  # 'pending', 'processing', 'completed', 'failed'
+    error_message = db.Column(db.Text)
+    asr_seconds = db.Column(db.Float)  # 识别服务耗时（秒）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'transcription_id': self.transcription_id,
+            'segment_index': self.segment_index,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'content': self.content,
+            'status': self.status,
+            'error_message': self.error_message,
+            'asr_seconds': self.asr_seconds,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class TranscriptionCache(db.Model):
+    """按录音内容哈希与识别模型版本缓存的转写结果"""
+    __tablename__ = 'transcription_cache'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'model_version',
+                            name='uq_transcription_cache_content_hash_model_version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    model_version = db.Column(db.String(100), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    audio_duration = db.Column(db.Float)
+    speech_duration = db.Column(db.Float)
+    speech_regions = db.Column(db.JSON)
+    asr_seconds = db.Column(db.Float)  # 生成该结果时识别服务的耗时，命中即视为节省
+    hit_count = db.Column(db.Integer, default=0)
+    last_hit_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content_hash': self.content_hash,
+            'model_version': self.model_version,
+            'audio_duration': self.audio_duration,
+            'speech_duration': self.speech_duration,
+            'asr_seconds': self.asr_seconds,
+            'hit_count': self.hit_count,
+            'last_hit_at': self.last_hit_at.isoformat() if self.last_hit_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class AlarmSearchTerm(db.Model):
+    """全文检索倒排索引：词项在每条警情（描述、地址、转写文本）中的加权词频"""
+    __tablename__ = 'alarm_search_terms'
+    __table_args__ = (
+        db.Index('ix_alarm_search_terms_alarm_record_id', 'alarm_record_id'),
+        # 覆盖索引：检索时只读索引即可完成按警情聚合权重，不回表
+        db.Index('ix_alarm_search_terms_term_alarm_record_id_weight', 'term', 'alarm_record_id', 'weight'),
+        # 按权重降序读取倒排列表，检索读够一页即可停止
+        db.Index('ix_alarm_search_terms_term_weight_alarm_record_id', 'term', 'weight', 'alarm_record_id'),
+    )
+
+    # 主键以词项开头，同一词项的倒排列表在索引中连续存放
+    term = db.Column(db.String(32), primary_key=True)
+    alarm_record_id = db.Column(db.Integer, db.ForeignKey('alarm_records.id'), primary_key=True)
+    weight = db.Column(db.Float, nullable=False)
@@ -1,15 +1,41 @@
 from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime
-import os
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from .models import AlarmRecord, MediaFile, Transcription
+from sqlalchemy import and_, or_, insert, text
+from sqlalchemy.exc import SQLAlchemyError
+from .models import AlarmRecord, AlarmType, CallerStats, MediaFile, Transcription
+from .extraction import engine as extraction_engine
+from .alarm_types import normalize_path, resolve_alarm_type, subtree_ids
+from .search import index_alarms, search_alarms
+from .dedup import find_primary, register as register_for_dedup
+from .caller_stats import record_calls
+from sqlalchemy.orm import joinedload, selectinload
+from ..pagination import paginate_query
+from ..geo import encode_cell, cover_ranges, haversine, circle_bboxes, parse_coordinate
+from ..phone_numbers import normalize_phone
+from ..phone_region import get_table as get_phone_region_table
+from ..tasks import probe_media_metadata, transcribe_audio, compute_waveform
+from .. import transcription_cache
+from ..chunked_upload import (UploadError, init_upload, finalize_upload, discard_upload,
+                              error_response, session_response, status_view, append_view,
+                              discard_view)
+from ..blob_store import store_file, store_stream, find_blob, acquire_blob, release_blob
+from ..serialization import parse_projection, apply_projection, make_serializer
+from ..media_delivery import send_media
+from ..waveform import waveform_path, read_level
+from ..media_integrity import integrity_report, chain_head
 from .. import db
 import mimetypes
-import subprocess
 import json
+import struct
 
 bp = Blueprint('alarm_unified_access', __name__)
 
+ALARM_EXPAND_LOADERS = {
+    'associated_media': lambda: selectinload(AlarmRecord.associated_media),
+    'transcription': lambda: joinedload(AlarmRecord.transcription)
+}
+
 def allowed_file(filename):
     """检查文件类型是否允许上传"""
     ALLOWED_EXTENSIONS = {'mp3', 'wav', 'mp4', 'avi', 'jpg', 'jpeg', 'png'}
@@ -26,17 +52,102 @@ def get_media_type(filename):
         return 'image'
     return 'unknown'
 
-def get_file_duration(file_path):
-    """获取音频/视频文件的时长（秒）"""
+def enqueue_media_probe(media_file):
+    """将媒体元数据探测提交到后台队列；提交失败时记录错误，文件记录保持可用"""
+    try:
+        probe_media_metadata.delay(media_file.id)
+    except Exception as e:
+        current_app.logger.error(f"Error enqueueing media probe: {str(e)}")
+        media_file.probe_status = 'failed'
+        media_file.probe_error = f'Failed to enqueue probe task: {str(e)}'
+        db.session.commit()
+
+def enqueue_waveform(media_file):
+    """将录音波形计算提交到后台队列；提交失败时记录错误"""
     try:
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', 
-               '-of', 'json', file_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        data = json.loads(result.stdout)
-        return int(float(data['format']['duration']))
+        compute_waveform.delay(media_file.id)
     except Exception as e:
-        current_app.logger.error(f"Error getting file duration: {str(e)}")
-        return None
+        current_app.logger.error(f"Error enqueueing waveform task: {str(e)}")
+        media_file.waveform_status = 'failed'
+        media_file.waveform_error = f'Failed to enqueue waveform task: {str(e)}'
+        db.session.commit()
+
+ALARM_REQUIRED_FIELDS = ['event_time', 'event_location_address', 'brief_summary']
+
+def create_media_file(alarm_id, filename, blob):
+    """为已存入内容存储的文件创建媒体文件记录，并提交元数据探测任务"""
+    # 获取文件信息（时长等元数据由后台任务探测，不阻塞请求）
+    media_type = get_media_type(filename)
+    media_file = MediaFile(
+        alarm_record_id=alarm_id,
+        file_path=blob.path,
+        file_name=filename,
+        file_size=blob.size,
+        media_type=media_type,
+        mime_type=mimetypes.guess_type(filename)[0],
+        content_hash=blob.sha256,
+        probe_status='pending' if media_type in ['audio', 'video'] else None,
+        waveform_status='pending' if media_type == 'audio' else None
+    )
+    db.session.add(media_file)
+    acquire_blob(blob)
+    db.session.commit()
+
+    if media_file.probe_status == 'pending':
+        enqueue_media_probe(media_file)
+    if media_file.waveform_status == 'pending':
+        enqueue_waveform(media_file)
+    return media_file
+
+def build_alarm_values(data):
+    """校验单条警情数据，返回可直接写入 alarm_records 的字段字典"""
+    if not isinstance(data, dict):
+        raise ValueError('Alarm data must be a JSON object')
+
+    missing_fields = [field for field in ALARM_REQUIRED_FIELDS if field not in data]
+    if missing_fields:
+        raise ValueError(f'Missing required fields: {", ".join(missing_fields)}')
+
+    # Convert event_time from ISO format string to datetime object
+    event_time_str = data.get('event_time')
+    if not event_time_str:
+        raise ValueError('event_time is required')
+    if not isinstance(event_time_str, str):
+        raise ValueError('event_time must be an ISO 8601 string')
+    try:
+        event_time_dt = datetime.fromisoformat(event_time_str.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('event_time must be an ISO 8601 string')
+    longitude = parse_coordinate(data.get('event_location_longitude'), 'event_location_longitude', -180, 180)
+    latitude = parse_coordinate(data.get('event_location_latitude'), 'event_location_latitude', -90, 90)
+
+    return {
+        'reporter_name': data.get('reporter_name'),
+        'reporter_phone': data.get('reporter_phone'),
+        'reporter_phone_normalized': normalize_phone(data.get('reporter_phone')),
+        'reporter_type': data.get('reporter_type'),
+        'event_time': event_time_dt,
+        'event_location_address': data.get('event_location_address'),
+        'event_location_longitude': longitude,
+        'event_location_latitude': latitude,
+        'event_geocell': encode_cell(longitude, latitude),
+        'alarm_type': normalize_path(data.get('alarm_type')),
+        'brief_summary': data.get('brief_summary'),
+        'emergency_level': data.get('emergency_level', '一般'),
+        'status': data.get('status', '待处理')
+    }
+
+def apply_phone_regions(rows):
+    """按报警号码批量查询归属地并写入字段字典；归属地表未配置时跳过"""
+    table = get_phone_region_table()
+    if table is None:
+        return
+    regions = table.lookup_many([values['reporter_phone_normalized'] for values in rows])
+    for values, region in zip(rows, regions):
+        if region:
+            values['reporter_phone_province'] = region['province']
+            values['reporter_phone_city'] = region['city']
+            values['reporter_phone_carrier'] = region['carrier']
 
 @bp.route('/', methods=['POST'])
 def create_alarm_record():
@@ -46,34 +157,27 @@ def create_alarm_record():
         return jsonify({'error': 'No input data provided'}), 400
 
     # Basic validation
-    required_fields = ['event_time', 'event_location_address', 'brief_summary']
-    missing_fields = [field for field in required_fields if field not in data]
+    missing_fields = [field for field in ALARM_REQUIRED_FIELDS if field not in data]
     if missing_fields:
         return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
 
+    if not data.get('event_time'):
+        return jsonify({'error': 'event_time is required'}), 400
+
     try:
-        # Convert event_time from ISO format string to datetime object
-        event_time_str = data.get('event_time')
-        if event_time_str:
-            event_time_dt = datetime.fromisoformat(event_time_str.replace('Z', '+00:00'))
-        else:
-            return jsonify({'error': 'event_time is required'}), 400
-
-        new_alarm = AlarmRecord(
-            reporter_name=data.get('reporter_name'),
-            reporter_phone=data.get('reporter_phone'),
-            reporter_type=data.get('reporter_type'),
-            event_time=event_time_dt,
-            event_location_address=data.get('event_location_address'),
-            event_location_longitude=data.get('event_location_longitude'),
-            event_location_latitude=data.get('event_location_latitude'),
-            alarm_type=data.get('alarm_type'),
-            brief_summary=data.get('brief_summary'),
-            emergency_level=data.get('emergency_level', '一般'),
-            status=data.get('status', '待处理')
-        )
+        values = build_alarm_values(data)
+        values['alarm_type_id'] = resolve_alarm_type(values['alarm_type'])
+        apply_phone_regions([values])
+        # 同一事件的重复报警关联到主警情
+        values['primary_alarm_id'], values['duplicate_reason'] = find_primary(values)
+        new_alarm = AlarmRecord(**values)
         db.session.add(new_alarm)
+        db.session.flush()
+        # 来电统计与警情在同一事务内提交
+        record_calls([(new_alarm.reporter_phone_normalized, new_alarm.id, new_alarm.alarm_time, new_alarm.alarm_type)])
         db.session.commit()
+        # 提交成功后再登记，索引中不会出现未落库的警情
+        register_for_dedup(new_alarm.id, values, new_alarm.primary_alarm_id)
         return jsonify({'message': 'Alarm record created successfully', 'data': new_alarm.to_dict()}), 201
     except ValueError as e:
         db.session.rollback()
@@ -82,6 +186,180 @@ def create_alarm_record():
         db.session.rollback()
         return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
+def iter_batch_rows():
+    """按请求格式逐行产出待导入的警情数据
+
+    - application/x-ndjson: 按行流式读取请求体，不整体缓冲
+    - application/json: 数组，或 {"items": [...]} 形式
+    解析失败的行以 ValueError 实例产出，由调用方记录为该行的错误。
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f'Invalid JSON line: {str(e)}')
+        return
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('items')
+    if not isinstance(data, list):
+        raise ValueError('Request body must be a JSON array, {"items": [...]} or NDJSON')
+    yield from data
+
+def insert_alarm_rows(mappings):
+    """一条语句写入一批警情并把生成的 id 回填到各行的字段字典
+
+    支持批量 INSERT ... RETURNING 的数据库（PostgreSQL、SQLite 3.35+）按参数顺序返回主键；
+    MySQL 以单条多行 INSERT 写入，InnoDB 为这类已知行数的插入分配连续的自增值，
+    由 LAST_INSERT_ID()（首行 id）和 auto_increment_increment 推算各行 id；其他情况逐行写入。
+    """
+    # 各行字段须一致才能合并为一条语句（归属地字段只在查到时才有）
+    keys = set().union(*mappings)
+    for values in mappings:
+        for key in keys:
+            values.setdefault(key, None)
+    connection = db.session.connection()
+    table = AlarmRecord.__table__
+    if connection.dialect.insert_executemany_returning_sort_by_parameter_order:
+        ids = connection.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), mappings
+        ).scalars().all()
+    elif connection.dialect.name in ('mysql', 'mariadb'):
+        first_id = connection.execute(insert(table).values(mappings)).lastrowid
+        step = connection.execute(text('SELECT @@auto_increment_increment')).scalar()
+        ids = [first_id + i * step for i in range(len(mappings))]
+    else:
+        ids = [connection.execute(insert(table), values).inserted_primary_key[0] for values in mappings]
+    for values, alarm_id in zip(mappings, ids):
+        values['id'] = alarm_id
+
+def flush_alarm_chunk(chunk, results):
+    """以 executemany 方式写入一批警情，识别其中的重复报警，并把生成的 id 回填到逐行结果中"""
+    if not chunk:
+        return
+    mappings = [values for _, values in chunk]
+    try:
+        # 同一分块内相同类型只查询（或创建）一次分类节点
+        type_ids = {}
+        alarm_time = datetime.utcnow()
+        for values in mappings:
+            values['alarm_type_id'] = resolve_alarm_type(values['alarm_type'], type_ids)
+            # 显式写入报警时间，来电统计与警情记录使用同一时间
+            values['alarm_time'] = alarm_time
+        apply_phone_regions(mappings)
+        insert_alarm_rows(mappings)
+        # 批量写入不触发 ORM 事件，显式建立检索索引
+        index_alarms(db.session.connection(), [values['id'] for values in mappings])
+        record_calls([(values['reporter_phone_normalized'], values['id'], values['alarm_time'], values['alarm_type'])
+                      for values in mappings])
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        for index, _ in chunk:
+            results.append({'index': index, 'error': f'Database error: {str(e)}'})
+        chunk.clear()
+        return
+
+    # 分块已提交，先记录各行 id，之后的重复报警识别失败也不影响结果
+    created = {}
+    for index, values in chunk:
+        created[values['id']] = {'index': index, 'id': values['id']}
+        results.append(created[values['id']])
+    chunk.clear()
+
+    # 按导入顺序逐行识别重复报警，同一分块内的后续行也能关联到前面的行
+    duplicates = []
+    try:
+        for values in mappings:
+            primary_id, reason = find_primary(values)
+            if primary_id:
+                duplicates.append({'id': values['id'], 'primary_alarm_id': primary_id, 'duplicate_reason': reason})
+            register_for_dedup(values['id'], values, primary_id)
+        if duplicates:
+            db.session.bulk_update_mappings(AlarmRecord, duplicates)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f'Failed to link duplicate alarms: {str(e)}')
+        return
+
+    for item in duplicates:
+        created[item['id']]['primary_alarm_id'] = item['primary_alarm_id']
+
+@bp.route('/batch', methods=['POST'])
+def create_alarm_records_batch():
+    """批量导入警情记录（JSON 数组或 NDJSON 流）
+
+    每 chunk_size 行执行一次批量插入并提交，返回逐行结果（成功行带 id，失败行带错误信息）。
+    """
+    default_chunk_size = current_app.config.get('ALARM_BATCH_CHUNK_SIZE', 500)
+    max_rows = current_app.config.get('ALARM_BATCH_MAX_ROWS', 10000)
+    chunk_size = request.args.get('chunk_size', default_chunk_size, type=int)
+    chunk_size = max(1, min(chunk_size, max_rows))
+
+    results = []
+    chunk = []
+    total = 0
+    aborted = None
+    try:
+        for index, row in enumerate(iter_batch_rows()):
+            total += 1
+            if index >= max_rows:
+                # 超出单批上限时停止读取，已提交的分块保持有效
+                results.append({'index': index, 'error': f'Batch exceeds maximum of {max_rows} rows'})
+                break
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                chunk.append((index, build_alarm_values(row)))
+            except ValueError as e:
+                results.append({'index': index, 'error': f'Invalid data format: {str(e)}'})
+                continue
+            if len(chunk) >= chunk_size:
+                flush_alarm_chunk(chunk, results)
+        flush_alarm_chunk(chunk, results)
+    except ValueError as e:
+        db.session.rollback()
+        if not results:
+            return jsonify({'error': str(e)}), 400
+        aborted = str(e)
+    except Exception as e:
+        db.session.rollback()
+        if not results:
+            return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+        current_app.logger.exception('Alarm batch import aborted')
+        aborted = f'An unexpected error occurred: {str(e)}'
+    if aborted:
+        # 已提交分块的 id 仍需返回，客户端据此只重传未写入的行，避免重复导入
+        for index, _ in chunk:
+            results.append({'index': index, 'error': f'Not imported: {aborted}'})
+
+    if total == 0:
+        return jsonify({'error': 'No input data provided'}), 400
+
+    results.sort(key=lambda item: item['index'])
+    failed = sum(1 for item in results if 'error' in item)
+    response = {
+        'message': 'Alarm batch processed',
+        'data': {
+            'total': total,
+            'created': total - failed,
+            'failed': failed,
+            'results': results
+        }
+    }
+    if aborted:
+        # 中断时之后的行未被读取，不在 results 中
+        response['message'] = 'Alarm batch aborted'
+        response['error'] = aborted
+        return jsonify(response), 207
+    return jsonify(response), 201 if failed == 0 else 207
+
 @bp.route('/<int:alarm_id>', methods=['GET'])
 def get_alarm_record(alarm_id):
     """获取特定警情记录"""
@@ -109,44 +387,191 @@ def associate_media_to_alarm(alarm_id):
         return jsonify({'error': 'Alarm record not found'}), 404
     
     try:
-        # 创建上传目录
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(alarm_id))
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # 保存文件
+        # 保存文件（边写边计算哈希，内容已存在时不重复落盘）
         filename = secure_filename(file.filename)
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
+        blob = store_stream(file.stream)
         
-        # 获取文件信息
-        file_size = os.path.getsize(file_path)
-        media_type = get_media_type(filename)
-        mime_type = mimetypes.guess_type(filename)[0]
-        duration = get_file_duration(file_path) if media_type in ['audio', 'video'] else None
+        media_file = create_media_file(alarm_id, filename, blob)
         
-        # 创建媒体文件记录
-        media_file = MediaFile(
-            alarm_record_id=alarm_id,
-            file_path=file_path,
-            file_name=filename,
-            file_size=file_size,
-            media_type=media_type,
-            duration=duration,
-            mime_type=mime_type
-        )
+        return jsonify({
+            'message': 'Media file associated successfully',
+            'data': media_file.to_dict()
+        }), 201
         
-        db.session.add(media_file)
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error associating media file: {str(e)}'}), 500
+
+@bp.route('/<int:alarm_id>/uploads', methods=['POST'])
+def init_media_upload(alarm_id):
+    """创建媒体文件分片上传会话（大文件断点续传）"""
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('file_name') or '')
+    if not filename:
+        return jsonify({'error': 'file_name is required'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    alarm = AlarmRecord.query.get(alarm_id)
+    if not alarm:
+        return jsonify({'error': 'Alarm record not found'}), 404
+    
+    try:
+        # 存储中已有相同内容时直接秒传，无需上传数据
+        blob = find_blob(data.get('sha256'), data.get('total_size'))
+        if blob:
+            media_file = create_media_file(alarm_id, filename, blob)
+            return jsonify({
+                'message': 'Media file associated successfully',
+                'data': media_file.to_dict(),
+                'sha256': blob.sha256,
+                'instant': True
+            }), 201
+        meta = init_upload('media', alarm_id, filename, data.get('total_size'), data.get('sha256'))
+    except UploadError as e:
+        return error_response(e)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'total_size must be an integer'}), 400
+    
+    return jsonify({
+        'message': 'Upload session created',
+        'data': session_response(meta)
+    }), 201
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_media_upload(upload_id):
+    """查询媒体文件上传进度"""
+    return status_view(upload_id, 'media')
+
+@bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def append_media_upload(upload_id):
+    """提交媒体文件分片"""
+    return append_view(upload_id, 'media')
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def discard_media_upload(upload_id):
+    """取消媒体文件上传"""
+    return discard_view(upload_id, 'media')
+
+@bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_media_upload(upload_id):
+    """完成媒体文件上传，校验后创建媒体文件记录"""
+    try:
+        meta, data_path, sha256 = finalize_upload(upload_id, 'media')
+    except UploadError as e:
+        return error_response(e)
+    
+    alarm_id = meta['target_id']
+    if not AlarmRecord.query.get(alarm_id):
+        discard_upload(upload_id)
+        return jsonify({'error': 'Alarm record not found'}), 404
+    
+    try:
+        # 上传文件直接重命名进内容存储，不再复制
+        blob = store_file(data_path, sha256)
+        media_file = create_media_file(alarm_id, meta['file_name'], blob)
+        discard_upload(upload_id)
         
         return jsonify({
             'message': 'Media file associated successfully',
-            'data': media_file.to_dict()
+            'data': media_file.to_dict(),
+            'sha256': sha256
         }), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Error associating media file: {str(e)}'}), 500
 
+@bp.route('/media/<int:media_id>', methods=['GET'])
+def get_media_file(media_id):
+    """获取媒体文件信息（可轮询 probe_status 获取元数据探测进度）"""
+    media_file = MediaFile.query.get(media_id)
+    if media_file:
+        return jsonify(media_file.to_dict()), 200
+    return jsonify({'error': 'Media file not found'}), 404
+
+@bp.route('/media/<int:media_id>/content', methods=['GET'])
+def get_media_content(media_id):
+    """在线播放或下载媒体文件，支持 Range 与条件请求"""
+    media_file = MediaFile.query.get(media_id)
+    if not media_file:
+        return jsonify({'error': 'Media file not found'}), 404
+    return send_media(media_file.file_path, media_file.file_name, media_file.mime_type,
+                      media_file.content_hash, media_file.uploaded_at)
+
+@bp.route('/media/<int:media_id>/waveform', methods=['GET'])
+def get_media_waveform(media_id):
+    """获取录音波形峰值
+
+    width=N 时返回峰值数不少于 N 的一级：默认为 int8 (min, max) 交错的二进制数据，
+    每个峰值覆盖的采样数等信息放在响应头中；format=json 时以 JSON 返回。不带 width 时返回完整的多级波形文件。
+    """
+    media_file = MediaFile.query.get(media_id)
+    if not media_file:
+        return jsonify({'error': 'Media file not found'}), 404
+    if media_file.waveform_status != 'completed' or not media_file.content_hash:
+        return jsonify({'error': 'Waveform is not available',
+                        'waveform_status': media_file.waveform_status}), 404
+
+    path = waveform_path(media_file.content_hash)
+    width = request.args.get('width', type=int)
+    if width is None:
+        return send_media(path, f'{media_file.id}.peaks', 'application/octet-stream',
+                          f'{media_file.content_hash}-peaks', media_file.uploaded_at)
+    if not 1 <= width <= 100000:
+        return jsonify({'error': 'width must be between 1 and 100000'}), 400
+
+    try:
+        level = read_level(path, width)
+    except FileNotFoundError:
+        return jsonify({'error': 'Waveform is not available',
+                        'waveform_status': media_file.waveform_status}), 404
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'Failed to read waveform: {str(e)}'}), 500
+    if request.args.get('format') == 'json':
+        data = level.pop('data')
+        response = jsonify(dict(level, peaks=list(struct.unpack(f'{len(data)}b', data))))
+    else:
+        response = current_app.response_class(level['data'], mimetype='application/octet-stream')
+        response.headers['X-Sample-Rate'] = str(level['sample_rate'])
+        response.headers['X-Total-Samples'] = str(level['total_samples'])
+        response.headers['X-Samples-Per-Peak'] = str(level['samples_per_peak'])
+        response.headers['X-Peak-Count'] = str(level['peak_count'])
+    response.set_etag(f"{media_file.content_hash}-{level['samples_per_peak']}")
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config.get('MEDIA_CACHE_MAX_AGE', 3600)
+    return response.make_conditional(request)
+
+@bp.route('/media/<int:media_id>/integrity', methods=['GET'])
+def get_media_integrity(media_id):
+    """获取媒体文件的哈希链记录与最近一次巡检结果"""
+    media_file = MediaFile.query.get(media_id)
+    if not media_file:
+        return jsonify({'error': 'Media file not found'}), 404
+    return jsonify(integrity_report(media_file.content_hash)), 200
+
+@bp.route('/integrity/head', methods=['GET'])
+def get_integrity_chain_head():
+    """获取哈希链的最新记录，其 entry_hash 涵盖全部历史记录，可抄送外部系统留存"""
+    return jsonify({'head': chain_head()}), 200
+
+@bp.route('/media/<int:media_id>', methods=['DELETE'])
+def delete_media_file(media_id):
+    """删除媒体文件记录，释放对存储内容的引用"""
+    media_file = MediaFile.query.get(media_id)
+    if not media_file:
+        return jsonify({'error': 'Media file not found'}), 404
+    
+    try:
+        if media_file.content_hash:
+            release_blob(media_file.content_hash)
+        db.session.delete(media_file)
+        db.session.commit()
+        return jsonify({'message': 'Media file deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error deleting media file: {str(e)}'}), 500
+
 @bp.route('/<int:alarm_id>/transcribe_audio', methods=['POST'])
 def transcribe_audio_for_alarm(alarm_id):
     """为警情录音进行语音转写"""
@@ -163,26 +588,68 @@ def transcribe_audio_for_alarm(alarm_id):
         # 创建或更新转写记录
         transcription = Transcription.query.filter_by(alarm_record_id=alarm_id).first()
         if not transcription:
-            transcription = Transcription(alarm_record_id=alarm_id)
+            transcription = Transcription(alarm_record_id=alarm_id, content='')
+        
+        # 同一录音已转写过（含挂到其他警情的同一文件）时直接复用结果，不再入队；未命中由任务统计
+        cached = transcription_cache.lookup(audio_files[0].content_hash, record_miss=False)
+        if cached:
+            transcription_cache.apply(cached, transcription)
+            db.session.add(transcription)
+            db.session.commit()
+            return jsonify({
+                'message': 'Transcription loaded from cache',
+                'data': transcription.to_dict(),
+                'cached': True
+            }), 200
         
         transcription.status = 'processing'
+        transcription.error_message = None
         db.session.add(transcription)
         db.session.commit()
         
-        # TODO: 调用语音识别服务
-        # 这里应该异步处理，使用Celery等任务队列
-        # 示例代码：
-        # task = transcribe_audio.delay(audio_files[0].file_path, transcription.id)
+        # 提交后再入队，保证 worker 能读到转写记录
+        try:
+            task = transcribe_audio.delay(audio_files[0].file_path, transcription.id,
+                                        audio_files[0].content_hash)
+        except Exception as e:
+            current_app.logger.error(f"Error enqueueing transcription: {str(e)}")
+            transcription.status = 'failed'
+            transcription.error_message = f'Failed to enqueue transcription task: {str(e)}'
+            db.session.commit()
+            return jsonify({'error': transcription.error_message}), 503
         
         return jsonify({
             'message': 'Audio transcription started',
-            'data': transcription.to_dict()
+            'data': transcription.to_dict(),
+            'task_id': task.id
         }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Error starting transcription: {str(e)}'}), 500
 
+@bp.route('/<int:alarm_id>/transcription', methods=['GET'])
+def get_alarm_transcription(alarm_id):
+    """获取转写结果、语音区间及分段进度（分段转写进行中时 content 为已完成片段的拼接结果）"""
+    transcription = Transcription.query.filter_by(alarm_record_id=alarm_id).first()
+    if not transcription:
+        return jsonify({'error': 'Transcription not found'}), 404
+    
+    data = transcription.to_dict()
+    data['speech_regions'] = transcription.speech_regions
+    data['segments'] = [segment.to_dict() for segment in transcription.segments]
+    data['progress'] = {
+        'total': len(transcription.segments),
+        'completed': sum(1 for segment in transcription.segments if segment.status == 'completed'),
+        'failed': sum(1 for segment in transcription.segments if segment.status == 'failed')
+    }
+    return jsonify(data), 200
+
+@bp.route('/transcription_cache/stats', methods=['GET'])
+def get_transcription_cache_stats():
+    """转写缓存命中率及节省的识别耗时"""
+    return jsonify(transcription_cache.stats()), 200
+
 @bp.route('/<int:alarm_id>/generate_draft', methods=['POST'])
 def generate_alarm_draft(alarm_id):
     """生成警情初稿"""
@@ -194,10 +661,11 @@ def generate_alarm_draft(alarm_id):
         # 获取转写文本
         transcription_text = ""
         if alarm.transcription and alarm.transcription.status == 'completed':
-            transcription_text = alarm.transcription.text_content
+            transcription_text = alarm.transcription.content
         
-        # TODO: 调用智能提取模块生成初稿
-        # 这里应该调用NLP服务或其他智能服务
+        # 从警情描述和转写文本中提取要素（本地正则与关键词自动机，不调用外部服务）
+        extracted = extraction_engine.extract(f'{alarm.brief_summary}\n{transcription_text or ""}',
+                                              reference=alarm.alarm_time)
         draft_text = f"""
         警情编号：{alarm.id}
         报警时间：{alarm.alarm_time.strftime('%Y-%m-%d %H:%M:%S')}
@@ -213,26 +681,265 @@ def generate_alarm_draft(alarm_id):
         
         录音转写内容：
         {transcription_text}
+        
+        要素提取：
+        时间线索：{'、'.join(t['text'] for t in extracted['times']) or '无'}
+        地点线索：{'、'.join(extracted['addresses']) or '无'}
+        涉及电话：{'、'.join(extracted['phones']) or '无'}
+        涉及车牌：{'、'.join(extracted['plates']) or '无'}
+        建议警情类型：{extracted['suggested_alarm_type'] or '无'}
+        建议紧急程度：{extracted['emergency']['level']}
         """
         
         return jsonify({
             'message': 'Draft generated successfully',
             'data': {
-                'draft_text': draft_text
+                'draft_text': draft_text,
+                'extracted': extracted
             }
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Error generating draft: {str(e)}'}), 500
 
+@bp.route('/search', methods=['GET'])
+def search_alarm_records():
+    """按关键词检索警情描述、事发地址和录音转写文本，结果按相关度排序并附带高亮摘要
+
+    total=exact 时返回命中总数，否则只返回 has_more。
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', 10, type=int), 100))
+    
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        result = search_alarms(
+            q, page=page, per_page=per_page,
+            start_date=datetime.fromisoformat(start_date) if start_date else None,
+            end_date=datetime.fromisoformat(end_date) if end_date else None,
+            with_total=request.args.get('total') == 'exact'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+def parse_time_window():
+    """解析 minutes（最近 N 分钟）或 start_date/end_date，返回 (开始, 结束)"""
+    minutes = request.args.get('minutes', type=int)
+    if minutes is not None:
+        if minutes <= 0:
+            raise ValueError('minutes must be positive')
+        return datetime.utcnow() - timedelta(minutes=minutes), None
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    return (datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(end_date) if end_date else None)
+
+def area_query(columns, bboxes, start_time=None, end_time=None):
+    """按格网码区间走索引筛出候选行，再以经纬度范围过滤；bboxes 为一个或多个矩形"""
+    max_cells = current_app.config.get('GEO_MAX_COVER_CELLS', 16)
+    conditions = []
+    for min_lon, min_lat, max_lon, max_lat in bboxes:
+        ranges = cover_ranges(min_lon, min_lat, max_lon, max_lat, max_cells)
+        conditions.append(and_(
+            or_(*[AlarmRecord.event_geocell.between(start, end) for start, end in ranges]),
+            AlarmRecord.event_location_longitude.between(min_lon, max_lon),
+            AlarmRecord.event_location_latitude.between(min_lat, max_lat)
+        ))
+    query = db.session.query(*columns).filter(or_(*conditions))
+    if start_time:
+        query = query.filter(AlarmRecord.alarm_time >= start_time)
+    if end_time:
+        query = query.filter(AlarmRecord.alarm_time <= end_time)
+    return query
+
+@bp.route('/nearby', methods=['GET'])
+def list_nearby_alarms():
+    """查询某点半径范围内的警情，按距离由近到远排序
+
+    参数：lon、lat、radius（米，默认 2000）、minutes 或 start_date/end_date、limit（默认 100）。
+    """
+    try:
+        longitude = parse_coordinate(request.args.get('lon'), 'lon', -180, 180)
+        latitude = parse_coordinate(request.args.get('lat'), 'lat', -90, 90)
+        if longitude is None or latitude is None:
+            raise ValueError('lon and lat are required')
+        radius = request.args.get('radius', 2000, type=float)
+        max_radius = current_app.config.get('GEO_MAX_RADIUS', 50000)
+        if not 0 < radius <= max_radius:
+            raise ValueError(f'radius must be between 0 and {max_radius} meters')
+        start_time, end_time = parse_time_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    
+    # 候选行只取坐标计算距离，命中的记录再整行加载
+    candidates = area_query(
+        (AlarmRecord.id, AlarmRecord.event_location_longitude, AlarmRecord.event_location_latitude),
+        circle_bboxes(longitude, latitude, radius), start_time, end_time
+    )
+    distances = []
+    for alarm_id, alarm_lon, alarm_lat in candidates:
+        distance = haversine(longitude, latitude, alarm_lon, alarm_lat)
+        if distance <= radius:
+            distances.append((distance, alarm_id))
+    distances.sort()
+    
+    nearest = distances[:limit]
+    alarms = {alarm.id: alarm for alarm in AlarmRecord.query.filter(
+        AlarmRecord.id.in_([alarm_id for _, alarm_id in nearest]))}
+    items = []
+    for distance, alarm_id in nearest:
+        data = alarms[alarm_id].to_dict(expand=set())
+        data['distance'] = round(distance, 1)
+        items.append(data)
+    return jsonify({'items': items, 'total': len(distances)}), 200
+
+@bp.route('/bbox', methods=['GET'])
+def list_alarms_in_bbox():
+    """查询矩形范围内的警情，按报警时间倒序
+
+    参数：min_lon、min_lat、max_lon、max_lat、minutes 或 start_date/end_date、limit（默认 500）。
+    """
+    try:
+        bbox = (
+            parse_coordinate(request.args.get('min_lon'), 'min_lon', -180, 180),
+            parse_coordinate(request.args.get('min_lat'), 'min_lat', -90, 90),
+            parse_coordinate(request.args.get('max_lon'), 'max_lon', -180, 180),
+            parse_coordinate(request.args.get('max_lat'), 'max_lat', -90, 90)
+        )
+        if None in bbox:
+            raise ValueError('min_lon, min_lat, max_lon and max_lat are required')
+        if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise ValueError('min_lon/min_lat must not exceed max_lon/max_lat')
+        start_time, end_time = parse_time_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = max(1, min(request.args.get('limit', 500, type=int), 2000))
+    
+    alarms = area_query((AlarmRecord,), [bbox], start_time, end_time).order_by(
+        AlarmRecord.alarm_time.desc(), AlarmRecord.id.desc()
+    ).limit(limit + 1).all()
+    return jsonify({
+        'items': [alarm.to_dict(expand=set()) for alarm in alarms[:limit]],
+        'has_more': len(alarms) > limit
+    }), 200
+
+@bp.route('/<int:alarm_id>/duplicates', methods=['GET'])
+def list_duplicate_alarms(alarm_id):
+    """获取同一事件的主警情及关联到它的重复报警；传入的是重复报警时按其主警情返回"""
+    alarm = AlarmRecord.query.get(alarm_id)
+    if not alarm:
+        return jsonify({'error': 'Alarm record not found'}), 404
+    
+    seen = {alarm.id}
+    while alarm.primary_alarm_id and alarm.primary_alarm_id not in seen:
+        primary = AlarmRecord.query.get(alarm.primary_alarm_id)
+        if not primary:
+            break
+        seen.add(primary.id)
+        alarm = primary
+    
+    duplicates = AlarmRecord.query.filter_by(primary_alarm_id=alarm.id).order_by(AlarmRecord.alarm_time).all()
+    return jsonify({
+        'primary': alarm.to_dict(expand=set()),
+        'duplicates': [duplicate.to_dict(expand=set()) for duplicate in duplicates]
+    }), 200
+
+@bp.route('/<int:alarm_id>/unlink_duplicate', methods=['POST'])
+def unlink_duplicate_alarm(alarm_id):
+    """误判时解除与主警情的关联，使其作为独立警情处理"""
+    alarm = AlarmRecord.query.get(alarm_id)
+    if not alarm:
+        return jsonify({'error': 'Alarm record not found'}), 404
+    if not alarm.primary_alarm_id:
+        return jsonify({'error': 'Alarm is not linked to a primary alarm'}), 400
+    
+    alarm.primary_alarm_id = None
+    alarm.duplicate_reason = None
+    db.session.commit()
+    return jsonify({'message': 'Duplicate link removed', 'data': alarm.to_dict(expand=set())}), 200
+
+@bp.route('/callers/<phone>', methods=['GET'])
+def get_caller_history(phone):
+    """按报警号码查询来电概况（累计报警次数、首末次报警时间、最近的警情类型），为一次主键读取
+
+    recent=N 时附带该号码最近 N 条警情，走 (reporter_phone_normalized, alarm_time) 索引。
+    """
+    normalized = normalize_phone(phone)
+    if not normalized:
+        return jsonify({'error': 'Invalid phone number'}), 400
+    recent = request.args.get('recent', 0, type=int)
+    if not 0 <= recent <= 50:
+        return jsonify({'error': 'recent must be between 0 and 50'}), 400
+
+    stats = db.session.get(CallerStats, normalized)
+    data = stats.to_dict() if stats else CallerStats(phone=normalized, total_calls=0).to_dict()
+    if recent:
+        alarms = (AlarmRecord.query.filter_by(reporter_phone_normalized=normalized)
+                  .order_by(AlarmRecord.alarm_time.desc(), AlarmRecord.id.desc()).limit(recent))
+        data['recent_alarms'] = [alarm.to_dict(expand=set()) for alarm in alarms]
+    return jsonify(data), 200
+
+@bp.route('/phone_region/<phone>', methods=['GET'])
+def get_phone_region(phone):
+    """查询单个号码的归属地"""
+    table = get_phone_region_table()
+    if table is None:
+        return jsonify({'error': 'Phone region table is not available'}), 503
+    normalized = normalize_phone(phone)
+    region = table.lookup(normalized) if normalized else None
+    if region is None:
+        return jsonify({'error': 'Phone region not found'}), 404
+    return jsonify(dict(region, phone=phone, normalized=normalized)), 200
+
+@bp.route('/phone_region', methods=['POST'])
+def lookup_phone_regions():
+    """批量查询号码归属地，请求体为 {"phones": [...]}，未识别的号码结果为 null"""
+    table = get_phone_region_table()
+    if table is None:
+        return jsonify({'error': 'Phone region table is not available'}), 503
+    data = request.get_json(silent=True) or {}
+    phones = data.get('phones')
+    max_phones = current_app.config.get('PHONE_REGION_MAX_BATCH', 10000)
+    if not isinstance(phones, list) or not phones:
+        return jsonify({'error': 'phones must be a non-empty list'}), 400
+    if len(phones) > max_phones:
+        return jsonify({'error': f'At most {max_phones} phones per request'}), 400
+
+    regions = table.lookup_many([normalize_phone(phone) for phone in phones])
+    return jsonify({'results': [
+        {'phone': phone, 'region': region} for phone, region in zip(phones, regions)
+    ]}), 200
+
+@bp.route('/types', methods=['GET'])
+def list_alarm_types():
+    """获取警情类型分类树（按路径排序的扁平列表），可用 root 只取某个大类的子树"""
+    root = request.args.get('root')
+    try:
+        query = AlarmType.query
+        if root:
+            query = query.filter(AlarmType.id.in_(subtree_ids(root)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify([alarm_type.to_dict() for alarm_type in query.order_by(AlarmType.path)]), 200
+
 @bp.route('/', methods=['GET'])
 def list_alarm_records():
     """获取警情记录列表，支持分页和过滤"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # 解析输出列与需要展开的关联对象，列裁剪下推到 SQL，关联对象按接口选择预加载策略
+    try:
+        fields, expand = parse_projection(AlarmRecord, ALARM_EXPAND_LOADERS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # 构建查询
-    query = AlarmRecord.query
+    query = apply_projection(AlarmRecord.query, AlarmRecord, ALARM_EXPAND_LOADERS, fields, expand,
+                             required=[AlarmRecord.alarm_time])
     
     # 添加过滤条件
     start_date = request.args.get('start_date')
@@ -240,28 +947,37 @@ def list_alarm_records():
     alarm_type = request.args.get('alarm_type')
     emergency_level = request.args.get('emergency_level')
     status = request.args.get('status')
+    reporter_phone = request.args.get('reporter_phone')
     
     if start_date:
         query = query.filter(AlarmRecord.alarm_time >= datetime.fromisoformat(start_date))
     if end_date:
         query = query.filter(AlarmRecord.alarm_time <= datetime.fromisoformat(end_date))
     if alarm_type:
-        query = query.filter(AlarmRecord.alarm_type == alarm_type)
+        # 按大类过滤时包含全部子类，经分类表展开为 id 列表后走 alarm_type_id 索引
+        try:
+            type_ids = subtree_ids(alarm_type)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(AlarmRecord.alarm_type_id.in_(type_ids))
     if emergency_level:
         query = query.filter(AlarmRecord.emergency_level == emergency_level)
     if status:
         query = query.filter(AlarmRecord.status == status)
+    if reporter_phone:
+        # 按规范化号码匹配，不受分隔符和国家码写法影响
+        query = query.filter(AlarmRecord.reporter_phone_normalized == normalize_phone(reporter_phone))
+    if request.args.get('primary_only') in ('1', 'true'):
+        # 只列出主警情，隐藏已关联的重复报警
+        query = query.filter(AlarmRecord.primary_alarm_id.is_(None))
     
-    # 执行分页查询
-    pagination = query.order_by(AlarmRecord.alarm_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 执行分页查询（页码分页或游标分页）
+    try:
+        result = paginate_query(query, AlarmRecord.alarm_time, AlarmRecord.id,
+                                serialize=make_serializer(fields, expand))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }), 200
+    return jsonify(result), 200
 
 # Add other routes as needed based on PRD for this module
\ No newline at end of file
@@ -0,0 +1,369 @@
+"""警情全文检索
+
+对警情描述、事发地址和录音转写文本建立倒排索引（alarm_search_terms）：
+- 中文按相邻两字切分（二元切分），字母数字按连续串切分，不依赖数据库的中文分词扩展，
+  PostgreSQL、MySQL 与 SQLite 使用同一套索引
+- 警情或转写文本在 flush 时增量重建该警情的词项，与业务数据在同一事务内提交；
+  批量导入等绕过 ORM 事件的写入显式调用 index_alarms
+- 查询词同样切分后要求全部命中，按字段加权词频排序（阈值算法，只读倒排列表的头部），
+  并为命中的字段生成高亮摘要
+"""
+import heapq
+import math
+import re
+import unicodedata
+from markupsafe import escape
+from sqlalchemy import event, inspect, select, delete, insert, func, and_, or_
+from sqlalchemy.orm import Session, joinedload
+from .models import AlarmRecord, Transcription, AlarmSearchTerm
+from .extraction import normalize_text
+from .. import db
+
+MAX_TERM_LENGTH = 32
+INDEX_BATCH_SIZE = 500
+SNIPPET_RADIUS = 30
+# 检索首轮从每个词项的倒排列表读取的行数，以及放弃阈值算法、改为连接查询前最多读取的行数；
+# 读到上限仍未确定时，多读的部分比连接查询本身还慢
+SEARCH_SCAN_BATCH = 200
+SEARCH_SCAN_LIMIT = 8000
+# 带时间范围检索时，范围内警情少于该数量则直接逐条计分
+SEARCH_DATE_SCAN_LIMIT = 5000
+
+# 字段权重：地址、描述由接警员录入，比转写文本更可信
+FIELD_WEIGHTS = {
+    'brief_summary': 2.0,
+    'event_location_address': 1.5,
+    'transcription': 1.0,
+}
+
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+')
+
+terms_table = AlarmSearchTerm.__table__
+
+def tokenize(text):
+    """切分为检索词项：中文连续串取相邻两字（单字串保留单字），字母数字串整体作为一个词项"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    for run in _TOKEN_RE.findall(text):
+        if run[0].isascii():
+            yield run[:MAX_TERM_LENGTH]
+        elif len(run) == 1:
+            yield run
+        else:
+            for index in range(len(run) - 1):
+                yield run[index:index + 2]
+
+def query_terms(q):
+    """查询词切分；孤立的单个汉字在文档中只会作为二元词项的一部分出现，忽略"""
+    terms = []
+    for term in tokenize(q):
+        if (term.isascii() or len(term) > 1) and term not in terms:
+            terms.append(term)
+    return terms
+
+def document_terms(fields):
+    """fields 为 {字段名: 文本}，返回 {词项: 权重}，权重为各字段 权重 * (1 + log(词频)) 之和"""
+    weights = {}
+    for name, text in fields.items():
+        counts = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            weights[term] = weights.get(term, 0.0) + FIELD_WEIGHTS[name] * (1 + math.log(count))
+    return weights
+
+def index_alarms(connection, alarm_ids):
+    """重建指定警情的词项；在调用方的事务内执行"""
+    alarm_ids = sorted(set(alarm_ids))
+    for begin in range(0, len(alarm_ids), INDEX_BATCH_SIZE):
+        batch = alarm_ids[begin:begin + INDEX_BATCH_SIZE]
+        documents = {}
+        rows = connection.execute(
+            select(AlarmRecord.id, AlarmRecord.brief_summary, AlarmRecord.event_location_address,
+                   Transcription.content)
+            .outerjoin(Transcription, Transcription.alarm_record_id == AlarmRecord.id)
+            .where(AlarmRecord.id.in_(batch))
+        )
+        for alarm_id, summary, address, transcript in rows:
+            document = documents.setdefault(alarm_id, {
+                'brief_summary': summary, 'event_location_address': address, 'transcription': ''
+            })
+            if transcript:
+                document['transcription'] += normalize_text(transcript) + '\n'
+
+        connection.execute(delete(terms_table).where(terms_table.c.alarm_record_id.in_(batch)))
+        values = [
+            {'term': term, 'alarm_record_id': alarm_id, 'weight': round(weight, 4)}
+            for alarm_id, fields in documents.items()
+            for term, weight in document_terms(fields).items()
+        ]
+        if values:
+            connection.execute(insert(terms_table), values)
+
+def _changed(obj, attributes):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+@event.listens_for(Session, 'before_flush')
+def _drop_deleted_alarm_terms(session, flush_context, instances):
+    """删除警情前先删除其词项，避免外键约束失败"""
+    alarm_ids = [obj.id for obj in session.deleted if isinstance(obj, AlarmRecord) and obj.id]
+    if alarm_ids:
+        session.connection().execute(
+            delete(terms_table).where(terms_table.c.alarm_record_id.in_(alarm_ids))
+        )
+
+@event.listens_for(Session, 'after_flush')
+def _reindex_changed_alarms(session, flush_context):
+    """描述、地址或转写文本有变化的警情在同一事务内重建词项"""
+    alarm_ids = set()
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, AlarmRecord):
+            if obj in session.new or _changed(obj, ('brief_summary', 'event_location_address')):
+                alarm_ids.add(obj.id)
+        elif isinstance(obj, Transcription) and obj.alarm_record_id:
+            if obj in session.new or _changed(obj, ('content', 'alarm_record_id')):
+                alarm_ids.add(obj.alarm_record_id)
+    if alarm_ids:
+        index_alarms(session.connection(), alarm_ids)
+
+def _normalize_with_spans(text):
+    """按 tokenize 的方式规范化（NFKC、小写），并返回规范化文本中每个字符来自原文的区间
+
+    逐个字符（连同其后的组合字符）规范化：NFKC 与小写可能改变长度（如 ㈱ 展开为 (株)），
+    命中区间据此映射回原文。
+    """
+    pieces, starts, ends = [], [], []
+    start = 0
+    for index in range(1, len(text) + 1):
+        if index < len(text) and unicodedata.combining(text[index]):
+            continue
+        piece = unicodedata.normalize('NFKC', text[start:index]).lower()
+        pieces.append(piece)
+        starts.extend([start] * len(piece))
+        ends.extend([index] * len(piece))
+        start = index
+    return ''.join(pieces), starts, ends
+
+def highlight(text, terms):
+    """截取第一处命中附近的文本，命中部分以 <em> 标记；未命中返回 None
+
+    在与索引相同规范化的文本上查找词项（全角字母数字等也能命中），再把命中区间映射回原文标记。
+    """
+    if not text:
+        return None
+    normalized, starts, ends = _normalize_with_spans(text)
+    spans = []
+    for term in terms:
+        start = normalized.find(term)
+        while start != -1:
+            spans.append((starts[start], ends[start + len(term) - 1]))
+            start = normalized.find(term, start + 1)
+    if not spans:
+        return None
+
+    # 相邻二元词项的命中区间相互重叠，合并后即为完整的命中词
+    spans.sort()
+    merged = [list(spans[0])]
+    for start, end in spans[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    window_start = max(0, merged[0][0] - SNIPPET_RADIUS)
+    window_end = min(len(text), merged[0][1] + SNIPPET_RADIUS * 2)
+    parts = ['…' if window_start else '']
+    cursor = window_start
+    for start, end in merged:
+        if start >= window_end:
+            break
+        end = min(end, window_end)
+        parts.append(str(escape(text[cursor:start])))
+        parts.append(f'<em>{escape(text[start:end])}</em>')
+        cursor = end
+    parts.append(str(escape(text[cursor:window_end])))
+    parts.append('…' if window_end < len(text) else '')
+    return ''.join(parts)
+
+def _within_dates(query, start_date, end_date):
+    if start_date:
+        query = query.where(AlarmRecord.alarm_time >= start_date)
+    if end_date:
+        query = query.where(AlarmRecord.alarm_time <= end_date)
+    return query
+
+def _postings(term, after, limit):
+    """按 (权重, 警情 id) 降序读取词项倒排列表中位于 after 之后的 limit 行"""
+    query = (select(terms_table.c.alarm_record_id, terms_table.c.weight)
+             .where(terms_table.c.term == term))
+    if after:
+        weight, alarm_id = after
+        query = query.where(or_(terms_table.c.weight < weight,
+                                and_(terms_table.c.weight == weight, terms_table.c.alarm_record_id < alarm_id)))
+    return db.session.execute(
+        query.order_by(terms_table.c.weight.desc(), terms_table.c.alarm_record_id.desc()).limit(limit)
+    ).all()
+
+def _score(terms, alarm_ids, start_date=None, end_date=None, known=None):
+    """返回 {警情 id: 得分}，只保留命中全部词项且在时间范围内的警情；得分按 terms 的顺序累加
+
+    known 为已从倒排列表读到的 {词项: {警情 id: 权重}}，其余的逐个词项按主键 (term, alarm_record_id) 查找，
+    只在前面词项都命中的警情中继续查；词项与警情 id 同时写成 IN 列表时，SQLite 会改为按词项扫描整个倒排列表。
+    """
+    known = known or {}
+    scores = dict.fromkeys(alarm_ids, 0.0)
+    for term in terms:
+        postings = known.get(term, {})
+        found = {alarm_id: postings[alarm_id] for alarm_id in scores if alarm_id in postings}
+        remaining = sorted(alarm_id for alarm_id in scores if alarm_id not in found)
+        for begin in range(0, len(remaining), INDEX_BATCH_SIZE):
+            found.update(db.session.execute(
+                select(terms_table.c.alarm_record_id, terms_table.c.weight)
+                .where(terms_table.c.term == term,
+                       terms_table.c.alarm_record_id.in_(remaining[begin:begin + INDEX_BATCH_SIZE]))
+            ).all())
+        scores = {alarm_id: scores[alarm_id] + weight for alarm_id, weight in found.items()}
+    if scores and (start_date or end_date):
+        remaining = sorted(scores)
+        in_range = set()
+        for begin in range(0, len(remaining), INDEX_BATCH_SIZE):
+            in_range.update(db.session.execute(_within_dates(
+                select(AlarmRecord.id).where(AlarmRecord.id.in_(remaining[begin:begin + INDEX_BATCH_SIZE])),
+                start_date, end_date
+            )).scalars())
+        scores = {alarm_id: score for alarm_id, score in scores.items() if alarm_id in in_range}
+    return scores
+
+def top_hits(terms, limit, start_date=None, end_date=None):
+    """按 (得分, 警情 id) 降序取前 limit 条命中，返回 [(警情 id, 得分)]
+
+    阈值算法：各词项的倒排列表按权重降序分批读取，新读到的警情按主键补齐全部词项的权重算出得分；
+    未读到的警情得分不超过各列表当前位置的权重之和，第 limit 名高于该阈值时即可停止，
+    不必聚合整个倒排列表。任一列表读完时全部命中都已读到。
+    时间范围内的警情少于 SEARCH_DATE_SCAN_LIMIT 条时改为直接对这些警情计分。
+    再读一轮将超过 SEARCH_SCAN_LIMIT 行仍未确定时（多个常见词很少同时出现），
+    或按已读部分的命中率估计读满 SEARCH_SCAN_LIMIT 行也凑不够 limit 条命中时，返回 None。
+
+    已知局限：几个词项各自很常见、同时出现却很少时，调用方改用 _matching_hits 连接查询，
+    耗时与第一个词项的倒排列表长度成正比。30 万条警情（约 550 万词项行）的 SQLite 库上，
+    这类查询耗时 25～90 ms，其余查询在 15 ms 以内；数据量再大一个数量级时会超过 100 ms，
+    需按警情时间分区或限定时间范围。
+    """
+    if start_date or end_date:
+        # 时间范围内的警情不多时直接逐条计分，比沿倒排列表读到足够多范围内的命中快
+        alarm_ids = db.session.execute(
+            _within_dates(select(AlarmRecord.id), start_date, end_date).limit(SEARCH_DATE_SCAN_LIMIT)
+        ).scalars().all()
+        if len(alarm_ids) < SEARCH_DATE_SCAN_LIMIT:
+            scores = _score(terms, alarm_ids)
+            return [(alarm_id, score) for score, alarm_id in
+                    heapq.nlargest(limit, ((score, alarm_id) for alarm_id, score in scores.items()))]
+
+    batch = max(SEARCH_SCAN_BATCH, limit)
+    frontier = dict.fromkeys(terms)
+    postings = {term: {} for term in terms}
+    seen = set()
+    scores = {}
+    scanned = 0
+    while True:
+        exhausted = False
+        candidates = set()
+        for term in terms:
+            rows = _postings(term, frontier[term], batch)
+            scanned += len(rows)
+            exhausted = exhausted or len(rows) < batch
+            if rows:
+                frontier[term] = (rows[-1].weight, rows[-1].alarm_record_id)
+            postings[term].update(rows)
+            candidates.update(postings[term])
+        # 每轮读取的行数翻倍，命中稀疏时减少往返次数
+        batch *= 2
+        candidates -= seen
+        seen |= candidates
+        scores.update(_score(terms, candidates, start_date, end_date, postings))
+
+        ranked = heapq.nlargest(limit, ((score, alarm_id) for alarm_id, score in scores.items()))
+        if exhausted:
+            return [(alarm_id, score) for score, alarm_id in ranked]
+        if len(ranked) == limit:
+            threshold = sum(frontier[term][0] for term in terms)
+            score, alarm_id = ranked[-1]
+            # 得分等于阈值的未读警情，id 必定小于各列表当前位置的 id
+            if score > threshold or (score == threshold and alarm_id >= min(last_id for _, last_id in frontier.values())):
+                return [(alarm_id, score) for score, alarm_id in ranked]
+        if scanned + batch * len(terms) > SEARCH_SCAN_LIMIT:
+            return None
+        # 按已读部分的命中率估计，读到 SEARCH_SCAN_LIMIT 行也凑不满 limit 条命中时提前放弃
+        if len(scores) * SEARCH_SCAN_LIMIT < limit * scanned:
+            return None
+
+def _matching_hits(terms, start_date=None, end_date=None):
+    """命中全部词项的警情（列 alarm_record_id, score），按 (得分, 警情 id) 降序；用于统计总数和阈值算法放弃时
+
+    沿第一个词项的倒排列表逐行按主键连接其余词项，不必像按警情分组聚合那样把全部倒排列表排序一遍。
+    同一个词切出的相邻二元词项几乎总是同时出现，按 terms[0::2] + terms[1::2] 的顺序连接，
+    先用互不重叠的词项排除不命中的行；得分仍按 terms 的顺序累加，与 top_hits 一致。
+    """
+    postings = [terms_table.alias(f'terms_{index}') for index in range(len(terms))]
+    first = postings[0]
+    score = sum((posting.c.weight for posting in postings[1:]), first.c.weight).label('score')
+    query = select(first.c.alarm_record_id, score).select_from(first).where(first.c.term == terms[0])
+    order = list(range(2, len(terms), 2)) + list(range(1, len(terms), 2))
+    for index in order:
+        query = query.join(postings[index], and_(postings[index].c.term == terms[index],
+                                                 postings[index].c.alarm_record_id == first.c.alarm_record_id))
+    if start_date or end_date:
+        query = _within_dates(query.join(AlarmRecord, AlarmRecord.id == first.c.alarm_record_id),
+                              start_date, end_date)
+    return query.order_by(score.desc(), first.c.alarm_record_id.desc())
+
+def search_alarms(q, page=1, per_page=10, start_date=None, end_date=None, with_total=False):
+    """检索警情，返回分页结果，每条结果附带得分与高亮摘要
+
+    按阈值算法只读取倒排列表的头部（见 top_hits），只多取一行判断是否还有下一页；
+    with_total 为真时才统计命中总数（需聚合全部命中，开销与查询词的倒排列表长度成正比）。
+    """
+    terms = query_terms(q)
+    if not terms:
+        raise ValueError('Query must contain a word or at least two consecutive Chinese characters')
+
+    offset = (page - 1) * per_page
+    rows = top_hits(terms, offset + per_page + 1, start_date, end_date)
+    if rows is None:
+        rows = db.session.execute(
+            _matching_hits(terms, start_date, end_date).offset(offset).limit(per_page + 1)
+        ).all()
+    else:
+        rows = rows[offset:]
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    alarms = {alarm.id: alarm for alarm in AlarmRecord.query.options(
+        joinedload(AlarmRecord.transcription)
+    ).filter(AlarmRecord.id.in_([alarm_id for alarm_id, _ in rows]))}
+
+    items = []
+    for alarm_id, hit_score in rows:
+        alarm = alarms[alarm_id]
+        data = alarm.to_dict(expand=set())
+        data['score'] = round(float(hit_score), 4)
+        transcript = normalize_text(alarm.transcription.content) if alarm.transcription else None
+        data['highlights'] = {
+            name: snippet for name, snippet in (
+                ('brief_summary', highlight(alarm.brief_summary, terms)),
+                ('event_location_address', highlight(alarm.event_location_address, terms)),
+                ('transcription', highlight(transcript, terms)),
+            ) if snippet
+        }
+        items.append(data)
+
+    result = {
+        'items': items,
+        'current_page': page,
+        'has_more': has_more
+    }
+    if with_total:
+        hits = _matching_hits(terms, start_date, end_date).order_by(None)
+        result['total'] = db.session.execute(select(func.count()).select_from(hits.subquery())).scalar()
+        result['pages'] = math.ceil(result['total'] / per_page)
+    return result
@@ -0,0 +1,124 @@
+"""语音识别服务客户端
+
+- 每个 worker 进程复用一个带连接池的 requests.Session（keep-alive），所有请求都设置连接/读取超时
+- 通过 Redis 信号量限制所有 worker 对识别服务的总并发；未配置 Redis 时退化为进程内信号量
+- 网络错误、超时、429 与 5xx 视为可重试错误，由 Celery 任务按指数退避重试
+"""
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import current_app
+import requests
+from requests.adapters import HTTPAdapter
+
+_session = None
+_session_lock = threading.Lock()
+_local_semaphores = {}
+_redis_clients = {}
+
+# 基于有序集合的计数信号量：先清理超时未释放的占位，再按加入顺序判断是否在前 limit 个之内
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1] - ARGV[2])
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[3])
+if redis.call('ZRANK', KEYS[1], ARGV[3]) < tonumber(ARGV[4]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+redis.call('ZREM', KEYS[1], ARGV[3])
+return 0
+"""
+
+class AsrError(Exception):
+    """识别服务调用失败；retryable 表示稍后重试可能成功"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+def get_session():
+    """取得本进程共享的 HTTP 会话"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = current_app.config.get('ASR_POOL_SIZE', 10)
+                session = requests.Session()
+                # 重试由 Celery 任务负责，连接池层不做重试，避免重试次数相乘
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+def redis_client():
+    url = current_app.config.get('ASR_REDIS_URL') or current_app.config.get('REDIS_URL')
+    if not url:
+        return None
+    if url not in _redis_clients:
+        import redis
+        _redis_clients[url] = redis.Redis.from_url(url)
+    return _redis_clients[url]
+
+@contextmanager
+def concurrency_slot():
+    """占用一个识别服务并发名额；等待超时抛出可重试的 AsrError"""
+    limit = current_app.config.get('ASR_MAX_CONCURRENCY', 4)
+    wait = current_app.config.get('ASR_SLOT_WAIT', 10)
+    client = redis_client()
+
+    if client is None:
+        semaphore = _local_semaphores.setdefault(limit, threading.BoundedSemaphore(limit))
+        if not semaphore.acquire(timeout=wait):
+            raise AsrError('ASR concurrency limit reached', retryable=True)
+        try:
+            yield
+        finally:
+            semaphore.release()
+        return
+
+    key = current_app.config.get('ASR_SEMAPHORE_KEY', 'asr:semaphore')
+    # 占位超过读取超时仍未释放，说明持有者已异常退出
+    lease = int(current_app.config.get('ASR_READ_TIMEOUT', 120)) + 30
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not client.eval(_ACQUIRE_SCRIPT, 1, key, time.time(), lease, token, limit):
+        if time.monotonic() >= deadline:
+            raise AsrError('ASR concurrency limit reached', retryable=True)
+        time.sleep(0.2 + random.random() * 0.3)
+    try:
+        yield
+    finally:
+        client.zrem(key, token)
+
+def recognize(file_path):
+    """把音频文件提交给识别服务，返回识别文本"""
+    api_key = current_app.config.get('SPEECH_RECOGNITION_API_KEY')
+    api_url = current_app.config.get('SPEECH_RECOGNITION_API_URL')
+    if not api_key or not api_url:
+        raise AsrError('Speech recognition service not configured')
+
+    timeout = (current_app.config.get('ASR_CONNECT_TIMEOUT', 5),
+               current_app.config.get('ASR_READ_TIMEOUT', 120))
+    headers = {'Authorization': f'Bearer {api_key}'}
+
+    with concurrency_slot():
+        try:
+            with open(file_path, 'rb') as audio_file:
+                response = get_session().post(api_url, files={'audio': audio_file},
+                                              headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise AsrError(f'ASR request failed: {str(e)}', retryable=True)
+
+    if response.status_code == 200:
+        return response.json().get('text', '')
+    retryable = response.status_code == 429 or response.status_code >= 500
+    raise AsrError(f'API request failed ({response.status_code}): {response.text[:500]}',
+                   retryable=retryable)
+
+def retry_delay(retries):
+    """指数退避（带随机抖动），单位秒"""
+    base = current_app.config.get('ASR_RETRY_BACKOFF', 2)
+    cap = current_app.config.get('ASR_RETRY_BACKOFF_MAX', 300)
+    return min(cap, base * 2 ** retries) * (0.5 + random.random() / 2)
@@ -0,0 +1,329 @@
+"""转写前的音频处理：解码为 PCM、语音活动检测（VAD）、分段规划与片段生成
+
+录音先由 ffmpeg 归一化为 16kHz 单声道 16 位 PCM 文件（受限的转码进程池，结果按内容哈希缓存），
+之后的分析和切片都直接在内存映射的 PCM 上完成：按帧计算能量与过零率判定语音帧，
+只把语音区间拼接后提交给识别服务。
+"""
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from contextlib import contextmanager
+import numpy as np
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FFMPEG_TIMEOUT = 300
+SAMPLE_RATE = 16000
+# 每次向量化处理的帧数（30ms 帧约 60 秒），限制长录音分析时的内存占用
+VAD_CHUNK_FRAMES = 2000
+
+_local_slots = {}
+
+def ffmpeg_binary():
+    return current_app.config.get('FFMPEG_BINARY', 'ffmpeg')
+
+def run_ffmpeg(args, timeout=FFMPEG_TIMEOUT):
+    """执行 ffmpeg，返回 stderr 文本；失败或超时抛出 RuntimeError"""
+    cmd = [ffmpeg_binary(), '-hide_banner', '-nostdin'] + args
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f'ffmpeg failed: {str(e)}')
+    if result.returncode != 0:
+        raise RuntimeError(f'ffmpeg failed: {result.stderr.strip()[-500:]}')
+    return result.stderr
+
+def work_path(suffix):
+    """转写中间文件路径，位于上传目录下以便各 worker 共享"""
+    work_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], '.segments')
+    os.makedirs(work_dir, exist_ok=True)
+    return os.path.join(work_dir, uuid.uuid4().hex + suffix)
+
+@contextmanager
+def ffmpeg_slot():
+    """占用本机的一个转码名额，限制同时运行的 ffmpeg 进程数
+
+    名额以文件锁实现，同一台机器上的所有 worker 进程共享；不支持 fcntl 的平台退化为进程内信号量。
+    """
+    size = current_app.config.get('AUDIO_NORMALIZE_WORKERS') or max(1, (os.cpu_count() or 2) // 2)
+    wait = current_app.config.get('AUDIO_NORMALIZE_WAIT', 600)
+
+    if fcntl is None:
+        semaphore = _local_slots.setdefault(size, threading.BoundedSemaphore(size))
+        if not semaphore.acquire(timeout=wait):
+            raise RuntimeError('Timed out waiting for an ffmpeg slot')
+        try:
+            yield
+        finally:
+            semaphore.release()
+        return
+
+    lock_dir = os.path.join(tempfile.gettempdir(), 'alarm-ffmpeg-slots')
+    os.makedirs(lock_dir, exist_ok=True)
+    deadline = time.monotonic() + wait
+    while True:
+        for index in range(size):
+            handle = open(os.path.join(lock_dir, f'slot-{index}.lock'), 'w')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            return
+        if time.monotonic() >= deadline:
+            raise RuntimeError('Timed out waiting for an ffmpeg slot')
+        time.sleep(0.1)
+
+def file_sha256(file_path):
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def normalized_cache_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'normalized')
+
+def normalized_pcm(file_path, content_hash=None):
+    """返回录音归一化为 16kHz 单声道 s16le 裸 PCM 后的缓存文件路径
+
+    缓存按源文件内容哈希存放，同一录音（包括挂到多个警情的同一文件）只转码一次。
+    """
+    content_hash = content_hash or file_sha256(file_path)
+    cache_path = os.path.join(normalized_cache_root(), content_hash[:2],
+                              f'{content_hash}.{SAMPLE_RATE}.s16le')
+    if os.path.exists(cache_path):
+        # 刷新修改时间，供 prune_normalized_cache 按最近使用淘汰
+        os.utime(cache_path)
+        return cache_path
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f'{cache_path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with ffmpeg_slot():
+            # 排队期间其他进程可能已完成同一文件的转码
+            if os.path.exists(cache_path):
+                return cache_path
+            run_ffmpeg(['-y', '-i', file_path, '-vn', '-threads', '1', '-ac', '1',
+                        '-ar', str(SAMPLE_RATE), '-f', 's16le', '-acodec', 'pcm_s16le', tmp_path])
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return cache_path
+
+def prune_normalized_cache(max_bytes):
+    """按最近使用时间淘汰归一化缓存，使总大小不超过 max_bytes，返回删除的文件数"""
+    root = normalized_cache_root()
+    if not os.path.isdir(root):
+        return 0
+    entries = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+def load_pcm(pcm_path):
+    """以内存映射方式打开 PCM 文件，不把整段录音读入内存"""
+    if os.path.getsize(pcm_path) < 2:
+        return np.zeros(0, dtype='<i2')
+    return np.memmap(pcm_path, dtype='<i2', mode='r')
+
+def frame_features(samples, frame_length):
+    """逐帧计算能量（dBFS）与过零率，分块向量化处理"""
+    n_frames = len(samples) // frame_length
+    energy = np.empty(n_frames, dtype=np.float32)
+    zcr = np.empty(n_frames, dtype=np.float32)
+    for begin in range(0, n_frames, VAD_CHUNK_FRAMES):
+        end = min(n_frames, begin + VAD_CHUNK_FRAMES)
+        block = np.asarray(samples[begin * frame_length:end * frame_length], dtype=np.float32)
+        block = block.reshape(-1, frame_length) / 32768.0
+        energy[begin:end] = 10 * np.log10(np.mean(block * block, axis=1) + 1e-10)
+        signs = np.signbit(block)
+        zcr[begin:end] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return energy, zcr
+
+def split_energy(energy, bins=64):
+    """把帧能量按两类方差最大化（Otsu）分为安静帧和响亮帧，返回分界值；分不开时返回 None"""
+    low, high = float(energy.min()), float(energy.max())
+    if high - low < 1e-6:
+        return None
+    counts, edges = np.histogram(energy, bins=bins, range=(low, high))
+    centers = (edges[:-1] + edges[1:]) / 2
+    weight_low = np.cumsum(counts)[:-1]
+    weight_high = len(energy) - weight_low
+    sum_low = np.cumsum(counts * centers)[:-1]
+    mean_low = sum_low / np.maximum(weight_low, 1)
+    mean_high = (np.sum(counts * centers) - sum_low) / np.maximum(weight_high, 1)
+    between = weight_low * weight_high * (mean_low - mean_high) ** 2
+    return float(edges[int(np.argmax(between)) + 1])
+
+def detect_speech(samples, sample_rate=SAMPLE_RATE, frame_ms=30, margin_db=12, min_db=-50, speech_db=-30,
+                  zcr_threshold=0.25, min_speech=0.25, min_gap=0.4, padding=0.15):
+    """基于能量与过零率的语音活动检测，返回语音区间 [(开始, 结束), ...]，单位秒
+
+    - 帧能量分为安静、响亮两类，两类均值相差 margin_db 以上时以安静类的中位数作为底噪，
+      高出底噪 margin_db 的帧判为浊音；分不出两类（整段都是语音或都是静音）时只按绝对电平 min_db 判定
+    - 高于 speech_db 的帧无论底噪如何都判为语音，避免底噪偏高时漏掉语音
+    - 能量略高于底噪且过零率高的帧判为清音（擦音、送气音），避免截掉字头字尾
+    - 间隔小于 min_gap 的区间合并，短于 min_speech 的区间丢弃，保留的区间两端各扩展 padding
+    """
+    frame_length = int(sample_rate * frame_ms / 1000)
+    energy, zcr = frame_features(samples, frame_length)
+    if not len(energy):
+        return []
+
+    floor = None
+    split = split_energy(energy)
+    if split is not None:
+        quiet, loud = energy[energy < split], energy[energy >= split]
+        if len(quiet) and len(loud) and float(loud.mean()) - float(quiet.mean()) >= margin_db:
+            floor = float(np.median(quiet))
+    if floor is None:
+        threshold = unvoiced_threshold = min_db
+    else:
+        threshold = min(max(floor + margin_db, min_db), speech_db)
+        unvoiced_threshold = min(max(floor + margin_db / 2, min_db), speech_db)
+    speech = (energy > threshold) | ((energy > unvoiced_threshold) & (zcr > zcr_threshold))
+
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    frame_seconds = frame_length / sample_rate
+    regions = []
+    for start, end in zip(starts * frame_seconds, ends * frame_seconds):
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    duration = len(samples) / sample_rate
+    return [(round(max(0.0, start - padding), 3), round(min(duration, end + padding), 3))
+            for start, end in regions if end - start >= min_speech]
+
+def has_signal(samples, sample_rate=SAMPLE_RATE, frame_ms=30, min_db=-50):
+    """录音中是否有任一帧能量高于 min_db（不是整段静音）"""
+    energy, _ = frame_features(samples, int(sample_rate * frame_ms / 1000))
+    return bool(len(energy)) and float(energy.max()) > min_db
+
+def fill_gaps(regions, duration):
+    """把语音区间扩展为覆盖整段录音的连续区间，相邻区间在停顿的中点相接
+
+    整段提交识别时不丢弃任何音频，但仍保留 VAD 找到的停顿作为分段的切点。
+    """
+    if not regions:
+        return [(0.0, duration)]
+    pieces = []
+    start = 0.0
+    for (_, previous_end), (next_start, _) in zip(regions, regions[1:]):
+        cut = round((previous_end + next_start) / 2, 3)
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, duration))
+    return pieces
+
+def plan_speech_regions(samples, max_active_ratio=0.9, sample_rate=SAMPLE_RATE):
+    """确定提交识别的区间：语音占比超过 max_active_ratio，或有信号却没检测出语音时，
+    不信任 VAD 的取舍，整段提交识别（检测到的停顿仍作为区间边界）；只有真正静音的录音返回空列表
+    """
+    duration = round(len(samples) / sample_rate, 3)
+    regions = detect_speech(samples, sample_rate)
+    active = sum(end - start for start, end in regions)
+    if duration and (active >= duration * max_active_ratio or (not regions and has_signal(samples, sample_rate))):
+        return fill_gaps(regions, duration)
+    return regions
+
+def quietest_point(samples, start, end, target, sample_rate=SAMPLE_RATE, frame_ms=30, smooth_frames=7):
+    """在 [start, end] 秒内找平滑后能量最低的位置；相差 1 dB 以内视为同样安静，取离 target 最近的"""
+    frame_length = int(sample_rate * frame_ms / 1000)
+    offset = int(start * sample_rate)
+    energy, _ = frame_features(samples[offset:int(end * sample_rate)], frame_length)
+    if not len(energy):
+        return target
+    if len(energy) >= smooth_frames:
+        energy = np.convolve(energy, np.ones(smooth_frames) / smooth_frames, mode='same')
+    positions = (offset + (np.arange(len(energy)) + 0.5) * frame_length) / sample_rate
+    quiet = np.flatnonzero(energy <= energy.min() + 1.0)
+    return round(float(positions[quiet[np.argmin(np.abs(positions[quiet] - target))]]), 3)
+
+def group_regions(regions, target=30, max_length=60, samples=None, sample_rate=SAMPLE_RATE):
+    """把语音区间按顺序分组，每组语音总时长接近 target 秒
+
+    超过 max_length 的单个区间拆开：给出 samples 时在 target 附近能量最低处（字词间的换气）拆分，
+    否则在 max_length 处硬切。
+    """
+    pieces = []
+    for start, end in regions:
+        while end - start > max_length:
+            if samples is None:
+                cut = start + max_length
+            else:
+                cut = quietest_point(samples, start + target / 2, start + max_length, start + target, sample_rate)
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    groups = []
+    current = []
+    speech = 0.0
+    for start, end in pieces:
+        if current and speech + (end - start) > target:
+            groups.append(current)
+            current = []
+            speech = 0.0
+        current.append((start, end))
+        speech += end - start
+    if current:
+        groups.append(current)
+    return groups
+
+def write_speech_clip(samples, regions, sample_rate=SAMPLE_RATE):
+    """把给定语音区间的样本依次拼接写成 WAV 临时文件，返回文件路径，由调用方删除"""
+    out_path = work_path('.wav')
+    with wave.open(out_path, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(sample_rate)
+        for start, end in regions:
+            clip.writeframes(np.asarray(
+                samples[int(start * sample_rate):int(end * sample_rate)], dtype='<i2'
+            ).tobytes())
+    return out_path
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f'{int(minutes):02d}:{seconds:04.1f}'
+
+def stitch_segments(segments):
+    """按时间顺序拼接已完成片段的识别文本，每段前标注时间范围"""
+    lines = []
+    for segment in sorted(segments, key=lambda s: s.segment_index):
+        if segment.status == 'completed' and segment.content:
+            lines.append(f'[{format_timestamp(segment.start_time)}-'
+                         f'{format_timestamp(segment.end_time)}] {segment.content}')
+    return '\n'.join(lines)
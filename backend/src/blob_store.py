@@ -0,0 +1,230 @@
+"""内容寻址的媒体文件存储
+
+文件按 SHA-256 存放在 UPLOAD_FOLDER/blobs/<前两位>/<三四位>/<sha256>，
+同一内容无论被警情、处置证据还是归档引用多少次，磁盘上只保存一份。
+media_blobs 表记录每个内容的大小与引用计数：文件记录创建时 acquire，删除时 release，
+引用计数归零的内容由 prune_blobs 在宽限期后清理。
+
+清理与并发上传同一内容之间以文件修改时间协调：上传复用已有文件时先刷新其修改时间，
+prune_blobs 先把文件改名为墓碑、再确认修改时间仍早于宽限期并删除数据库记录，最后才删除墓碑；
+改名之后到达的上传看不到文件，会放入自己的副本。
+"""
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+from . import db
+
+READ_BLOCK_SIZE = 1024 * 1024
+TOMBSTONE_SUFFIX = '.deleted'
+
+StoredBlob = namedtuple('StoredBlob', ['sha256', 'size', 'path'])
+
+class MediaBlob(db.Model):
+    """内容寻址存储中的文件内容"""
+    __tablename__ = 'media_blobs'
+    __table_args__ = (
+        db.Index('ix_media_blobs_verified_at', 'verified_at'),
+    )
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    verified_at = db.Column(db.DateTime)  # 最近一次巡检时间，见 media_integrity.py
+    integrity_status = db.Column(db.String(20))  # 'ok', 'mismatch', 'missing'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'verified_at': self.verified_at.isoformat() if self.verified_at else None,
+            'integrity_status': self.integrity_status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+def blobs_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs')
+
+def blob_path(sha256):
+    """按哈希前缀分两级目录，避免单个目录下文件过多"""
+    return os.path.join(blobs_root(), sha256[:2], sha256[2:4], sha256)
+
+def _touch(path):
+    """刷新文件修改时间，告知 prune_blobs 该内容正被使用；文件不存在（已被清理）时返回 False"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _adopt(src_path, sha256):
+    """把已写完的文件放入存储；内容已登记且文件仍在时直接丢弃新文件，不产生额外写入
+
+    数据库中没有该内容的记录时，已有文件可能正被 prune_blobs 清理，始终以新文件替换。
+    """
+    target = blob_path(sha256)
+    size = os.path.getsize(src_path)
+    if db.session.get(MediaBlob, sha256) is not None and _touch(target):
+        os.remove(src_path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            # 同一文件系统内重命名，零拷贝
+            os.replace(src_path, target)
+        except OSError:
+            shutil.move(src_path, target)
+    return StoredBlob(sha256, size, target)
+
+def store_file(src_path, sha256=None):
+    """把磁盘上的文件移入存储，sha256 未知时先流式计算"""
+    if sha256 is None:
+        hasher = hashlib.sha256()
+        with open(src_path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+                hasher.update(block)
+        sha256 = hasher.hexdigest()
+    return _adopt(src_path, sha256)
+
+def store_stream(stream):
+    """边写临时文件边计算哈希，写完后移入存储"""
+    tmp_dir = os.path.join(blobs_root(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+                hasher.update(block)
+                f.write(block)
+        return _adopt(tmp_path, hasher.hexdigest())
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def find_blob(sha256, size=None):
+    """查找已存储的内容（秒传），不存在或大小不符时返回 None"""
+    if not sha256:
+        return None
+    sha256 = sha256.lower()
+    blob = MediaBlob.query.get(sha256)
+    if not blob or (size is not None and blob.size != int(size)):
+        return None
+    path = blob_path(sha256)
+    # 刷新修改时间，之后的清理会跳过该内容；文件已被清理时按未找到处理，由客户端正常上传
+    if not _touch(path):
+        return None
+    return StoredBlob(sha256, blob.size, path)
+
+def acquire_blob(blob):
+    """引用计数加一，随调用方的事务一起提交"""
+    result = db.session.execute(
+        update(MediaBlob).where(MediaBlob.sha256 == blob.sha256)
+        .values(ref_count=MediaBlob.ref_count + 1)
+    )
+    if result.rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(MediaBlob(sha256=blob.sha256, size=blob.size, ref_count=1))
+    except IntegrityError:
+        # 并发请求已先插入同一内容
+        db.session.execute(
+            update(MediaBlob).where(MediaBlob.sha256 == blob.sha256)
+            .values(ref_count=MediaBlob.ref_count + 1)
+        )
+
+def release_blob(sha256):
+    """引用计数减一，随调用方的事务一起提交；文件由 prune_blobs 延迟清理"""
+    db.session.execute(
+        update(MediaBlob).where(MediaBlob.sha256 == sha256, MediaBlob.ref_count > 0)
+        .values(ref_count=MediaBlob.ref_count - 1)
+    )
+
+def _retire(path, deadline):
+    """把文件改名为墓碑，返回墓碑路径；文件不存在时返回 False
+
+    改名后修改时间晚于 deadline，说明清理前刚有上传复用了该文件，改回原名并返回 None。
+    """
+    tombstone = f'{path}.{uuid.uuid4().hex}{TOMBSTONE_SUFFIX}'
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return False
+    if os.path.getmtime(tombstone) > deadline:
+        # 原位置可能已有并发上传放入的副本，内容相同，直接覆盖
+        os.replace(tombstone, path)
+        return None
+    return tombstone
+
+def prune_blobs(grace_seconds=3600):
+    """清理引用计数为零的内容以及未登记的孤儿文件，返回删除的文件数
+
+    只清理超过宽限期的对象，避免与正在进行的上传或秒传竞争。
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    deadline = time.time() - grace_seconds
+    removed = 0
+    stale = [row.sha256 for row in MediaBlob.query.filter(
+        MediaBlob.ref_count <= 0, MediaBlob.updated_at < cutoff
+    ).all()]
+    for sha256 in stale:
+        path = blob_path(sha256)
+        # 先改名再删除记录：之后到达的上传找不到文件，会放入自己的副本
+        tombstone = _retire(path, deadline)
+        if tombstone is None:
+            continue
+        result = db.session.execute(delete(MediaBlob).where(
+            MediaBlob.sha256 == sha256, MediaBlob.ref_count <= 0, MediaBlob.updated_at < cutoff
+        ))
+        db.session.commit()
+        if not tombstone:
+            continue
+        if result.rowcount:
+            os.remove(tombstone)
+            removed += 1
+        else:
+            # 期间被重新引用
+            os.replace(tombstone, path)
+
+    # 写入存储后数据库提交失败、或上传中断留下的临时文件；以及清理中途退出留下的墓碑
+    root = blobs_root()
+    if not os.path.isdir(root):
+        return removed
+    known = None
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if os.path.basename(directory) == 'tmp':
+                if os.path.getmtime(path) <= deadline:
+                    os.remove(path)
+                    removed += 1
+                continue
+            if known is None:
+                known = {row.sha256 for row in db.session.query(MediaBlob.sha256)}
+            if filename.endswith(TOMBSTONE_SUFFIX):
+                sha256 = filename.split('.', 1)[0]
+                target = os.path.join(directory, sha256)
+                if sha256 in known and not os.path.exists(target):
+                    os.replace(path, target)
+                elif os.path.getmtime(path) <= deadline:
+                    os.remove(path)
+                    removed += 1
+                continue
+            if filename in known or os.path.getmtime(path) > deadline:
+                continue
+            tombstone = _retire(path, deadline)
+            if tombstone:
+                os.remove(tombstone)
+                removed += 1
+    return removed
@@ -0,0 +1,277 @@
+"""分片续传上传
+
+协议：
+1. init：声明文件名、总大小（可选 sha256），返回 upload_id
+2. append：以原始字节（application/octet-stream）提交分片，Upload-Offset 头或 offset 参数
+   必须等于服务端已接收的字节数；分片直接流式写入磁盘，同时增量计算 SHA-256
+3. status：查询已接收的字节数，断线后据此续传
+4. finalize：校验大小与摘要，由各模块把文件移入正式目录并创建文件记录
+
+会话保存在上传目录下，同一会话的分片可以落到不同的 worker：偏移检查与写入在会话文件的 flock 下进行，
+摘要状态只在进程内缓存，缺失时从磁盘补算。超过 CHUNKED_UPLOAD_EXPIRY 秒无新分片的会话在创建新会话时清理。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, request, jsonify
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+# 进程内缓存各上传会话的增量摘要状态：{upload_id: (已摘要字节数, hasher)}
+# 已接收的字节不会再被改写（超出大小的分片只截掉本次写入的部分），偏移一致时缓存即有效
+_hashers = {}
+# 每个上传会话一把进程内的锁，不同文件的分片可以并发写入
+_session_locks = {}
+_registry_lock = threading.Lock()
+
+class UploadError(Exception):
+    """上传会话错误，携带应返回的 HTTP 状态码"""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+def sessions_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], '.uploads')
+
+def session_dir(upload_id):
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload session not found', 404)
+    return os.path.join(sessions_root(), upload_id)
+
+def data_path(upload_id):
+    return os.path.join(session_dir(upload_id), 'data')
+
+def meta_path(upload_id):
+    return os.path.join(session_dir(upload_id), 'meta.json')
+
+def load_session(upload_id, target=None):
+    """读取上传会话元数据，并附带当前已接收的字节数"""
+    if not os.path.exists(meta_path(upload_id)):
+        raise UploadError('Upload session not found', 404)
+    with open(meta_path(upload_id), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if target and meta['target'] != target:
+        raise UploadError('Upload session not found', 404)
+    meta['offset'] = os.path.getsize(data_path(upload_id))
+    return meta
+
+def max_upload_size():
+    return current_app.config.get('CHUNKED_UPLOAD_MAX_SIZE', 4 * 1024 ** 3)
+
+def init_upload(target, target_id, filename, total_size=None, sha256=None, extra=None):
+    """创建上传会话，顺带清理过期的会话"""
+    purge_expired_uploads()
+    max_size = max_upload_size()
+    if total_size is not None:
+        total_size = int(total_size)
+        if total_size < 0 or total_size > max_size:
+            raise UploadError(f'File size must be between 0 and {max_size} bytes', 413)
+
+    upload_id = uuid.uuid4().hex
+    directory = os.path.join(sessions_root(), upload_id)
+    os.makedirs(directory)
+    meta = {
+        'upload_id': upload_id,
+        'target': target,
+        'target_id': target_id,
+        'file_name': filename,
+        'total_size': total_size,
+        'sha256': sha256.lower() if sha256 else None,
+        'extra': extra or {},
+        'created_at': datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    open(os.path.join(directory, 'data'), 'wb').close()
+    meta['offset'] = 0
+    return meta
+
+@contextmanager
+def _session_lock(upload_id):
+    """独占上传会话：进程内的线程锁，加上 meta.json 上的 flock 使其他 worker 进程的请求依次执行
+
+    锁加在 meta.json 而不是数据文件上：finalize 后数据文件被移入内容存储，之后还要在锁内删除会话。
+    不支持 fcntl 的平台只有进程内的锁，需以单进程方式部署。
+    """
+    with _registry_lock:
+        lock = _session_locks.setdefault(upload_id, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        try:
+            handle = open(meta_path(upload_id), 'rb')
+        except FileNotFoundError:
+            raise UploadError('Upload session not found', 404)
+        with handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+def _hasher_at(upload_id, offset):
+    """取得摘要已推进到 offset 的 hasher；进程重启或请求落到其他 worker 时从磁盘补算一次"""
+    cached = _hashers.get(upload_id)
+    if cached and cached[0] == offset:
+        return cached[1]
+    hasher = hashlib.sha256()
+    with open(data_path(upload_id), 'rb') as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+def append_chunk(upload_id, target, offset, stream):
+    """把请求体流式追加到上传文件，返回新的 offset"""
+    with _session_lock(upload_id):
+        meta = load_session(upload_id, target)
+        current = meta['offset']
+        if offset != current:
+            raise UploadError('Upload offset mismatch', 409, offset=current)
+
+        hasher = _hasher_at(upload_id, current)
+        # 未声明总大小时以允许的最大文件大小为上限
+        if meta['total_size'] is not None:
+            limit, message = meta['total_size'], 'Chunk exceeds declared file size'
+        else:
+            limit, message = max_upload_size(), f'File size exceeds {max_upload_size()} bytes'
+        written = current
+        with open(data_path(upload_id), 'ab') as f:
+            while True:
+                block = stream.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                if written + len(block) > limit:
+                    f.truncate(current)
+                    _hashers.pop(upload_id, None)
+                    raise UploadError(message, 413, offset=current)
+                f.write(block)
+                hasher.update(block)
+                written += len(block)
+        _hashers[upload_id] = (written, hasher)
+        return written
+
+def finalize_upload(upload_id, target):
+    """校验上传完整性，返回 (会话元数据, 数据文件路径, sha256)"""
+    with _session_lock(upload_id):
+        meta = load_session(upload_id, target)
+        if meta['total_size'] is not None and meta['offset'] != meta['total_size']:
+            raise UploadError('Upload is incomplete', 409, offset=meta['offset'])
+        digest = _hasher_at(upload_id, meta['offset']).hexdigest()
+        if meta['sha256'] and meta['sha256'] != digest:
+            raise UploadError('SHA-256 mismatch', 422)
+        return meta, data_path(upload_id), digest
+
+def discard_upload(upload_id):
+    """删除上传会话及其临时文件"""
+    try:
+        with _session_lock(upload_id):
+            _remove_session(upload_id)
+    except UploadError:
+        pass
+    with _registry_lock:
+        _session_locks.pop(upload_id, None)
+
+def _remove_session(upload_id):
+    _hashers.pop(upload_id, None)
+    shutil.rmtree(session_dir(upload_id), ignore_errors=True)
+
+def _last_activity(upload_id):
+    """最后一次收到分片的时间；数据文件已移走时取会话创建时间"""
+    try:
+        return os.path.getmtime(data_path(upload_id))
+    except FileNotFoundError:
+        return os.path.getmtime(meta_path(upload_id))
+
+def purge_expired_uploads(now=None):
+    """删除超过 CHUNKED_UPLOAD_EXPIRY 秒（默认 24 小时）没有收到分片的会话，返回删除的数量"""
+    root = sessions_root()
+    if not os.path.isdir(root):
+        return 0
+    expiry = current_app.config.get('CHUNKED_UPLOAD_EXPIRY', 24 * 3600)
+    deadline = (now or time.time()) - expiry
+    purged = 0
+    for upload_id in os.listdir(root):
+        try:
+            if _last_activity(upload_id) >= deadline:
+                continue
+            with _session_lock(upload_id):
+                # 等锁期间可能收到了新分片或已被其他请求删除
+                if _last_activity(upload_id) >= deadline:
+                    continue
+                _remove_session(upload_id)
+        except (UploadError, OSError):
+            continue
+        with _registry_lock:
+            _session_locks.pop(upload_id, None)
+        purged += 1
+    return purged
+
+def request_offset():
+    """读取客户端声明的分片起始偏移"""
+    value = request.headers.get('Upload-Offset', request.args.get('offset'))
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise UploadError('Upload-Offset header is required')
+
+def error_response(error):
+    body = {'error': str(error)}
+    if error.offset is not None:
+        body['offset'] = error.offset
+    return jsonify(body), error.status_code
+
+def session_response(meta):
+    return {
+        'upload_id': meta['upload_id'],
+        'file_name': meta['file_name'],
+        'total_size': meta['total_size'],
+        'offset': meta['offset']
+    }
+
+def status_view(upload_id, target):
+    """查询上传进度的通用视图"""
+    try:
+        meta = load_session(upload_id, target)
+    except UploadError as e:
+        return error_response(e)
+    response = jsonify({'data': session_response(meta)})
+    response.headers['Upload-Offset'] = str(meta['offset'])
+    return response, 200
+
+def append_view(upload_id, target):
+    """提交分片的通用视图"""
+    try:
+        offset = append_chunk(upload_id, target, request_offset(), request.stream)
+    except UploadError as e:
+        return error_response(e)
+    response = jsonify({'data': {'upload_id': upload_id, 'offset': offset}})
+    response.headers['Upload-Offset'] = str(offset)
+    return response, 200
+
+def discard_view(upload_id, target):
+    """取消上传的通用视图"""
+    try:
+        load_session(upload_id, target)
+    except UploadError as e:
+        return error_response(e)
+    discard_upload(upload_id)
+    return jsonify({'message': 'Upload discarded'}), 200
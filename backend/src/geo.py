@@ -0,0 +1,99 @@
+"""地理位置索引工具
+
+坐标按 geohash 的方式（经纬度二分、比特交织）编码为 52 位整数格网码存入普通 B 树索引：
+同一格网的所有子格网在整数上连续，查询时把目标区域覆盖为少量格网，每个格网对应一个整数区间，
+以 BETWEEN 走索引筛出候选行，再按精确的经纬度范围或球面距离过滤。
+整数区间不受字符串排序规则影响，PostgreSQL、MySQL 与 SQLite 行为一致。
+"""
+import math
+
+CELL_BITS = 26  # 每个坐标轴的比特数，最细格网约 0.6m
+EARTH_RADIUS = 6371008.8  # 米
+
+def _axis_index(value, low, high, bits):
+    index = int((value - low) / (high - low) * (1 << bits))
+    return min(max(index, 0), (1 << bits) - 1)
+
+def _interleave(x, y, bits):
+    """经度比特在前、纬度比特在后交织，与 geohash 的比特顺序一致"""
+    code = 0
+    for bit in range(bits - 1, -1, -1):
+        code = (code << 2) | (((x >> bit) & 1) << 1) | ((y >> bit) & 1)
+    return code
+
+def encode_cell(longitude, latitude):
+    """返回坐标所在的最细格网码；坐标缺失时返回 None"""
+    if longitude is None or latitude is None:
+        return None
+    return _interleave(_axis_index(longitude, -180.0, 180.0, CELL_BITS),
+                       _axis_index(latitude, -90.0, 90.0, CELL_BITS), CELL_BITS)
+
+def cell_xy(longitude, latitude, bits):
+    """返回坐标在每轴 bits 位的格网中的 (经度序号, 纬度序号)；坐标缺失时返回 None"""
+    if longitude is None or latitude is None:
+        return None
+    return (_axis_index(longitude, -180.0, 180.0, bits),
+            _axis_index(latitude, -90.0, 90.0, bits))
+
+def cover_ranges(min_lon, min_lat, max_lon, max_lat, max_cells=16):
+    """用不超过 max_cells 个同级格网覆盖矩形区域，返回合并后的格网码区间 [(起, 止), ...]（闭区间）
+
+    选取能满足格网数限制的最细一级，格网越细，区间内混入的区域外候选行越少；
+    跨越本初子午线或赤道的矩形在第 1 级仍占多个格网，此时退到第 0 级（全球一个格网）。
+    """
+    for bits in range(CELL_BITS, -1, -1):
+        x0 = _axis_index(min_lon, -180.0, 180.0, bits)
+        x1 = _axis_index(max_lon, -180.0, 180.0, bits)
+        y0 = _axis_index(min_lat, -90.0, 90.0, bits)
+        y1 = _axis_index(max_lat, -90.0, 90.0, bits)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_cells:
+            break
+    shift = 2 * (CELL_BITS - bits)
+    cells = sorted(_interleave(x, y, bits) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+
+    ranges = []
+    for cell in cells:
+        start, end = cell << shift, ((cell + 1) << shift) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return [tuple(r) for r in ranges]
+
+def haversine(lon1, lat1, lon2, lat2):
+    """两点间的球面距离（米）"""
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+def circle_bboxes(longitude, latitude, radius):
+    """以 (经度, 纬度) 为圆心、radius 米为半径的圆的外接矩形列表 [(min_lon, min_lat, max_lon, max_lat), ...]
+
+    圆包含极点时经度取全范围；跨越 ±180° 经线时拆为两个矩形。
+    """
+    angle = radius / EARTH_RADIUS
+    lat_delta = math.degrees(angle)
+    min_lat, max_lat = latitude - lat_delta, latitude + lat_delta
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return [(-180.0, max(-90.0, min_lat), 180.0, min(90.0, max_lat))]
+    # 圆上经度跨度最大的点不在圆心所在纬线上，按球面公式计算，近似为 lat_delta / cos(纬度) 会漏掉高纬度的边缘
+    lon_delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    min_lon, max_lon = longitude - lon_delta, longitude + lon_delta
+    if min_lon < -180.0:
+        return [(min_lon + 360.0, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)]
+    if max_lon > 180.0:
+        return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon - 360.0, max_lat)]
+    return [(min_lon, min_lat, max_lon, max_lat)]
+
+def parse_coordinate(value, name, low, high):
+    """校验经度或纬度，缺失时返回 None，非法时抛出 ValueError"""
+    if value is None or value == '':
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return value
@@ -0,0 +1,63 @@
+"""媒体文件回放与下载
+
+录音、视频和证据文件以内容寻址方式存放（见 blob_store.py），内容永不改变，以 SHA-256 作为强 ETag：
+- 支持 Range 请求（206），拖动播放进度只读取所需的字节区间
+- 支持 If-None-Match / If-Modified-Since 条件请求（304）
+- 文件内容不经 Python 缓冲：默认交给 WSGI 服务器的 file_wrapper（gunicorn 下为 sendfile）；
+  配置 USE_X_SENDFILE 时由 Apache/lighttpd 发送；配置 MEDIA_ACCEL_REDIRECT_PREFIX 时
+  以 X-Accel-Redirect 交给 nginx 的 internal location（该 location 以 UPLOAD_FOLDER 为根）发送
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import current_app, jsonify, request, send_file
+from werkzeug.http import http_date
+from werkzeug.wrappers import Response
+from werkzeug.utils import secure_filename
+
+def _resolve(file_path):
+    """返回 UPLOAD_FOLDER 内的真实路径及其相对路径，越界或文件不存在时返回 (None, None)"""
+    root = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(file_path)
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None, None
+    return path, os.path.relpath(path, root)
+
+def send_media(file_path, file_name, mime_type=None, content_hash=None, last_modified=None):
+    """发送媒体文件内容；?download=1 时作为附件下载，否则内联播放"""
+    path, relative_path = _resolve(file_path)
+    if path is None:
+        return jsonify({'error': 'Media content not found'}), 404
+
+    mime_type = mime_type or mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    as_attachment = request.args.get('download') in ('1', 'true')
+    max_age = current_app.config.get('MEDIA_CACHE_MAX_AGE', 3600)
+    prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+
+    if prefix:
+        # nginx 负责 Range 与发送文件，这里只处理条件请求和响应头
+        response = Response(mimetype=mime_type)
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative_path.replace(os.sep, '/')
+        response.headers['Content-Disposition'] = (
+            f"{'attachment' if as_attachment else 'inline'}; "
+            f"filename=\"{secure_filename(file_name) or 'media'}\"; filename*=UTF-8''{quote(file_name, safe='')}"
+        )
+        if content_hash:
+            response.set_etag(content_hash)
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+        response.make_conditional(request)
+        if response.status_code == 304:
+            del response.headers['X-Accel-Redirect']
+        return response
+
+    response = send_file(
+        path, mimetype=mime_type, as_attachment=as_attachment, download_name=file_name,
+        conditional=True, etag=content_hash or True, last_modified=last_modified, max_age=max_age
+    )
+    # 录音和证据不允许共享缓存（代理、CDN）保存
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,210 @@
+"""媒体文件防篡改校验
+
+内容存储中的文件在写入时已流式计算 SHA-256（见 blob_store.py、chunked_upload.py）。每个新内容入库时，
+在同一事务内向 media_integrity_log 追加一条哈希链记录：
+    entry_hash = SHA-256(seq | prev_hash | sha256 | size | created_at)
+任何一条记录被修改、删除或插入都会使其后的链断开，链头哈希可定期抄送到外部系统留存。
+
+后台巡检（scrub）逐个重新计算文件哈希，与内容地址比对：按块内存映射读取，读完的页立即通知内核丢弃，
+并按 MEDIA_SCRUB_BYTES_PER_SEC 限制读取速率，巡检 TB 级录音时不挤占接口的磁盘带宽和页缓存。
+"""
+import hashlib
+import mmap
+import os
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, select, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .blob_store import MediaBlob, blob_path
+from . import db
+
+GENESIS_HASH = '0' * 64
+APPEND_ATTEMPTS = 10
+VERIFY_BATCH_SIZE = 1000
+
+class IntegrityLogEntry(db.Model):
+    """内容存储的哈希链记录（只追加）"""
+    __tablename__ = 'media_integrity_log'
+    __table_args__ = (
+        db.Index('ix_media_integrity_log_sha256', 'sha256'),
+    )
+
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    prev_hash = db.Column(db.String(64), nullable=False)
+    entry_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'sha256': self.sha256,
+            'size': self.size,
+            'prev_hash': self.prev_hash,
+            'entry_hash': self.entry_hash,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+log_table = IntegrityLogEntry.__table__
+
+def chain_hash(seq, prev_hash, sha256, size, created_at):
+    raw = f'{seq}|{prev_hash}|{sha256}|{size}|{created_at.isoformat()}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def append_entry(connection, sha256, size):
+    """在调用方事务内追加一条链记录；并发追加时序号冲突，重读链头后重试"""
+    for _ in range(APPEND_ATTEMPTS):
+        head = connection.execute(
+            select(log_table.c.seq, log_table.c.entry_hash)
+            .order_by(log_table.c.seq.desc()).limit(1).with_for_update()
+        ).first()
+        seq = head.seq + 1 if head else 1
+        prev_hash = head.entry_hash if head else GENESIS_HASH
+        # 截到秒，MySQL 的 DATETIME 不保存微秒，否则校验时无法复算
+        created_at = datetime.utcnow().replace(microsecond=0)
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(log_table).values(
+                    seq=seq, sha256=sha256, size=size, prev_hash=prev_hash, created_at=created_at,
+                    entry_hash=chain_hash(seq, prev_hash, sha256, size, created_at)
+                ))
+            return seq
+        except IntegrityError:
+            continue
+    raise RuntimeError('Failed to append integrity log entry')
+
+@event.listens_for(Session, 'after_flush')
+def _log_new_blobs(session, flush_context):
+    """新内容登记到 media_blobs 时追加链记录"""
+    blobs = [obj for obj in session.new if isinstance(obj, MediaBlob)]
+    if blobs:
+        connection = session.connection()
+        for blob in sorted(blobs, key=lambda blob: blob.sha256):
+            append_entry(connection, blob.sha256, blob.size)
+
+def chain_head():
+    entry = IntegrityLogEntry.query.order_by(IntegrityLogEntry.seq.desc()).first()
+    return entry.to_dict() if entry else None
+
+def verify_chain():
+    """从头复算整条链，返回 {'valid', 'entries', 'head', 'broken_at', 'reason'}"""
+    prev_hash, expected_seq, count = GENESIS_HASH, 1, 0
+    while True:
+        rows = db.session.execute(
+            select(log_table).where(log_table.c.seq >= expected_seq)
+            .order_by(log_table.c.seq).limit(VERIFY_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return {'valid': True, 'entries': count, 'head': prev_hash, 'broken_at': None, 'reason': None}
+        for row in rows:
+            reason = None
+            if row.seq != expected_seq:
+                reason = f'Missing entries before seq {row.seq}'
+            elif row.prev_hash != prev_hash:
+                reason = 'prev_hash does not match the previous entry'
+            elif row.entry_hash != chain_hash(row.seq, row.prev_hash, row.sha256, row.size, row.created_at):
+                reason = 'entry_hash does not match the entry content'
+            if reason:
+                return {'valid': False, 'entries': count, 'head': prev_hash, 'broken_at': row.seq, 'reason': reason}
+            prev_hash, expected_seq, count = row.entry_hash, row.seq + 1, count + 1
+
+class IoBudget:
+    """按字节数限速：累计读取量超出 rate * 已用时间时休眠"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.started = time.monotonic()
+        self.consumed = 0
+
+    def consume(self, amount):
+        self.consumed += amount
+        if not self.rate:
+            return
+        ahead = self.consumed / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+def hash_file(path, budget, chunk_size):
+    """按块内存映射计算文件 SHA-256，每块读完后丢弃对应的页缓存"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return hasher.hexdigest(), 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, chunk_size):
+                    block = view[offset:offset + chunk_size]
+                    hasher.update(block)
+                    block.release()
+                    if hasattr(os, 'posix_fadvise'):
+                        os.posix_fadvise(f.fileno(), offset, chunk_size, os.POSIX_FADV_DONTNEED)
+                    budget.consume(min(chunk_size, size - offset))
+            finally:
+                view.release()
+    return hasher.hexdigest(), size
+
+def scrub(max_bytes=None, bytes_per_second=None):
+    """巡检内容存储：先校验从未校验过的内容，再按上次校验时间由远及近复查
+
+    每次最多读取 max_bytes 字节，返回 {'checked', 'bytes', 'ok', 'mismatch', 'missing'}。
+    """
+    config = current_app.config
+    if bytes_per_second is None:
+        bytes_per_second = config.get('MEDIA_SCRUB_BYTES_PER_SEC', 32 * 1024 * 1024)
+    if max_bytes is None:
+        max_bytes = config.get('MEDIA_SCRUB_MAX_BYTES', 100 * 1024 ** 3)
+    chunk_size = config.get('MEDIA_SCRUB_CHUNK_SIZE', 8 * 1024 * 1024)
+    cutoff = datetime.utcnow() - timedelta(days=config.get('MEDIA_SCRUB_INTERVAL_DAYS', 30))
+
+    budget = IoBudget(bytes_per_second)
+    summary = {'checked': 0, 'bytes': 0, 'ok': 0, 'mismatch': 0, 'missing': 0}
+    seen = set()
+    for condition in (MediaBlob.verified_at.is_(None), MediaBlob.verified_at < cutoff):
+        while summary['bytes'] < max_bytes:
+            candidates = [blob for blob in MediaBlob.query.filter(condition, MediaBlob.ref_count > 0)
+                          .order_by(MediaBlob.verified_at).limit(100) if blob.sha256 not in seen]
+            if not candidates:
+                break
+            for blob in candidates:
+                seen.add(blob.sha256)
+                status = verify_blob(blob, budget, chunk_size, summary)
+                summary[status] += 1
+                summary['checked'] += 1
+                if summary['bytes'] >= max_bytes:
+                    break
+    return summary
+
+def verify_blob(blob, budget, chunk_size, summary):
+    path = blob_path(blob.sha256)
+    if not os.path.exists(path):
+        status = 'missing'
+    else:
+        digest, size = hash_file(path, budget, chunk_size)
+        summary['bytes'] += size
+        status = 'ok' if digest == blob.sha256 and size == blob.size else 'mismatch'
+    if status != 'ok':
+        current_app.logger.error(f'Media integrity check failed for {blob.sha256}: {status}')
+    # 保持 updated_at 不变，prune_blobs 以其判断引用计数归零后的宽限期
+    db.session.execute(update(MediaBlob).where(MediaBlob.sha256 == blob.sha256).values(
+        verified_at=datetime.utcnow(), integrity_status=status, updated_at=MediaBlob.updated_at))
+    db.session.commit()
+    return status
+
+def integrity_report(content_hash):
+    """单个文件的校验信息：链记录与最近一次巡检结果"""
+    blob = db.session.get(MediaBlob, content_hash) if content_hash else None
+    entry = IntegrityLogEntry.query.filter_by(sha256=content_hash).order_by(
+        IntegrityLogEntry.seq.desc()).first() if content_hash else None
+    return {
+        'content_hash': content_hash,
+        'log_entry': entry.to_dict() if entry else None,
+        'integrity_status': blob.integrity_status if blob else None,
+        'verified_at': blob.verified_at.isoformat() if blob and blob.verified_at else None
+    }
@@ -0,0 +1,35 @@
+import json
+import subprocess
+
+PROBE_TIMEOUT = 30
+
+def probe_media_file(file_path, timeout=PROBE_TIMEOUT):
+    """调用 ffprobe 读取音视频元数据
+
+    返回 {'duration', 'codec', 'sample_rate', 'width', 'height'}，取不到的字段为 None。
+    ffprobe 执行失败或超时时抛出 RuntimeError。
+    """
+    cmd = ['ffprobe', '-v', 'error',
+           '-show_entries', 'format=duration:stream=codec_type,codec_name,sample_rate,width,height',
+           '-of', 'json', file_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f'ffprobe failed: {str(e)}')
+    if result.returncode != 0:
+        raise RuntimeError(f'ffprobe failed: {result.stderr.strip()}')
+
+    data = json.loads(result.stdout or '{}')
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    primary = video or audio or {}
+
+    duration = data.get('format', {}).get('duration')
+    return {
+        'duration': int(float(duration)) if duration else None,
+        'codec': primary.get('codec_name'),
+        'sample_rate': int(audio['sample_rate']) if audio and audio.get('sample_rate') else None,
+        'width': video.get('width') if video else None,
+        'height': video.get('height') if video else None
+    }
@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_, func, select
+from . import db
+
+def encode_cursor(sort_value, item_id):
+    """将 (排序键, id) 编码为不透明的游标字符串"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, item_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """解析游标字符串，返回 (排序键, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(item_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def estimate_count(query):
+    """估算查询结果总数
+
+    PostgreSQL 下读取执行计划中的行数估计，不扫描数据；其他数据库退化为精确计数。
+    """
+    statement = query.enable_eagerloads(False).order_by(None).statement
+    bind = db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        compiled = statement.compile(dialect=bind.dialect)
+        plan = db.session.connection().exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return exact_count(query)
+
+def exact_count(query):
+    """精确计数"""
+    subquery = query.enable_eagerloads(False).order_by(None).statement.subquery()
+    return db.session.execute(select(func.count()).select_from(subquery)).scalar()
+
+def nulls_first():
+    """降序排列时排序键为 NULL 的行是否排在最前：PostgreSQL 是，SQLite、MySQL 排在最后
+
+    沿用各数据库的默认顺序，排序键上的普通索引可直接反向扫描，无需额外的表达式索引。
+    """
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+def keyset_order(sort_column, id_column):
+    """游标分页的排序：(sort_column, id) 降序，NULL 的位置显式写出，与 keyset_conditions 一致"""
+    sort_order = sort_column.desc().nulls_first() if nulls_first() else sort_column.desc()
+    return sort_order, id_column.desc()
+
+def keyset_conditions(sort_column, id_column, sort_value, last_id):
+    """位于游标 (sort_value, last_id) 之后的行，按顺序分为若干段，每段单独查询
+
+    排序键可为 NULL：NULL 行与非 NULL 行分段查询，每段都是排序索引上的范围扫描；
+    合成一个 OR 条件时数据库只能从头扫描索引并逐行过滤，翻页越深越慢。
+    """
+    if sort_value is None:
+        conditions = [and_(sort_column.is_(None), id_column < last_id)]
+        # NULL 排在前面时，之后还有全部非 NULL 的行
+        return conditions + [sort_column.isnot(None)] if nulls_first() else conditions
+    conditions = [or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id))]
+    # NULL 排在后面时，非 NULL 的行翻完后接着是 NULL 的行（排序键不允许为 NULL 时省去这一段）
+    if nulls_first() or not sort_column.expression.nullable:
+        return conditions
+    return conditions + [sort_column.is_(None)]
+
+def keyset_paginate(query, sort_column, id_column, per_page, cursor=None):
+    """按 (sort_column, id) 降序做游标分页
+
+    只取 per_page + 1 行来判断是否还有下一页，不使用 OFFSET，也不统计总数。
+    """
+    order = keyset_order(sort_column, id_column)
+    limit = per_page + 1
+    if not cursor:
+        rows = query.order_by(*order).limit(limit).all()
+    else:
+        rows = []
+        for condition in keyset_conditions(sort_column, id_column, *decode_cursor(cursor)):
+            rows += query.filter(condition).order_by(*order).limit(limit - len(rows)).all()
+            if len(rows) >= limit:
+                break
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return items, next_cursor, has_more
+
+def paginate_query(query, sort_column, id_column, serialize=None):
+    """根据请求参数分页并组装列表响应
+
+    - 默认沿用 page/per_page 页码分页（兼容现有前端）
+    - 传入 cursor 参数（首页可为空字符串）时使用游标分页；
+      total=exact 返回精确总数，total=estimate 返回估算总数，不传则不统计
+    """
+    serialize = serialize or (lambda item: item.to_dict())
+    per_page = request.args.get('per_page', 10, type=int)
+
+    if 'cursor' in request.args:
+        per_page = max(1, min(per_page, 100))
+        items, next_cursor, has_more = keyset_paginate(
+            query, sort_column, id_column, per_page, request.args.get('cursor')
+        )
+        result = {
+            'items': [serialize(item) for item in items],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+        total_mode = request.args.get('total')
+        if total_mode == 'exact':
+            result['total'] = exact_count(query)
+        elif total_mode == 'estimate':
+            result['total'] = estimate_count(query)
+            result['total_estimated'] = True
+        return result
+
+    page = request.args.get('page', 1, type=int)
+    pagination = query.order_by(*keyset_order(sort_column, id_column)).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    return {
+        'items': [serialize(item) for item in pagination.items],
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'current_page': page
+    }
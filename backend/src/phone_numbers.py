@@ -0,0 +1,25 @@
+"""电话号码处理"""
+import re
+
+_NON_DIGITS = re.compile(r'\D')
+
+def normalize_phone(phone):
+    """把号码规范化为纯数字（去掉空格、横线及 +86/0086 国家码），位数过少的号码返回 None"""
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub('', str(phone))
+    national = None
+    if digits.startswith('0086'):
+        national = digits[4:]
+    elif digits.startswith('86') and 11 <= len(digits) <= 13:
+        # 国内号码不会以 86 开头且长达 11~13 位（手机号以 1 开头，带区号的座机以 0 开头）
+        national = digits[2:]
+    if national is not None:
+        # 去掉国家码后，1 开头的 11 位是手机号，其余是省略了长途字冠 0 的区号加本地号码
+        if (national.startswith('1') and len(national) == 11) or national.startswith('0'):
+            digits = national
+        else:
+            digits = '0' + national
+    if len(digits) < 7:
+        return None
+    return digits
@@ -0,0 +1,164 @@
+"""电话号码归属地查询
+
+归属地数据由 `flask build-phone-region-table` 从 CSV（号段或区号, 省, 市, 运营商, 区号）编译为二进制文件，
+运行时以 mmap 只读映射，多个 worker 进程共享同一份页缓存，无需网络调用或加载到 Python 对象。
+
+号段（手机号前 7 位）和长途区号（含开头的 0）互不为前缀，每个前缀换算为 16 位十进制键空间上的一个闭区间，
+按起点排序存储；查询时把号码按同样方式右补零得到键，在起点数组上二分查找即可，批量查询用 numpy 向量化。
+
+文件格式（小端）：
+    头部    magic(4s) version(H) reserved(H) count(I) region_count(I) strings_offset(I)
+    starts  count 个 uint64，区间起点，升序
+    ends    count 个 uint64，区间终点
+    regions count 个 uint16，区域编号
+    字符串表 region_count 个 (长度 uint16 + UTF-8 的 "省|市|运营商|区号")
+"""
+import csv
+import mmap
+import os
+import struct
+import threading
+import numpy as np
+from flask import current_app
+
+MAGIC = b'PRGN'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+KEY_DIGITS = 16
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+def _key(digits):
+    return int(digits[:KEY_DIGITS].ljust(KEY_DIGITS, '0'))
+
+def _range(prefix):
+    span = 10 ** (KEY_DIGITS - len(prefix))
+    start = int(prefix) * span
+    return start, start + span - 1
+
+def lookup_digits(phone):
+    """返回用于查表的号码数字：11 位手机号或以 0 开头的固话；无法判断归属地的号码返回 None"""
+    if not phone:
+        return None
+    if len(phone) == 11 and phone[0] == '1':
+        return phone
+    if phone[0] == '0' and len(phone) >= 10:
+        return phone
+    return None
+
+class PhoneRegionTable:
+    """mmap 映射的号段区间表"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, region_count, strings_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a phone region table')
+
+        offset = HEADER.size
+        self.starts = np.frombuffer(self._mmap, dtype='<u8', count=count, offset=offset)
+        offset += count * 8
+        self.ends = np.frombuffer(self._mmap, dtype='<u8', count=count, offset=offset)
+        offset += count * 8
+        self.region_ids = np.frombuffer(self._mmap, dtype='<u2', count=count, offset=offset)
+
+        # 区域字符串表很小（省市运营商组合数百至数千条），解析为元组
+        self.regions = []
+        offset = strings_offset
+        for _ in range(region_count):
+            (length,) = struct.unpack_from('<H', self._mmap, offset)
+            raw = bytes(self._mmap[offset + 2:offset + 2 + length]).decode('utf-8')
+            self.regions.append(tuple(raw.split('|')))
+            offset += 2 + length
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup_keys(self, keys):
+        """keys 为 uint64 数组，返回每个键对应的区域编号数组，未命中为 -1"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        if not len(self.starts):
+            return np.full(len(keys), -1, dtype=np.int64)
+        index = np.searchsorted(self.starts, keys, side='right').astype(np.int64) - 1
+        safe = np.maximum(index, 0)
+        found = (index >= 0) & (keys <= self.ends[safe])
+        return np.where(found, self.region_ids[safe].astype(np.int64), -1)
+
+    def region(self, region_id):
+        province, city, carrier, area_code = self.regions[region_id]
+        return {'province': province or None, 'city': city or None,
+                'carrier': carrier or None, 'area_code': area_code or None}
+
+    def lookup_many(self, phones):
+        """phones 为规范化后的号码列表，返回对应的归属地字典列表，无法识别的为 None"""
+        digits = [lookup_digits(phone) for phone in phones]
+        keys = [_key(d) if d else 0 for d in digits]
+        region_ids = self.lookup_keys(keys) if keys else []
+        return [self.region(int(region_id)) if d and region_id >= 0 else None
+                for d, region_id in zip(digits, region_ids)]
+
+    def lookup(self, phone):
+        return self.lookup_many([phone])[0]
+
+def get_table():
+    """返回当前配置的归属地表；未配置或文件不存在时返回 None，文件被替换后自动重新映射"""
+    path = current_app.config.get('PHONE_REGION_TABLE')
+    if not path or not os.path.exists(path):
+        return None
+    mtime = os.stat(path).st_mtime
+    table = _tables.get(path)
+    if table is None or table.mtime != mtime:
+        with _tables_lock:
+            table = _tables.get(path)
+            if table is None or table.mtime != mtime:
+                table = _tables[path] = PhoneRegionTable(path)
+    return table
+
+def build_table(rows, path):
+    """rows 为 (号段或区号, 省, 市, 运营商, 区号) 的可迭代对象，编译为二进制表，原子替换 path
+
+    返回写入的区间数；前缀相互包含时抛出 ValueError。
+    """
+    regions = {}
+    ranges = []
+    for prefix, province, city, carrier, area_code in rows:
+        prefix = prefix.strip()
+        if not prefix.isdigit() or len(prefix) > KEY_DIGITS:
+            raise ValueError(f'Invalid prefix: {prefix}')
+        name = '|'.join(value.strip().replace('|', ' ') for value in (province, city, carrier, area_code))
+        region_id = regions.setdefault(name, len(regions))
+        ranges.append(_range(prefix) + (region_id,))
+    if len(regions) > 0xFFFF:
+        raise ValueError('Too many distinct regions')
+
+    ranges.sort()
+    for previous, current in zip(ranges, ranges[1:]):
+        if current[0] <= previous[1]:
+            raise ValueError(f'Overlapping prefixes at key {current[0]}')
+
+    strings = b''.join(struct.pack('<H', len(raw)) + raw
+                       for raw in (name.encode('utf-8') for name in regions))
+    count = len(ranges)
+    strings_offset = HEADER.size + count * 18
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, count, len(regions), strings_offset))
+        f.write(np.array([r[0] for r in ranges], dtype='<u8').tobytes())
+        f.write(np.array([r[1] for r in ranges], dtype='<u8').tobytes())
+        f.write(np.array([r[2] for r in ranges], dtype='<u2').tobytes())
+        f.write(strings)
+    os.replace(tmp_path, path)
+    return count
+
+def read_source(path):
+    """读取 CSV 源数据，跳过空行、注释行和表头"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#') or not row[0].strip().isdigit():
+                continue
+            row = (row + [''] * 5)[:5]
+            yield tuple(row)
@@ -0,0 +1,247 @@
+"""列表接口查询计划检查
+
+为每个列表接口构造与路由一致的查询形状（单个过滤条件 + 默认排序 + 游标条件的各段），
+在可选的种子数据上执行 EXPLAIN，若任一查询退化为全表扫描则判定失败。
+"""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import or_, text
+from . import db
+from .pagination import keyset_order, keyset_conditions
+from .alarm_unified_access.models import AlarmRecord
+from .alarm_unified_access.alarm_types import resolve_alarm_type
+from .alarm_dispatch_down.models import DispatchUnit, DispatchUnitClosure, AlarmDispatch, DispatchLog
+from .alarm_dispatch_down.unit_tree import subtree_ids_query
+from .alarm_dispatching.models import PoliceOfficer, DispatchTask, DispatchGroup
+from .alarm_handling.models import HandlingRecord, HandlingLog
+from .alarm_archiving.models import ArchivedAlarm, ArchiveLog
+
+SAMPLE_TIME = datetime(2025, 1, 1)
+
+def list_shapes(model, sort_column, filters):
+    """生成某个列表接口的查询形状：无过滤、逐个过滤条件、时间范围、游标翻页"""
+    order = keyset_order(sort_column, model.id)
+    shapes = [('default', model.query.order_by(*order).limit(10))]
+    for name, condition in filters:
+        shapes.append((name, model.query.filter(condition).order_by(*order).limit(10)))
+    shapes.append(('date_range', model.query.filter(
+        sort_column >= SAMPLE_TIME, sort_column <= SAMPLE_TIME + timedelta(days=1)
+    ).order_by(*order).limit(10)))
+    # 非 NULL 与 NULL 游标各段的查询（排序键不允许为 NULL 时不会出现 NULL 游标）
+    cursors = [('cursor', SAMPLE_TIME)]
+    if sort_column.expression.nullable:
+        cursors.append(('cursor_null', None))
+    for name, sort_value in cursors:
+        for index, condition in enumerate(keyset_conditions(sort_column, model.id, sort_value, 1000)):
+            shapes.append((name if index == 0 else f'{name}_{index + 1}',
+                           model.query.filter(condition).order_by(*order).limit(11)))
+    return shapes
+
+def build_query_shapes():
+    """返回 [(接口名, 形状名, 查询)]"""
+    endpoints = [
+        ('list_alarm_records', AlarmRecord, AlarmRecord.alarm_time, [
+            ('status', AlarmRecord.status == '待处理'),
+            # 按大类过滤时展开为该类及全部子类的 id 列表
+            ('alarm_type', AlarmRecord.alarm_type_id.in_([1, 2, 3])),
+            ('emergency_level', AlarmRecord.emergency_level == '紧急'),
+            ('reporter_phone', AlarmRecord.reporter_phone_normalized == '13800000001'),
+        ]),
+        ('list_dispatches', AlarmDispatch, AlarmDispatch.dispatch_time, [
+            ('alarm_record_id', AlarmDispatch.alarm_record_id == 1),
+            ('unit_id', AlarmDispatch.unit_id == 1),
+            ('unit_subtree', AlarmDispatch.unit_id.in_(subtree_ids_query(1))),
+            ('status', AlarmDispatch.status == 'pending'),
+        ]),
+        ('list_dispatch_tasks', DispatchTask, DispatchTask.assigned_time, [
+            ('alarm_record_id', DispatchTask.alarm_record_id == 1),
+            ('officer_id', DispatchTask.officer_id == 1),
+            ('status', DispatchTask.status == 'pending'),
+            ('priority', DispatchTask.priority == 'urgent'),
+        ]),
+        ('list_dispatch_groups', DispatchGroup, DispatchGroup.created_at, [
+            ('alarm_record_id', DispatchGroup.alarm_record_id == 1),
+            ('status', DispatchGroup.status == 'pending'),
+        ]),
+        ('list_handling_records', HandlingRecord, HandlingRecord.created_at, [
+            ('alarm_record_id', HandlingRecord.alarm_record_id == 1),
+            ('status', HandlingRecord.status == 'pending'),
+        ]),
+        ('list_archives', ArchivedAlarm, ArchivedAlarm.created_at, [
+            ('alarm_record_id', ArchivedAlarm.alarm_record_id == 1),
+            ('archive_type', ArchivedAlarm.archive_type == '一般'),
+            ('archive_status', ArchivedAlarm.archive_status == 'pending'),
+        ]),
+    ]
+    shapes = []
+    for endpoint, model, sort_column, filters in endpoints:
+        for name, query in list_shapes(model, sort_column, filters):
+            shapes.append((endpoint, name, query))
+
+    shapes.append(('list_nearby_alarms', 'event_geocell', AlarmRecord.query.filter(or_(
+        AlarmRecord.event_geocell.between(1 << 40, (1 << 41) - 1),
+        AlarmRecord.event_geocell.between(3 << 40, (1 << 42) - 1)
+    ))))
+    shapes.append(('list_officers', 'unit_id', PoliceOfficer.query.filter(
+        PoliceOfficer.unit_id == 1).order_by(PoliceOfficer.name).limit(10)))
+    shapes.append(('list_officers', 'unit_subtree', PoliceOfficer.query.filter(
+        PoliceOfficer.unit_id.in_(subtree_ids_query(1))).order_by(PoliceOfficer.name).limit(10)))
+    shapes.append(('list_officers', 'status', PoliceOfficer.query.filter(
+        PoliceOfficer.status == 'available').order_by(PoliceOfficer.name).limit(10)))
+    shapes.append(('get_dispatch_logs', 'dispatch_id', DispatchLog.query.filter_by(
+        dispatch_id=1).order_by(DispatchLog.created_at.desc())))
+    shapes.append(('get_handling_logs', 'handling_record_id', HandlingLog.query.filter_by(
+        handling_record_id=1).order_by(HandlingLog.created_at.desc())))
+    shapes.append(('get_archive_logs', 'archived_alarm_id', ArchiveLog.query.filter_by(
+        archived_alarm_id=1).order_by(ArchiveLog.created_at.desc())))
+    return shapes
+
+def seed_dataset(rows):
+    """写入（未提交的）种子数据，使优化器按真实数据分布选择执行计划"""
+    now = datetime.utcnow()
+    statuses = ['待处理', '处理中', '已派单']
+    levels = ['一般', '紧急', '非常紧急']
+    types = ['刑事案件/盗窃/入室盗窃', '治安案件/殴打他人', '交通事故', '火灾']
+    rand = random.Random(110)
+
+    def moment(i):
+        return now - timedelta(seconds=i * 37 + rand.randint(0, 30))
+
+    unit = {'name': '种子单位', 'code': f'SEED-{now.timestamp():.0f}', 'level': '支队'}
+    db.session.bulk_insert_mappings(DispatchUnit, [unit], return_defaults=True)
+    # 批量写入不触发闭包表维护，手工写入自身行
+    db.session.bulk_insert_mappings(DispatchUnitClosure, [
+        {'ancestor_id': unit['id'], 'descendant_id': unit['id'], 'depth': 0}])
+    officers = [{
+        'name': f'警员{i}', 'badge_number': f'SEED{now.timestamp():.0f}{i:04d}',
+        'unit_id': unit['id'], 'status': rand.choice(['available', 'on_duty'])
+    } for i in range(50)]
+    db.session.bulk_insert_mappings(PoliceOfficer, officers, return_defaults=True)
+
+    type_ids = {}
+    alarms = []
+    for i in range(rows):
+        alarm_type = rand.choice(types)
+        alarms.append({
+            'alarm_time': moment(i), 'event_time': moment(i),
+            'event_location_address': f'测试路{i}号', 'brief_summary': '种子数据',
+            'alarm_type': alarm_type, 'alarm_type_id': resolve_alarm_type(alarm_type, type_ids),
+            'reporter_phone_normalized': f'138{rand.randint(0, rows // 3):08d}',
+            'emergency_level': rand.choice(levels), 'status': rand.choice(statuses)
+        })
+    db.session.bulk_insert_mappings(AlarmRecord, alarms, return_defaults=True)
+    alarm_ids = [alarm['id'] for alarm in alarms]
+
+    dispatches = [{
+        'alarm_record_id': alarm_id, 'unit_id': unit['id'], 'dispatch_time': moment(i),
+        'status': rand.choice(['pending', 'sent', 'completed'])
+    } for i, alarm_id in enumerate(alarm_ids)]
+    db.session.bulk_insert_mappings(AlarmDispatch, dispatches, return_defaults=True)
+    db.session.bulk_insert_mappings(DispatchLog, [{
+        'dispatch_id': dispatch['id'], 'action': 'create', 'status': 'pending',
+        'operator': 'seed', 'operator_id': 0, 'created_at': dispatch['dispatch_time']
+    } for dispatch in dispatches])
+
+    db.session.bulk_insert_mappings(DispatchTask, [{
+        'alarm_record_id': alarm_id, 'officer_id': rand.choice(officers)['id'],
+        'assigned_time': moment(i), 'status': rand.choice(['pending', 'accepted', 'completed']),
+        'priority': rand.choice(['low', 'normal', 'high', 'urgent'])
+    } for i, alarm_id in enumerate(alarm_ids)])
+    db.session.bulk_insert_mappings(DispatchGroup, [{
+        'alarm_record_id': alarm_id, 'created_at': moment(i),
+        'status': rand.choice(['pending', 'in_progress', 'completed'])
+    } for i, alarm_id in enumerate(alarm_ids)])
+
+    handlings = [{
+        'alarm_record_id': alarm_id, 'handler_id': rand.choice(officers)['id'],
+        'created_at': moment(i), 'status': rand.choice(['pending', 'in_progress', 'completed'])
+    } for i, alarm_id in enumerate(alarm_ids)]
+    db.session.bulk_insert_mappings(HandlingRecord, handlings, return_defaults=True)
+    db.session.bulk_insert_mappings(HandlingLog, [{
+        'handling_record_id': handling['id'], 'action': 'create', 'status': 'pending',
+        'operator': 'seed', 'operator_id': 0, 'created_at': handling['created_at']
+    } for handling in handlings])
+
+    archives = [{
+        'alarm_record_id': alarm_id, 'archive_number': f'SEED{now.timestamp():.0f}{i:07d}',
+        'archive_type': rand.choice(['一般', '重大']), 'archive_status': 'pending',
+        'created_at': moment(i), 'updated_at': moment(i)
+    } for i, alarm_id in enumerate(alarm_ids)]
+    db.session.bulk_insert_mappings(ArchivedAlarm, archives, return_defaults=True)
+    db.session.bulk_insert_mappings(ArchiveLog, [{
+        'archived_alarm_id': archive['id'], 'action': 'create', 'status': 'pending',
+        'operator': 'seed', 'operator_id': 0, 'created_at': archive['created_at']
+    } for archive in archives])
+    db.session.flush()
+
+def explain_full_scans(query, filtered=True):
+    """执行 EXPLAIN，返回计划中出现的全表扫描描述列表
+
+    带过滤条件的查询必须通过索引条件定位数据；沿排序索引从头扫到尾再逐行过滤同样视为全表扫描。
+    不带过滤条件的查询只要求能沿索引顺序读取（配合 LIMIT 只读少量行）。
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+        return [row[-1] for row in rows
+                if row[-1].startswith('SCAN') and (filtered or 'INDEX' not in row[-1])]
+
+    if dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}').scalar()
+        scans = []
+
+        def walk(node):
+            node_type = node.get('Node Type')
+            if node_type == 'Seq Scan' or (
+                    filtered and node_type in ('Index Scan', 'Index Only Scan')
+                    and 'Index Cond' not in node):
+                scans.append(f"{node_type} on {node.get('Relation Name')}")
+            for child in node.get('Plans', []):
+                walk(child)
+
+        walk(plan[0]['Plan'])
+        return scans
+
+    if dialect.name == 'mysql':
+        result = connection.exec_driver_sql(f'EXPLAIN {sql}')
+        columns = list(result.keys())
+        scans = []
+        for row in result.fetchall():
+            row = dict(zip(columns, row))
+            # 小表上优化器可能主动选择全表扫描，只有连可用索引都没有时才判定失败
+            if filtered:
+                full_scan = row.get('type') in ('ALL', 'index') and not row.get('possible_keys')
+            else:
+                full_scan = row.get('type') == 'ALL'
+            if full_scan:
+                scans.append(f"{row.get('type')} on {row.get('table')}")
+        return scans
+
+    raise RuntimeError(f'Unsupported database dialect: {dialect.name}')
+
+def check_query_plans(seed_rows=0):
+    """检查所有列表接口的查询计划，返回 (检查结果列表, 是否全部通过)
+
+    种子数据与统计信息更新均在事务内完成，检查结束后回滚，不会留下数据。
+    """
+    results = []
+    try:
+        dialect = db.session.connection().dialect.name
+        if seed_rows:
+            seed_dataset(seed_rows)
+        if dialect == 'postgresql':
+            if seed_rows:
+                db.session.execute(text('ANALYZE'))
+            # 禁用顺序扫描后仍出现 Seq Scan，说明没有任何索引能满足该查询
+            db.session.execute(text('SET LOCAL enable_seqscan = off'))
+
+        for endpoint, name, query in build_query_shapes():
+            scans = explain_full_scans(query, filtered=name != 'default')
+            results.append({'endpoint': endpoint, 'shape': name, 'full_scans': scans})
+    finally:
+        db.session.rollback()
+
+    return results, all(not item['full_scans'] for item in results)
@@ -0,0 +1,89 @@
+from datetime import date, datetime
+from flask import request
+from sqlalchemy.orm import load_only
+
+def parse_expand(allowed, default=None):
+    """解析 expand 查询参数，返回需要展开的关联对象名集合
+
+    - 不传 expand：返回 default，default 为 None 时展开全部关联对象（保持原有响应结构）
+    - expand=（空）：不展开任何关联对象
+    - expand=a,b：只展开列出的关联对象
+    """
+    raw = request.args.get('expand')
+    if raw is None:
+        return set(allowed) if default is None else set(default)
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise ValueError(f'Unknown expand fields: {", ".join(sorted(unknown))}')
+    return names
+
+def parse_fields(model):
+    """解析 fields 查询参数，返回需要输出的列名列表；未传时返回 None"""
+    raw = request.args.get('fields')
+    if raw is None:
+        return None
+    names = []
+    for name in raw.split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    unknown = [name for name in names if name not in model.__table__.columns]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return names or ['id']
+
+def parse_projection(model, loaders):
+    """解析 fields/expand 参数，返回 (fields, expand)
+
+    指定了 fields 时，除非 expand 显式列出，否则不再展开关联对象。
+    """
+    fields = parse_fields(model)
+    expand = parse_expand(loaders, default=set() if fields is not None else None)
+    return fields, expand
+
+def apply_loaders(query, loaders, expand):
+    """为需要展开的关联对象附加预加载策略，避免序列化时逐行懒加载
+
+    loaders 的值为返回加载选项的函数：backref 属性要等映射配置完成后才存在，不能在导入时构造。
+    """
+    options = [loaders[name]() for name in loaders if name in expand]
+    if options:
+        query = query.options(*options)
+    return query
+
+def apply_projection(query, model, loaders, fields, expand, required=()):
+    """把列裁剪下推到 SQL（只 SELECT 需要的列），并附加关联对象的预加载策略
+
+    required 为分页等内部逻辑必须读取的列（如排序键），会被加载但不一定输出。
+    """
+    query = apply_loaders(query, loaders, expand)
+    if fields is not None:
+        columns = {model.id.key, *fields, *(column.key for column in required)}
+        query = query.options(load_only(*(getattr(model, name) for name in columns)))
+    return query
+
+def make_serializer(fields, expand=None):
+    """返回列表项的序列化函数：未指定 fields 时沿用模型 to_dict，否则只输出选中的列
+
+    expand 为 None 表示模型没有可展开的关联对象。
+    """
+    if fields is None:
+        if expand is None:
+            return lambda item: item.to_dict()
+        return lambda item: item.to_dict(expand=expand)
+
+    def serialize(item):
+        data = {}
+        for name in fields:
+            value = getattr(item, name)
+            data[name] = value.isoformat() if isinstance(value, (date, datetime)) else value
+        for name in expand or ():
+            related = getattr(item, name)
+            if isinstance(related, list):
+                data[name] = [entry.to_dict() for entry in related]
+            else:
+                data[name] = related.to_dict() if related else None
+        return data
+
+    return serialize
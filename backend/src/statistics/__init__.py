@@ -1,5 +1 @@
-from flask import Blueprint
-
-bp = Blueprint('statistics', __name__)
-
-from . import routes 
\ No newline at end of file
+from .routes import bp
@@ -4,6 +4,9 @@ from .. import db
 class StatisticsRecord(db.Model):
     """统计数据记录"""
     __tablename__ = 'statistics_records'
+    __table_args__ = (
+        db.Index('ix_statistics_records_statistics_type_statistics_date', 'statistics_type', 'statistics_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     statistics_type = db.Column(db.String(50), nullable=False)  # 统计类型：daily, weekly, monthly
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from sqlalchemy import func
 from .models import StatisticsRecord, StatisticsConfig
 from ..alarm_unified_access.models import AlarmRecord
+from ..alarm_unified_access.alarm_types import rollup_counts, subtree_ids
 from ..alarm_dispatch_down.models import AlarmDispatch
 from ..alarm_dispatching.models import DispatchTask
 from ..alarm_handling.models import HandlingRecord
@@ -219,6 +220,34 @@ def get_monthly_statistics():
     
     return jsonify(monthly_data), 200
 
+@bp.route('/alarm_types', methods=['GET'])
+def get_alarm_type_statistics():
+    """按警情类型分类树汇总警情数量，每个节点给出直接归入的数量与含全部子类的合计
+
+    可选参数：start_date、end_date（按报警时间过滤），root（只统计某个大类的子树）。
+    """
+    query = db.session.query(AlarmRecord.alarm_type_id, func.count(AlarmRecord.id))
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        if start_date:
+            query = query.filter(AlarmRecord.alarm_time >= datetime.fromisoformat(start_date))
+        if end_date:
+            query = query.filter(AlarmRecord.alarm_time <= datetime.fromisoformat(end_date))
+        root = request.args.get('root')
+        if root:
+            query = query.filter(AlarmRecord.alarm_type_id.in_(subtree_ids(root)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 警情表上只按 alarm_type_id 分组计数，逐级汇总在分类树上完成
+    counts = dict(query.filter(AlarmRecord.alarm_type_id.isnot(None))
+                  .group_by(AlarmRecord.alarm_type_id).all())
+    return jsonify({
+        'root': root,
+        'types': rollup_counts(counts, root)
+    }), 200
+
 @bp.route('/configs', methods=['GET'])
 def list_statistics_configs():
     """获取统计配置列表"""
@@ -1,8 +1,17 @@
-from celery import Celery
+from celery import Celery, chord
 from flask import current_app
-import requests
 import os
-from .alarm_unified_access.models import Transcription, db
+import time
+from .alarm_unified_access.models import Transcription, TranscriptionSegment, MediaFile, db
+from .media_probe import probe_media_file
+from .asr_client import AsrError, recognize, retry_delay
+from . import transcription_cache
+from .audio_processing import (SAMPLE_RATE, file_sha256, normalized_pcm, load_pcm, plan_speech_regions, group_regions,
+                               write_speech_clip, stitch_segments)
+from .waveform import waveform_path, build_levels, write_waveform
+from .media_integrity import scrub
+
+TRANSCRIBE_MAX_RETRIES = 5
 
 # 创建 Celery 实例
 celery = Celery('alarm_system')
@@ -15,7 +24,18 @@ def init_celery(app):
         accept_content=['json'],
         result_serializer='json',
         timezone='Asia/Shanghai',
-        enable_utc=True
+        enable_utc=True,
+        # 媒体探测、语音转写各走独立队列，由专门的 worker 以固定并发消费，不占用 Web 进程
+        task_routes={
+            'src.tasks.probe_media_metadata': {'queue': 'media'},
+            'src.tasks.compute_waveform': {'queue': 'media'},
+            'src.tasks.scrub_media_integrity': {'queue': 'media'},
+            'src.tasks.transcribe_audio': {'queue': 'transcription'},
+            'src.tasks.transcribe_segment': {'queue': 'transcription'},
+            'src.tasks.finish_segmented_transcription': {'queue': 'transcription'}
+        },
+        # 转写任务耗时长，每个 worker 进程只预取一个，避免任务堆积在个别进程上
+        worker_prefetch_multiplier=1
     )
 
     class ContextTask(celery.Task):
@@ -26,54 +46,263 @@ def init_celery(app):
     celery.Task = ContextTask
     return celery
 
-@celery.task
-def transcribe_audio(file_path, transcription_id):
-    """异步任务：将音频文件转写为文本"""
+def retry_or_fail(task, record, error):
+    """可重试的识别错误按指数退避重试；不可重试或重试用尽时把记录标记为失败"""
+    db.session.rollback()
+    if error.retryable and task.request.retries < task.max_retries:
+        # 记录最近一次失败原因，状态保持 processing
+        record.error_message = f'Retry {task.request.retries + 1}: {str(error)}'
+        db.session.commit()
+        raise task.retry(exc=error, countdown=retry_delay(task.request.retries))
+    record.status = 'failed'
+    record.error_message = str(error)
+    db.session.commit()
+    return {'status': 'error', 'message': str(error)}
+
+def detect_speech_regions(transcription, file_path, content_hash=None):
+    """取得归一化后的 PCM 并做语音活动检测，把语音区间记录到转写记录上
+
+    返回 (PCM 缓存路径, 样本, 语音区间)；转码失败时返回 None，退化为整段上传原文件。
+    """
     try:
-        # 获取转写记录
-        transcription = Transcription.query.get(transcription_id)
-        if not transcription:
-            return {'status': 'error', 'message': 'Transcription record not found'}
-        
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            transcription.status = 'failed'
-            transcription.error_message = 'Audio file not found'
-            db.session.commit()
-            return {'status': 'error', 'message': 'Audio file not found'}
-        
-        # 调用语音识别服务
-        api_key = current_app.config['SPEECH_RECOGNITION_API_KEY']
-        api_url = current_app.config['SPEECH_RECOGNITION_API_URL']
-        
-        if not api_key or not api_url:
-            transcription.status = 'failed'
-            transcription.error_message = 'Speech recognition service not configured'
+        pcm_path = normalized_pcm(file_path, content_hash)
+    except RuntimeError as e:
+        current_app.logger.warning(f'Audio decoding failed, transcribing whole file: {str(e)}')
+        return None
+    samples = load_pcm(pcm_path)
+    regions = plan_speech_regions(samples, current_app.config.get('TRANSCRIBE_VAD_MAX_ACTIVE_RATIO', 0.9))
+    transcription.audio_duration = round(len(samples) / SAMPLE_RATE, 3)
+    transcription.speech_duration = round(sum(end - start for start, end in regions), 3)
+    transcription.speech_regions = [[start, end] for start, end in regions]
+    return pcm_path, samples, regions
+
+def regions_within(regions, start, end):
+    """截取落在 [start, end] 内的语音区间"""
+    clipped = []
+    for region_start, region_end in regions:
+        region_start, region_end = max(region_start, start), min(region_end, end)
+        if region_end > region_start:
+            clipped.append((region_start, region_end))
+    return clipped
+
+def recognize_speech(samples, regions):
+    """只把语音区间拼接成音频提交识别"""
+    clip_path = write_speech_clip(samples, regions)
+    try:
+        return recognize(clip_path)
+    finally:
+        os.remove(clip_path)
+
+def refresh_transcription_content(transcription_id):
+    """用已完成的片段重新拼接转写文本，使部分结果在其余片段完成前即可查看"""
+    # 行锁串行化并发完成的片段，避免后提交的拼接结果覆盖先提交的
+    transcription = Transcription.query.filter_by(id=transcription_id).with_for_update().first()
+    segments = TranscriptionSegment.query.filter_by(transcription_id=transcription_id).all()
+    transcription.content = stitch_segments(segments)
+    db.session.commit()
+    return transcription, segments
+
+@celery.task(bind=True, acks_late=True, max_retries=TRANSCRIBE_MAX_RETRIES)
+def transcribe_audio(self, file_path, transcription_id, content_hash=None):
+    """异步任务：将音频文件转写为文本
+
+    先做语音活动检测，只上传语音部分；语音较长时按区间分组并行转写。
+    """
+    # 获取转写记录
+    transcription = Transcription.query.get(transcription_id)
+    if not transcription:
+        return {'status': 'error', 'message': 'Transcription record not found'}
+    
+    # 检查文件是否存在
+    if not os.path.exists(file_path):
+        transcription.status = 'failed'
+        transcription.error_message = 'Audio file not found'
+        db.session.commit()
+        return {'status': 'error', 'message': 'Audio file not found'}
+    
+    # 清除上一次转写留下的片段；先 flush 删除，避免与新片段的 (transcription_id, segment_index) 冲突
+    transcription.segments = []
+    db.session.flush()
+    
+    content_hash = content_hash or file_sha256(file_path)
+    if not self.request.retries:
+        # 同一录音已有当前模型版本的结果时直接复用，不再转码和调用识别服务
+        cached = transcription_cache.lookup(content_hash)
+        if cached:
+            transcription_cache.apply(cached, transcription)
             db.session.commit()
-            return {'status': 'error', 'message': 'Speech recognition service not configured'}
-        
-        # 准备音频文件
-        with open(file_path, 'rb') as audio_file:
-            files = {'audio': audio_file}
-            headers = {'Authorization': f'Bearer {api_key}'}
+            return {'status': 'success', 'message': 'Transcription loaded from cache'}
+    
+    try:
+        asr_seconds = 0.0
+        detected = detect_speech_regions(transcription, file_path, content_hash)
+        if detected is None:
+            # 调用语音识别服务
+            started = time.monotonic()
+            transcription.content = recognize(file_path)
+            asr_seconds = time.monotonic() - started
+        else:
+            pcm_path, samples, regions = detected
+            config = current_app.config
+            if transcription.speech_duration >= config.get('TRANSCRIBE_SEGMENT_MIN_DURATION', 90):
+                groups = group_regions(regions, config.get('TRANSCRIBE_SEGMENT_TARGET', 30),
+                                       config.get('TRANSCRIBE_SEGMENT_MAX', 60), samples)
+            else:
+                groups = [regions] if regions else []
             
-            # 发送请求到语音识别服务
-            response = requests.post(api_url, files=files, headers=headers)
+            if len(groups) > 1:
+                transcription.content = ''
+                transcription.segments = [
+                    TranscriptionSegment(segment_index=index, start_time=group[0][0],
+                                         end_time=group[-1][1], status='pending')
+                    for index, group in enumerate(groups)
+                ]
+                db.session.commit()
+                # 各片段分发到转写队列并行处理，全部结束后汇总状态
+                chord(transcribe_segment.s(pcm_path, segment.id) for segment in transcription.segments)(
+                    finish_segmented_transcription.s(transcription_id, content_hash)
+                )
+                return {'status': 'success', 'message': f'Transcription split into {len(groups)} segments'}
             
-            if response.status_code == 200:
-                result = response.json()
-                transcription.text_content = result.get('text', '')
+            if not regions:
+                # 整段静音时不调用识别服务；该结果不写入缓存，调整 VAD 后可重新转写
+                transcription.content = ''
                 transcription.status = 'completed'
-            else:
-                transcription.status = 'failed'
-                transcription.error_message = f'API request failed: {response.text}'
+                transcription.error_message = None
+                db.session.commit()
+                return {'status': 'success', 'message': 'No speech detected'}
+            started = time.monotonic()
+            transcription.content = recognize_speech(samples, regions)
+            asr_seconds = time.monotonic() - started
         
+        transcription.status = 'completed'
+        transcription.error_message = None
+        transcription_cache.store(content_hash, transcription, asr_seconds)
         db.session.commit()
         return {'status': 'success', 'message': 'Transcription completed'}
-        
+    
+    except AsrError as e:
+        return retry_or_fail(self, transcription, e)
+    
     except Exception as e:
-        if transcription:
-            transcription.status = 'failed'
-            transcription.error_message = str(e)
-            db.session.commit()
-        return {'status': 'error', 'message': str(e)} 
\ No newline at end of file
+        db.session.rollback()
+        transcription.status = 'failed'
+        transcription.error_message = str(e)
+        db.session.commit()
+        return {'status': 'error', 'message': str(e)}
+
+@celery.task(bind=True, acks_late=True, max_retries=TRANSCRIBE_MAX_RETRIES)
+def transcribe_segment(self, pcm_path, segment_id):
+    """异步任务：转写录音的一个片段（只含该片段内的语音区间）
+
+    失败时只标记片段状态而不抛出异常，保证汇总任务总能执行。
+    """
+    segment = TranscriptionSegment.query.get(segment_id)
+    if not segment:
+        return {'status': 'error', 'message': 'Transcription segment not found'}
+    
+    segment.status = 'processing'
+    db.session.commit()
+    
+    try:
+        regions = regions_within(segment.transcription.speech_regions or [],
+                                 segment.start_time, segment.end_time)
+        started = time.monotonic()
+        segment.content = recognize_speech(load_pcm(pcm_path), regions)
+        segment.asr_seconds = round(time.monotonic() - started, 3)
+        segment.status = 'completed'
+        segment.error_message = None
+        db.session.commit()
+    
+    except AsrError as e:
+        return retry_or_fail(self, segment, e)
+    
+    except Exception as e:
+        db.session.rollback()
+        segment.status = 'failed'
+        segment.error_message = str(e)
+        db.session.commit()
+        return {'status': 'error', 'message': str(e)}
+    
+    # 提前拼接部分结果只为方便查看，失败时不影响片段结果，汇总任务会重新拼接
+    transcription_id = segment.transcription_id
+    try:
+        refresh_transcription_content(transcription_id)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f'Failed to refresh transcription {transcription_id}: {str(e)}')
+    return {'status': 'success', 'message': 'Segment transcribed'}
+
+@celery.task
+def finish_segmented_transcription(results, transcription_id, content_hash=None):
+    """异步任务：所有片段结束后拼接最终文本并更新转写状态，全部成功时写入缓存"""
+    transcription, segments = refresh_transcription_content(transcription_id)
+    failed = [segment for segment in segments if segment.status != 'completed']
+    if failed:
+        transcription.status = 'failed'
+        transcription.error_message = f'{len(failed)} of {len(segments)} segments failed'
+    else:
+        transcription.status = 'completed'
+        transcription.error_message = None
+        transcription_cache.store(content_hash, transcription,
+                                  sum(segment.asr_seconds or 0 for segment in segments))
+    db.session.commit()
+    return {'status': transcription.status, 'message': transcription.error_message}
+
+@celery.task
+def probe_media_metadata(media_file_id):
+    """异步任务：探测媒体文件的时长、编码、采样率和分辨率并回填到 MediaFile"""
+    media_file = MediaFile.query.get(media_file_id)
+    if not media_file:
+        return {'status': 'error', 'message': 'Media file record not found'}
+
+    media_file.probe_status = 'processing'
+    db.session.commit()
+
+    try:
+        metadata = probe_media_file(media_file.file_path)
+        for key, value in metadata.items():
+            setattr(media_file, key, value)
+        media_file.probe_status = 'completed'
+        media_file.probe_error = None
+        db.session.commit()
+        return {'status': 'success', 'message': 'Media metadata extracted'}
+    except Exception as e:
+        db.session.rollback()
+        media_file.probe_status = 'failed'
+        media_file.probe_error = str(e)
+        db.session.commit()
+        return {'status': 'error', 'message': str(e)}
+
+@celery.task
+def compute_waveform(media_file_id):
+    """异步任务：解码录音并生成多级波形峰值文件；同一内容已有波形文件时直接复用"""
+    media_file = MediaFile.query.get(media_file_id)
+    if not media_file:
+        return {'status': 'error', 'message': 'Media file record not found'}
+
+    media_file.waveform_status = 'processing'
+    db.session.commit()
+
+    try:
+        content_hash = media_file.content_hash or file_sha256(media_file.file_path)
+        path = waveform_path(content_hash)
+        if not os.path.exists(path):
+            samples = load_pcm(normalized_pcm(media_file.file_path, content_hash))
+            write_waveform(path, build_levels(samples), SAMPLE_RATE, len(samples))
+        media_file.waveform_status = 'completed'
+        media_file.waveform_error = None
+        db.session.commit()
+        return {'status': 'success', 'message': 'Waveform generated'}
+    except Exception as e:
+        db.session.rollback()
+        media_file.waveform_status = 'failed'
+        media_file.waveform_error = str(e)
+        db.session.commit()
+        return {'status': 'error', 'message': str(e)}
+
+@celery.task
+def scrub_media_integrity(max_bytes=None):
+    """异步任务：限速巡检内容存储中的文件哈希，建议由定时任务每天触发"""
+    summary = scrub(max_bytes=max_bytes)
+    return {'status': 'success', 'summary': summary}
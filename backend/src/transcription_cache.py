@@ -0,0 +1,123 @@
+"""转写结果缓存
+
+以（录音内容哈希, ASR_MODEL_VERSION）为键缓存转写结果：同一录音重复转写、或挂到多个警情时，
+直接复用已有结果而不再调用识别服务。升级识别模型时修改 ASR_MODEL_VERSION 即可让旧结果失效。
+命中/未命中次数及节省的识别耗时记录在 Redis 计数器中（未配置 Redis 时为进程内计数）。
+"""
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .alarm_unified_access.models import TranscriptionCache
+from .asr_client import redis_client
+
+COUNTER_PREFIX = 'asr:cache:'
+
+_local_counters = {'hits': 0, 'misses': 0, 'saved_seconds': 0.0}
+_counter_lock = threading.Lock()
+
+def model_version():
+    return current_app.config.get('ASR_MODEL_VERSION', 'default')
+
+def _count_locally(name, amount):
+    with _counter_lock:
+        _local_counters[name] += amount
+
+def _count(name, amount=1):
+    client = redis_client()
+    if client is None:
+        _count_locally(name, amount)
+        return
+    try:
+        if isinstance(amount, float):
+            client.incrbyfloat(COUNTER_PREFIX + name, amount)
+        else:
+            client.incrby(COUNTER_PREFIX + name, amount)
+    except Exception as e:
+        # 计数失败不影响转写；记入进程内计数，Redis 不可用时 stats 以此为准
+        current_app.logger.warning(f'Failed to update transcription cache counter: {str(e)}')
+        _count_locally(name, amount)
+
+def lookup(content_hash, record_miss=True):
+    """查找缓存结果，命中时更新命中统计并返回缓存记录"""
+    if not content_hash:
+        return None
+    entry = TranscriptionCache.query.filter_by(content_hash=content_hash,
+                                               model_version=model_version()).first()
+    if entry is not None and not entry.content and not entry.asr_seconds:
+        # 仅由 VAD 判定、未调用识别服务得到的空结果不缓存，也不予复用
+        entry = None
+    if entry is None:
+        if record_miss:
+            _count('misses')
+        return None
+
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_hit_at = datetime.utcnow()
+    _count('hits')
+    _count('saved_seconds', float(entry.asr_seconds or 0))
+    return entry
+
+def apply(entry, transcription):
+    """把缓存结果写入转写记录"""
+    transcription.segments = []
+    transcription.content = entry.content
+    transcription.audio_duration = entry.audio_duration
+    transcription.speech_duration = entry.speech_duration
+    transcription.speech_regions = entry.speech_regions
+    transcription.status = 'completed'
+    transcription.error_message = None
+
+def store(content_hash, transcription, asr_seconds):
+    """保存完整的转写结果；并发写入同一键时保留先写入的结果"""
+    if not content_hash:
+        return
+    entry = TranscriptionCache(
+        content_hash=content_hash,
+        model_version=model_version(),
+        content=transcription.content or '',
+        audio_duration=transcription.audio_duration,
+        speech_duration=transcription.speech_duration,
+        speech_regions=transcription.speech_regions,
+        asr_seconds=round(asr_seconds, 3),
+        hit_count=0
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.add(entry)
+    except IntegrityError:
+        pass
+
+def stats():
+    """缓存命中统计"""
+    client = redis_client()
+    counters = None
+    if client is not None:
+        try:
+            values = client.mget([COUNTER_PREFIX + name for name in ('hits', 'misses', 'saved_seconds')])
+            counters = {
+                'hits': int(values[0] or 0),
+                'misses': int(values[1] or 0),
+                'saved_seconds': float(values[2] or 0)
+            }
+        except Exception as e:
+            # Redis 不可用时退回进程内计数（含 Redis 故障期间的计数），条目统计仍可查看
+            current_app.logger.warning(f'Failed to read transcription cache counters: {str(e)}')
+    if counters is None:
+        with _counter_lock:
+            counters = dict(_local_counters)
+    lookups = counters['hits'] + counters['misses']
+    entries, total_hits = db.session.query(
+        func.count(TranscriptionCache.id), func.sum(TranscriptionCache.hit_count)
+    ).filter(TranscriptionCache.model_version == model_version()).one()
+    return {
+        'model_version': model_version(),
+        'hits': counters['hits'],
+        'misses': counters['misses'],
+        'hit_rate': round(counters['hits'] / lookups, 4) if lookups else None,
+        'saved_asr_seconds': round(counters['saved_seconds'], 3),
+        'entries': entries,
+        'entry_hits': int(total_hits or 0)
+    }
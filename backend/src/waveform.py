@@ -0,0 +1,108 @@
+"""录音波形峰值
+
+录音归一化为 16kHz PCM 后（与转写共用 audio_processing 的缓存），按每 BASE_SAMPLES_PER_PEAK 个采样取一对
+(最小值, 最大值)，再逐级两两合并生成多级分辨率，量化为 int8 存成一个二进制文件。
+文件按内容哈希存放在 UPLOAD_FOLDER/waveforms 下，同一录音只计算一次；前端按显示宽度取合适的一级，
+几百像素宽的波形只需几 KB。
+
+文件格式（小端）：
+    头部      magic(4s) version(H) level_count(H) sample_rate(I) total_samples(Q)
+    级别表    level_count 个 (samples_per_peak(I) peak_count(I) offset(Q))，由细到粗
+    峰值数据  每级 peak_count 对 int8 (min, max) 交错存放
+"""
+import os
+import struct
+import uuid
+import numpy as np
+from flask import current_app
+
+MAGIC = b'WAVP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQ')
+LEVEL = struct.Struct('<IIQ')
+BASE_SAMPLES_PER_PEAK = 256  # 16kHz 下每个峰值 16ms
+MIN_PEAKS = 256  # 最粗一级的峰值数不少于此值
+CHUNK_PEAKS = 8192  # 每次向量化处理的峰值数，限制长录音的内存占用
+
+def waveform_path(content_hash):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'waveforms', content_hash[:2], f'{content_hash}.peaks')
+
+def base_peaks(samples, samples_per_peak=BASE_SAMPLES_PER_PEAK):
+    """逐块计算最细一级的 (min, max)，返回 int8 数组，形状为 (峰值数, 2)"""
+    total = len(samples)
+    count = -(-total // samples_per_peak)
+    peaks = np.empty((count, 2), dtype=np.int8)
+    for begin in range(0, count, CHUNK_PEAKS):
+        end = min(begin + CHUNK_PEAKS, count)
+        block = np.asarray(samples[begin * samples_per_peak:end * samples_per_peak])
+        full = len(block) // samples_per_peak
+        if full:
+            frames = block[:full * samples_per_peak].reshape(full, samples_per_peak)
+            peaks[begin:begin + full, 0] = frames.min(axis=1) >> 8
+            peaks[begin:begin + full, 1] = frames.max(axis=1) >> 8
+        if begin + full < end:
+            # 末尾不足一个峰值宽度的采样
+            tail = block[full * samples_per_peak:]
+            peaks[begin + full] = (tail.min() >> 8, tail.max() >> 8)
+    return peaks
+
+def downsample(peaks):
+    """相邻两个峰值合并为一个"""
+    if len(peaks) % 2:
+        peaks = np.concatenate([peaks, peaks[-1:]])
+    pairs = peaks.reshape(-1, 2, 2)
+    return np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+
+def build_levels(samples):
+    """返回 [(samples_per_peak, 峰值数组)]，由细到粗"""
+    peaks = base_peaks(samples)
+    levels = [(BASE_SAMPLES_PER_PEAK, peaks)]
+    while len(peaks) > MIN_PEAKS * 2:
+        peaks = downsample(peaks)
+        levels.append((levels[-1][0] * 2, peaks))
+    return levels
+
+def write_waveform(path, levels, sample_rate, total_samples):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    offset = HEADER.size + LEVEL.size * len(levels)
+    table = []
+    for samples_per_peak, peaks in levels:
+        table.append(LEVEL.pack(samples_per_peak, len(peaks), offset))
+        offset += peaks.nbytes
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(levels), sample_rate, total_samples))
+        f.write(b''.join(table))
+        for _, peaks in levels:
+            f.write(np.ascontiguousarray(peaks).tobytes())
+    os.replace(tmp_path, path)
+
+def read_header(f):
+    """读取头部与级别表，返回 (sample_rate, total_samples, [(samples_per_peak, 峰值数, 偏移)])"""
+    magic, version, level_count, sample_rate, total_samples = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a waveform file')
+    levels = [LEVEL.unpack(f.read(LEVEL.size)) for _ in range(level_count)]
+    return sample_rate, total_samples, levels
+
+def read_level(path, width):
+    """读取峰值数不少于 width 的最粗一级（width 超过最细一级时取最细一级）
+
+    返回 {'sample_rate', 'total_samples', 'samples_per_peak', 'peak_count', 'data'}，data 为 int8 (min, max) 交错的字节串。
+    """
+    with open(path, 'rb') as f:
+        sample_rate, total_samples, levels = read_header(f)
+        chosen = levels[0]
+        for level in levels:
+            if level[1] >= width:
+                chosen = level
+        samples_per_peak, peak_count, offset = chosen
+        f.seek(offset)
+        data = f.read(peak_count * 2)
+    return {
+        'sample_rate': sample_rate,
+        'total_samples': total_samples,
+        'samples_per_peak': samples_per_peak,
+        'peak_count': peak_count,
+        'data': data
+    }
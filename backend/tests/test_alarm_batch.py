@@ -0,0 +1,109 @@
+import json
+
+from sqlalchemy.exc import OperationalError
+
+from src.alarm_unified_access import routes
+from src.alarm_unified_access.models import AlarmRecord
+
+
+def alarm(i, **fields):
+    return dict({
+        'event_time': f'2025-06-01T08:{i:02d}:00',
+        'event_location_address': f'建设路{i}号',
+        'brief_summary': f'电动车被盗 {i}',
+        'reporter_phone': f'1380013{i:04d}',
+    }, **fields)
+
+
+def stored_summaries(session):
+    session.rollback()
+    return sorted(record.brief_summary for record in AlarmRecord.query.all())
+
+
+def post_batch(client, chunk_size=None, **kwargs):
+    url = '/api/alarm/batch' + (f'?chunk_size={chunk_size}' if chunk_size else '')
+    return client.post(url, **kwargs)
+
+
+def test_json_array_items_and_ndjson(app, session):
+    client = app.test_client()
+    response = post_batch(client, json=[alarm(1), alarm(2)])
+    assert response.status_code == 201
+    assert [item['index'] for item in response.get_json()['data']['results']] == [0, 1]
+
+    response = post_batch(client, json={'items': [alarm(3)]})
+    assert response.status_code == 201
+
+    body = '\n'.join(json.dumps(alarm(i), ensure_ascii=False) for i in (4, 5)) + '\n\n'
+    response = post_batch(client, chunk_size=1, data=body.encode(), content_type='application/x-ndjson')
+    assert response.status_code == 201
+    data = response.get_json()['data']
+    assert (data['total'], data['created'], data['failed']) == (2, 2, 0)
+
+    ids = [item['id'] for item in data['results']]
+    assert [session.get(AlarmRecord, alarm_id).brief_summary for alarm_id in ids] == ['电动车被盗 4', '电动车被盗 5']
+    assert len(stored_summaries(session)) == 5
+
+
+def test_invalid_rows_reported_per_index(app, session):
+    client = app.test_client()
+    body = '\n'.join([
+        json.dumps(alarm(1)),
+        json.dumps({'event_time': '2025-06-01T08:00:00'}),
+        '{not json',
+        json.dumps(alarm(4, event_time=20250601)),
+        json.dumps(alarm(5, event_location_latitude=91)),
+        json.dumps(alarm(6)),
+    ])
+    response = post_batch(client, data=body, content_type='application/x-ndjson')
+    assert response.status_code == 207
+    data = response.get_json()['data']
+    assert (data['total'], data['created'], data['failed']) == (6, 2, 4)
+    errors = {item['index']: item['error'] for item in data['results'] if 'error' in item}
+    assert sorted(errors) == [1, 2, 3, 4]
+    assert 'Missing required fields' in errors[1]
+    assert 'Invalid JSON line' in errors[2]
+    assert 'event_time must be an ISO 8601 string' in errors[3]
+    assert stored_summaries(session) == ['电动车被盗 1', '电动车被盗 6']
+
+
+def test_rejects_unusable_body(app, session):
+    client = app.test_client()
+    assert post_batch(client, json={'rows': []}).status_code == 400
+    assert post_batch(client, json=[]).status_code == 400
+
+
+def test_failed_chunk_keeps_earlier_chunks(app, session, monkeypatch):
+    insert_alarm_rows = routes.insert_alarm_rows
+    calls = []
+
+    def fail_second_chunk(mappings):
+        calls.append(len(mappings))
+        if len(calls) == 2:
+            raise OperationalError('INSERT INTO alarm_records', {}, Exception('disk I/O error'))
+        insert_alarm_rows(mappings)
+    monkeypatch.setattr(routes, 'insert_alarm_rows', fail_second_chunk)
+
+    response = post_batch(app.test_client(), chunk_size=2, json=[alarm(i) for i in range(5)])
+    assert response.status_code == 207
+    results = response.get_json()['data']['results']
+    assert ['id' in item for item in results] == [True, True, False, False, True]
+    assert 'Database error' in results[2]['error']
+    assert stored_summaries(session) == ['电动车被盗 0', '电动车被盗 1', '电动车被盗 4']
+
+
+def test_aborted_batch_returns_207_with_committed_chunks(app, session, monkeypatch):
+    def rows_then_disconnect():
+        yield from (alarm(i) for i in range(3))
+        raise ValueError('Client disconnected')
+    monkeypatch.setattr(routes, 'iter_batch_rows', rows_then_disconnect)
+
+    response = post_batch(app.test_client(), chunk_size=2, json=[])
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body['message'] == 'Alarm batch aborted'
+    assert body['error'] == 'Client disconnected'
+    results = body['data']['results']
+    assert ['id' in item for item in results] == [True, True, False]
+    assert results[2]['error'] == 'Not imported: Client disconnected'
+    assert stored_summaries(session) == ['电动车被盗 0', '电动车被盗 1']
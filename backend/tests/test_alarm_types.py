@@ -0,0 +1,127 @@
+import pytest
+
+from src.alarm_unified_access.alarm_types import normalize_path, resolve_alarm_type, rollup_counts, subtree_ids
+from src.alarm_unified_access.models import AlarmRecord, AlarmType
+
+TYPES = {
+    '刑事案件/盗窃/入室盗窃': 3,
+    '刑事案件/盗窃/扒窃': 2,
+    '刑事案件/盗窃': 1,
+    '刑事案件/盗窃案': 4,
+    '刑事案件/诈骗': 2,
+    '交通事故': 5,
+}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('刑事案件/盗窃', '刑事案件/盗窃'),
+    # 旧数据中常见的空白与多余分隔符
+    (' 刑事案件 / 盗窃 /', '刑事案件/盗窃'),
+    ('刑事案件//盗窃', '刑事案件/盗窃'),
+    ('/ /', None),
+    ('', None),
+    (None, None),
+])
+def test_normalize_path(value, expected):
+    assert normalize_path(value) == expected
+
+
+def test_normalize_path_rejects_invalid():
+    with pytest.raises(ValueError):
+        normalize_path(['刑事案件'])
+    with pytest.raises(ValueError):
+        normalize_path('类' * 101)
+
+
+def test_resolve_creates_ancestors_once(session):
+    theft_id = resolve_alarm_type('刑事案件/盗窃/入室盗窃')
+    session.commit()
+    nodes = {node.path: node for node in AlarmType.query}
+    assert sorted(nodes) == ['刑事案件', '刑事案件/盗窃', '刑事案件/盗窃/入室盗窃']
+    leaf = nodes['刑事案件/盗窃/入室盗窃']
+    assert (leaf.id, leaf.name, leaf.depth) == (theft_id, '入室盗窃', 2)
+    assert leaf.parent_id == nodes['刑事案件/盗窃'].id
+    assert nodes['刑事案件/盗窃'].parent_id == nodes['刑事案件'].id
+
+    # 写法不同的旧类型字符串解析到同一节点；中间节点本身也可作为类型
+    assert resolve_alarm_type(' 刑事案件 /盗窃/ 入室盗窃 ') == theft_id
+    assert resolve_alarm_type('刑事案件/盗窃') == nodes['刑事案件/盗窃'].id
+    assert resolve_alarm_type('  ') is None
+    assert AlarmType.query.count() == 3
+
+    cache = {}
+    fraud_id = resolve_alarm_type('刑事案件/诈骗', cache)
+    assert cache == {'刑事案件/诈骗': fraud_id}
+    assert resolve_alarm_type('刑事案件/诈骗', cache) == fraud_id
+
+
+@pytest.fixture
+def typed_alarms(app):
+    client = app.test_client()
+    for path, count in TYPES.items():
+        for i in range(count):
+            response = client.post('/api/alarm/', json={
+                'event_time': '2025-06-01T08:00:00', 'event_location_address': f'建设路{i}号',
+                'brief_summary': '报警', 'alarm_type': path,
+            })
+            assert response.status_code == 201
+    return client
+
+
+def test_subtree_ids(session, typed_alarms):
+    ids = {node.path: node.id for node in AlarmType.query}
+    assert sorted(subtree_ids('刑事案件/盗窃')) == sorted(
+        ids[path] for path in ('刑事案件/盗窃', '刑事案件/盗窃/入室盗窃', '刑事案件/盗窃/扒窃'))
+    # 名称前缀相同的兄弟节点不属于子树
+    assert ids['刑事案件/盗窃案'] not in subtree_ids('刑事案件/盗窃')
+    assert subtree_ids(' 交通事故/ ') == [ids['交通事故']]
+    assert subtree_ids('刑事%') == []
+    assert subtree_ids('') == []
+
+
+def test_list_filter_includes_descendants(session, typed_alarms):
+    def listed(alarm_type):
+        response = typed_alarms.get(f'/api/alarm/?alarm_type={alarm_type}&per_page=100')
+        assert response.status_code == 200
+        return sorted(item['alarm_type'] for item in response.get_json()['items'])
+
+    assert listed('刑事案件/盗窃') == sorted(
+        ['刑事案件/盗窃'] + ['刑事案件/盗窃/入室盗窃'] * 3 + ['刑事案件/盗窃/扒窃'] * 2)
+    assert len(listed('刑事案件')) == 12
+    assert listed('不存在的类型') == []
+    assert AlarmRecord.query.filter(AlarmRecord.alarm_type_id.is_(None)).count() == 0
+
+
+def test_types_route(session, typed_alarms):
+    paths = [node['path'] for node in typed_alarms.get('/api/alarm/types').get_json()]
+    assert paths == sorted(set(TYPES) | {'刑事案件'})
+    subtree = typed_alarms.get('/api/alarm/types?root=刑事案件/盗窃').get_json()
+    assert [node['path'] for node in subtree] == ['刑事案件/盗窃', '刑事案件/盗窃/入室盗窃', '刑事案件/盗窃/扒窃']
+
+
+def test_statistics_roll_up_to_parents(session, typed_alarms):
+    response = typed_alarms.get('/api/statistics/alarm_types')
+    assert response.status_code == 200
+    nodes = {node['path']: (node['count'], node['total']) for node in response.get_json()['types']}
+    assert nodes == {
+        '交通事故': (5, 5),
+        '刑事案件': (0, 12),
+        '刑事案件/盗窃': (1, 6),
+        '刑事案件/盗窃/入室盗窃': (3, 3),
+        '刑事案件/盗窃/扒窃': (2, 2),
+        '刑事案件/盗窃案': (4, 4),
+        '刑事案件/诈骗': (2, 2),
+    }
+
+    data = typed_alarms.get('/api/statistics/alarm_types?root=刑事案件/盗窃').get_json()
+    assert data['root'] == '刑事案件/盗窃'
+    assert [(node['path'], node['total']) for node in data['types']] == [
+        ('刑事案件/盗窃', 6), ('刑事案件/盗窃/入室盗窃', 3), ('刑事案件/盗窃/扒窃', 2)]
+
+
+def test_rollup_ignores_unknown_ids(session):
+    leaf_id = resolve_alarm_type('火灾/住宅火灾')
+    session.commit()
+    nodes = rollup_counts({leaf_id: 2, 9999: 7})
+    assert [(node['path'], node['count'], node['total']) for node in nodes] == [
+        ('火灾', 0, 2), ('火灾/住宅火灾', 2, 2)]
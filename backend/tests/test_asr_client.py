@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+from argparse import Namespace
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from celery.exceptions import Retry
+
+from src import asr_client
+from src.alarm_unified_access.models import AlarmRecord, Transcription
+from src.asr_client import AsrError, recognize, retry_delay
+from src.tasks import retry_or_fail
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import stub_asr_server  # noqa: E402
+
+API_KEY = 'test-key'
+
+
+@pytest.fixture
+def stub(app):
+    """在后台线程启动识别桩服务，返回按参数配置服务的函数"""
+    servers = []
+
+    def start(latency=0.0, error_rate=0.0, api_key=API_KEY):
+        options = Namespace(latency=latency, jitter=0.0, error_rate=error_rate, api_key=api_key, verbose=False)
+        stats = stub_asr_server.Stats()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), stub_asr_server.make_handler(options, stats))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        app.config.update(SPEECH_RECOGNITION_API_URL=f'http://127.0.0.1:{server.server_port}/asr',
+                          SPEECH_RECOGNITION_API_KEY=API_KEY)
+        return stats
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / 'clip.wav'
+    path.write_bytes(b'RIFF' + bytes(1000))
+    return str(path)
+
+
+def recognize_error(file_path):
+    with pytest.raises(AsrError) as error:
+        recognize(file_path)
+    return error.value
+
+
+def test_recognize(stub, audio):
+    stats = stub()
+    assert recognize(audio).startswith('桩服务识别结果：')
+    assert recognize(audio)
+    # 复用同一个 keep-alive 连接
+    assert stats.to_dict()['connections'] == 1
+
+
+def test_server_errors_and_timeouts_are_retryable(app, stub, audio):
+    stub(error_rate=1.0)
+    error = recognize_error(audio)
+    assert error.retryable and '503' in str(error)
+
+    stub(latency=1.0)
+    app.config['ASR_READ_TIMEOUT'] = 0.2
+    assert recognize_error(audio).retryable
+
+
+def test_client_errors_are_not_retried(app, stub, audio):
+    stats = stub(api_key='another-key')
+    error = recognize_error(audio)
+    assert not error.retryable and '401' in str(error)
+
+    app.config['SPEECH_RECOGNITION_API_URL'] = None
+    assert not recognize_error(audio).retryable
+    # 未进入识别处理
+    assert stats.to_dict()['requests'] == 0
+
+
+def test_concurrency_cap(app, stub, audio):
+    stats = stub(latency=0.2)
+    app.config.update(ASR_MAX_CONCURRENCY=2, ASR_SLOT_WAIT=30)
+    results = []
+
+    def call():
+        with app.app_context():
+            results.append(recognize(audio))
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 6
+    assert stats.to_dict()['peak_active'] == 2
+
+
+def test_slot_wait_timeout_is_retryable(app):
+    app.config.update(ASR_MAX_CONCURRENCY=1, ASR_SLOT_WAIT=0.1)
+    with asr_client.concurrency_slot():
+        with pytest.raises(AsrError) as error:
+            with asr_client.concurrency_slot():
+                pass
+    assert error.value.retryable
+
+
+def test_retry_delay_backs_off_exponentially(app):
+    app.config.update(ASR_RETRY_BACKOFF=2, ASR_RETRY_BACKOFF_MAX=300)
+    for retries in range(10):
+        limit = min(300, 2 * 2 ** retries)
+        assert limit / 2 <= retry_delay(retries) <= limit
+
+
+def task(retries, max_retries=5):
+    def retry(exc, countdown):
+        return Retry(exc=exc, when=countdown)
+    return SimpleNamespace(request=SimpleNamespace(retries=retries), max_retries=max_retries, retry=retry)
+
+
+def test_retry_or_fail(session, monkeypatch):
+    alarm = AlarmRecord(event_time=datetime(2025, 6, 1), event_location_address='建设路1号', brief_summary='报警')
+    session.add(alarm)
+    session.flush()
+    record = Transcription(alarm_record_id=alarm.id, content='', status='processing')
+    session.add(record)
+    session.commit()
+    monkeypatch.setattr('src.tasks.retry_delay', lambda retries: 2 ** retries)
+
+    # 可重试错误按退避时间重新排队，状态保持 processing
+    with pytest.raises(Retry) as retry:
+        retry_or_fail(task(retries=3), record, AsrError('API request failed (503)', retryable=True))
+    assert retry.value.when == 8
+    assert (record.status, record.error_message) == ('processing', 'Retry 4: API request failed (503)')
+
+    # 重试用尽或不可重试时标记失败
+    for error, retries in ((AsrError('timeout', retryable=True), 5), (AsrError('API request failed (400)'), 0)):
+        assert retry_or_fail(task(retries=retries), record, error) == {'status': 'error', 'message': str(error)}
+        assert (record.status, record.error_message) == ('failed', str(error))
@@ -0,0 +1,173 @@
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src import audio_processing
+from src.audio_processing import (SAMPLE_RATE, detect_speech, ffmpeg_slot, file_sha256, group_regions, load_pcm,
+                                  normalized_cache_root, normalized_pcm, plan_speech_regions)
+
+
+def speech_like(rng, seconds):
+    """以 4 Hz 音节包络调制的噪声，模拟连续说话"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    return rng.normal(0, 4000, len(t)) * envelope
+
+
+def room_noise(rng, seconds):
+    return rng.normal(0, 30, int(seconds * SAMPLE_RATE))
+
+
+def build_call(rng, duration, pauses, pause_length):
+    """说话段之间插入 pauses 个停顿，返回 (samples, 停顿区间列表)"""
+    burst = (duration - pauses * pause_length) / (pauses + 1)
+    parts = []
+    gaps = []
+    position = 0.0
+    for index in range(pauses + 1):
+        parts.append(speech_like(rng, burst))
+        position += burst
+        if index < pauses:
+            parts.append(room_noise(rng, pause_length))
+            gaps.append((position, position + pause_length))
+            position += pause_length
+    return np.clip(np.concatenate(parts), -32768, 32767).astype('<i2'), gaps
+
+
+def boundaries(groups):
+    return [group[-1][1] for group in groups[:-1]]
+
+
+def test_detect_speech_finds_pauses():
+    rng = np.random.default_rng(0)
+    samples, gaps = build_call(rng, 30, 4, 0.8)
+    regions = detect_speech(samples)
+    assert len(regions) == 5
+    for (_, end), (start, _), (gap_start, gap_end) in zip(regions, regions[1:], gaps):
+        assert gap_start <= end < start <= gap_end
+
+
+def test_detect_speech_silence():
+    assert detect_speech(np.zeros(SAMPLE_RATE * 5, dtype='<i2')) == []
+
+
+def test_mostly_speech_call_is_cut_at_pauses():
+    # 212 秒、40 个 0.8 秒停顿：语音占比超过 90%，整段提交识别，但分段仍须落在停顿里
+    rng = np.random.default_rng(1)
+    samples, gaps = build_call(rng, 212, 40, 0.8)
+    regions = plan_speech_regions(samples)
+    assert regions[0][0] == 0.0
+    assert regions[-1][1] == round(len(samples) / SAMPLE_RATE, 3)
+    assert all(a[1] == b[0] for a, b in zip(regions, regions[1:]))
+
+    groups = group_regions(regions, 30, 60, samples)
+    assert len(groups) >= 4
+    for cut in boundaries(groups):
+        assert any(start <= cut <= end for start, end in gaps), cut
+    for group in groups:
+        assert group[-1][1] - group[0][0] <= 60
+
+
+def test_long_region_split_at_quietest_dip():
+    rng = np.random.default_rng(2)
+    samples = np.concatenate([speech_like(rng, 41.5), rng.normal(0, 300, SAMPLE_RATE // 2),
+                              speech_like(rng, 58)]).clip(-32768, 32767).astype('<i2')
+    groups = group_regions([(0.0, 100.0)], 30, 60, samples)
+    assert 41.5 <= boundaries(groups)[0] <= 42.0
+    assert [len(group) for group in groups] == [1, 1]
+
+
+def test_long_region_hard_cut_without_samples():
+    groups = group_regions([(0.0, 130.0)], 30, 60)
+    assert [group[0] for group in groups] == [(0.0, 60.0), (60.0, 120.0), (120.0, 130.0)]
+
+
+@pytest.fixture
+def slot_dir(tmp_path, monkeypatch):
+    # 名额锁文件放在临时目录，不与本机其他进程共享
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+
+
+@pytest.mark.parametrize('use_flock', [True, False])
+def test_ffmpeg_slot_limits_concurrency(app, slot_dir, monkeypatch, use_flock):
+    if not use_flock:
+        monkeypatch.setattr(audio_processing, 'fcntl', None)
+    app.config['AUDIO_NORMALIZE_WORKERS'] = 2
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def convert():
+        with app.app_context(), ffmpeg_slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.1)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=convert) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_ffmpeg_slot_wait_timeout(app, slot_dir):
+    app.config.update(AUDIO_NORMALIZE_WORKERS=1, AUDIO_NORMALIZE_WAIT=0.2)
+    with ffmpeg_slot():
+        with pytest.raises(RuntimeError, match='Timed out'):
+            with ffmpeg_slot():
+                pass
+    with ffmpeg_slot():
+        pass
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    calls = []
+
+    def run(args):
+        calls.append(args)
+        with open(args[-1], 'wb') as f:
+            f.write(np.arange(100, dtype='<i2').tobytes())
+        return ''
+    monkeypatch.setattr(audio_processing, 'run_ffmpeg', run)
+    return calls
+
+
+def test_normalized_pcm_is_cached_by_content(app, slot_dir, fake_ffmpeg, tmp_path):
+    first = tmp_path / 'call.wav'
+    first.write_bytes(b'RIFF recording')
+    copy = tmp_path / 'copy.wav'
+    copy.write_bytes(b'RIFF recording')
+
+    path = normalized_pcm(str(first))
+    assert len(fake_ffmpeg) == 1
+    assert load_pcm(path).tolist() == list(range(100))
+    # 同一内容（另一个文件、或已知哈希）直接复用缓存，不再转码
+    assert normalized_pcm(str(copy)) == path
+    assert normalized_pcm(str(first), file_sha256(str(first))) == path
+    assert len(fake_ffmpeg) == 1
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
+
+    other = tmp_path / 'other.wav'
+    other.write_bytes(b'RIFF another recording')
+    assert normalized_pcm(str(other)) != path
+    assert len(fake_ffmpeg) == 2
+
+
+def test_failed_conversion_leaves_no_cache(app, slot_dir, monkeypatch, tmp_path):
+    def fail(args):
+        open(args[-1], 'wb').close()
+        raise RuntimeError('ffmpeg failed: Invalid data')
+    monkeypatch.setattr(audio_processing, 'run_ffmpeg', fail)
+    source = tmp_path / 'broken.wav'
+    source.write_bytes(b'not audio')
+    with pytest.raises(RuntimeError):
+        normalized_pcm(str(source))
+    assert [files for _, _, files in os.walk(normalized_cache_root()) if files] == []
@@ -0,0 +1,81 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+from src import db
+from src.blob_store import MediaBlob, acquire_blob, find_blob, prune_blobs, release_blob, store_stream
+
+
+def backdate(blob, hours=2):
+    """让内容与文件都早于清理的宽限期"""
+    MediaBlob.query.filter_by(sha256=blob.sha256).update(
+        {'updated_at': datetime.utcnow() - timedelta(hours=hours)})
+    past = time.time() - hours * 3600
+    os.utime(blob.path, (past, past))
+
+
+def ref_count(blob):
+    return db.session.get(MediaBlob, blob.sha256).ref_count
+
+
+def test_same_content_stored_once(session):
+    first = store_stream(io.BytesIO(b'recording'))
+    acquire_blob(first)
+    session.commit()
+    second = store_stream(io.BytesIO(b'recording'))
+    acquire_blob(second)
+    session.commit()
+    assert first == second
+    assert ref_count(first) == 2
+    assert os.listdir(os.path.dirname(first.path)) == [first.sha256]
+
+
+def test_release_never_goes_negative(session):
+    blob = store_stream(io.BytesIO(b'evidence'))
+    acquire_blob(blob)
+    session.commit()
+    release_blob(blob.sha256)
+    release_blob(blob.sha256)
+    session.commit()
+    assert ref_count(blob) == 0
+
+
+def test_prune_keeps_referenced_and_removes_released(session):
+    kept = store_stream(io.BytesIO(b'kept'))
+    dropped = store_stream(io.BytesIO(b'dropped'))
+    acquire_blob(kept)
+    acquire_blob(dropped)
+    session.commit()
+    release_blob(dropped.sha256)
+    session.commit()
+    backdate(kept)
+    backdate(dropped)
+    session.commit()
+
+    assert prune_blobs(grace_seconds=3600) == 1
+    assert os.path.exists(kept.path)
+    assert not os.path.exists(dropped.path)
+    assert db.session.get(MediaBlob, dropped.sha256) is None
+    assert find_blob(dropped.sha256) is None
+    assert find_blob(kept.sha256) == kept
+
+
+def test_prune_skips_recently_reused_content(session):
+    blob = store_stream(io.BytesIO(b'reused'))
+    acquire_blob(blob)
+    release_blob(blob.sha256)
+    session.commit()
+    backdate(blob)
+    session.commit()
+    # 秒传刷新了文件修改时间：清理跳过该内容
+    assert find_blob(blob.sha256) == blob
+    assert prune_blobs(grace_seconds=3600) == 0
+    assert os.path.exists(blob.path)
+
+
+def test_prune_removes_orphan_files(session):
+    blob = store_stream(io.BytesIO(b'orphan'))
+    backdate(blob)
+    assert prune_blobs(grace_seconds=3600) == 1
+    assert not os.path.exists(blob.path)
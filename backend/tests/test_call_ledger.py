@@ -0,0 +1,199 @@
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src import db
+from src.alarm_log_ledger.ledger import get_buffer, insert_new_calls
+from src.alarm_log_ledger.models import CallRecord
+from src.alarm_log_ledger.routes import build_call_values
+
+
+def call(call_id, start_time='2025-06-01T08:00:00', **fields):
+    return build_call_values(dict(fields, call_id=call_id, start_time=start_time,
+                                  caller_number='13800138000'))
+
+
+def stored_calls(session):
+    # 结束当前读事务，看到写入线程已提交的数据
+    session.rollback()
+    return sorted((row.call_id, row.start_time.isoformat()) for row in CallRecord.query.all())
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def stop_writer(buffer):
+    """停止后台写入线程，之后只有显式 flush 会写入"""
+    buffer.closed = True
+    with buffer.condition:
+        buffer.condition.notify()
+    buffer.thread.join(timeout=5)
+
+
+@pytest.fixture
+def ledger(app):
+    """按测试配置创建写入缓冲，结束时停止写入线程"""
+    def make(**config):
+        app.config.update(config)
+        return get_buffer()
+    yield make
+    buffer = app.extensions.pop('call_ledger_buffer', None)
+    if buffer is not None:
+        buffer.rows = []
+        stop_writer(buffer)
+
+
+def fail_writes(monkeypatch, buffer):
+    def write(batch):
+        raise OperationalError('INSERT INTO call_ledger', {}, Exception('database is locked'))
+    monkeypatch.setattr(buffer, '_write', write)
+
+
+def test_flushes_when_row_count_reached(session, ledger):
+    buffer = ledger(LEDGER_FLUSH_ROWS=3, LEDGER_FLUSH_INTERVAL_MS=60000)
+    buffer.append([call('c1'), call('c2')])
+    time.sleep(0.2)
+    assert buffer.pending() == 2
+
+    buffer.append([call('c3')])
+    assert wait_for(lambda: len(stored_calls(session)) == 3)
+    assert buffer.pending() == 0
+    assert buffer.stats['batches'] == 1
+
+
+def test_flushes_after_interval(session, ledger):
+    buffer = ledger(LEDGER_FLUSH_ROWS=500, LEDGER_FLUSH_INTERVAL_MS=50)
+    buffer.append([call('c1')])
+    assert wait_for(lambda: stored_calls(session) == [('c1', '2025-06-01T08:00:00')])
+    assert buffer.stats['written'] == 1
+
+
+def test_duplicates_counted_not_written(session, ledger):
+    buffer = ledger(LEDGER_FLUSH_ROWS=500, LEDGER_FLUSH_INTERVAL_MS=60000)
+    buffer.append([call('c1'), call('c2')])
+    buffer.flush()
+    # 重复上报的 c1、批内重复的 c3；同一 call_id 在另一时间视为不同呼叫
+    buffer.append([call('c1'), call('c3'), call('c3'), call('c1', start_time='2025-06-02T08:00:00')])
+    buffer.flush()
+
+    assert stored_calls(session) == [
+        ('c1', '2025-06-01T08:00:00'), ('c1', '2025-06-02T08:00:00'),
+        ('c2', '2025-06-01T08:00:00'), ('c3', '2025-06-01T08:00:00'),
+    ]
+    assert buffer.stats['written'] == 4
+    assert buffer.stats['duplicates'] == 2
+    assert buffer.stats['rejected'] == 0
+
+
+def test_insert_new_calls_returns_new_row_count(session):
+    with db.engine.begin() as connection:
+        assert insert_new_calls(connection, [call('c1'), call('c2')]) == 2
+    with db.engine.begin() as connection:
+        assert insert_new_calls(connection, [call('c2'), call('c3'), call('c3')]) == 1
+
+
+def test_failed_flush_requeues_rows(session, ledger, monkeypatch):
+    buffer = ledger(LEDGER_FLUSH_ROWS=2, LEDGER_FLUSH_INTERVAL_MS=10)
+    stop_writer(buffer)
+    fail_writes(monkeypatch, buffer)
+    buffer.append([call('c1'), call('c2'), call('c3')])
+    buffer.flush()
+    assert buffer.pending() == 3
+    assert 'database is locked' in buffer.stats['last_error']
+
+    monkeypatch.undo()
+    buffer.flush()
+    assert buffer.pending() == 0
+    assert [call_id for call_id, _ in stored_calls(session)] == ['c1', 'c2', 'c3']
+
+
+def test_malformed_rows_rejected_individually(session, ledger):
+    buffer = ledger(LEDGER_FLUSH_ROWS=500, LEDGER_FLUSH_INTERVAL_MS=60000)
+    missing_start = call('c2')
+    del missing_start['start_time']
+    buffer.append([call('c1'), missing_start, dict(call('c3'), start_time='not a time'), call('c4')])
+    buffer.flush()
+
+    # 格式错误的行不放回缓冲，否则每次写入都会失败
+    assert buffer.pending() == 0
+    assert [call_id for call_id, _ in stored_calls(session)] == ['c1', 'c4']
+    assert (buffer.stats['written'], buffer.stats['rejected']) == (2, 2)
+
+
+def test_writer_thread_survives_unexpected_errors(session, ledger, monkeypatch):
+    buffer = ledger(LEDGER_FLUSH_ROWS=1, LEDGER_FLUSH_INTERVAL_MS=10)
+    write = buffer._write
+    failures = []
+
+    def fail_once(batch):
+        if not failures:
+            failures.append(batch)
+            raise KeyError('call_id')
+        write(batch)
+    monkeypatch.setattr(buffer, '_write', fail_once)
+
+    buffer.append([call('c1')])
+    assert wait_for(lambda: buffer.stats['rejected'] == 1)
+    buffer.append([call('c2')])
+    assert wait_for(lambda: [call_id for call_id, _ in stored_calls(session)] == ['c2'])
+    assert buffer.thread.is_alive()
+
+    # flush 本身抛出异常时写入线程记录错误后继续运行
+    monkeypatch.setattr(buffer, '_take', lambda: 1 / 0)
+    assert wait_for(lambda: 'division by zero' in (buffer.stats['last_error'] or ''))
+    assert buffer.thread.is_alive()
+
+
+def test_full_buffer_returns_503(app, session, ledger, monkeypatch):
+    buffer = ledger(LEDGER_FLUSH_ROWS=500, LEDGER_FLUSH_INTERVAL_MS=10, LEDGER_BUFFER_MAX_ROWS=2)
+    stop_writer(buffer)
+    fail_writes(monkeypatch, buffer)
+    client = app.test_client()
+    rows = [{'call_id': 'c1', 'start_time': '2025-06-01T08:00:00'},
+            {'call_id': 'c2', 'start_time': '2025-06-01T08:00:00'}]
+
+    response = client.post('/api/ledger/calls', json=rows)
+    assert response.status_code == 202
+    response = client.post('/api/ledger/calls', json={'call_id': 'c3', 'start_time': '2025-06-01T08:00:00'})
+    assert response.status_code == 503
+    assert buffer.pending() == 2
+
+
+def test_record_calls_reports_errors_per_row(app, session, ledger):
+    buffer = ledger(LEDGER_FLUSH_ROWS=500, LEDGER_FLUSH_INTERVAL_MS=60000)
+    client = app.test_client()
+    body = '\n'.join([
+        '{"call_id": "c1", "start_time": "2025-06-01T08:00:00Z"}',
+        '{"call_id": "c2"}',
+        'not json',
+        '',
+        '{"call_id": "c3", "start_time": "2025-06-01T08:00:00", "direction": "sideways"}',
+        '{"call_id": "c4", "start_time": "2025-06-01T08:05:00", "end_time": "2025-06-01T08:00:00"}',
+    ])
+    response = client.post('/api/ledger/calls', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 202
+    data = response.get_json()['data']
+    assert (data['total'], data['accepted'], data['failed']) == (5, 1, 4)
+    assert [error['index'] for error in data['errors']] == [1, 2, 3, 4]
+    assert 'start_time is required' in data['errors'][0]['error']
+    assert buffer.pending() == 1
+
+    assert client.post('/api/ledger/calls', data='{"broken"', content_type='application/json').status_code == 400
+    assert client.post('/api/ledger/calls', json=[]).status_code == 400
+
+
+def test_build_call_values_derives_durations():
+    values = build_call_values({
+        'call_id': 'c1', 'start_time': '2025-06-01T08:00:00+08:00',
+        'answer_time': '2025-06-01T08:00:10+08:00', 'end_time': '2025-06-01T08:01:40+08:00',
+    })
+    assert values['start_time'] == datetime(2025, 6, 1, 0, 0, 0)
+    assert (values['duration'], values['talk_duration'], values['disposition']) == (100, 90, 'answered')
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.alarm_unified_access import routes
+from src.alarm_unified_access.caller_stats import record_calls
+from src.alarm_unified_access.models import AlarmRecord, CallerStats
+from src.phone_numbers import normalize_phone
+
+
+def alarm(i, phone, alarm_type=None):
+    return {
+        'event_time': '2025-06-01T08:00:00',
+        'event_location_address': f'建设路{i}号',
+        'brief_summary': f'报警 {i}',
+        'reporter_phone': phone,
+        'alarm_type': alarm_type,
+    }
+
+
+def caller(client, phone, recent=0):
+    response = client.get(f'/api/alarm/callers/{phone}?recent={recent}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_counters_follow_repeated_ingests_of_same_number(app, session):
+    client = app.test_client()
+    client.post('/api/alarm/', json=alarm(1, '+86 138-0013-8000', '交通事故'))
+    client.post('/api/alarm/', json=alarm(2, '13800138000', '纠纷/邻里纠纷'))
+    client.post('/api/alarm/batch', json=[
+        alarm(3, '8613800138000', '交通事故'),
+        alarm(4, '0086 138 0013 8000', '火灾'),
+        alarm(5, '13900139000', '火灾'),
+    ])
+
+    stats = caller(client, '138-0013-8000', recent=10)
+    alarms = AlarmRecord.query.filter_by(reporter_phone_normalized='13800138000').order_by(AlarmRecord.id).all()
+    assert stats['phone'] == '13800138000'
+    assert stats['total_calls'] == len(alarms) == 4
+    assert stats['first_call_at'] == alarms[0].alarm_time.isoformat()
+    assert stats['last_call_at'] == alarms[-1].alarm_time.isoformat()
+    assert stats['last_alarm_id'] == alarms[-1].id
+    assert stats['last_alarm_types'] == ['火灾', '交通事故', '纠纷/邻里纠纷']
+    assert [item['id'] for item in stats['recent_alarms']] == [alarm.id for alarm in reversed(alarms)]
+    assert caller(client, '13900139000')['total_calls'] == 1
+
+
+@pytest.mark.parametrize('raw, normalized', [
+    ('+86 138-0013-8000', '13800138000'),
+    ('0086 138 0013 8000', '13800138000'),
+    ('+86 10 1234 5678', '01012345678'),    # 国际格式的固话：去掉 86 并补回字冠 0
+    ('0086-21-6234-5678', '02162345678'),
+    ('+86 755 2345 6789', '075523456789'),
+    ('+86 (0)10 1234 5678', '01012345678'),  # 保留了字冠 0 的写法
+    ('010-12345678', '01012345678'),
+    ('86123456', '86123456'),                # 以 86 开头的本地号码不当作国家码
+    ('8612345678', '8612345678'),
+    ('110', None),
+    (None, None),
+])
+def test_normalize_phone(raw, normalized):
+    assert normalize_phone(raw) == normalized
+
+
+def test_international_landline_counts_as_same_caller(app, session):
+    client = app.test_client()
+    client.post('/api/alarm/', json=alarm(1, '010-12345678', '火灾'))
+    client.post('/api/alarm/', json=alarm(2, '+86 10 1234 5678', '交通事故'))
+    assert caller(client, '01012345678')['total_calls'] == 2
+
+
+def test_unknown_and_invalid_numbers(app, session):
+    client = app.test_client()
+    assert caller(client, '13700137000') == {
+        'phone': '13700137000', 'total_calls': 0, 'first_call_at': None, 'last_call_at': None,
+        'last_alarm_id': None, 'last_alarm_types': [],
+    }
+    assert client.get('/api/alarm/callers/110').status_code == 400
+    assert client.get('/api/alarm/callers/13700137000?recent=51').status_code == 400
+
+
+def test_rolled_back_insert_does_not_count(app, session, monkeypatch):
+    client = app.test_client()
+    client.post('/api/alarm/', json=alarm(1, '13800138000', '火灾'))
+
+    def fail(mappings):
+        raise OperationalError('INSERT INTO alarm_records', {}, Exception('disk I/O error'))
+    monkeypatch.setattr(routes, 'insert_alarm_rows', fail)
+    client.post('/api/alarm/batch', json=[alarm(2, '13800138000', '交通事故')])
+
+    stats = caller(client, '13800138000')
+    assert stats['total_calls'] == 1
+    assert stats['last_alarm_types'] == ['火灾']
+
+
+def test_record_calls_orders_by_alarm_time(session):
+    record_calls([
+        ('13800138000', 1, datetime(2025, 6, 1, 10), '火灾'),
+        ('13800138000', 2, datetime(2025, 6, 1, 8), '交通事故'),
+        (None, 3, datetime(2025, 6, 1, 9), '火灾'),
+    ])
+    # 稍后导入的较早警情不改变最近一次报警
+    record_calls([('13800138000', 4, datetime(2025, 6, 1, 7), '纠纷/邻里纠纷')])
+    session.commit()
+
+    stats = session.get(CallerStats, '13800138000')
+    assert stats.total_calls == 3
+    assert stats.first_call_at == datetime(2025, 6, 1, 7)
+    assert stats.last_call_at == datetime(2025, 6, 1, 10)
+    assert stats.last_alarm_id == 1
+    assert stats.last_alarm_types == ['火灾', '交通事故']
+    assert session.query(CallerStats).count() == 1
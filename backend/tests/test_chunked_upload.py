@@ -0,0 +1,123 @@
+import fcntl
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from src import chunked_upload
+from src.chunked_upload import UploadError, append_chunk, finalize_upload, init_upload, load_session
+
+PAYLOAD = b'0123456789' * 3
+
+
+def start(total_size=len(PAYLOAD), sha256=hashlib.sha256(PAYLOAD).hexdigest()):
+    return init_upload('alarm', 1, 'call.wav', total_size, sha256)['upload_id']
+
+
+def test_resume_after_offset_mismatch(app):
+    upload_id = start()
+    assert append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD[:12])) == 12
+
+    # 客户端以为上一片没送达，从旧的位置重发：拒绝并告知服务端已收到的字节数
+    with pytest.raises(UploadError) as error:
+        append_chunk(upload_id, 'alarm', 5, io.BytesIO(PAYLOAD[5:12]))
+    assert error.value.status_code == 409
+    assert error.value.offset == 12
+    assert load_session(upload_id)['offset'] == 12
+
+    # 换到另一个 worker（进程内没有摘要状态）后续传，摘要从磁盘补算
+    chunked_upload._hashers.clear()
+    assert append_chunk(upload_id, 'alarm', 12, io.BytesIO(PAYLOAD[12:])) == len(PAYLOAD)
+    meta, path, digest = finalize_upload(upload_id, 'alarm')
+    assert digest == hashlib.sha256(PAYLOAD).hexdigest()
+    with open(path, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+
+def test_chunk_beyond_declared_size_is_rolled_back(app):
+    upload_id = start()
+    append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD[:20]))
+    with pytest.raises(UploadError) as error:
+        append_chunk(upload_id, 'alarm', 20, io.BytesIO(PAYLOAD[20:] + b'extra'))
+    assert error.value.status_code == 413
+    assert load_session(upload_id)['offset'] == 20
+    append_chunk(upload_id, 'alarm', 20, io.BytesIO(PAYLOAD[20:]))
+    assert finalize_upload(upload_id, 'alarm')[2] == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def test_finalize_checks_size_and_digest(app):
+    upload_id = start()
+    append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD[:10]))
+    with pytest.raises(UploadError) as error:
+        finalize_upload(upload_id, 'alarm')
+    assert (error.value.status_code, error.value.offset) == (409, 10)
+
+    upload_id = start(sha256='0' * 64)
+    append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD))
+    with pytest.raises(UploadError) as error:
+        finalize_upload(upload_id, 'alarm')
+    assert error.value.status_code == 422
+
+
+def test_session_belongs_to_target(app):
+    upload_id = start()
+    with pytest.raises(UploadError) as error:
+        append_chunk(upload_id, 'evidence', 0, io.BytesIO(PAYLOAD))
+    assert error.value.status_code == 404
+    with pytest.raises(UploadError):
+        load_session('../etc')
+
+
+def test_append_waits_for_lock_held_by_another_process(app):
+    upload_id = start()
+    results = []
+
+    def append():
+        with app.app_context():
+            results.append(append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD[:12])))
+            try:
+                append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD[:12]))
+            except UploadError as e:
+                results.append(e.status_code)
+
+    # 另一个 worker 持有会话锁时（独立打开的文件上的 flock），分片须等待
+    with open(chunked_upload.meta_path(upload_id), 'rb') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        worker = threading.Thread(target=append)
+        worker.start()
+        worker.join(0.3)
+        assert worker.is_alive() and results == []
+        fcntl.flock(handle, fcntl.LOCK_UN)
+    worker.join(5)
+    # 同一偏移的第二个分片在偏移检查时被拒绝，不会重复写入
+    assert results == [12, 409]
+    assert load_session(upload_id)['offset'] == 12
+
+
+def test_unknown_total_size_is_capped(app):
+    app.config['CHUNKED_UPLOAD_MAX_SIZE'] = 20
+    upload_id = init_upload('alarm', 1, 'call.wav')['upload_id']
+    append_chunk(upload_id, 'alarm', 0, io.BytesIO(PAYLOAD[:15]))
+    with pytest.raises(UploadError) as error:
+        append_chunk(upload_id, 'alarm', 15, io.BytesIO(PAYLOAD[15:]))
+    assert (error.value.status_code, error.value.offset) == (413, 15)
+    assert load_session(upload_id)['offset'] == 15
+
+
+def test_expired_sessions_are_purged(app):
+    app.config['CHUNKED_UPLOAD_EXPIRY'] = 3600
+    stale, active = start(), start()
+    append_chunk(active, 'alarm', 0, io.BytesIO(PAYLOAD[:10]))
+    an_hour_ago = time.time() - 3601
+    os.utime(chunked_upload.data_path(stale), (an_hour_ago, an_hour_ago))
+
+    # 创建新会话时清理
+    start()
+    with pytest.raises(UploadError) as error:
+        load_session(stale)
+    assert error.value.status_code == 404
+    assert load_session(active)['offset'] == 10
+    assert chunked_upload.purge_expired_uploads(now=time.time() + 3601) == 2
@@ -0,0 +1,117 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src import db
+from src.alarm_unified_access import dedup, routes
+from src.alarm_unified_access.dedup import find_primary, register
+from src.alarm_unified_access.models import AlarmRecord
+
+NOW = 1_750_000_000.0
+WINDOW = 600
+
+
+@pytest.fixture(autouse=True)
+def local_index(app):
+    """未配置 Redis，使用进程内索引"""
+    app.config.update(DUPLICATE_WINDOW_SECONDS=WINDOW, DUPLICATE_RADIUS=300)
+    dedup._local_store.clear()
+    yield dedup._local_store
+    dedup._local_store.clear()
+
+
+def alarm_values(phone=None, lon=None, lat=None):
+    return {'reporter_phone': phone, 'event_location_longitude': lon, 'event_location_latitude': lat}
+
+
+def alarm(i, **fields):
+    return dict({
+        'event_time': '2025-06-01T08:00:00',
+        'event_location_address': f'建设路{i}号',
+        'brief_summary': f'有人打架 {i}',
+    }, **fields)
+
+
+def test_phone_match_within_window():
+    register(1, alarm_values(phone='138-0013-8000'), now=NOW)
+    assert find_primary(alarm_values(phone='+86 13800138000'), now=NOW + WINDOW - 1) == (1, 'phone')
+    assert find_primary(alarm_values(phone='13800138000'), now=NOW + WINDOW + 1) == (None, None)
+    assert find_primary(alarm_values(phone='13900139000'), now=NOW + 1) == (None, None)
+
+
+def test_location_match_in_neighbouring_cell():
+    # 两点相距约 90 米，跨越 16 位格网的边界
+    register(1, alarm_values(lon=116.400, lat=39.900), now=NOW)
+    assert dedup.cell_xy(116.400, 39.900, 16) != dedup.cell_xy(116.401, 39.9003, 16)
+    assert find_primary(alarm_values(lon=116.401, lat=39.9003), now=NOW + 60) == (1, 'location')
+    # 超出判定距离
+    assert find_primary(alarm_values(lon=116.406, lat=39.900), now=NOW + 60) == (None, None)
+
+
+def test_location_match_across_time_buckets():
+    bucket_end = (NOW // WINDOW + 1) * WINDOW - 1
+    register(1, alarm_values(lon=116.4, lat=39.9), now=bucket_end)
+    assert find_primary(alarm_values(lon=116.4, lat=39.9), now=bucket_end + 2) == (1, 'location')
+    assert find_primary(alarm_values(lon=116.4, lat=39.9), now=bucket_end + WINDOW + 2) == (None, None)
+
+
+def test_location_match_across_antimeridian():
+    register(1, alarm_values(lon=179.9995, lat=-16.5), now=NOW)
+    assert find_primary(alarm_values(lon=-179.9995, lat=-16.5), now=NOW + 1) == (1, 'location')
+
+
+def test_phone_match_preferred_and_window_extended():
+    register(1, alarm_values(lon=116.4, lat=39.9), now=NOW)
+    register(2, alarm_values(phone='13800138000'), now=NOW + 10)
+    assert find_primary(alarm_values(phone='13800138000', lon=116.4, lat=39.9), now=NOW + 20) == (2, 'phone')
+    # 重复报警以主警情 id 登记，窗口随之顺延
+    register(3, alarm_values(phone='13800138000'), primary_id=2, now=NOW + 500)
+    assert find_primary(alarm_values(phone='13800138000'), now=NOW + 1000) == (2, 'phone')
+
+
+def test_disabled(app):
+    app.config['DUPLICATE_DETECTION_ENABLED'] = False
+    register(1, alarm_values(phone='13800138000'), now=NOW)
+    assert dedup._local_store == {}
+    assert find_primary(alarm_values(phone='13800138000'), now=NOW) == (None, None)
+
+
+def test_registered_only_after_commit(app, session, monkeypatch):
+    register_for_dedup = routes.register_for_dedup
+    committed = []
+
+    def check_committed(alarm_id, values, primary_id=None):
+        # 另开连接读取：只能看到已提交的警情
+        with db.engine.connect() as connection:
+            committed.append(connection.execute(
+                text('SELECT COUNT(*) FROM alarm_records WHERE id = :id'), {'id': alarm_id}).scalar())
+        register_for_dedup(alarm_id, values, primary_id)
+    monkeypatch.setattr(routes, 'register_for_dedup', check_committed)
+
+    client = app.test_client()
+    first = client.post('/api/alarm/', json=alarm(1, reporter_phone='13800138000')).get_json()['data']
+    second = client.post('/api/alarm/', json=alarm(2, reporter_phone='138 0013 8000')).get_json()['data']
+    batch = client.post('/api/alarm/batch', json=[alarm(3, reporter_phone='13800138000')]).get_json()['data']
+    assert committed == [1, 1, 1]
+    assert second['primary_alarm_id'] == first['id']
+    assert second['duplicate_reason'] == 'phone'
+    assert batch['results'][0]['primary_alarm_id'] == first['id']
+
+
+def test_rolled_back_insert_leaves_no_key(app, session, local_index, monkeypatch):
+    def fail(calls):
+        raise OperationalError('UPDATE caller_stats', {}, Exception('lock wait timeout'))
+    monkeypatch.setattr(routes, 'record_calls', fail)
+
+    client = app.test_client()
+    response = client.post('/api/alarm/', json=alarm(1, reporter_phone='13800138000',
+                                                      event_location_longitude=116.4,
+                                                      event_location_latitude=39.9))
+    assert response.status_code == 500
+    response = client.post('/api/alarm/batch', json=[alarm(2, reporter_phone='13800138000')])
+    assert response.status_code == 207
+    assert 'error' in response.get_json()['data']['results'][0]
+
+    assert local_index == {}
+    assert AlarmRecord.query.count() == 0
+    assert find_primary(alarm_values(phone='13800138000', lon=116.4, lat=39.9)) == (None, None)
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+
+from src.alarm_unified_access.extraction import KeywordAutomaton, cn_to_int, engine
+
+# 报警时间
+REFERENCE = datetime(2025, 6, 1, 14, 30)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('昨晚十一点半我停在楼下的电动车被偷了', [('昨晚十一点半', '2025-05-31T23:30:00')]),
+    ('今天早上8点20分在长安街上发生追尾', [('今天早上8点20分', '2025-06-01T08:20:00')]),
+    ('中午十二点一刻有人在店里闹事', [('中午十二点一刻', '2025-06-01T12:15:00')]),
+    ('下午两点一刻我从银行出来包就被抢了', [('下午两点一刻', '2025-06-01T14:15:00')]),
+    # 未指明日期且晚于报警时间的，视为前一天
+    ('晚上九点左右楼上一直在吵', [('晚上九点', '2025-05-31T21:00:00')]),
+    ('凌晨12点有人在学校门口打架', [('凌晨12点', '2025-06-01T00:00:00')]),
+    ('大概13:05的时候我发现钱包没了', [('13:05', '2025-06-01T13:05:00')]),
+    ('大概十分钟前有人在人民公园打架', [('十分钟前', '2025-06-01T14:20:00')]),
+    ('半小时前邻居太吵了', [('半小时前', '2025-06-01T14:00:00')]),
+    ('两个钟头以前我爸出门就没回来', [('两个钟头以前', '2025-06-01T12:30:00')]),
+    ('6月1日我在网上刷单被骗了三万块', [('6月1日', None)]),
+    ('你们快一点过来，多派一点人', []),
+])
+def test_times(text, expected):
+    times = engine.extract(text, REFERENCE)['times']
+    assert [(t['text'], t['value']) for t in times] == expected
+
+
+def test_times_without_reference_keep_text():
+    times = engine.extract('昨晚十一点半被偷了')['times']
+    assert times == [{'text': '昨晚十一点半', 'value': None}]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('喂，你好，我在朝阳区建国路88号门口，刚才有人抢了我的包', ['朝阳区建国路88号']),
+    ('我家在海淀区中关村大街27号院3号楼2单元501室，家里进了小偷', ['海淀区中关村大街27号院3号楼2单元501室']),
+    ('我在东城区和平里街道和平里小区门口', ['东城区和平里街道和平里小区']),
+    ('着火了，幸福小区5栋12楼冒烟了', ['幸福小区5栋12楼']),
+    ('有人在人民公园打架，就在解放路这边', ['人民公园', '解放路']),
+    ('我是说我住这儿，你们快点来', []),
+])
+def test_addresses(text, expected):
+    assert engine.extract(text)['addresses'] == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('我的电话是138 0013 8000，你们快一点过来', ['13800138000']),
+    ('手机号13800138000，座机010-62345678', ['13800138000', '01062345678']),
+    ('打0755 23456789找我', ['075523456789']),
+    ('我的号码是138001380001', []),
+    ('车牌尾号是12345678', []),
+])
+def test_phones(text, expected):
+    assert engine.extract(text)['phones'] == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('车牌是京A·12345，另一辆是粤B D1234', ['京A12345', '粤BD1234']),
+    ('浙ad12345撞人了', ['浙AD12345']),
+    ('一辆苏E1234学的教练车', ['苏E1234学']),
+    ('京A123', []),
+])
+def test_plates(text, expected):
+    assert engine.extract(text)['plates'] == expected
+
+
+@pytest.mark.parametrize('text, suggested, keywords', [
+    ('家里进了小偷，门被撬锁了', '刑事案件/盗窃/入室盗窃', ['家里进了小偷', '撬锁']),
+    ('昨晚十一点半我停在楼下的电动车被偷了', '刑事案件/盗窃', ['被偷']),
+    ('刚才有人抢了我的包，往东跑了', '刑事案件/抢劫', ['抢了']),
+    ('大概十分钟前有人在人民公园打架', '治安案件/殴打他人', ['打架']),
+    ('救命，我老公打我', '纠纷/家庭纠纷', ['老公打我']),
+    ('半小时前邻居太吵了，一直噪音扰民', '纠纷/邻里纠纷', ['太吵了', '噪音扰民']),
+    ('在长安街上发生追尾', '交通事故', ['追尾']),
+    ('着火了，幸福小区冒烟了', '火灾', ['着火', '冒烟']),
+    ('在万达广场走丢了一个小孩，找不到孩子了', '求助/人员走失', ['走丢', '找不到孩子']),
+    ('我在网上刷单被骗了三万块', '刑事案件/诈骗', ['刷单', '被骗']),
+    ('我想咨询一下户口怎么办', None, None),
+])
+def test_alarm_types(text, suggested, keywords):
+    result = engine.extract(text)
+    assert result['suggested_alarm_type'] == suggested
+    if keywords:
+        assert result['alarm_types'][0]['keywords'] == keywords
+
+
+@pytest.mark.parametrize('text, level, keywords', [
+    ('有人在人民公园打架，有人拿刀，流了很多血', '非常紧急', ['拿刀', '流了很多血']),
+    ('救命，我老公打我，他还在打', '非常紧急', ['救命', '还在打']),
+    ('浙AD12345撞人了，人还在地上', '紧急', ['撞人', '人还在']),
+    ('昨晚电动车被偷了', '一般', []),
+])
+def test_emergency_level(text, level, keywords):
+    assert engine.extract(text)['emergency'] == {'level': level, 'keywords': keywords}
+
+
+def test_segment_tags_removed():
+    text = '[00:00.0-00:30.0] 我在解放路\n[00:30.0-01:00.0] 有人持刀抢劫'
+    result = engine.extract(text, REFERENCE)
+    assert result['addresses'] == ['解放路']
+    assert result['times'] == []
+    assert result['suggested_alarm_type'] == '刑事案件/抢劫'
+    assert result['emergency']['level'] == '非常紧急'
+
+
+def test_automaton_finds_overlapping_and_longest():
+    automaton = KeywordAutomaton([('he', 1), ('she', 2), ('his', 3), ('hers', 4)])
+    assert sorted(word for _, _, word, _ in automaton.finditer('ushers')) == ['he', 'hers', 'she']
+    assert [word for _, _, word, _ in automaton.findall_longest('ushers')] == ['she']
+    assert [(start, end) for start, end, word, _ in automaton.finditer('ahishers') if word == 'his'] == [(1, 4)]
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('11', 11), ('十', 10), ('十一', 11), ('二十', 20), ('二十三', 23), ('两', 2), ('零五', 5), ('几', None),
+])
+def test_cn_to_int(value, expected):
+    assert cn_to_int(value) == expected
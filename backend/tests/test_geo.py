@@ -0,0 +1,175 @@
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from src.alarm_unified_access.models import AlarmRecord
+from src.geo import CELL_BITS, EARTH_RADIUS, circle_bboxes, cover_ranges, encode_cell, haversine
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(code, length):
+    bits = code >> (2 * CELL_BITS - 5 * length)
+    return ''.join(GEOHASH_ALPHABET[(bits >> (5 * i)) & 31] for i in range(length - 1, -1, -1))
+
+
+def destination(longitude, latitude, distance, bearing):
+    """从某点沿方位角 bearing（度）移动 distance 米后的坐标"""
+    angle = distance / EARTH_RADIUS
+    lat1, lon1, theta = math.radians(latitude), math.radians(longitude), math.radians(bearing)
+    lat2 = math.asin(math.sin(lat1) * math.cos(angle) + math.cos(lat1) * math.sin(angle) * math.cos(theta))
+    lon2 = lon1 + math.atan2(math.sin(theta) * math.sin(angle) * math.cos(lat1),
+                             math.cos(angle) - math.sin(lat1) * math.sin(lat2))
+    return (math.degrees(lon2) + 540) % 360 - 180, math.degrees(lat2)
+
+
+def covered(ranges, longitude, latitude):
+    cell = encode_cell(longitude, latitude)
+    return any(start <= cell <= end for start, end in ranges)
+
+
+def in_bbox(bbox, longitude, latitude):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat
+
+
+def test_encode_cell_matches_geohash_bit_order():
+    assert geohash(encode_cell(10.40744, 57.64911), 10) == 'u4pruydqqv'
+    assert geohash(encode_cell(116.3913, 39.9075), 6) == 'wx4g08'
+    assert encode_cell(-180, -90) == 0
+    assert encode_cell(180, 90) == (1 << 2 * CELL_BITS) - 1
+    assert encode_cell(None, 39.9) is None
+
+
+@pytest.mark.parametrize('bbox', [
+    (116.30, 39.90, 116.31, 39.91),
+    (116.0, 39.0, 117.0, 40.0),
+    # 跨越本初子午线、赤道及高层格网边界
+    (-0.5, -0.5, 0.5, 0.5),
+    (-1e-9, -1e-9, 1e-9, 1e-9),
+    (89.9, 44.9, 90.1, 45.1),
+    (-180.0, -90.0, 180.0, 90.0),
+    (179.5, 10.0, 180.0, 11.0),
+    (-180.0, 10.0, -179.5, 11.0),
+    (-20.0, 89.5, 20.0, 90.0),
+    (0.0, -90.0, 0.0, -89.9),
+])
+def test_cover_ranges_contain_every_point_in_bbox(bbox):
+    rnd = random.Random(str(bbox))
+    min_lon, min_lat, max_lon, max_lat = bbox
+    for max_cells in (1, 4, 16):
+        ranges = cover_ranges(*bbox, max_cells=max_cells)
+        assert len(ranges) <= max_cells
+        assert all(start <= end for start, end in ranges)
+        assert all(a[1] + 1 < b[0] for a, b in zip(ranges, ranges[1:]))
+        corners = [(lon, lat) for lon in (min_lon, max_lon) for lat in (min_lat, max_lat)]
+        samples = [(rnd.uniform(min_lon, max_lon), rnd.uniform(min_lat, max_lat)) for _ in range(500)]
+        for longitude, latitude in corners + samples:
+            assert covered(ranges, longitude, latitude), (longitude, latitude, max_cells)
+
+
+def test_cover_ranges_pick_finest_level():
+    # 很小的矩形落在一个最细格网内
+    ranges = cover_ranges(116.3, 39.9, 116.3, 39.9)
+    cell = encode_cell(116.3, 39.9)
+    assert ranges == [(cell, cell)]
+
+
+@pytest.mark.parametrize('longitude, latitude', [
+    (116.3913, 39.9075),
+    (0.0, 0.0),
+    (179.999, 30.0),
+    (-179.999, -30.0),
+    (180.0, 0.0),
+    (-180.0, 0.0),
+    (10.0, 80.0),
+    (10.0, 89.99),
+    (-150.0, -89.995),
+    (179.99, 89.99),
+])
+@pytest.mark.parametrize('radius', [50, 2000, 50000])
+def test_circle_bboxes_cover_every_point_in_radius(longitude, latitude, radius):
+    rnd = random.Random(f'{longitude},{latitude},{radius}')
+    boxes = circle_bboxes(longitude, latitude, radius)
+    assert 1 <= len(boxes) <= 2
+    for min_lon, min_lat, max_lon, max_lat in boxes:
+        assert -180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90
+    box_ranges = [(box, cover_ranges(*box)) for box in boxes]
+
+    bearings = [i * 7.5 for i in range(48)] + [rnd.uniform(0, 360) for _ in range(200)]
+    for bearing in bearings:
+        # 圆周上（略向内收，极点附近反三角函数的浮点误差可达厘米级）与圆内的点
+        for distance in (radius * (1 - 1e-3), rnd.uniform(0, radius)):
+            point = destination(longitude, latitude, distance, bearing)
+            assert haversine(longitude, latitude, *point) <= radius * (1 + 1e-6)
+            assert any(in_bbox(box, *point) and covered(ranges, *point) for box, ranges in box_ranges), \
+                (point, bearing, distance)
+
+
+def test_circle_bboxes_split_at_antimeridian():
+    boxes = circle_bboxes(179.99, 0.0, 5000)
+    assert len(boxes) == 2
+    assert boxes[0][2] == 180.0 and boxes[1][0] == -180.0
+    # 包含极点时经度取全范围
+    assert circle_bboxes(10.0, 89.99, 5000)[0][0::2] == (-180.0, 180.0)
+
+
+def test_haversine():
+    assert haversine(116.3913, 39.9075, 116.3913, 39.9075) == 0
+    assert haversine(0, 0, 1, 0) == pytest.approx(111195, rel=1e-4)
+    assert haversine(179.999, 0, -179.999, 0) == pytest.approx(222.4, rel=1e-3)
+
+
+@pytest.fixture
+def located_alarms(session):
+    points = {
+        'tiananmen': (116.3975, 39.9087),
+        'wangfujing': (116.4108, 39.9146),
+        'tongzhou': (116.6566, 39.9097),
+        'east_of_dateline': (179.9995, -16.5),
+        'west_of_dateline': (-179.9995, -16.5),
+        'far_pacific': (-179.5, -16.5),
+        'north_pole_a': (0.0, 89.9995),
+        'north_pole_b': (180.0, 89.9995),
+    }
+    for name, (longitude, latitude) in points.items():
+        session.add(AlarmRecord(event_time=datetime(2025, 6, 1), event_location_address=name,
+                                brief_summary=name, event_location_longitude=longitude,
+                                event_location_latitude=latitude,
+                                event_geocell=encode_cell(longitude, latitude)))
+    session.commit()
+
+
+def nearby(client, longitude, latitude, radius):
+    response = client.get(f'/api/alarm/nearby?lon={longitude}&lat={latitude}&radius={radius}')
+    assert response.status_code == 200
+    return [item['brief_summary'] for item in response.get_json()['items']]
+
+
+def test_nearby_route(app, located_alarms):
+    client = app.test_client()
+    assert nearby(client, 116.3975, 39.9087, 2000) == ['tiananmen', 'wangfujing']
+    assert nearby(client, 116.3975, 39.9087, 50000) == ['tiananmen', 'wangfujing', 'tongzhou']
+    # 跨越 ±180° 经线
+    assert nearby(client, 179.9995, -16.5, 1000) == ['east_of_dateline', 'west_of_dateline']
+    assert nearby(client, -179.9999, -16.5, 1000) == ['west_of_dateline', 'east_of_dateline']
+    # 极点附近经度相差 180° 的两点实际相距约 110 米
+    assert sorted(nearby(client, 90.0, 89.9999, 500)) == ['north_pole_a', 'north_pole_b']
+
+    assert client.get('/api/alarm/nearby?lon=116.4').status_code == 400
+    assert client.get('/api/alarm/nearby?lon=116.4&lat=39.9&radius=0').status_code == 400
+
+
+def test_bbox_route(app, located_alarms):
+    client = app.test_client()
+    response = client.get('/api/alarm/bbox?min_lon=116.39&min_lat=39.90&max_lon=116.42&max_lat=39.92')
+    assert sorted(item['brief_summary'] for item in response.get_json()['items']) == ['tiananmen', 'wangfujing']
+    response = client.get('/api/alarm/bbox?min_lon=179.9&min_lat=-17&max_lon=180&max_lat=-16')
+    assert [item['brief_summary'] for item in response.get_json()['items']] == ['east_of_dateline']
+    response = client.get('/api/alarm/bbox?min_lon=-180&min_lat=89.9&max_lon=180&max_lat=90')
+    assert sorted(item['brief_summary'] for item in response.get_json()['items']) == ['north_pole_a', 'north_pole_b']
+
+    assert client.get('/api/alarm/bbox?min_lon=117&min_lat=39&max_lon=116&max_lat=40').status_code == 400
+    assert client.get('/api/alarm/bbox?min_lon=116&min_lat=39&max_lon=117').status_code == 400
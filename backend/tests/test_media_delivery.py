@@ -0,0 +1,124 @@
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+from src.alarm_dispatch_down.models import DispatchUnit
+from src.alarm_dispatching.models import PoliceOfficer
+from src.alarm_handling.models import EvidenceFile, HandlingRecord
+from src.alarm_unified_access.models import AlarmRecord, MediaFile
+from src.blob_store import store_stream
+
+CONTENT = bytes(range(256)) * 40
+UPLOADED_AT = datetime(2025, 6, 1, 8, 0, 0)
+
+
+@pytest.fixture
+def stored(app, session):
+    blob = store_stream(io.BytesIO(CONTENT))
+    alarm = AlarmRecord(event_time=UPLOADED_AT, event_location_address='建设路1号', brief_summary='有人打架')
+    session.add(alarm)
+    session.flush()
+    media = MediaFile(alarm_record_id=alarm.id, file_path=blob.path, file_name='报警录音.wav',
+                      mime_type='audio/wav', content_hash=blob.sha256, uploaded_at=UPLOADED_AT)
+    unit = DispatchUnit(name='一大队', code='N1', level='大队')
+    session.add_all([media, unit])
+    session.flush()
+    officer = PoliceOfficer(name='张三', badge_number='A001', unit_id=unit.id)
+    session.add(officer)
+    session.flush()
+    record = HandlingRecord(alarm_record_id=alarm.id, handler_id=officer.id)
+    session.add(record)
+    session.flush()
+    evidence = EvidenceFile(handling_record_id=record.id, file_name='现场.jpg', file_path=blob.path,
+                            mime_type='image/jpeg', content_hash=blob.sha256, upload_time=UPLOADED_AT)
+    session.add(evidence)
+    session.commit()
+    return blob, f'/api/alarm/media/{media.id}/content', f'/api/handling/evidence/{evidence.id}/content'
+
+
+def test_full_content_with_private_cache(app, stored):
+    blob, media_url, evidence_url = stored
+    client = app.test_client()
+    response = client.get(media_url)
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert response.mimetype == 'audio/wav'
+    assert response.headers['ETag'] == f'"{blob.sha256}"'
+    assert response.cache_control.private and not response.cache_control.public
+    assert response.cache_control.max_age == 3600
+    assert response.headers['Content-Disposition'].startswith('inline')
+
+    response = client.get(evidence_url + '?download=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    assert response.cache_control.private
+
+
+@pytest.mark.parametrize('range_header, start, end', [
+    ('bytes=0-99', 0, 99),
+    ('bytes=1000-', 1000, len(CONTENT) - 1),
+    ('bytes=-24', len(CONTENT) - 24, len(CONTENT) - 1),
+])
+def test_range_request(app, stored, range_header, start, end):
+    _, media_url, evidence_url = stored
+    client = app.test_client()
+    for url in (media_url, evidence_url):
+        response = client.get(url, headers={'Range': range_header})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f'bytes {start}-{end}/{len(CONTENT)}'
+        assert response.data == CONTENT[start:end + 1]
+
+
+def test_unsatisfiable_range(app, stored):
+    _, media_url, _ = stored
+    response = app.test_client().get(media_url, headers={'Range': f'bytes={len(CONTENT)}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+
+def test_conditional_requests(app, stored):
+    blob, media_url, evidence_url = stored
+    client = app.test_client()
+    for url in (media_url, evidence_url):
+        response = client.get(url, headers={'If-None-Match': f'"{blob.sha256}"'})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.cache_control.private
+    response = client.get(media_url, headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+    response = client.get(media_url, headers={'If-Modified-Since': 'Sun, 01 Jun 2025 09:00:00 GMT'})
+    assert response.status_code == 304
+
+
+def test_accel_redirect(app, stored):
+    blob, media_url, _ = stored
+    app.config['MEDIA_ACCEL_REDIRECT_PREFIX'] = '/protected/'
+    client = app.test_client()
+    response = client.get(media_url, headers={'Range': 'bytes=0-99'})
+    relative = os.path.relpath(blob.path, app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+    # 由 nginx 发送文件并处理 Range
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f'/protected/{relative}'
+    assert response.data == b''
+    assert response.headers['ETag'] == f'"{blob.sha256}"'
+    assert response.cache_control.private
+    assert "filename*=UTF-8''%E6%8A%A5%E8%AD%A6%E5%BD%95%E9%9F%B3.wav" in response.headers['Content-Disposition']
+
+    response = client.get(media_url, headers={'If-None-Match': f'"{blob.sha256}"'})
+    assert response.status_code == 304
+    assert 'X-Accel-Redirect' not in response.headers
+
+
+def test_missing_content(app, session, stored):
+    blob, media_url, _ = stored
+    client = app.test_client()
+    assert client.get('/api/alarm/media/999/content').status_code == 404
+    # 记录指向上传目录之外的文件时不发送
+    MediaFile.query.update({'file_path': os.path.abspath(__file__)})
+    session.commit()
+    response = client.get(media_url)
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Media content not found'}
@@ -0,0 +1,74 @@
+import io
+import os
+
+from sqlalchemy import delete, update
+
+from src import db
+from src.blob_store import acquire_blob, store_stream
+from src.media_integrity import (GENESIS_HASH, IntegrityLogEntry, chain_head, integrity_report, log_table,
+                                 scrub, verify_chain)
+
+
+def store(session, content):
+    blob = store_stream(io.BytesIO(content))
+    acquire_blob(blob)
+    session.commit()
+    return blob
+
+
+def test_chain_valid_after_appends(session):
+    blobs = [store(session, f'recording {i}'.encode()) for i in range(5)]
+    # 已存在的内容不重复登记
+    store(session, b'recording 0')
+
+    result = verify_chain()
+    assert result['valid']
+    assert result['entries'] == 5
+    assert result['head'] == chain_head()['entry_hash']
+    entries = IntegrityLogEntry.query.order_by(IntegrityLogEntry.seq).all()
+    assert [entry.seq for entry in entries] == [1, 2, 3, 4, 5]
+    assert entries[0].prev_hash == GENESIS_HASH
+    assert sorted(entry.sha256 for entry in entries) == sorted(blob.sha256 for blob in blobs)
+
+
+def test_edited_entry_breaks_chain(session):
+    for i in range(4):
+        store(session, f'evidence {i}'.encode())
+    db.session.execute(update(log_table).where(log_table.c.seq == 3).values(sha256='f' * 64))
+    session.commit()
+
+    result = verify_chain()
+    assert not result['valid']
+    assert result['broken_at'] == 3
+    assert result['entries'] == 2
+    assert result['reason'] == 'entry_hash does not match the entry content'
+
+
+def test_deleted_entry_breaks_chain(session):
+    for i in range(4):
+        store(session, f'evidence {i}'.encode())
+    db.session.execute(delete(log_table).where(log_table.c.seq == 2))
+    session.commit()
+
+    result = verify_chain()
+    assert not result['valid']
+    assert result['broken_at'] == 3
+    assert result['reason'] == 'Missing entries before seq 3'
+
+
+def test_scrub_reports_mismatch_and_missing(session):
+    intact = store(session, b'intact recording')
+    modified = store(session, b'modified recording')
+    removed = store(session, b'removed recording')
+    with open(modified.path, 'r+b') as f:
+        f.write(b'M')
+    os.remove(removed.path)
+
+    summary = scrub(bytes_per_second=0)
+    assert summary == {'checked': 3, 'bytes': len(b'intact recording') + len(b'modified recording'),
+                       'ok': 1, 'mismatch': 1, 'missing': 1}
+    assert integrity_report(intact.sha256)['integrity_status'] == 'ok'
+    assert integrity_report(modified.sha256)['integrity_status'] == 'mismatch'
+    assert integrity_report(removed.sha256)['integrity_status'] == 'missing'
+    # 已校验的内容在复查周期内不再读取
+    assert scrub(bytes_per_second=0)['checked'] == 0
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from src import pagination
+from src.alarm_dispatch_down.models import AlarmDispatch, DispatchUnit
+from src.alarm_unified_access.models import AlarmRecord
+from src.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+
+@pytest.fixture
+def dispatches(session):
+    unit = DispatchUnit(name='一大队', code='D1', level='大队')
+    alarm = AlarmRecord(event_time=datetime(2025, 1, 1), event_location_address='建设路1号', brief_summary='测试')
+    session.add_all([unit, alarm])
+    session.flush()
+    base = datetime(2025, 1, 1)
+    # 有重复的派发时间，也有未派发（dispatch_time 为 NULL）的记录
+    times = [base, base + timedelta(hours=1), None, base + timedelta(hours=1), None, base,
+             base + timedelta(hours=2), None, base + timedelta(hours=3), None, base, base + timedelta(hours=2)]
+    rows = [AlarmDispatch(alarm_record_id=alarm.id, unit_id=unit.id, dispatch_time=dispatch_time) for dispatch_time in times]
+    session.add_all(rows)
+    session.flush()
+    # 显式传入 None 时仍会套用列默认值，插入后再置空
+    session.execute(update(AlarmDispatch).where(
+        AlarmDispatch.id.in_([row.id for row, dispatch_time in zip(rows, times) if dispatch_time is None])
+    ).values(dispatch_time=None))
+    session.commit()
+    session.expire_all()
+    return AlarmDispatch.query.all()
+
+
+def walk(per_page):
+    ids = []
+    cursor = ''
+    while True:
+        items, cursor, has_more = keyset_paginate(
+            AlarmDispatch.query, AlarmDispatch.dispatch_time, AlarmDispatch.id, per_page, cursor
+        )
+        ids += [item.id for item in items]
+        if not has_more:
+            return ids
+
+
+def expected_order(rows, nulls_first):
+    timed = sorted((row for row in rows if row.dispatch_time), key=lambda row: (row.dispatch_time, row.id), reverse=True)
+    untimed = sorted((row for row in rows if not row.dispatch_time), key=lambda row: row.id, reverse=True)
+    ordered = untimed + timed if nulls_first else timed + untimed
+    return [row.id for row in ordered]
+
+
+@pytest.mark.parametrize('per_page', [1, 2, 3, 5, 20])
+def test_keyset_pages_cover_null_rows(dispatches, per_page):
+    assert sum(row.dispatch_time is None for row in dispatches) == 4
+    assert walk(per_page) == expected_order(dispatches, nulls_first=False)
+
+
+@pytest.mark.parametrize('per_page', [1, 3, 4])
+def test_keyset_pages_with_nulls_first(monkeypatch, dispatches, per_page):
+    # PostgreSQL 降序时 NULL 排在最前；SQLite 支持 NULLS FIRST，可模拟该顺序
+    monkeypatch.setattr(pagination, 'nulls_first', lambda: True)
+    assert walk(per_page) == expected_order(dispatches, nulls_first=True)
+
+
+def test_cursor_round_trip():
+    moment = datetime(2025, 6, 1, 8, 30)
+    assert decode_cursor(encode_cursor(moment, 42)) == (moment, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from src.phone_region import PhoneRegionTable, build_table, get_table, read_source
+
+ROWS = [
+    ('1380013', '北京', '北京', '中国移动', '010'),
+    ('1380014', '北京', '北京', '中国移动', '010'),
+    ('1390755', '广东', '深圳', '中国移动', '0755'),
+    ('1890100', '北京', '北京', '中国电信', '010'),
+    ('010', '北京', '北京', '', '010'),
+    ('0755', '广东', '深圳', '', '0755'),
+    ('0760', '广东', '中山', '', '0760'),
+    ('021', '上海', '上海', '', '021'),
+]
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = str(tmp_path / 'phone_region.bin')
+    assert build_table(ROWS, path) == len(ROWS)
+    return path
+
+
+@pytest.mark.parametrize('phone, city, carrier', [
+    ('13800138000', '北京', '中国移动'),
+    ('13800149999', '北京', '中国移动'),
+    ('13907551234', '深圳', '中国移动'),
+    ('18901001234', '北京', '中国电信'),
+    ('01012345678', '北京', None),
+    ('075588889999', '深圳', None),
+    ('076012345678', '中山', None),
+    ('02112345678', '上海', None),
+])
+def test_lookup_matches_segment_or_area_code(table_path, phone, city, carrier):
+    region = PhoneRegionTable(table_path).lookup(phone)
+    assert (region['city'], region['carrier']) == (city, carrier)
+
+
+@pytest.mark.parametrize('phone', [
+    '13800150000',   # 相邻号段未收录
+    '075012345678',  # 与 0755 共享前缀的其他区号
+    '02212345678',
+    '1380013',       # 位数不足的手机号
+    '12345',
+    '95588000',      # 非手机号也非固话
+    None,
+])
+def test_lookup_misses(table_path, phone):
+    assert PhoneRegionTable(table_path).lookup(phone) is None
+
+
+def test_lookup_many_keeps_order(table_path):
+    table = PhoneRegionTable(table_path)
+    regions = table.lookup_many(['02112345678', None, '13907551234'])
+    assert [region and region['city'] for region in regions] == ['上海', None, '深圳']
+    assert table.lookup_many([]) == []
+    assert table.region(0)['area_code'] == '010'
+
+
+@pytest.mark.parametrize('rows', [
+    [('0755', '广东', '深圳', '', '0755'), ('07551', '广东', '深圳', '', '0755')],
+    [('138', '', '', '中国移动', ''), ('1380013', '北京', '北京', '中国移动', '010')],
+    [('010', '北京', '北京', '', '010'), ('010', '北京', '北京', '', '010')],
+])
+def test_overlapping_prefixes_rejected(tmp_path, rows):
+    with pytest.raises(ValueError, match='Overlapping prefixes'):
+        build_table(rows, str(tmp_path / 'phone_region.bin'))
+
+
+def test_invalid_prefix_rejected(tmp_path):
+    with pytest.raises(ValueError, match='Invalid prefix'):
+        build_table([('13a', '', '', '', '')], str(tmp_path / 'phone_region.bin'))
+
+
+def test_rebuild_replaces_table_atomically(table_path):
+    old = PhoneRegionTable(table_path)
+    # 编译失败时保留原文件
+    with pytest.raises(ValueError):
+        build_table([('021', '上海', '上海', '', '021'), ('0213', '上海', '上海', '', '021')], table_path)
+    assert PhoneRegionTable(table_path).lookup('02112345678')['city'] == '上海'
+
+    build_table([('021', '上海', '上海', '', '021-new')], table_path)
+    assert not os.path.exists(f'{table_path}.tmp')
+    # 已映射的旧表仍指向被替换前的文件，新映射读到新数据
+    assert old.lookup('13800138000')['city'] == '北京'
+    new = PhoneRegionTable(table_path)
+    assert len(new) == 1
+    assert new.lookup('13800138000') is None
+    assert new.lookup('02112345678')['area_code'] == '021-new'
+
+
+def test_get_table_remaps_replaced_file(app, table_path):
+    app.config['PHONE_REGION_TABLE'] = table_path
+    table = get_table()
+    assert get_table() is table
+
+    build_table([('021', '上海', '上海', '', '021')], table_path)
+    os.utime(table_path, (table.mtime + 1, table.mtime + 1))
+    assert get_table() is not table
+    assert len(get_table()) == 1
+
+    app.config['PHONE_REGION_TABLE'] = table_path + '.missing'
+    assert get_table() is None
+
+
+def test_region_routes(app, table_path):
+    client = app.test_client()
+    assert client.get('/api/alarm/phone_region/13800138000').status_code == 503
+
+    app.config['PHONE_REGION_TABLE'] = table_path
+    response = client.get('/api/alarm/phone_region/+86 138-0013-8000')
+    assert response.status_code == 200
+    assert response.get_json()['normalized'] == '13800138000'
+    assert client.get('/api/alarm/phone_region/110').status_code == 404
+
+    response = client.post('/api/alarm/phone_region', json={'phones': ['010-12345678', 'unknown']})
+    assert [item['region'] and item['region']['city'] for item in response.get_json()['results']] == ['北京', None]
+
+    # 国际格式的固话去掉国家码后补回长途字冠 0，按区号命中
+    response = client.post('/api/alarm/phone_region', json={'phones': ['+86 10 1234 5678', '+86 755 8888 9999']})
+    assert [item['region']['city'] for item in response.get_json()['results']] == ['北京', '深圳']
+
+
+def test_read_source_skips_header_and_comments(tmp_path):
+    source = tmp_path / 'regions.csv'
+    source.write_text('﻿prefix,province,city,carrier,area_code\n# 注释\n\n1380013,北京,北京,中国移动,010\n010,北京,北京\n',
+                      encoding='utf-8')
+    assert list(read_source(str(source))) == [
+        ('1380013', '北京', '北京', '中国移动', '010'),
+        ('010', '北京', '北京', '', ''),
+    ]
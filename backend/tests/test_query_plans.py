@@ -0,0 +1,26 @@
+from src import query_plans
+from src.alarm_dispatching.models import DispatchTask
+from src.query_plans import build_query_shapes, check_query_plans
+
+
+def failures(results):
+    return [(item['endpoint'], item['shape']) for item in results if item['full_scans']]
+
+
+def test_every_list_filter_uses_an_index(session):
+    results, passed = check_query_plans(seed_rows=300)
+    assert failures(results) == []
+    assert passed
+    assert ('list_dispatch_tasks', 'priority') in {(item['endpoint'], item['shape']) for item in results}
+
+
+def test_filter_without_index_fails(session, monkeypatch):
+    shapes = build_query_shapes()
+    # feedback 列上没有索引，只能沿排序索引逐行过滤
+    shapes.append(('list_dispatch_tasks', 'feedback', DispatchTask.query.filter(
+        DispatchTask.feedback == '已到场').order_by(DispatchTask.assigned_time.desc()).limit(10)))
+    monkeypatch.setattr(query_plans, 'build_query_shapes', lambda: shapes)
+
+    results, passed = check_query_plans(seed_rows=300)
+    assert failures(results) == [('list_dispatch_tasks', 'feedback')]
+    assert not passed
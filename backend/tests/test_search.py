@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.alarm_unified_access import search
+from src.alarm_unified_access.models import AlarmRecord
+from src.alarm_unified_access.search import highlight, query_terms, search_alarms, tokenize, top_hits
+
+
+def test_tokenize():
+    assert list(tokenize('建设路88号 ＡＢｃ')) == ['建设', '设路', '88', '号', 'abc']
+    assert list(tokenize('')) == []
+    assert list(tokenize(None)) == []
+    assert list(tokenize('x' * 40)) == ['x' * 32]
+
+
+def test_query_terms_drop_single_characters_and_duplicates():
+    assert query_terms('盗 被盗 被盗 A栋') == ['被盗', 'a']
+    assert query_terms('盗') == []
+
+
+def test_highlight_merges_overlapping_bigrams():
+    assert highlight('有人入室盗窃，撬门', query_terms('入室盗窃')) == '有人<em>入室盗窃</em>，撬门'
+    assert highlight('两车追尾', query_terms('被盗')) is None
+    assert highlight(None, ['被盗']) is None
+
+
+
+def test_highlight_matches_normalized_text():
+    # 全角字母数字按 NFKC 规范化后建索引，高亮时同样规范化，标记的是原文
+    assert highlight('幸福小区１２３号楼', query_terms('123')) == '幸福小区<em>１２３</em>号楼'
+    assert highlight('车牌ＡＢＣ被盗', query_terms('abc 被盗')) == '车牌<em>ＡＢＣ被盗</em>'
+    # 规范化后长度变化的字符与组合字符
+    assert highlight('Cafe\u0301 见面', query_terms('café')) == '<em>Caf</em>e\u0301 见面'
+    assert highlight('ﬁle 丢失', query_terms('file')) == '<em>ﬁle</em> 丢失'
+
+def test_highlight_escapes_and_trims():
+    text = '甲' * 50 + '<b>电动车被盗</b>' + '乙' * 100
+    snippet = highlight(text, query_terms('被盗'))
+    assert snippet.startswith('…') and snippet.endswith('…')
+    assert '&lt;b&gt;电动车<em>被盗</em>&lt;/b&gt;' in snippet
+    assert '<b>' not in snippet
+
+
+@pytest.fixture
+def alarms(session):
+    rnd = random.Random(7)
+    cities = ['北京', '上海', '广州']
+    streets = ['建设路', '人民路', '火车站']
+    base = datetime(2025, 1, 1)
+    for index in range(400):
+        session.add(AlarmRecord(
+            alarm_time=base + timedelta(hours=index),
+            event_time=base + timedelta(hours=index),
+            event_location_address=f'{rnd.choice(cities)}市{rnd.choice(streets)}{rnd.randint(1, 99)}号',
+            brief_summary=rnd.choice(['电动车被盗', '两车追尾', '邻居噪音扰民']) + rnd.choice(['', '北京', '北京北京']),
+        ))
+    session.commit()
+
+
+def expected(session, q, limit, start_date=None, end_date=None):
+    return session.execute(search._matching_hits(query_terms(q), start_date, end_date).limit(limit)).all()
+
+
+@pytest.mark.parametrize('q', ['北京', '北京 建设路', '上海 北京', '广州市火车站'])
+@pytest.mark.parametrize('limit', [1, 11, 50])
+def test_top_hits_matches_full_ranking(monkeypatch, session, alarms, q, limit):
+    # 小批量读取，迫使阈值算法经过多轮才停止
+    monkeypatch.setattr(search, 'SEARCH_SCAN_BATCH', 3)
+    hits = top_hits(query_terms(q), limit)
+    assert hits == [tuple(row) for row in expected(session, q, limit)]
+
+
+def test_top_hits_with_dates(session, alarms):
+    start, end = datetime(2025, 1, 5), datetime(2025, 1, 9)
+    hits = top_hits(query_terms('北京 人民路'), 20, start, end)
+    assert hits == [tuple(row) for row in expected(session, '北京 人民路', 20, start, end)]
+    alarms = {alarm.id: alarm for alarm in AlarmRecord.query.filter(AlarmRecord.id.in_([a for a, _ in hits]))}
+    assert all(start <= alarms[alarm_id].alarm_time <= end for alarm_id, _ in hits)
+
+
+def test_top_hits_gives_up_after_scan_limit(monkeypatch, session, alarms):
+    monkeypatch.setattr(search, 'SEARCH_SCAN_BATCH', 3)
+    monkeypatch.setattr(search, 'SEARCH_SCAN_LIMIT', 10)
+    assert top_hits(query_terms('上海 北京'), 11) is None
+    # 放弃阈值算法后改为连接查询，结果不变
+    result = search_alarms('上海 北京', per_page=5, page=2, with_total=True)
+    rows = expected(session, '上海 北京', 11)
+    assert [item['id'] for item in result['items']] == [alarm_id for alarm_id, _ in rows[5:10]]
+    assert result['has_more'] is True
+    assert result['total'] == len(expected(session, '上海 北京', 1000))
+
+
+
+def test_top_hits_gives_up_when_terms_rarely_co_occur(monkeypatch, session, alarms):
+    monkeypatch.setattr(search, 'SEARCH_SCAN_BATCH', 3)
+    # 首轮读到的警情中没有同时命中全部词项的，不再继续读取
+    for q in ('被盗 追尾', '建设路 人民路'):
+        assert top_hits(query_terms(q), 11) is None
+        assert search_alarms(q, with_total=True)['items'] == []
+
+def test_search_pages(session, alarms):
+    first = search_alarms('北京', per_page=10)
+    second = search_alarms('北京', per_page=10, page=2)
+    ids = [alarm_id for alarm_id, _ in expected(session, '北京', 20)]
+    assert [item['id'] for item in first['items'] + second['items']] == ids
+    assert first['items'][0]['highlights']
+
+
+def test_full_width_hit_is_highlighted(session):
+    session.add(AlarmRecord(event_time=datetime(2025, 6, 1), event_location_address='幸福小区１２３号楼',
+                            brief_summary='车牌ＡＢＣ１２３４被刮'))
+    session.commit()
+    items = search_alarms('abc1234')['items']
+    assert len(items) == 1
+    assert items[0]['highlights'] == {'brief_summary': '车牌<em>ＡＢＣ１２３４</em>被刮'}
+    items = search_alarms('123号楼')['items']
+    assert items[0]['highlights'] == {'brief_summary': '车牌ＡＢＣ<em>１２３</em>４被刮',
+                                      'event_location_address': '幸福小区<em>１２３号楼</em>'}
@@ -0,0 +1,130 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src import db
+from src.alarm_dispatch_down.models import DispatchUnit
+from src.alarm_dispatching.models import DispatchGroup, DispatchGroupMember, DispatchTask, PoliceOfficer
+from src.alarm_handling.models import EvidenceFile, HandlingLog, HandlingRecord
+from src.alarm_unified_access.models import AlarmRecord, MediaFile, Transcription
+
+ROWS = 30
+BASE = datetime(2025, 6, 1)
+
+
+@pytest.fixture
+def related(session):
+    """每条记录都带有可展开的关联对象"""
+    unit = DispatchUnit(name='一大队', code='N1', level='大队')
+    session.add(unit)
+    session.flush()
+    officers = [PoliceOfficer(name=f'警员{i}', badge_number=f'A{i:03d}', unit_id=unit.id) for i in range(3)]
+    session.add_all(officers)
+    session.flush()
+    for i in range(ROWS):
+        moment = BASE + timedelta(minutes=i)
+        alarm = AlarmRecord(alarm_time=moment, event_time=moment, event_location_address=f'建设路{i}号',
+                            brief_summary=f'报警 {i}')
+        session.add(alarm)
+        session.flush()
+        session.add_all([MediaFile(alarm_record_id=alarm.id, file_path=f'{i}-{n}.wav', file_name=f'{n}.wav')
+                         for n in range(2)])
+        session.add(Transcription(alarm_record_id=alarm.id, content=f'转写 {i}', status='completed'))
+        session.add(DispatchTask(alarm_record_id=alarm.id, officer_id=officers[i % 3].id, assigned_time=moment))
+        group = DispatchGroup(alarm_record_id=alarm.id, name=f'组{i}', leader_id=officers[0].id, created_at=moment)
+        group.members = [DispatchGroupMember(officer_id=officer.id, role='member') for officer in officers[1:]]
+        session.add(group)
+        record = HandlingRecord(alarm_record_id=alarm.id, handler_id=officers[i % 3].id, created_at=moment)
+        record.evidence_files = [EvidenceFile(file_name='现场.jpg', file_path=f'{i}.jpg')]
+        record.handling_logs = [HandlingLog(action='create', status='pending', operator='张三', operator_id=1)]
+        session.add(record)
+    session.commit()
+    session.expunge_all()
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def fetch(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['items']
+
+
+@pytest.mark.parametrize('url, expand', [
+    ('/api/alarm/', 'associated_media,transcription'),
+    ('/api/dispatching/tasks', 'officer'),
+    ('/api/dispatching/groups', 'leader,members'),
+    ('/api/handling/records', 'handler,evidence_files,handling_logs'),
+])
+@pytest.mark.parametrize('paging', ['page=1', 'cursor='])
+def test_expand_does_not_query_per_row(app, related, url, expand, paging):
+    client = app.test_client()
+    counts = []
+    for per_page in (5, 25):
+        with count_queries() as statements:
+            items = fetch(client, f'{url}?{paging}&per_page={per_page}&expand={expand}')
+        assert len(items) == per_page
+        for name in expand.split(','):
+            assert all(name in item for item in items)
+        counts.append(len(statements))
+    # 查询次数与每页条数无关
+    assert counts[0] == counts[1]
+    assert counts[0] <= 2 + len(expand.split(','))
+
+
+def test_default_expands_everything_without_extra_queries(app, related):
+    client = app.test_client()
+    counts = []
+    for per_page in (5, 25):
+        with count_queries() as statements:
+            items = fetch(client, f'/api/alarm/?per_page={per_page}')
+        assert len(items[0]['associated_media']) == 2
+        assert items[0]['transcription']['content'].startswith('转写')
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_fields_return_only_requested_keys(app, related):
+    client = app.test_client()
+    with count_queries() as statements:
+        items = fetch(client, '/api/alarm/?per_page=5&fields=id,alarm_time,status')
+    assert [set(item) for item in items] == [{'id', 'alarm_time', 'status'}] * 5
+    assert items[0]['alarm_time'] == (BASE + timedelta(minutes=ROWS - 1)).isoformat()
+    # 列裁剪下推到 SQL
+    select_list = next(statement for statement in statements if 'LIMIT' in statement).split('FROM')[0]
+    assert 'brief_summary' not in select_list and 'alarm_records.status' in select_list
+
+    # 指定 fields 时只展开显式列出的关联对象
+    items = fetch(client, '/api/dispatching/groups?per_page=3&fields=name&expand=members')
+    assert [set(item) for item in items] == [{'name', 'members'}] * 3
+    assert len(items[0]['members']) == 2
+    # 排序键必须读取，但不输出
+    items = fetch(client, '/api/handling/records?cursor=&per_page=3&fields=status')
+    assert items == [{'status': 'pending'}] * 3
+    # 空的 fields 只输出 id
+    items = fetch(client, '/api/dispatching/tasks?per_page=2&fields=,')
+    assert [set(item) for item in items] == [{'id'}] * 2
+
+
+@pytest.mark.parametrize('query, message', [
+    ('fields=id,password', 'Unknown fields: password'),
+    ('fields=associated_media', 'Unknown fields: associated_media'),
+    ('expand=dispatch_tasks', 'Unknown expand fields: dispatch_tasks'),
+])
+def test_unknown_fields_rejected(app, related, query, message):
+    response = app.test_client().get(f'/api/alarm/?{query}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': message}
@@ -0,0 +1,120 @@
+import json
+import subprocess
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+# 先加载蓝图（其中导入 tasks），直接导入 tasks 会形成循环导入；
+# 任务以 .run 在测试的应用上下文中执行（Celery 的 ContextTask 绑定的是最先创建的应用）
+from src.alarm_unified_access.models import AlarmRecord, MediaFile, Transcription, TranscriptionSegment
+from src import media_probe, tasks  # noqa: E402
+
+
+@pytest.fixture
+def alarm(session):
+    alarm = AlarmRecord(event_time=datetime(2025, 6, 1, 8), event_location_address='建设路1号',
+                        brief_summary='有人打架')
+    session.add(alarm)
+    session.commit()
+    return alarm
+
+
+@pytest.fixture
+def segmented(session, alarm):
+    transcription = Transcription(alarm_record_id=alarm.id, content='', status='processing',
+                                  speech_regions=[[0.0, 5.0], [30.0, 35.0]])
+    transcription.segments = [
+        TranscriptionSegment(segment_index=0, start_time=0.0, end_time=10.0, status='pending'),
+        TranscriptionSegment(segment_index=1, start_time=25.0, end_time=40.0, status='pending'),
+    ]
+    session.add(transcription)
+    session.commit()
+    return transcription
+
+
+def test_segment_survives_failed_refresh(session, segmented, monkeypatch):
+    monkeypatch.setattr(tasks, 'load_pcm', lambda path: [])
+    monkeypatch.setattr(tasks, 'recognize_speech', lambda samples, regions: f'片段{regions[0][0]:.0f}')
+    refresh = tasks.refresh_transcription_content
+
+    def lock_timeout(transcription_id):
+        raise OperationalError('SELECT ... FOR UPDATE', {}, Exception('lock wait timeout'))
+    monkeypatch.setattr(tasks, 'refresh_transcription_content', lock_timeout)
+
+    # 拼接失败不让片段任务失败，否则 chord 不会执行汇总任务
+    first, second = segmented.segments
+    assert tasks.transcribe_segment.run(None, first.id)['status'] == 'success'
+    assert session.get(TranscriptionSegment, first.id).status == 'completed'
+
+    monkeypatch.setattr(tasks, 'refresh_transcription_content', refresh)
+    assert tasks.transcribe_segment.run(None, second.id)['status'] == 'success'
+    assert tasks.finish_segmented_transcription.run([], segmented.id)['status'] == 'completed'
+    transcription = session.get(Transcription, segmented.id)
+    assert transcription.status == 'completed'
+    assert '片段0' in transcription.content and '片段30' in transcription.content
+
+
+@pytest.fixture
+def media(session, alarm):
+    media = MediaFile(alarm_record_id=alarm.id, file_path='/data/call.mp4', file_name='call.mp4',
+                      media_type='video', probe_status='pending')
+    session.add(media)
+    session.commit()
+    return media
+
+
+def fake_ffprobe(monkeypatch, returncode=0, output=None, stderr=''):
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode, json.dumps(output or {}), stderr)
+    monkeypatch.setattr(media_probe.subprocess, 'run', run)
+    return calls
+
+
+def test_probe_stores_metadata(session, media, monkeypatch):
+    calls = fake_ffprobe(monkeypatch, output={
+        'streams': [
+            {'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '44100'},
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1280, 'height': 720},
+        ],
+        'format': {'duration': '95.62'},
+    })
+    assert tasks.probe_media_metadata.run(media.id)['status'] == 'success'
+    assert calls[0][0] == 'ffprobe' and calls[0][-1] == '/data/call.mp4'
+
+    media = session.get(MediaFile, media.id)
+    # 有视频流时编码取视频流，采样率取音频流
+    assert (media.duration, media.codec, media.sample_rate) == (95, 'h264', 44100)
+    assert (media.width, media.height) == (1280, 720)
+    assert (media.probe_status, media.probe_error) == ('completed', None)
+
+
+def test_probe_audio_only(session, media, monkeypatch):
+    fake_ffprobe(monkeypatch, output={
+        'streams': [{'codec_type': 'audio', 'codec_name': 'pcm_s16le', 'sample_rate': '8000'}],
+        'format': {},
+    })
+    tasks.probe_media_metadata.run(media.id)
+    media = session.get(MediaFile, media.id)
+    assert (media.duration, media.codec, media.sample_rate, media.width) == (None, 'pcm_s16le', 8000, None)
+
+
+def test_probe_failure_is_recorded(session, media, monkeypatch):
+    fake_ffprobe(monkeypatch, returncode=1, stderr='call.mp4: Invalid data found when processing input\n')
+    result = tasks.probe_media_metadata.run(media.id)
+    assert result['status'] == 'error'
+
+    media = session.get(MediaFile, media.id)
+    assert media.probe_status == 'failed'
+    assert media.probe_error == 'ffprobe failed: call.mp4: Invalid data found when processing input'
+    assert media.duration is None
+
+    def timeout(cmd, **kwargs):
+        raise subprocess.TimeoutExpired(cmd, kwargs['timeout'])
+    monkeypatch.setattr(media_probe.subprocess, 'run', timeout)
+    tasks.probe_media_metadata.run(media.id)
+    assert session.get(MediaFile, media.id).probe_error.startswith('ffprobe failed: Command')
+    assert tasks.probe_media_metadata.run(999)['status'] == 'error'
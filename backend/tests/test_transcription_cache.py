@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from src import transcription_cache
+from src.alarm_unified_access.models import TranscriptionCache
+
+CONTENT_HASH = 'a' * 64
+
+
+def result(content='我家门口有人打架', asr_seconds=2.5):
+    return SimpleNamespace(content=content, audio_duration=30.0, speech_duration=12.0,
+                           speech_regions=[[0.5, 12.5]]), asr_seconds
+
+
+def test_store_then_lookup_counts_hit(session):
+    transcription, asr_seconds = result()
+    transcription_cache.store(CONTENT_HASH, transcription, asr_seconds)
+    session.commit()
+
+    before = transcription_cache.stats()
+    entry = transcription_cache.lookup(CONTENT_HASH)
+    session.commit()
+    after = transcription_cache.stats()
+
+    assert entry.content == '我家门口有人打架'
+    assert entry.speech_regions == [[0.5, 12.5]]
+    assert entry.hit_count == 1
+    assert after['hits'] == before['hits'] + 1
+    assert after['saved_asr_seconds'] == round(before['saved_asr_seconds'] + 2.5, 3)
+
+
+def test_lookup_miss(session):
+    before = transcription_cache.stats()['misses']
+    assert transcription_cache.lookup(CONTENT_HASH) is None
+    assert transcription_cache.lookup(CONTENT_HASH, record_miss=False) is None
+    assert transcription_cache.lookup(None) is None
+    assert transcription_cache.stats()['misses'] == before + 1
+
+
+def test_concurrent_store_keeps_first_result(session):
+    first, asr_seconds = result('先写入的结果')
+    transcription_cache.store(CONTENT_HASH, first, asr_seconds)
+    session.commit()
+    # 另一进程已写入同一键：唯一约束冲突只回滚保存点，会话仍可提交
+    second, asr_seconds = result('后写入的结果')
+    transcription_cache.store(CONTENT_HASH, second, asr_seconds)
+    session.commit()
+
+    entries = TranscriptionCache.query.filter_by(content_hash=CONTENT_HASH).all()
+    assert [entry.content for entry in entries] == ['先写入的结果']
+
+
+def test_model_version_mismatch_is_a_miss(app, session):
+    app.config['ASR_MODEL_VERSION'] = 'paraformer-v1'
+    transcription, asr_seconds = result()
+    transcription_cache.store(CONTENT_HASH, transcription, asr_seconds)
+    session.commit()
+
+    app.config['ASR_MODEL_VERSION'] = 'paraformer-v2'
+    assert transcription_cache.lookup(CONTENT_HASH) is None
+    assert transcription_cache.stats()['entries'] == 0
+
+    app.config['ASR_MODEL_VERSION'] = 'paraformer-v1'
+    assert transcription_cache.lookup(CONTENT_HASH) is not None
+
+
+def test_vad_only_empty_result_not_reused(session):
+    transcription, _ = result(content='')
+    transcription_cache.store(CONTENT_HASH, transcription, 0)
+    session.commit()
+    assert transcription_cache.lookup(CONTENT_HASH) is None
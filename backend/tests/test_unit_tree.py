@@ -0,0 +1,55 @@
+import pytest
+
+from src.alarm_dispatch_down.models import DispatchUnit, DispatchUnitClosure
+from src.alarm_dispatch_down.unit_tree import ancestors, descendants, is_in_subtree
+
+
+@pytest.fixture
+def units(session):
+    north = DispatchUnit(name='北区支队', code='N', level='支队')
+    south = DispatchUnit(name='南区支队', code='S', level='支队')
+    # 上级与下级在同一次 flush 中新增
+    brigade = DispatchUnit(name='一大队', code='N1', level='大队', parent=north)
+    station = DispatchUnit(name='一站', code='N1a', level='工作站', parent=brigade)
+    session.add_all([north, south, brigade, station])
+    session.commit()
+    return north, south, brigade, station
+
+
+def paths(session):
+    return {(row.ancestor_id, row.descendant_id): row.depth for row in DispatchUnitClosure.query}
+
+
+def test_closure_for_new_units(session, units):
+    north, south, brigade, station = units
+    assert paths(session) == {
+        (north.id, north.id): 0, (south.id, south.id): 0, (brigade.id, brigade.id): 0, (station.id, station.id): 0,
+        (north.id, brigade.id): 1, (north.id, station.id): 2, (brigade.id, station.id): 1,
+    }
+    assert [(unit.id, depth) for unit, depth in descendants(north.id)] == [(brigade.id, 1), (station.id, 2)]
+    assert ancestors(station.id) == [north, brigade]
+
+
+def test_reparent_moves_whole_subtree(session, units):
+    north, south, brigade, station = units
+    brigade.parent_id = south.id
+    session.commit()
+
+    assert descendants(north.id) == []
+    assert [unit for unit, _ in descendants(south.id)] == [brigade, station]
+    assert ancestors(station.id) == [south, brigade]
+    assert is_in_subtree(south.id, station.id)
+    assert not is_in_subtree(north.id, station.id)
+    assert paths(session)[(south.id, station.id)] == 2
+
+
+def test_detach_and_delete(session, units):
+    north, south, brigade, station = units
+    brigade.parent = None
+    session.commit()
+    assert ancestors(station.id) == [brigade]
+    assert descendants(north.id) == []
+
+    session.delete(station)
+    session.commit()
+    assert all(station.id not in pair for pair in paths(session))
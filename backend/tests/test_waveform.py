@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.alarm_unified_access.models import AlarmRecord, MediaFile
+from src.waveform import (BASE_SAMPLES_PER_PEAK, MIN_PEAKS, build_levels, read_header, read_level,
+                          waveform_path, write_waveform)
+
+SAMPLE_RATE = 16000
+CONTENT_HASH = 'ab' * 32
+
+
+def pcm(count, seed=3):
+    return np.random.default_rng(seed).integers(-32768, 32768, count, dtype=np.int16)
+
+
+def expected_peaks(samples, samples_per_peak):
+    peaks = []
+    for begin in range(0, len(samples), samples_per_peak):
+        frame = [int(value) for value in samples[begin:begin + samples_per_peak]]
+        peaks.append((min(frame) >> 8, max(frame) >> 8))
+    return peaks
+
+
+def test_levels_hold_min_max_of_each_span():
+    # 末尾不足一个峰值宽度，且峰值数为奇数的级别需要补齐
+    samples = pcm(BASE_SAMPLES_PER_PEAK * 1500 + 100)
+    levels = build_levels(samples)
+    assert [spp for spp, _ in levels] == [BASE_SAMPLES_PER_PEAK << i for i in range(len(levels))]
+    assert len(levels[-1][1]) <= MIN_PEAKS * 2 < len(levels[-2][1])
+    for samples_per_peak, peaks in levels:
+        assert peaks.dtype == np.int8
+        assert [tuple(peak) for peak in peaks.tolist()] == expected_peaks(samples, samples_per_peak)
+
+
+def test_short_recording_has_one_level():
+    samples = np.array([0, -256, 512, 32767, -32768, 100], dtype=np.int16)
+    levels = build_levels(samples)
+    assert len(levels) == 1
+    assert levels[0][1].tolist() == [[-128, 127]]
+
+
+@pytest.fixture
+def sidecar(app):
+    samples = pcm(BASE_SAMPLES_PER_PEAK * 2000)
+    levels = build_levels(samples)
+    path = waveform_path(CONTENT_HASH)
+    write_waveform(path, levels, SAMPLE_RATE, len(samples))
+    return path, levels, len(samples)
+
+
+def test_sidecar_round_trip(sidecar):
+    path, levels, total = sidecar
+    with open(path, 'rb') as f:
+        sample_rate, total_samples, table = read_header(f)
+    assert (sample_rate, total_samples) == (SAMPLE_RATE, total)
+    assert [(spp, count) for spp, count, _ in table] == [(spp, len(peaks)) for spp, peaks in levels]
+
+    for samples_per_peak, peaks in levels:
+        level = read_level(path, len(peaks))
+        assert level['samples_per_peak'] == samples_per_peak
+        assert level['peak_count'] == len(peaks)
+        assert level['data'] == peaks.tobytes()
+
+
+def test_level_selection_by_width(sidecar):
+    path, levels, _ = sidecar
+    counts = [len(peaks) for _, peaks in levels]
+    # 取峰值数不少于 width 的最粗一级
+    assert read_level(path, 1)['peak_count'] == counts[-1]
+    assert read_level(path, counts[-1] + 1)['peak_count'] == counts[-2]
+    assert read_level(path, counts[1])['peak_count'] == counts[1]
+    # 超过最细一级时取最细一级
+    assert read_level(path, counts[0] * 10)['peak_count'] == counts[0]
+
+
+@pytest.fixture
+def media(session):
+    alarm = AlarmRecord(event_time=datetime(2025, 6, 1), event_location_address='建设路1号', brief_summary='报警')
+    session.add(alarm)
+    session.flush()
+    media = MediaFile(alarm_record_id=alarm.id, file_path='call.wav', file_name='call.wav',
+                      content_hash=CONTENT_HASH, waveform_status='completed', uploaded_at=datetime(2025, 6, 1))
+    session.add(media)
+    session.commit()
+    return media
+
+
+def test_waveform_route(app, sidecar, media):
+    path, levels, total = sidecar
+    client = app.test_client()
+    url = f'/api/alarm/media/{media.id}/waveform'
+
+    coarse_spp, coarse = levels[-1]
+    response = client.get(f'{url}?width=100')
+    assert response.status_code == 200
+    assert response.data == coarse.tobytes()
+    assert response.headers['X-Samples-Per-Peak'] == str(coarse_spp)
+    assert response.headers['X-Peak-Count'] == str(len(coarse))
+    assert response.headers['X-Total-Samples'] == str(total)
+    assert response.cache_control.private
+
+    data = client.get(f'{url}?width=100&format=json').get_json()
+    assert data['peaks'] == coarse.flatten().tolist()
+    assert data['sample_rate'] == SAMPLE_RATE
+
+    etag = response.headers['ETag']
+    assert client.get(f'{url}?width=100', headers={'If-None-Match': etag}).status_code == 304
+
+    with open(path, 'rb') as f:
+        assert client.get(url).data == f.read()
+    assert client.get(f'{url}?width=0').status_code == 400
+
+
+def test_waveform_route_without_sidecar(app, session, media):
+    client = app.test_client()
+    url = f'/api/alarm/media/{media.id}/waveform'
+    # 已完成但波形文件不在（如被清理）
+    for query in ('', '?width=100'):
+        response = client.get(url + query)
+        assert response.status_code == 404
+
+    media.waveform_status = 'pending'
+    session.commit()
+    response = client.get(f'{url}?width=100')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Waveform is not available', 'waveform_status': 'pending'}
+    assert client.get('/api/alarm/media/999/waveform').status_code == 404